@@ -0,0 +1,125 @@
+"""
+Latency benchmark: split (one process per service) vs in-process deployment.
+
+Starts the gateway both ways with uvicorn and times gateway endpoints that
+need no external APIs:
+  - POST /api/recommendations/merge     gateway -> recommender
+  - GET  /api/recommendations/progress  gateway -> recommender
+
+Usage:
+    python -m benchmarks.bench_inprocess
+    python -m benchmarks.bench_inprocess --requests 500 --recs 200
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+GATEWAY_PORT = 5055
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def start(module: str, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def make_payload(n: int) -> dict:
+    return {
+        "lastfm_recommendations": [
+            {"album_info": {"name": f"Album {i}", "artists": [{"name": f"Artist {i % 50}"}]}, "score": n - i}
+            for i in range(n)
+        ],
+        "artist_recommendations": [
+            {"album_name": f"Album {i * 2}", "artist_name": f"Artist {(i * 2) % 50}", "rating": 4.0}
+            for i in range(n)
+        ],
+    }
+
+
+def timed(client: httpx.Client, requests: int, method: str, path: str, **kwargs) -> List[float]:
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        resp = client.request(method, path, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+        resp.raise_for_status()
+    return samples
+
+
+def summarize(samples: List[float]) -> str:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    return f"p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   mean {statistics.fmean(samples):7.2f} ms"
+
+
+def run_mode(name: str, modules: List[tuple], requests: int, payload: dict):
+    procs = [start(module, port) for module, port in modules]
+    try:
+        base = f"http://127.0.0.1:{GATEWAY_PORT}"
+        wait_until_up(f"{base}/api/recommendations/progress")
+        if any(port == 3002 for _, port in modules):
+            wait_until_up("http://127.0.0.1:3002/health")
+
+        with httpx.Client(base_url=base, timeout=30.0) as client:
+            # warm-up
+            timed(client, 10, "POST", "/api/recommendations/merge", json=payload)
+            merge = timed(client, requests, "POST", "/api/recommendations/merge", json=payload)
+            progress = timed(client, requests, "GET", "/api/recommendations/progress")
+
+        print(f"\n{name}")
+        print(f"  merge     {summarize(merge)}")
+        print(f"  progress  {summarize(progress)}")
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split vs in-process latency")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--recs", type=int, default=100, help="recommendations per source in the merge payload")
+    args = parser.parse_args()
+
+    payload = make_payload(args.recs)
+    print(f"{args.requests} requests per endpoint, {args.recs} recs per source")
+
+    run_mode("split (HTTP between services)", [
+        ("services.recommender.main:app", 3002),
+        ("gateway.main:app", GATEWAY_PORT),
+    ], args.requests, payload)
+
+    run_mode("in-process (ASGI transport)", [
+        ("gateway.inprocess:app", GATEWAY_PORT),
+    ], args.requests, payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark for the per-call cost of log_event on the request path.
+
+Compares the previous synchronous log_event (f-string + stdlib logging
+handler writing to the stream + return dict) with the queued pipeline in
+libs/shared/log_pipeline.py, for:
+
+- an INFO event with an eager f-string (unchanged call sites)
+- an INFO event with lazy %-args (hot loops)
+- a DEBUG event below the configured level
+- a DEBUG event with sampling (LOG_LEVEL=DEBUG, 10% kept)
+
+Both write to os.devnull, so the numbers are the caller-side overhead
+without terminal I/O; with a real pipe or file the synchronous path only
+gets slower.
+
+Usage:
+    python -m benchmarks.bench_logging
+    python -m benchmarks.bench_logging --calls 200000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.shared.log_pipeline import LogPipeline
+
+_legacy_logger = logging.getLogger("bench.legacy")
+
+
+def legacy_log_event(service: str, level: str, message: str, data: Optional[dict] = None):
+    """Previous libs.shared.utils.log_event, kept as the "before" reference"""
+    timestamp = datetime.utcnow().isoformat()
+    log_msg = f"[{timestamp}] [{service}] [{level}] {message}"
+
+    if level == "ERROR":
+        _legacy_logger.error(log_msg, extra={"data": data})
+    elif level == "WARNING":
+        _legacy_logger.warning(log_msg, extra={"data": data})
+    elif level == "INFO":
+        _legacy_logger.info(log_msg, extra={"data": data})
+    else:
+        _legacy_logger.debug(log_msg, extra={"data": data})
+
+    return {
+        "service": service,
+        "level": level,
+        "message": message,
+        "timestamp": timestamp,
+        "data": data,
+    }
+
+
+def per_call_us(fn: Callable[[int], None], calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    handler = logging.StreamHandler(devnull)
+    _legacy_logger.addHandler(handler)
+    _legacy_logger.propagate = False
+
+    info_pipeline = LogPipeline(stream=devnull, level="INFO", max_queue=args.calls * 2)
+    debug_pipeline = LogPipeline(stream=devnull, level="DEBUG", debug_sample_rate=0.1, max_queue=args.calls * 2)
+
+    artist, album, total = "Radiohead", "OK Computer", 50
+
+    def legacy(level: str):
+        return lambda i: legacy_log_event("gateway", level, f"[{i}/{total}] Processing: {artist} - {album}")
+
+    # (name, legacy logger level, legacy call, pipeline call)
+    cases = [
+        ("INFO, f-string", logging.INFO,
+         legacy("INFO"),
+         lambda i: info_pipeline.submit("gateway", "INFO", f"[{i}/{total}] Processing: {artist} - {album}", (), None)),
+        ("INFO, lazy args", logging.INFO,
+         legacy("INFO"),
+         lambda i: info_pipeline.submit("gateway", "INFO", "[%d/%d] Processing: %s - %s", (i, total, artist, album), None)),
+        ("DEBUG, below level", logging.INFO,
+         legacy("DEBUG"),
+         lambda i: info_pipeline.submit("gateway", "DEBUG", "[%d/%d] Trying release %d", (i, total, i), None)),
+        ("DEBUG, sampled 10%", logging.DEBUG,
+         legacy("DEBUG"),
+         lambda i: debug_pipeline.submit("gateway", "DEBUG", "[%d/%d] Trying release %d", (i, total, i), None)),
+    ]
+
+    print(f"log_event per-call overhead, {args.calls:,} calls (µs/call)\n")
+    print(f"{'case':<22} {'legacy':>10} {'pipeline':>10} {'speedup':>9}")
+    for name, legacy_level, legacy_fn, new_fn in cases:
+        _legacy_logger.setLevel(legacy_level)
+        legacy_us = per_call_us(legacy_fn, args.calls)
+        new_us = per_call_us(new_fn, args.calls)
+        print(f"{name:<22} {legacy_us:>10.2f} {new_us:>10.2f} {legacy_us / new_us:>8.1f}x")
+
+    start = time.perf_counter()
+    info_pipeline.flush(timeout=30)
+    debug_pipeline.flush(timeout=30)
+    print(f"\nBackground writer drained the queue in {time.perf_counter() - start:.2f}s")
+    print(f"INFO pipeline:  {info_pipeline.stats()}")
+    print(f"DEBUG pipeline: {debug_pipeline.stats()}")
+    info_pipeline.close()
+    debug_pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Memory benchmark for StudioAlbum and AlbumData.
+
+Measures the per-record footprint with tracemalloc for the previous plain
+classes (per-instance __dict__, AlbumData holding every track dict) and the
+current slotted/frozen dataclasses.
+
+Usage:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --records 50000 --tracks-per-album 12
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.recommender.artist_recommendations import StudioAlbum
+from services.recommender.album_aggregator import AlbumData
+
+
+# ---------------------------------------------------------------------------
+# Previous representations, kept here as the "before" reference
+# ---------------------------------------------------------------------------
+
+class LegacyStudioAlbum:
+    def __init__(self, title: str, year: str, discogs_master_id: Optional[str],
+                 artist_name: str, rating: Optional[float] = None,
+                 votes: Optional[int] = None, cover_image: Optional[str] = None,
+                 discogs_release_id: Optional[str] = None, discogs_type: str = "master"):
+        self.title = title
+        self.year = year
+        self.discogs_master_id = discogs_master_id
+        self.discogs_release_id = discogs_release_id
+        self.discogs_type = discogs_type
+        self.artist_name = artist_name
+        self.rating = rating
+        self.votes = votes
+        self.cover_image = cover_image
+
+
+class LegacyAlbumData:
+    def __init__(self):
+        self.tracks: List[dict] = []
+        self.total_score: float = 0
+        self.artists: Set[str] = set()
+        self.album_info = None
+        self.score_by_period: Dict[str, float] = {"short_term": 0, "medium_term": 0, "long_term": 0}
+        self.tracks_by_period: Dict[str, int] = {"short_term": 0, "medium_term": 0, "long_term": 0}
+
+
+# ---------------------------------------------------------------------------
+# Record builders. Strings and track dicts are created up front so only the
+# records themselves (and whatever they allocate) are measured.
+# ---------------------------------------------------------------------------
+
+def build_studio_albums(cls, strings: List[tuple]) -> list:
+    return [
+        cls(title=title, year=year, discogs_master_id=master_id, artist_name=artist,
+            rating=4.2, votes=120, cover_image=cover)
+        for title, year, master_id, artist, cover in strings
+    ]
+
+
+def build_legacy_album_data(album_tracks: List[List[dict]]) -> list:
+    records = []
+    for tracks in album_tracks:
+        data = LegacyAlbumData()
+        for track in tracks:
+            data.tracks.append(track)
+            data.total_score += track["score"]
+            data.score_by_period[track["time_range"]] += track["score"]
+            data.tracks_by_period[track["time_range"]] += 1
+            data.artists.add(track["album"]["artists"][0]["id"])
+            if data.album_info is None:
+                data.album_info = track["album"]
+        records.append(data)
+    return records
+
+
+def build_album_data(album_tracks: List[List[dict]]) -> list:
+    records = []
+    for idx, tracks in enumerate(album_tracks):
+        per_period = [0.0, 0.0, 0.0]
+        counts = [0, 0, 0]
+        for track in tracks:
+            period = ("short_term", "medium_term", "long_term").index(track["time_range"])
+            per_period[period] += track["score"]
+            counts[period] += 1
+        records.append(AlbumData(
+            album_id=tracks[0]["album"]["id"],
+            album_info=tracks[0]["album"],
+            track_count=len(tracks),
+            total_score=sum(per_period),
+            artist_boost=idx % 2 == 0,
+            score_by_period=tuple(per_period),
+            tracks_by_period=tuple(counts),
+        ))
+    return records
+
+
+def measure(build: Callable[[], list]) -> int:
+    """Bytes allocated by build() that are still alive afterwards"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    records = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del records
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-record memory footprint (tracemalloc)")
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--tracks-per-album", type=int, default=10)
+    args = parser.parse_args()
+
+    strings = [
+        (f"Album {i}", str(1960 + i % 60), str(100000 + i), f"Artist {i // 5}", f"https://img/{i}.jpg")
+        for i in range(args.records)
+    ]
+    periods = ("short_term", "medium_term", "long_term")
+    album_tracks = [
+        [
+            {
+                "name": f"Track {i}-{t}",
+                "score": float(t * 3 + 1),
+                "time_range": periods[t % 3],
+                "album": {"id": f"album-{i}", "artists": [{"id": f"artist-{i // 5}"}]},
+            }
+            for t in range(args.tracks_per_album)
+        ]
+        for i in range(args.records)
+    ]
+
+    rows = [
+        ("StudioAlbum", measure(lambda: build_studio_albums(LegacyStudioAlbum, strings)),
+         measure(lambda: build_studio_albums(StudioAlbum, strings))),
+        ("AlbumData", measure(lambda: build_legacy_album_data(album_tracks)),
+         measure(lambda: build_album_data(album_tracks))),
+    ]
+
+    print(f"{args.records} records, {args.tracks_per_album} tracks per album\n")
+    print(f"{'record':<12} {'before B/rec':>13} {'after B/rec':>12} {'saved':>7}")
+    for name, before, after in rows:
+        per_before = before / args.records
+        per_after = after / args.records
+        saved = 1 - per_after / per_before if per_before else 0
+        print(f"{name:<12} {per_before:>13.1f} {per_after:>12.1f} {saved:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
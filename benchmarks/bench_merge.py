@@ -0,0 +1,134 @@
+"""
+Benchmark for the /merge-recommendations interleaving merge.
+
+Compares the keyed k-way merge (services/recommender/merge.py) with the
+previous two-list loop that rebuilt album keys twice per item, at 10k+
+recommendations per source, and checks both keep the same albums in the
+same order for the two-source case.
+
+Usage:
+    python -m benchmarks.bench_merge
+    python -m benchmarks.bench_merge --sizes 10000 50000 --sources 4
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.recommender.merge import InterleavingMerge
+
+
+def make_recs(n: int, source: int, overlap: float = 0.3, seed: int = 0) -> List[dict]:
+    """Ranked recs for one source; `overlap` of them also appear in other sources"""
+    rnd = random.Random(seed + source)
+    recs = []
+    for i in range(n):
+        shared = rnd.random() < overlap
+        album_idx = rnd.randrange(n) if shared else n * (source + 1) + i
+        if source % 2 == 0:
+            recs.append({
+                "album_info": {"name": f"Album {album_idx}", "artists": [{"name": f"Artist {album_idx % 997}"}]},
+                "score": n - i,
+            })
+        else:
+            recs.append({
+                "album_name": f"Album {album_idx}",
+                "artist_name": f"Artist {album_idx % 997}",
+                "discogs_master_id": str(album_idx) if i % 3 else None,
+                "rating": 4.0,
+            })
+    return recs
+
+
+def legacy_merge(lastfm_recs: List[dict], artist_recs: List[dict]) -> List[dict]:
+    """Previous /merge-recommendations loop, kept as the "before" reference"""
+    seen_albums = set()
+    merged: List[dict] = []
+    max_len = max(len(artist_recs), len(lastfm_recs))
+
+    def get_album_keys(rec: dict) -> list:
+        keys = []
+        if "album_info" in rec:
+            album_info = rec.get("album_info", {})
+            album = album_info.get("name", "").lower().strip()
+            artists_list = album_info.get("artists", [])
+            artist = artists_list[0].get("name", "") if artists_list else ""
+            artist = artist.lower().strip()
+        else:
+            album = rec.get("album_name", "").lower().strip()
+            artist = rec.get("artist_name", "").lower().strip()
+        keys.append(f"{artist}::{album}")
+        discogs_master = rec.get("discogs_master_id")
+        if discogs_master:
+            keys.append(f"master::{discogs_master}")
+        return keys
+
+    def is_duplicate(rec: dict) -> bool:
+        return any(key in seen_albums for key in get_album_keys(rec))
+
+    def mark_as_seen(rec: dict):
+        for key in get_album_keys(rec):
+            seen_albums.add(key)
+
+    for i in range(max_len):
+        if i < len(lastfm_recs):
+            if not is_duplicate(lastfm_recs[i]):
+                mark_as_seen(lastfm_recs[i])
+                merged.append(lastfm_recs[i])
+        if i < len(artist_recs):
+            if not is_duplicate(artist_recs[i]):
+                mark_as_seen(artist_recs[i])
+                merged.append(artist_recs[i])
+    return merged
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recommendation merging")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--sources", type=int, default=4, help="sources for the k-way case")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'case':<26} {'per source':>10} {'ms':>10} {'merged':>8} {'speedup':>8}")
+    for n in args.sizes:
+        lastfm, artist = make_recs(n, 0), make_recs(n, 1)
+
+        expected = legacy_merge(lastfm, artist)
+        merged = InterleavingMerge([lastfm, artist]).merge()
+        if [id(r) for r in merged] != [id(r) for r in expected]:
+            raise AssertionError(f"keyed merge differs from legacy merge (n={n})")
+
+        legacy_s = best_of(lambda: legacy_merge(lastfm, artist), args.repeat)
+        keyed_s = best_of(lambda: InterleavingMerge([lastfm, artist]).merge(), args.repeat)
+        print(f"{'legacy 2-way':<26} {n:>10} {legacy_s * 1000:>10.1f} {len(expected):>8}")
+        print(f"{'keyed 2-way':<26} {n:>10} {keyed_s * 1000:>10.1f} {len(merged):>8} {legacy_s / keyed_s:>7.2f}x")
+
+        sources = [make_recs(n, s) for s in range(args.sources)]
+        weights = [2 if s == 0 else 1 for s in range(args.sources)]
+
+        def stream_all():
+            merger = InterleavingMerge(sources, weights)
+            return sum(1 for _ in merger.iter_merge())
+
+        kway_s = best_of(lambda: InterleavingMerge(sources, weights).merge(), args.repeat)
+        stream_s = best_of(stream_all, args.repeat)
+        total = stream_all()
+        print(f"{f'keyed {args.sources}-way weighted':<26} {n:>10} {kway_s * 1000:>10.1f} {total:>8}")
+        print(f"{f'keyed {args.sources}-way streaming':<26} {n:>10} {stream_s * 1000:>10.1f} {total:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Micro-benchmarks for the recommendation/pricing hot functions, on synthetic
+inputs at several sizes, with results stored per commit so regressions show
+up between runs (asv-style, without the dependency).
+
+Cases:
+  - ScoringEngine.score_lastfm_tracks / score_lastfm_artists
+  - AlbumAggregator.aggregate_albums
+  - /merge-recommendations (InterleavingMerge, 2 and 4 sources)
+  - gateway get_vinyl_releases
+  - PricingClient._pick_best_ebay_item
+  - DiscogsClient._normalize_album_title
+  - DiscogsClient._filter_and_normalize_tracklist
+
+Each run is written to benchmarks/results/micro/<timestamp>-<commit>.json and
+compared with the most recent earlier run from the same machine (or the file
+given with --compare). Cases slower than --threshold are flagged.
+
+Usage:
+    python -m benchmarks.bench_micro
+    python -m benchmarks.bench_micro --cases merge get_vinyl_releases --max-size 10000
+    python -m benchmarks.bench_micro --compare benchmarks/results/micro/<run>.json --fail-on-regression
+    python -m benchmarks.bench_micro --no-save
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# PricingClient/DiscogsClient are used without starting them; gateway.main only needs to import
+os.environ.setdefault("EBAY_CLIENT_ID", "bench")
+os.environ.setdefault("EBAY_CLIENT_SECRET", "bench")
+# Keep per-call log_event INFO lines out of the timings and the output
+os.environ["LOG_LEVEL"] = "ERROR"
+
+from benchmarks.bench_merge import make_recs
+from benchmarks.bench_scoring import make_artists, make_tracks
+from gateway.main import get_vinyl_releases
+from services.discogs.discogs_client import DiscogsClient
+from services.pricing.pricing_client import EU_COUNTRIES, PricingClient
+from services.recommender.album_aggregator import AlbumAggregator
+from services.recommender.merge import InterleavingMerge
+from services.recommender.scoring_engine import ScoringEngine
+
+RESULTS_DIR = ROOT / "benchmarks" / "results" / "micro"
+
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs
+# ---------------------------------------------------------------------------
+
+FORMATS = [
+    ["Vinyl", "LP", "Album"],
+    ["Vinyl", "LP", "Album", "Reissue"],
+    ["Vinyl", "LP", "Album", "Remastered"],
+    ["CD", "Album"],
+    ["Cassette", "Album"],
+    ["File", "FLAC", "Album"],
+    "Vinyl, 12\", 45 RPM",
+]
+
+
+def make_releases(n: int, seed: int = 7) -> List[dict]:
+    """Discogs search results: mostly CDs/files, a third vinyl, some reissues"""
+    rnd = random.Random(seed)
+    return [
+        {"id": i, "title": f"Artist {i % 50} - Album {i}", "format": rnd.choice(FORMATS), "year": str(1965 + i % 60)}
+        for i in range(n)
+    ]
+
+
+def make_ebay_items(n: int, seed: int = 11) -> List[dict]:
+    """eBay itemSummaries for "Radiohead - OK Computer" with the usual noise"""
+    rnd = random.Random(seed)
+    countries = EU_COUNTRIES.split(",") + ["GB", "US", "JP"]
+    titles = [
+        "Radiohead - OK Computer 2LP Vinyl 180g",
+        "RADIOHEAD OK COMPUTER OKNOTOK 1997 2017 3LP",
+        "Radiohead - Ok Computer CD",
+        "Radiohead – OK Computer Cassette",
+        "Thom Yorke - Anima LP",
+        "Radiohead, Kid A / Amnesiac vinyl box",
+    ]
+    items = []
+    for i in range(n):
+        item = {
+            "title": rnd.choice(titles),
+            "itemLocation": {"country": rnd.choice(countries)},
+            "price": {"value": f"{rnd.uniform(15, 80):.2f}", "currency": "EUR" if rnd.random() < 0.85 else "GBP"},
+            "shippingOptions": [{"shippingCost": {"value": f"{rnd.uniform(0, 15):.2f}", "currency": "EUR"}}],
+            "itemWebUrl": f"https://www.ebay.es/itm/{100000 + i}",
+        }
+        if rnd.random() < 0.05:
+            item["shippingOptions"] = []
+        items.append(item)
+    return items
+
+
+TITLE_SUFFIXES = [
+    "", "", " (Deluxe Edition)", " (Remastered 2011)", " [Remastered]", " - Remastered 2009",
+    " (25th Anniversary Edition)", " (Bonus Tracks)", " (Explicit)", " (Live)",
+]
+
+
+def make_titles(n: int, seed: int = 13) -> List[str]:
+    rnd = random.Random(seed)
+    return [f"Album Title {i}{rnd.choice(TITLE_SUFFIXES)}" for i in range(n)]
+
+
+def make_tracklist(n: int, seed: int = 17) -> List[dict]:
+    """Discogs tracklist with side markers ("A", "B"...) every 6 tracks and a few blanks"""
+    rnd = random.Random(seed)
+    tracks = []
+    side = 0
+    for i in range(n):
+        if i % 6 == 0:
+            tracks.append({"position": chr(ord("A") + side % 26), "title": f"Side {side}", "duration": ""})
+            side += 1
+        position = f"{chr(ord('A') + (side - 1) % 26)}{i % 6 + 1}"
+        tracks.append({
+            "position": position if rnd.random() > 0.02 else "",
+            "title": f"Track {i}",
+            "duration": f"{rnd.randint(2, 9)}:{rnd.randint(0, 59):02d}",
+        })
+    return tracks
+
+
+# ---------------------------------------------------------------------------
+# Cases: name -> (sizes, setup(size) -> callable, unit of size)
+# ---------------------------------------------------------------------------
+
+def _scoring_tracks(n: int) -> Callable[[], object]:
+    engine, tracks = ScoringEngine(), make_tracks(n)
+    return lambda: engine.score_lastfm_tracks(tracks)
+
+
+def _scoring_artists(n: int) -> Callable[[], object]:
+    engine, artists = ScoringEngine(), make_artists(n)
+    return lambda: engine.score_lastfm_artists(artists)
+
+
+def _aggregate(n: int) -> Callable[[], object]:
+    engine, aggregator = ScoringEngine(), AlbumAggregator()
+    scored_tracks = engine.score_lastfm_tracks(make_tracks(n))
+    scored_artists = engine.score_lastfm_artists(make_artists(300))
+    return lambda: aggregator.aggregate_albums(scored_tracks, scored_artists)
+
+
+def _merge(sources: int) -> Callable[[int], Callable[[], object]]:
+    def setup(n: int) -> Callable[[], object]:
+        recs = [make_recs(n, source) for source in range(sources)]
+        return lambda: InterleavingMerge(recs).merge()
+    return setup
+
+
+def _vinyl(n: int) -> Callable[[], object]:
+    releases = make_releases(n)
+    return lambda: get_vinyl_releases(releases)
+
+
+def _ebay(n: int) -> Callable[[], object]:
+    pricing = PricingClient()
+    items = make_ebay_items(n)
+    return lambda: pricing._pick_best_ebay_item(items, "Radiohead", "OK Computer")
+
+
+def _normalize_titles(n: int) -> Callable[[], object]:
+    discogs = DiscogsClient("", "")
+    titles = make_titles(n)
+    return lambda: [discogs._normalize_album_title(title) for title in titles]
+
+
+def _tracklist(n: int) -> Callable[[], object]:
+    discogs = DiscogsClient("", "")
+    tracklist = make_tracklist(n)
+    return lambda: discogs._filter_and_normalize_tracklist(tracklist)
+
+
+CASES: Dict[str, tuple] = {
+    "score_lastfm_tracks": ([1_000, 10_000, 100_000], _scoring_tracks, "tracks"),
+    "score_lastfm_artists": ([100, 1_000, 10_000], _scoring_artists, "artists"),
+    "aggregate_albums": ([1_000, 10_000, 100_000], _aggregate, "tracks"),
+    "merge": ([1_000, 10_000, 50_000], _merge(2), "recs/source"),
+    "merge_4_sources": ([1_000, 10_000, 50_000], _merge(4), "recs/source"),
+    "get_vinyl_releases": ([100, 1_000, 10_000], _vinyl, "releases"),
+    "pick_best_ebay_item": ([50, 200, 1_000], _ebay, "items"),
+    "normalize_album_title": ([100, 1_000, 10_000], _normalize_titles, "titles"),
+    "filter_tracklist": ([10, 100, 1_000], _tracklist, "tracks"),
+}
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(fn)
+    loops, elapsed = timer.autorange()
+    # scale loops so each sample takes at least min_time
+    if elapsed < min_time:
+        loops = max(loops, int(loops * min_time / max(elapsed, 1e-9)))
+    samples = [t / loops for t in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "loops": loops,
+        "min_ms": round(min(samples) * 1000, 5),
+        "median_ms": round(statistics.median(samples) * 1000, 5),
+        "stdev_ms": round(statistics.stdev(samples) * 1000, 5) if len(samples) > 1 else 0.0,
+    }
+
+
+def git_info() -> dict:
+    def git(*args) -> str:
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {
+        "commit": git("rev-parse", "--short", "HEAD") or "unknown",
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def machine_info() -> dict:
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def previous_run(machine: dict, exclude: Optional[Path] = None) -> Optional[Path]:
+    """Most recent stored run from the same host/Python"""
+    for path in sorted(RESULTS_DIR.glob("*.json"), reverse=True):
+        if path == exclude:
+            continue
+        try:
+            stored = json.loads(path.read_text())["machine"]
+        except (OSError, ValueError, KeyError):
+            continue
+        if stored.get("host") == machine["host"] and stored.get("python") == machine["python"]:
+            return path
+    return None
+
+
+def compare(results: List[dict], baseline_path: Path, threshold: float) -> List[dict]:
+    baseline = {(r["case"], r["size"]): r for r in json.loads(baseline_path.read_text())["results"]}
+    regressions = []
+    print(f"\nvs {baseline_path.name}")
+    print(f"{'case':<24} {'size':>8} {'before ms':>11} {'after ms':>11} {'ratio':>7}")
+    for row in results:
+        before = baseline.get((row["case"], row["size"]))
+        if not before or not before["min_ms"]:
+            continue
+        ratio = row["min_ms"] / before["min_ms"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append({**row, "baseline_min_ms": before["min_ms"], "ratio": round(ratio, 3)})
+        elif ratio < 1 / threshold:
+            flag = "  faster"
+        print(f"{row['case']:<24} {row['size']:>8} {before['min_ms']:>11.4f} {row['min_ms']:>11.4f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for recommender/pricing hot functions")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), help="run only these cases")
+    parser.add_argument("--max-size", type=int, help="skip input sizes above this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum seconds per sample")
+    parser.add_argument("--compare", type=Path, help="stored run to compare with (default: previous run on this machine)")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio flagged as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a regression is flagged")
+    parser.add_argument("--no-save", action="store_true", help="do not store this run")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'case':<24} {'size':>8} {'unit':<12} {'min ms':>11} {'median ms':>11} {'µs/item':>9}")
+    for name in args.cases or CASES:
+        sizes, setup, unit = CASES[name]
+        for size in sizes:
+            if args.max_size and size > args.max_size:
+                continue
+            row = {"case": name, "size": size, "unit": unit, **measure(setup(size), args.repeat, args.min_time)}
+            results.append(row)
+            print(f"{name:<24} {size:>8} {unit:<12} {row['min_ms']:>11.4f} {row['median_ms']:>11.4f} "
+                  f"{row['min_ms'] * 1000 / size:>9.3f}")
+
+    machine = machine_info()
+    saved = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        git = git_info()
+        saved = RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{git['commit']}.json"
+        saved.write_text(json.dumps({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git": git,
+            "machine": machine,
+            "config": {"repeat": args.repeat, "min_time": args.min_time},
+            "results": results,
+        }, indent=2))
+        print(f"\nstored {saved.relative_to(ROOT)}")
+
+    baseline = args.compare or previous_run(machine, exclude=saved)
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than {args.threshold:.2f}x the baseline")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
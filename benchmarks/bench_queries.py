@@ -0,0 +1,448 @@
+"""
+Query benchmark: runs every production query path in gateway/db.py,
+services/recommender/db_utils.py and db_explorer/app.py against a (large,
+synthetic) database, times each call and captures the SQL it executes with
+EXPLAIN QUERY PLAN, flagging full table scans.
+
+The real functions/routes are called, so the statements are exactly what
+production runs; the SQL is captured with sqlite3's trace callback. A
+progress handler aborts statements running longer than --statement-timeout
+so one pathological query does not stall the run. Foreign keys whose child
+column has no index are listed too (each parent DELETE scans the child).
+
+The benchmark writes to the database it is given (logins, regenerate,
+explorer updates/deletes), so point it at a generated copy:
+
+Usage:
+    python -m benchmarks.synthetic_db --out /tmp/vinylbe-large.db
+    python -m benchmarks.bench_queries --db /tmp/vinylbe-large.db
+    python -m benchmarks.bench_queries --db /tmp/vinylbe-large.db --iterations 5 --output queries.json --fail-on-scan
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Keep per-call log_event INFO lines out of the timings and the output
+os.environ["LOG_LEVEL"] = "ERROR"
+
+from gateway import db as gateway_db
+from services.recommender import db_utils as recommender_db
+
+try:
+    from db_explorer import app as explorer
+except ImportError:  # Flask is only installed where the explorer runs
+    explorer = None
+
+SKIP_PLAN = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "CREATE", "ALTER", "ANALYZE", "INSERT")
+
+
+# ---------------------------------------------------------------------------
+# SQL capture
+# ---------------------------------------------------------------------------
+
+def normalize_sql(sql: str) -> str:
+    """Statement shape without literals, to group executions of the same query"""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    return " ".join(sql.split())
+
+
+class Capture:
+    """Collects the statements executed on every connection opened while installed"""
+
+    def __init__(self, statement_timeout: float):
+        self.statement_timeout = statement_timeout
+        self.statements: Dict[str, str] = {}
+        self.interrupted = 0
+        self._started = 0.0
+        self._connect = sqlite3.connect
+
+    def _trace(self, sql: str):
+        self._started = time.perf_counter()
+        self.statements.setdefault(normalize_sql(sql), sql)
+
+    def _progress(self) -> int:
+        if time.perf_counter() - self._started > self.statement_timeout:
+            self.interrupted += 1
+            return 1
+        return 0
+
+    def connect(self, *args, **kwargs):
+        conn = self._connect(*args, **kwargs)
+        conn.set_trace_callback(self._trace)
+        conn.set_progress_handler(self._progress, 10_000)
+        return conn
+
+    def __enter__(self):
+        sqlite3.connect = self.connect
+        return self
+
+    def __exit__(self, *exc):
+        sqlite3.connect = self._connect
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    try:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+
+
+def plan_flags(plan: List[str]) -> List[str]:
+    flags = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW":
+            flags.append("full index scan" if "INDEX" in detail else "FULL SCAN")
+        if "TEMP B-TREE" in detail:
+            flags.append("temp b-tree")
+    return sorted(set(flags))
+
+
+def unindexed_foreign_keys(conn: sqlite3.Connection) -> List[str]:
+    """Child columns of foreign keys with no index starting with them"""
+    missing = []
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    for table in tables:
+        leading = set()
+        for index in conn.execute(f"PRAGMA index_list('{table}')").fetchall():
+            columns = conn.execute(f"PRAGMA index_info('{index[1]}')").fetchall()
+            if columns:
+                leading.add(columns[0][2])
+        for fk in conn.execute(f"PRAGMA foreign_key_list('{table}')").fetchall():
+            if fk[3] not in leading:
+                missing.append(f"{table}.{fk[3]} -> {fk[2]}.{fk[4]}")
+    return missing
+
+
+# ---------------------------------------------------------------------------
+# Parameters sampled from the database
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Sample:
+    user_ids: List[int]
+    heavy_user_id: int
+    lastfm_usernames: List[str]
+    google_subs: List[str]
+    emails: List[str]
+    max_album_id: int
+    max_artist_id: int
+    terms: List[str]
+    taken_ids: set = field(default_factory=set)
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection, rnd: random.Random) -> "Sample":
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM user ORDER BY RANDOM() LIMIT 500")]
+        heavy = conn.execute(
+            "SELECT user_id FROM recommendation GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+        words = set()
+        for (name,) in conn.execute("SELECT name FROM artists ORDER BY RANDOM() LIMIT 200"):
+            words.update(w for w in name.split() if len(w) >= 4)
+        return cls(
+            user_ids=user_ids,
+            heavy_user_id=heavy[0] if heavy else user_ids[0],
+            lastfm_usernames=[r[0] for r in conn.execute(
+                "SELECT provider_user_id FROM auth_identity WHERE provider = 'lastfm' ORDER BY RANDOM() LIMIT 200")],
+            google_subs=[r[0] for r in conn.execute(
+                "SELECT provider_user_id FROM auth_identity WHERE provider = 'google' ORDER BY RANDOM() LIMIT 200")],
+            emails=[r[0] for r in conn.execute(
+                "SELECT email FROM user WHERE email IS NOT NULL ORDER BY RANDOM() LIMIT 200")],
+            max_album_id=conn.execute("SELECT MAX(id) FROM albums").fetchone()[0] or 1,
+            max_artist_id=conn.execute("SELECT MAX(id) FROM artists").fetchone()[0] or 1,
+            terms=sorted(w[:rnd.randint(4, len(w))].lower() for w in words) or ["love"],
+        )
+
+    def fresh_id(self, rnd: random.Random, upper: int) -> int:
+        """Random id not used by a previous write/delete in this run"""
+        while True:
+            candidate = rnd.randint(1, upper)
+            if candidate not in self.taken_ids:
+                self.taken_ids.add(candidate)
+                return candidate
+
+
+def album_row(conn: sqlite3.Connection, rnd: random.Random, sample: Sample, require: Optional[str] = None) -> dict:
+    """Random album (with a non-null `require` column when given)"""
+    for _ in range(200):
+        row = conn.execute(
+            """
+            SELECT a.id, a.title, a.mbid, a.spotify_id, ar.id AS artist_id, ar.name AS artist_name
+            FROM albums a JOIN artists ar ON ar.id = a.artist_id WHERE a.id = ?
+            """,
+            (rnd.randint(1, sample.max_album_id),),
+        ).fetchone()
+        if row:
+            album = dict(zip(("id", "title", "mbid", "spotify_id", "artist_id", "artist_name"), row))
+            if not require or album[require]:
+                return album
+    raise RuntimeError(f"no albums{f' with {require}' if require else ''} in the database")
+
+
+def user_recommendations(conn: sqlite3.Connection, user_id: int, limit: int = 20) -> List[dict]:
+    return [
+        {"id": r[0], "artist_name": r[1], "album_title": r[2]}
+        for r in conn.execute(
+            "SELECT id, artist_name, album_title FROM recommendation WHERE user_id = ? LIMIT ?", (user_id, limit)
+        )
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Steps: one production call each, with fresh parameters per iteration
+# ---------------------------------------------------------------------------
+
+def build_steps(ref: sqlite3.Connection, sample: Sample) -> List[tuple]:
+    def gateway_steps():
+        def regenerate(rnd):
+            user_id = rnd.choice(sample.user_ids)
+            recs = [{**r, "source": "lastfm"} for r in user_recommendations(ref, user_id)]
+            for _ in range(20):
+                album = album_row(ref, rnd, sample)
+                recs.append({"artist_name": album["artist_name"], "album_title": album["title"], "source": "artist_based"})
+            gateway_db.regenerate_recommendations(user_id, recs)
+
+        def update_status(rnd):
+            recs = user_recommendations(ref, rnd.choice(sample.user_ids), 50)
+            if recs:
+                rec = rnd.choice(recs)
+                user_id = ref.execute("SELECT user_id FROM recommendation WHERE id = ?", (rec["id"],)).fetchone()[0]
+                gateway_db.update_recommendation_status(user_id, rec["id"], rnd.choice(["favorite", "owned", "neutral"]))
+
+        def upsert_status(rnd):
+            album = album_row(ref, rnd, sample)
+            gateway_db.upsert_recommendation_status(rnd.choice(sample.user_ids), album["artist_name"], album["title"], "disliked")
+
+        def select_and_remove_artist(rnd):
+            user_id = rnd.choice(sample.user_ids)
+            gateway_db.add_user_selected_artist(user_id, album_row(ref, rnd, sample)["artist_name"])
+            selected = gateway_db.get_user_selected_artists(user_id)
+            if selected:
+                gateway_db.remove_user_selected_artist(user_id, selected[0]["id"])
+
+        return [
+            ("get_or_create_user_via_lastfm", lambda rnd: gateway_db.get_or_create_user_via_lastfm(rnd.choice(sample.lastfm_usernames))),
+            ("get_or_create_user_via_lastfm (new)", lambda rnd: gateway_db.get_or_create_user_via_lastfm(f"bench_{rnd.getrandbits(48):x}")),
+            ("get_or_create_user_via_google", lambda rnd: gateway_db.get_or_create_user_via_google(
+                "bench@example.com", "Bench", rnd.choice(sample.google_subs or ["missing"]))),
+            ("link_lastfm_to_existing_user", lambda rnd: gateway_db.link_lastfm_to_existing_user(
+                rnd.choice(sample.user_ids), f"bench_{rnd.getrandbits(48):x}")),
+            ("upsert_user_profile_lastfm", lambda rnd: gateway_db.upsert_user_profile_lastfm(
+                rnd.choice(sample.user_ids), "bench", [{"name": "Artist", "playcount": 1}] * 20)),
+            ("get_user_profile_lastfm", lambda rnd: gateway_db.get_user_profile_lastfm(rnd.choice(sample.user_ids))),
+            ("add/get/remove_user_selected_artist", select_and_remove_artist),
+            ("upsert_recommendation_status", upsert_status),
+            ("regenerate_recommendations (40 recs)", regenerate),
+            ("get_recommendations_for_user", lambda rnd: gateway_db.get_recommendations_for_user(rnd.choice(sample.user_ids))),
+            ("get_recommendations_for_user (heaviest)", lambda rnd: gateway_db.get_recommendations_for_user(sample.heavy_user_id)),
+            ("get_favorite_recommendations", lambda rnd: gateway_db.get_favorite_recommendations(rnd.choice(sample.user_ids))),
+            ("update_recommendation_status", update_status),
+            ("get_user_by_email", lambda rnd: gateway_db.get_user_by_email(rnd.choice(sample.emails or ["missing@example.com"]))),
+            ("get_user_by_id", lambda rnd: gateway_db.get_user_by_id(rnd.choice(sample.user_ids))),
+            ("get_random_albums_with_covers (500)", lambda rnd: gateway_db.get_random_albums_with_covers(500)),
+            ("search_artists", lambda rnd: gateway_db.search_artists(rnd.choice(sample.terms))),
+            ("search_albums", lambda rnd: gateway_db.search_albums(rnd.choice(sample.terms))),
+        ]
+
+    def recommender_steps():
+        def cached(by: str):
+            def call(rnd):
+                album = album_row(ref, rnd, sample, require=by if by in ("mbid", "spotify_id") else None)
+                recommender_db.get_cached_album(
+                    album["artist_name"], album["title"],
+                    mbid=album["mbid"] if by == "mbid" else None,
+                    spotify_id=album["spotify_id"] if by == "spotify_id" else None,
+                )
+            return call
+
+        return [
+            ("get_cached_album (spotify_id)", cached("spotify_id")),
+            ("get_cached_album (mbid)", cached("mbid")),
+            ("get_cached_album (name)", cached("name")),
+            ("get_cached_album (miss)", lambda rnd: recommender_db.get_cached_album(f"Nobody {rnd.random()}", "Nothing")),
+            ("create_basic_album_entry (existing artist)", lambda rnd: recommender_db.create_basic_album_entry(
+                album_row(ref, rnd, sample)["artist_name"], f"Bench Album {rnd.getrandbits(48):x}")),
+            ("create_basic_album_entry (new artist)", lambda rnd: recommender_db.create_basic_album_entry(
+                f"Bench Artist {rnd.getrandbits(48):x}", "Bench Album", spotify_id=f"{rnd.getrandbits(64):x}")),
+        ]
+
+    def explorer_steps():
+        if explorer is None:
+            return []
+        client = explorer.app.test_client()
+
+        def get(path_fn):
+            def call(rnd):
+                resp = client.get(path_fn(rnd))
+                if resp.status_code >= 500:
+                    raise RuntimeError(f"HTTP {resp.status_code}")
+            return call
+
+        def update_artist(rnd):
+            artist_id = sample.fresh_id(rnd, sample.max_artist_id)
+            row = ref.execute("SELECT name, image_url FROM artists WHERE id = ?", (artist_id,)).fetchone()
+            if row:
+                client.post(f"/api/update/artist/{artist_id}", json={"name": row[0], "image_url": row[1]})
+
+        deep_artist_page = max(1, sample.max_artist_id // 20 // 2)
+        deep_album_page = max(1, sample.max_album_id // 20 // 2)
+        return [
+            ("explorer /api/summary", get(lambda rnd: "/api/summary")),
+            ("explorer /api/stats", get(lambda rnd: "/api/stats")),
+            ("explorer /api/artists", get(lambda rnd: "/api/artists")),
+            ("explorer /api/artists?page=<middle>", get(lambda rnd: f"/api/artists?page={deep_artist_page}")),
+            ("explorer /api/artists?search=", get(lambda rnd: f"/api/artists?search={rnd.choice(sample.terms)}")),
+            ("explorer /api/artist/<id>", get(lambda rnd: f"/api/artist/{album_row(ref, rnd, sample)['artist_id']}")),
+            ("explorer /api/albums", get(lambda rnd: "/api/albums")),
+            ("explorer /api/albums?page=<middle>", get(lambda rnd: f"/api/albums?page={deep_album_page}")),
+            ("explorer /api/albums?search=", get(lambda rnd: f"/api/albums?search={rnd.choice(sample.terms)}")),
+            ("explorer /api/albums?artist_id=", get(lambda rnd: f"/api/albums?artist_id={album_row(ref, rnd, sample)['artist_id']}")),
+            ("explorer /api/album/<id>", get(lambda rnd: f"/api/album/{album_row(ref, rnd, sample)['id']}")),
+            ("explorer /api/users", get(lambda rnd: "/api/users")),
+            ("explorer /api/user/<id>", get(lambda rnd: f"/api/user/{rnd.choice(sample.user_ids)}")),
+            ("explorer /api/user/<id>/recommendations", get(lambda rnd: f"/api/user/{rnd.choice(sample.user_ids)}/recommendations")),
+            ("explorer /api/search", get(lambda rnd: f"/api/search?q={rnd.choice(sample.terms)}")),
+            ("explorer update artist", update_artist),
+            ("explorer update album", lambda rnd: client.post(
+                f"/api/update/album/{sample.fresh_id(rnd, sample.max_album_id)}",
+                json={"title": f"Bench Title {rnd.getrandbits(48):x}", "year": "1999", "cover_url": None})),
+            ("explorer update user", lambda rnd: client.post(
+                f"/api/update/user/{rnd.choice(sample.user_ids)}", json={"display_name": "Bench", "email": None})),
+            ("explorer delete album", lambda rnd: client.delete(f"/api/delete/album/{sample.fresh_id(rnd, sample.max_album_id)}")),
+            ("explorer delete artist", lambda rnd: client.delete(f"/api/delete/artist/{sample.fresh_id(rnd, sample.max_artist_id)}")),
+            ("explorer delete user", lambda rnd: client.delete(f"/api/delete/user/{sample.user_ids.pop()}")),
+        ]
+
+    return (
+        [("gateway/db.py", name, fn) for name, fn in gateway_steps()]
+        + [("recommender/db_utils.py", name, fn) for name, fn in recommender_steps()]
+        + [("db_explorer/app.py", name, fn) for name, fn in explorer_steps()]
+    )
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_step(fn: Callable[[random.Random], object], rnd: random.Random, iterations: int, budget: float,
+             statement_timeout: float) -> dict:
+    samples: List[float] = []
+    errors: List[str] = []
+    with Capture(statement_timeout) as capture:
+        deadline = time.perf_counter() + budget
+        for _ in range(iterations):
+            start = time.perf_counter()
+            try:
+                fn(rnd)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            samples.append(time.perf_counter() - start)
+            if time.perf_counter() > deadline:
+                break
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "calls": len(ms),
+        "p50_ms": round(statistics.median(ms), 2),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+        "max_ms": round(ms[-1], 2),
+        "interrupted": capture.interrupted,
+        "errors": sorted(set(errors))[:3],
+        "statements": capture.statements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark production queries with EXPLAIN QUERY PLAN")
+    parser.add_argument("--db", required=True, type=Path, help="database to run against (it is written to)")
+    parser.add_argument("--iterations", type=int, default=10, help="calls per step")
+    parser.add_argument("--budget", type=float, default=20.0, help="max seconds per step")
+    parser.add_argument("--statement-timeout", type=float, default=30.0, help="abort statements running longer (s)")
+    parser.add_argument("--only", help="run only steps whose name contains this text")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    parser.add_argument("--fail-on-scan", action="store_true", help="exit 1 when any query does a full table scan")
+    args = parser.parse_args()
+
+    if args.db.resolve() == (ROOT / "vinylbe.db").resolve():
+        parser.error("refusing to run against the real vinylbe.db (the benchmark writes to it)")
+    if not args.db.exists():
+        parser.error(f"{args.db} does not exist (generate one with python -m benchmarks.synthetic_db)")
+
+    for module in (gateway_db, recommender_db) + ((explorer,) if explorer else ()):
+        module.DB_PATH = str(args.db)
+
+    rnd = random.Random(args.seed)
+    ref = sqlite3.connect(args.db)
+    try:
+        print(f"{args.db}: " + ", ".join(
+            f"{table} {ref.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]:,}"
+            for table in ("artists", "albums", "user", "recommendation")))
+        if explorer is None:
+            print("Flask not installed: skipping db_explorer/app.py")
+        sample = Sample.from_db(ref, rnd)
+
+        results = []
+        print(f"\n{'step':<46} {'calls':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}  plan")
+        for module, name, fn in build_steps(ref, sample):
+            if args.only and args.only not in name:
+                continue
+            row = run_step(fn, rnd, args.iterations, args.budget, args.statement_timeout)
+            statements = []
+            for shape, sql in row.pop("statements").items():
+                if shape.upper().startswith(SKIP_PLAN):
+                    continue
+                plan = explain(ref, sql)
+                statements.append({"sql": shape, "plan": plan, "flags": plan_flags(plan)})
+            row.update(module=module, step=name, statements=statements)
+            results.append(row)
+
+            flags = sorted({flag for s in statements for flag in s["flags"]})
+            notes = ", ".join(flags + ([f"{row['interrupted']} interrupted"] if row["interrupted"] else [])
+                              + ([f"errors: {row['errors'][0]}"] if row["errors"] else []))
+            print(f"{name:<46} {row['calls']:>5} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['max_ms']:>9.2f}  {notes}")
+
+        missing_fk_indexes = unindexed_foreign_keys(ref)
+    finally:
+        ref.close()
+
+    full_scans = [(r, s) for r in results for s in r["statements"] if "FULL SCAN" in s["flags"]]
+    if full_scans:
+        print(f"\nFull table scans ({len(full_scans)} statements)")
+        for row, statement in sorted(full_scans, key=lambda rs: -rs[0]["p95_ms"]):
+            print(f"\n  [{row['module']}] {row['step']}  (p95 {row['p95_ms']:.1f} ms)")
+            sql = statement["sql"]
+            print(f"    {sql if len(sql) <= 240 else sql[:160] + ' ... ' + sql[-75:]}")
+            for detail in statement["plan"]:
+                print(f"      {detail}")
+    if missing_fk_indexes:
+        print("\nForeign keys without an index on the child column (parent deletes scan the child table)")
+        for fk in missing_fk_indexes:
+            print(f"  {fk}")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "db": str(args.db),
+            "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+            "steps": results,
+            "unindexed_foreign_keys": missing_fk_indexes,
+        }, indent=2))
+        print(f"\nreport written to {args.output}")
+
+    if args.fail_on_scan and full_scans:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Benchmark for the columnar ScoringEngine / AlbumAggregator.
+
+Compares the NumPy implementation against the previous per-track loops on
+synthetic Last.fm histories (1k-100k tracks) and checks that both produce
+identical output.
+
+Usage:
+    python -m benchmarks.bench_scoring
+    python -m benchmarks.bench_scoring --sizes 1000 10000 --repeat 3
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Set
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.recommender.scoring_engine import ScoringEngine
+from services.recommender.album_aggregator import AlbumAggregator
+
+PERIODS = ["short_term", "medium_term", "long_term"]
+BOOSTS = {"short_term": 3.0, "medium_term": 2.0, "long_term": 1.0}
+
+
+def make_tracks(n: int, seed: int = 42) -> List[dict]:
+    """Synthetic Last.fm top tracks: ~8 tracks per album, skewed playcounts"""
+    rnd = random.Random(seed)
+    n_albums = max(1, n // 8)
+    tracks = []
+    for i in range(n):
+        album_idx = int(rnd.paretovariate(1.2)) % n_albums
+        artist_idx = album_idx % max(1, n_albums // 4)
+        tracks.append({
+            "name": f"Track {i}",
+            "playcount": str(int(rnd.paretovariate(1.1) * 10)),
+            "time_range": PERIODS[i % 3],
+            "album": {
+                "id": f"album-{album_idx}",
+                "name": f"Album {album_idx}",
+                "artists": [{"id": f"artist-{artist_idx}", "name": f"Artist {artist_idx}"}],
+            },
+        })
+    return tracks
+
+
+def make_artists(n: int, seed: int = 42) -> List[dict]:
+    rnd = random.Random(seed)
+    return [
+        {"id": f"artist-{i}", "name": f"Artist {i}", "playcount": str(rnd.randint(1, 5000))}
+        for i in range(n)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Previous per-track implementation, kept here as the "before" reference
+# ---------------------------------------------------------------------------
+
+def legacy_score_lastfm_tracks(tracks: List[dict]) -> List[dict]:
+    scored_tracks = []
+    if not tracks:
+        return scored_tracks
+    max_playcount = max((int(t.get("playcount", 0)) for t in tracks), default=1)
+    for idx, track in enumerate(tracks):
+        boost = BOOSTS.get(track.get("time_range", "medium_term"), 1.0)
+        playcount = int(track.get("playcount", 0))
+        playcount_score = (playcount / max_playcount) * 300 if max_playcount > 0 else 0
+        scored_tracks.append({
+            **track,
+            "position": idx,
+            "score": playcount_score * boost,
+            "playcount": playcount,
+            "source": "lastfm"
+        })
+    return scored_tracks
+
+
+def legacy_score_lastfm_artists(artists: List[dict]) -> List[dict]:
+    scored_artists = []
+    if not artists:
+        return scored_artists
+    max_playcount = max((int(a.get("playcount", 0)) for a in artists), default=1)
+    for idx, artist in enumerate(artists):
+        playcount = int(artist.get("playcount", 0))
+        playcount_score = (playcount / max_playcount) * 300 if max_playcount > 0 else 0
+        scored_artists.append({
+            **artist,
+            "position": idx,
+            "score": playcount_score,
+            "playcount": playcount,
+            "source": "lastfm"
+        })
+    return scored_artists
+
+
+class _LegacyAlbumData:
+    def __init__(self):
+        self.tracks: List[dict] = []
+        self.total_score: float = 0
+        self.artists: Set[str] = set()
+        self.album_info = None
+        self.score_by_period: Dict[str, float] = {"short_term": 0, "medium_term": 0, "long_term": 0}
+        self.tracks_by_period: Dict[str, int] = {"short_term": 0, "medium_term": 0, "long_term": 0}
+
+
+def legacy_aggregate_albums(scored_tracks: List[dict], scored_artists: List[dict]) -> List[dict]:
+    boost_multiplier = 5.0
+    artist_scores = {a.get("id") or a.get("name"): a["score"] for a in scored_artists}
+    album_data: Dict[str, _LegacyAlbumData] = {}
+    for track in scored_tracks:
+        album_id = track.get("album", {}).get("id")
+        if not album_id:
+            continue
+        if album_id not in album_data:
+            album_data[album_id] = _LegacyAlbumData()
+        data = album_data[album_id]
+        track_score = track.get("score", 0)
+        time_range = track.get("time_range", "unknown")
+        data.tracks.append(track)
+        data.total_score += track_score
+        if time_range in data.score_by_period:
+            data.score_by_period[time_range] += track_score
+            data.tracks_by_period[time_range] += 1
+        for artist in track.get("album", {}).get("artists", []):
+            artist_id = artist.get("id") or artist.get("name")
+            if artist_id:
+                data.artists.add(artist_id)
+        if data.album_info is None:
+            data.album_info = track.get("album", {})
+
+    filtered = []
+    for album_id, data in album_data.items():
+        track_count = len(data.tracks)
+        if track_count < 5:
+            continue
+        artist_boost = any(artist_id in artist_scores for artist_id in data.artists)
+        base_score = data.total_score
+        final_score = base_score * boost_multiplier if artist_boost else base_score
+        filtered.append({
+            "album_id": album_id,
+            "album_info": data.album_info,
+            "track_count": track_count,
+            "score": final_score,
+            "artist_boost": artist_boost,
+            "score_breakdown": {
+                "base_score": round(base_score, 2),
+                "artist_boost_applied": artist_boost,
+                "artist_boost_multiplier": boost_multiplier if artist_boost else 1.0,
+                "final_score": round(final_score, 2),
+                "score_by_period": {p: round(data.score_by_period[p], 2) for p in PERIODS},
+                "tracks_by_period": data.tracks_by_period,
+            },
+        })
+    filtered.sort(key=lambda x: x["score"], reverse=True)
+    return filtered
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: List[int], repeat: int) -> List[dict]:
+    engine = ScoringEngine()
+    aggregator = AlbumAggregator()
+    artists = make_artists(300)
+    scored_artists = engine.score_lastfm_artists(artists)
+    results = []
+
+    for n in sizes:
+        tracks = make_tracks(n)
+        scored_tracks = engine.score_lastfm_tracks(tracks)
+
+        cases = [
+            ("score_lastfm_tracks", lambda: legacy_score_lastfm_tracks(tracks), lambda: engine.score_lastfm_tracks(tracks)),
+            ("score_lastfm_artists", lambda: legacy_score_lastfm_artists(artists), lambda: engine.score_lastfm_artists(artists)),
+            ("aggregate_albums", lambda: legacy_aggregate_albums(scored_tracks, scored_artists),
+             lambda: aggregator.aggregate_albums(scored_tracks, scored_artists)),
+        ]
+
+        for name, legacy_fn, columnar_fn in cases:
+            if json.dumps(legacy_fn()) != json.dumps(columnar_fn()):
+                raise AssertionError(f"{name}: columnar output differs from legacy output (n={n})")
+            legacy_s = best_of(legacy_fn, repeat)
+            columnar_s = best_of(columnar_fn, repeat)
+            results.append({
+                "case": name,
+                "tracks": n,
+                "legacy_ms": round(legacy_s * 1000, 3),
+                "columnar_ms": round(columnar_s * 1000, 3),
+                "speedup": round(legacy_s / columnar_s, 2) if columnar_s else None,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar scoring/aggregation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Silence per-call log_event output during timing
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'case':<22} {'tracks':>8} {'legacy ms':>11} {'columnar ms':>12} {'speedup':>8}")
+    for row in run(args.sizes, args.repeat):
+        print(f"{row['case']:<22} {row['tracks']:>8} {row['legacy_ms']:>11.2f} {row['columnar_ms']:>12.2f} {row['speedup']:>7.2f}x")
+    print("\n✓ Columnar output identical to legacy output for all sizes")
+
+
+if __name__ == "__main__":
+    main()
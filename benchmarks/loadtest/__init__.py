@@ -0,0 +1,5 @@
+"""
+Offline end-to-end load test: the in-process deployment against stub
+upstreams (see stubs.py), driven by simulated users (see journeys.py).
+Run with `python -m benchmarks.loadtest --help`.
+"""
@@ -0,0 +1,203 @@
+"""
+Offline load test: starts the in-process deployment against stub upstreams
+(benchmarks/loadtest/server.py) on a throwaway copy of the database, runs
+simulated users through login -> generate -> browse -> modals for a fixed
+duration and reports p50/p95/p99 and throughput per endpoint.
+
+Usage:
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --users 50 --duration 120
+    python -m benchmarks.loadtest --latency discogs=400 --latency default=50 --rate-429 discogs=0.05
+    python -m benchmarks.loadtest --output results.json
+
+--latency / --rate-429 take "stub=value" (or "default=value"); stubs are
+discogs, musicbrainz, spotify, lastfm, ebay, zenrows, store_bajoelvolcan,
+store_borabora. Marilians is served through the zenrows stub.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.loadtest.journeys import Recorder, run_journey
+from benchmarks.loadtest.stubs import parse_behaviors
+
+
+def copy_database(source: Path, target: Path):
+    # Read-only source so the real database (and its -shm) is never touched
+    mode = "ro&immutable=1" if not source.with_name(source.name + "-wal").exists() else "ro"
+    src = sqlite3.connect(f"file:{source}?mode={mode}", uri=True)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+def wait_until_up(url: str, proc: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("load-test server exited during startup")
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def drive(base: str, users: int, duration: float, think: float, seed: int, rec: Recorder, catalog: List[dict]):
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+
+    async with httpx.AsyncClient(base_url=base, timeout=120.0, limits=limits) as client:
+        async def virtual_user(n: int):
+            rnd = random.Random(seed * 100003 + n)
+            iteration = 0
+            while time.monotonic() < deadline:
+                # a fresh username per iteration, so every journey starts from login
+                await run_journey(client, rec, rnd, n * 10000 + iteration, catalog, think)
+                iteration += 1
+
+        # ramp up over the first tenth of the run instead of a thundering herd
+        async def staggered(n: int):
+            await asyncio.sleep(duration * 0.1 * n / max(users, 1))
+            await virtual_user(n)
+
+        await asyncio.gather(*(staggered(n) for n in range(users)))
+
+
+def report(rec: Recorder, elapsed: float, stub_stats: dict) -> dict:
+    endpoints = {}
+    for name, stats in sorted(rec.endpoints.items()):
+        ms = [s * 1000 for s in stats.latencies]
+        endpoints[name] = {
+            "count": len(ms),
+            "errors": stats.errors,
+            "statuses": dict(stats.statuses),
+            "p50_ms": round(percentile(ms, 50), 1),
+            "p95_ms": round(percentile(ms, 95), 1),
+            "p99_ms": round(percentile(ms, 99), 1),
+            "max_ms": round(max(ms, default=0.0), 1),
+            "rps": round(len(ms) / elapsed, 2) if elapsed else 0.0,
+        }
+
+    print(f"\n{'endpoint':48} {'count':>6} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'rps':>7}")
+    for name, row in endpoints.items():
+        print(f"{name:48} {row['count']:6d} {row['errors']:5d} "
+              f"{row['p50_ms']:7.1f}ms {row['p95_ms']:7.1f}ms {row['p99_ms']:7.1f}ms {row['max_ms']:7.1f}ms {row['rps']:7.2f}")
+
+    total = sum(row["count"] for row in endpoints.values())
+    print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.2f} req/s), "
+          f"{rec.journeys} journeys completed, {rec.failed_journeys} failed at login")
+
+    if stub_stats:
+        print("\nupstream stubs")
+        for name, stub in stub_stats.items():
+            print(f"  {name:20} {stub['requests']:6d} requests  {stub['throttled']:5d} throttled  "
+                  f"({stub['latency_ms']}ms, 429 rate {stub['rate_429']})")
+
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "journeys": rec.journeys,
+        "failed_journeys": rec.failed_journeys,
+        "endpoints": endpoints,
+        "stubs": stub_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against stubbed upstreams")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--latency", action="append", default=[], metavar="STUB=MS",
+                        help="stub latency in ms (repeatable, 'default=' for all stubs)")
+    parser.add_argument("--rate-429", action="append", default=[], metavar="STUB=P",
+                        help="probability of a 429 from a stub (repeatable)")
+    parser.add_argument("--jitter", type=int, default=None, help="latency jitter in ms for all stubs")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="mean pause between journey steps")
+    parser.add_argument("--db", default=str(ROOT / "vinylbe.db"), help="database to copy for the run")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    behaviors = parse_behaviors(args.latency, args.rate_429, args.jitter)
+
+    with tempfile.TemporaryDirectory(prefix="vinylbe-loadtest-") as workdir:
+        db_copy = Path(workdir) / "vinylbe.db"
+        copy_database(Path(args.db), db_copy)
+
+        env = os.environ.copy()
+        env.update({
+            "LOADTEST_DB": str(db_copy),
+            "LOADTEST_STUBS": json.dumps({name: vars(b) for name, b in behaviors.items()}),
+            "TRACE_EXPORT_PATH": str(Path(workdir) / "traces.jsonl"),
+        })
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.loadtest.server:app",
+             "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=open(Path(workdir) / "server.log", "w"),
+        )
+        base = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_until_up(f"{base}/health", server)
+            catalog = httpx.get(f"{base}/__loadtest/catalog", params={"seed": args.seed}, timeout=10.0).json()["albums"]
+            print(f"{args.users} users for {args.duration:.0f}s against {len(catalog)} catalog artists "
+                  f"(think {args.think_ms:.0f}ms)")
+
+            rec = Recorder()
+            start = time.perf_counter()
+            asyncio.run(drive(base, args.users, args.duration, args.think_ms / 1000, args.seed, rec, catalog))
+            elapsed = time.perf_counter() - start
+
+            stub_stats = httpx.get(f"{base}/__loadtest/stubs", timeout=10.0).json()
+            result = report(rec, elapsed, stub_stats)
+        except Exception:
+            log = (Path(workdir) / "server.log").read_text(errors="replace")
+            print(log[-4000:], file=sys.stderr)
+            raise
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    if args.output:
+        result["config"] = vars(args)
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"\nreport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
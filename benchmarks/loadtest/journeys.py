@@ -0,0 +1,117 @@
+"""
+User journeys driven by the load test, mirroring what the frontend does:
+
+    login     Last.fm auth URL, then username login (imports the Last.fm profile)
+    generate  Last.fm album recommendations + one or two artist searches,
+              stored with /recommendations/regenerate
+    browse    recommendations list, mosaic, search-as-you-type
+    modals    /album-pricing for a few albums (Discogs, eBay, stores, Spotify)
+
+Each request is recorded under its route template, e.g. "GET /album-pricing".
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+
+class Recorder:
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.journeys = 0
+        self.failed_journeys = 0
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        stats = self.endpoints[name]
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            stats.latencies.append(time.perf_counter() - start)
+            stats.errors += 1
+            stats.statuses[0] += 1
+            return None
+        stats.latencies.append(time.perf_counter() - start)
+        stats.statuses[resp.status_code] += 1
+        if resp.status_code >= 400:
+            stats.errors += 1
+        return resp
+
+
+def _json(resp: Optional[httpx.Response], default):
+    if resp is None or resp.status_code >= 400:
+        return default
+    try:
+        return resp.json()
+    except ValueError:
+        return default
+
+
+async def run_journey(client: httpx.AsyncClient, rec: Recorder, rnd: random.Random, user_no: int,
+                      catalog: List[dict], think: float):
+    async def pause():
+        if think:
+            await asyncio.sleep(rnd.uniform(0.5, 1.5) * think)
+
+    username = f"loadtest_{user_no:04d}"
+
+    # login
+    await rec.call(client, "GET /auth/lastfm/login", "GET", "/auth/lastfm/login")
+    login = _json(await rec.call(client, "POST /auth/lastfm", "POST", "/auth/lastfm",
+                                 json={"lastfm_username": username}), {})
+    user_id = login.get("user_id")
+    if not user_id:
+        rec.failed_journeys += 1
+        return
+    await pause()
+
+    # generate
+    lastfm = _json(await rec.call(client, "POST /api/lastfm/recommendations", "POST", "/api/lastfm/recommendations",
+                                  json={"username": username, "time_range": rnd.choice(["short_term", "medium_term", "long_term"])}), {})
+    new_recs = [
+        {"artist_name": a.get("artist_name"), "album_title": a.get("album_name") or a.get("album_title"),
+         "source": "lastfm"}
+        for a in lastfm.get("albums", [])
+        if a.get("artist_name") and (a.get("album_name") or a.get("album_title"))
+    ]
+    for pick in rnd.sample(catalog, 2 if rnd.random() < 0.5 else 1):
+        single = _json(await rec.call(client, "POST /api/recommendations/artist-single", "POST",
+                                      "/api/recommendations/artist-single",
+                                      json={"artist_name": pick["artist"], "top_albums": 3, "user_id": user_id}), {})
+        new_recs.extend(
+            {"artist_name": r.get("artist_name"), "album_title": r.get("album_name"), "source": "artist_based"}
+            for r in single.get("recommendations", []) if r.get("artist_name") and r.get("album_name")
+        )
+    await rec.call(client, "POST /users/{id}/recommendations/regenerate", "POST",
+                   f"/users/{user_id}/recommendations/regenerate", json={"new_recs": new_recs})
+    await pause()
+
+    # browse
+    recs = _json(await rec.call(client, "GET /api/users/{id}/recommendations", "GET",
+                                f"/api/users/{user_id}/recommendations"), [])
+    await rec.call(client, "GET /api/mosaic", "GET", "/api/mosaic")
+    typed = rnd.choice(catalog)["artist"]
+    for length in (3, 5, len(typed)):
+        await rec.call(client, "GET /api/search", "GET", "/api/search", params={"q": typed[:length]})
+    await pause()
+
+    # modals
+    candidates = [(r.get("artist_name"), r.get("album_name") or r.get("album_title")) for r in recs
+                  if isinstance(r, dict) and r.get("artist_name")]
+    candidates = candidates or [(c["artist"], c["album"]) for c in catalog]
+    for artist, album in rnd.sample(candidates, min(3, len(candidates))):
+        await rec.call(client, "GET /album-pricing", "GET", "/album-pricing", params={"artist": artist, "album": album})
+        await pause()
+
+    rec.journeys += 1
@@ -0,0 +1,96 @@
+"""
+Load-test server: the single-process deployment (gateway/inprocess.py) with
+every external API replaced by the stubs in stubs.py, running on a copy of
+the database. Started by `python -m benchmarks.loadtest`; can also be run
+by hand to click through the UI offline:
+
+    LOADTEST_DB=/tmp/vinylbe-loadtest.db uvicorn benchmarks.loadtest.server:app --port 5055
+
+Environment:
+    LOADTEST_DB        database copy to run against (required; never the real vinylbe.db)
+    LOADTEST_STUBS     JSON {stub: {latency_ms, jitter_ms, rate_429, retry_after}}, "default" for all
+    LOADTEST_ARTISTS   real DB artists in the stub catalog (default 300)
+    LOADTEST_LOGS      directory for the recommendation logs (default: next to LOADTEST_DB)
+
+Extra endpoints:
+    GET /__loadtest/stubs     per-stub request / 429 counts
+    GET /__loadtest/catalog   artist/album pairs the journeys can ask for
+"""
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+DB_COPY = os.environ.get("LOADTEST_DB")
+if not DB_COPY:
+    raise RuntimeError("LOADTEST_DB must point to a copy of the database")
+
+# Dummy credentials so every service starts; all calls go to the stubs anyway.
+# The FNAC path (Google Custom Search + ScrapingBot) has no stub, so keep it off.
+for key in ("LASTFM_API_KEY", "LASTFM_API_SECRET", "SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET",
+            "EBAY_CLIENT_ID", "EBAY_CLIENT_SECRET", "DISCOGS_KEY", "DISCOGS_SECRET",
+            "DISCOGS_CONSUMER_KEY", "DISCOGS_CONSUMER_SECRET", "ZENROWS_API_KEY"):
+    os.environ[key] = "loadtest"
+for key in ("SCRAPINGBOT_API_KEY", "GOOGLE_CUSTOM_SEARCH_API_KEY", "GOOGLE_CUSTOM_SEARCH_ENGINE_ID"):
+    os.environ.pop(key, None)
+# Background catalogue jobs would add traffic the journeys did not ask for
+os.environ["RATING_REFRESH_INTERVAL"] = "0"
+os.environ["PROMOTION_POLL_SECONDS"] = "0"
+os.environ["BACKUP_INTERVAL_HOURS"] = "0"
+
+from benchmarks.loadtest.stubs import (  # noqa: E402
+    Catalog, StubBehavior, SyncASGIBridge, build_stubs, install_stubs,
+)
+from gateway import db as gateway_db, db_utils as gateway_db_utils, recommendation_logger  # noqa: E402
+from libs.shared.http_clients import InstrumentedClient  # noqa: E402
+from services.lastfm import db_utils as lastfm_db  # noqa: E402
+from services.recommender import artist_recommendations, db_utils as recommender_db  # noqa: E402
+from services.spotify import db_utils as spotify_db  # noqa: E402
+
+for module in (gateway_db, gateway_db_utils, lastfm_db, recommender_db, artist_recommendations, spotify_db):
+    module.DB_PATH = DB_COPY
+
+# Keep the run's recommendation logs out of the repo's logs/
+logs_dir = Path(os.environ.get("LOADTEST_LOGS") or Path(DB_COPY).parent)
+recommendation_logger._recommendations.path = logs_dir / "recommendations_generation.jsonl"
+recommendation_logger._sessions.path = logs_dir / "search_sessions.jsonl"
+recommendation_logger._summary.path = logs_dir / "daily_summary.json"
+
+behaviors = {name: StubBehavior(**config) for name, config in json.loads(os.environ.get("LOADTEST_STUBS", "{}")).items()}
+catalog = Catalog.from_db(DB_COPY, max_artists=int(os.environ.get("LOADTEST_ARTISTS", "300")))
+stubs = build_stubs(catalog, behaviors)
+mounts = install_stubs(stubs)
+
+# The recommender's Discogs vinyl searches use a module-level sync client
+artist_recommendations.CLIENT = InstrumentedClient(
+    transport=SyncASGIBridge(mounts),
+    headers=artist_recommendations.HEADERS,
+    timeout=artist_recommendations.CLIENT.timeout,
+    follow_redirects=True,
+)
+
+from gateway.inprocess import app  # noqa: E402  (after the stubs are mounted)
+
+
+@app.get("/__loadtest/stubs", include_in_schema=False)
+async def stub_stats():
+    return {
+        name: {
+            "requests": stub.stats.requests,
+            "throttled": stub.stats.throttled,
+            "latency_ms": stub.behavior.latency_ms,
+            "rate_429": stub.behavior.rate_429,
+            "routes": stub.stats.by_route,
+        }
+        for name, stub in stubs.items()
+    }
+
+
+@app.get("/__loadtest/catalog", include_in_schema=False)
+async def stub_catalog(limit: int = 200, seed: int = 0):
+    rnd = random.Random(seed)
+    names = rnd.sample(catalog.artist_names, min(limit, len(catalog.artist_names)))
+    return {"albums": [{"artist": name, "album": rnd.choice(catalog.albums(name))} for name in names]}
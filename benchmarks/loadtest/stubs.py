@@ -0,0 +1,567 @@
+"""
+Stub upstream APIs for the load test.
+
+Every external dependency (Discogs, MusicBrainz, Spotify, Last.fm, eBay,
+ZenRows and the Marilians / Bajo el Volcán / Bora Bora stores) is an ASGI
+app serving the recorded fixtures in ./fixtures, filled in with artists and
+albums from a small catalog so the services' matchers find what they look
+for. Each stub sleeps for its configured latency (plus jitter) and answers
+a configured fraction of requests with 429 + Retry-After.
+
+Stubs are registered with libs.shared.inprocess under the real upstream
+base URLs, so the pooled async clients reach them without any change to the
+service code; the recommender's synchronous Discogs/MusicBrainz client is
+served through SyncASGIBridge.
+"""
+import asyncio
+import html
+import json
+import random
+import re
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from string import Template
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# Stub name -> base URLs it answers for (scheme matters for the mounts)
+UPSTREAM_HOSTS: Dict[str, Tuple[str, ...]] = {
+    "discogs": ("https://api.discogs.com",),
+    "musicbrainz": ("https://musicbrainz.org",),
+    "spotify": ("https://api.spotify.com", "https://accounts.spotify.com"),
+    "lastfm": ("http://ws.audioscrobbler.com", "https://ws.audioscrobbler.com"),
+    "ebay": ("https://api.ebay.com",),
+    "zenrows": ("https://api.zenrows.com",),
+    "store_bajoelvolcan": ("https://www.bajoelvolcan.es",),
+    "store_borabora": ("https://discosborabora.com",),
+}
+
+
+@dataclass
+class StubBehavior:
+    latency_ms: float = 80.0
+    jitter_ms: float = 40.0
+    rate_429: float = 0.0
+    retry_after: int = 1
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    throttled: int = 0
+    by_route: Dict[str, int] = field(default_factory=dict)
+
+
+# ---------------------------------------------------------------------------
+# Catalog and fixtures
+# ---------------------------------------------------------------------------
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "x"
+
+
+def _norm(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def _stable_id(*parts: str, modulo: int = 9_000_000) -> int:
+    return zlib.crc32("|".join(parts).encode()) % modulo + 100_000
+
+
+class Catalog:
+    """Artists and albums the stubs know about, shared by every upstream"""
+
+    def __init__(self, artists: Dict[str, List[str]]):
+        self.artists = artists
+        self.artist_names = list(artists)
+        self._by_norm = {_norm(name): name for name in artists}
+        self._by_mbid: Dict[str, str] = {}
+        self._by_spotify_id: Dict[str, str] = {}
+        for name in artists:
+            self.mbid(name)
+            self.spotify_id(name)
+        # Discogs master/release/spotify album id -> (artist, album), filled as ids are handed out
+        self._albums_by_id: Dict[int, Tuple[str, str]] = {}
+        self._spotify_albums: Dict[str, Tuple[str, str]] = {}
+        for artist, albums in artists.items():
+            for album in albums:
+                self._albums_by_id[self.master_id(artist, album)] = (artist, album)
+                self._albums_by_id[self.release_id(artist, album)] = (artist, album)
+                self._spotify_albums[self.spotify_album_id(artist, album)] = (artist, album)
+
+    @classmethod
+    def from_db(cls, db_path: str, max_artists: int = 300, synthetic: int = 100) -> "Catalog":
+        """Real artist/album names from the DB (cache hits) plus synthetic artists (cache misses)"""
+        artists: Dict[str, List[str]] = {}
+        try:
+            conn = sqlite3.connect(db_path)
+            try:
+                rows = conn.execute(
+                    """SELECT ar.name, al.title FROM artists ar JOIN albums al ON al.artist_id = ar.id
+                       WHERE ar.id IN (SELECT id FROM artists ORDER BY id LIMIT ?)
+                       ORDER BY ar.id, al.rating DESC""",
+                    (max_artists,),
+                ).fetchall()
+            finally:
+                conn.close()
+            for name, title in rows:
+                artists.setdefault(name, []).append(title)
+        except sqlite3.Error:
+            pass
+        for i in range(synthetic):
+            artists[f"Stub Artist {i:03d}"] = [f"Stub Album {i:03d}-{j}" for j in range(1, 6)]
+        return cls(artists)
+
+    def resolve_artist(self, text: str) -> str:
+        text = text.strip().strip('"')
+        if text.lower().startswith("artist:"):
+            text = text[7:].strip().strip('"')
+        return self._by_norm.get(_norm(text), text)
+
+    def split_query(self, query: str) -> Tuple[str, str]:
+        """Best (artist, album) guess for a free-text "artist album" query"""
+        q = _norm(query)
+        for norm_name, name in self._by_norm.items():
+            if q.startswith(norm_name + " ") or q == norm_name:
+                rest = q[len(norm_name):].strip()
+                for album in self.artists[name]:
+                    if _norm(album) == rest:
+                        return name, album
+                return name, rest.title() or self.artists[name][0]
+        words = query.split()
+        half = max(1, len(words) // 2)
+        return " ".join(words[:half]), " ".join(words[half:]) or query
+
+    def albums(self, artist: str) -> List[str]:
+        return self.artists.get(artist) or [f"{artist} LP {i}" for i in range(1, 6)]
+
+    def album_for_id(self, album_id: int) -> Tuple[str, str]:
+        return self._albums_by_id.get(album_id, ("Unknown Artist", f"Album {album_id}"))
+
+    def remember(self, artist: str, album: str):
+        for album_id in (self.master_id(artist, album), self.release_id(artist, album)):
+            self._albums_by_id.setdefault(album_id, (artist, album))
+        self._spotify_albums.setdefault(self.spotify_album_id(artist, album), (artist, album))
+
+    def master_id(self, artist: str, album: str) -> int:
+        return _stable_id("master", artist, album)
+
+    def release_id(self, artist: str, album: str) -> int:
+        return _stable_id("release", artist, album)
+
+    def mbid(self, artist: str) -> str:
+        h = f"{zlib.crc32(artist.encode()):08x}"
+        mbid = f"{h}-0000-4000-8000-{h}{h[:4]}"
+        self._by_mbid.setdefault(mbid, artist)
+        return mbid
+
+    def artist_for_mbid(self, mbid: str) -> str:
+        return self._by_mbid.get(mbid, "Unknown Artist")
+
+    def spotify_id(self, artist: str) -> str:
+        spotify_id = f"stubart{zlib.crc32(artist.encode()):015d}"
+        self._by_spotify_id.setdefault(spotify_id, artist)
+        return spotify_id
+
+    def artist_for_spotify_id(self, spotify_id: str) -> str:
+        return self._by_spotify_id.get(spotify_id, "Unknown Artist")
+
+    def spotify_album_id(self, artist: str, album: str) -> str:
+        return f"stubalb{zlib.crc32(f'{artist}|{album}'.encode()):015d}"
+
+    def album_for_spotify_id(self, album_id: str) -> Tuple[str, str]:
+        return self._spotify_albums.get(album_id, ("Unknown Artist", album_id))
+
+
+_templates: Dict[str, Template] = {}
+
+
+def _template(name: str) -> Template:
+    if name not in _templates:
+        _templates[name] = Template((FIXTURES / name).read_text(encoding="utf-8"))
+    return _templates[name]
+
+
+def fixture_json(name: str, **values):
+    """A JSON fixture with $placeholders filled in (strings JSON-escaped)"""
+    escaped = {k: json.dumps(v)[1:-1] if isinstance(v, str) else json.dumps(v) for k, v in values.items()}
+    return json.loads(_template(name).safe_substitute(escaped))
+
+
+def fixture_html(name: str, **values) -> str:
+    return _template(name).safe_substitute({k: html.escape(str(v)) for k, v in values.items()})
+
+
+def _price(*parts: str, low: float = 14.0, high: float = 38.0) -> float:
+    return round(low + (zlib.crc32("|".join(parts).encode()) % 1000) / 1000 * (high - low), 2)
+
+
+def _rating(artist: str, album: str) -> Tuple[float, int]:
+    seed = zlib.crc32(f"{artist}|{album}".encode())
+    return round(3.4 + (seed % 140) / 100, 2), 50 + seed % 2500
+
+
+# ---------------------------------------------------------------------------
+# Upstream handlers
+# ---------------------------------------------------------------------------
+
+def discogs_handler(catalog: Catalog) -> Callable[[Request], Response]:
+    def search_result(artist: str, album: str, kind: str, year: int) -> dict:
+        catalog.remember(artist, album)
+        master_id = catalog.master_id(artist, album)
+        result_id = master_id if kind == "master" else catalog.release_id(artist, album)
+        seed = zlib.crc32(album.encode())
+        return fixture_json(
+            "discogs/search_result.json",
+            id=result_id, type=kind, master_id=master_id, artist=artist, album=album,
+            artist_slug=_slug(artist), album_slug=_slug(album), year=str(year),
+            want=200 + seed % 5000, have=500 + seed % 9000,
+        )
+
+    def handle(request: Request) -> Response:
+        path = request.url.path
+        params = request.query_params
+        if path == "/database/search":
+            kind = params.get("type") or "release"
+            per_page = int(params.get("per_page") or 20)
+            if params.get("artist") and params.get("release_title"):
+                pairs = [(catalog.resolve_artist(params["artist"]), params["release_title"])]
+            elif params.get("artist"):
+                artist = catalog.resolve_artist(params["artist"])
+                pairs = [(artist, album) for album in catalog.albums(artist)]
+            elif params.get("q"):
+                pairs = [catalog.split_query(params["q"])]
+            else:
+                title = params.get("release_title", "")
+                pairs = [(name, title) for name in catalog.artist_names[:3]]
+            results = [search_result(a, b, kind, 1990 + i) for i, (a, b) in enumerate(pairs[:per_page])]
+            return JSONResponse({"pagination": {"page": 1, "pages": 1, "per_page": per_page,
+                                                "items": len(results)}, "results": results})
+
+        match = re.match(r"^/(masters|releases|marketplace/stats)/(\d+)", path)
+        if not match:
+            return JSONResponse({"message": "The requested resource was not found."}, status_code=404)
+        kind, item_id = match.group(1), int(match.group(2))
+        artist, album = catalog.album_for_id(item_id)
+        rating, votes = _rating(artist, album)
+        if kind == "marketplace/stats":
+            return JSONResponse(fixture_json("discogs/marketplace_stats.json", price=_price("discogs", album)))
+        if kind == "masters":
+            return JSONResponse(fixture_json(
+                "discogs/master.json", id=item_id, main_release=catalog.release_id(artist, album),
+                artist=artist, album=album, rating=rating, votes=votes,
+            ))
+        return JSONResponse(fixture_json(
+            "discogs/release.json", id=item_id, master_id=catalog.master_id(artist, album),
+            artist=artist, album=album, rating=rating, votes=votes,
+            have=1000 + votes, want=400 + votes // 2,
+        ))
+
+    return handle
+
+
+def musicbrainz_handler(catalog: Catalog) -> Callable[[Request], Response]:
+    def handle(request: Request) -> Response:
+        path = request.url.path
+        params = request.query_params
+        if path.startswith("/ws/2/artist"):
+            artist = catalog.resolve_artist(params.get("query", ""))
+            return JSONResponse(fixture_json("musicbrainz/artist_search.json", artist=artist, mbid=catalog.mbid(artist)))
+        if path.startswith("/ws/2/release-group"):
+            mbid = params.get("artist", "")
+            artist = catalog.artist_for_mbid(mbid)
+            groups = []
+            for i, album in enumerate(catalog.albums(artist)):
+                catalog.remember(artist, album)
+                groups.append(fixture_json(
+                    "musicbrainz/release_group.json", rg_id=f"{zlib.crc32(album.encode()):08x}-rg00-4000-8000-{i:012d}",
+                    album=album, artist=artist, mbid=mbid, year=str(1990 + i),
+                    master_id=catalog.master_id(artist, album),
+                ))
+            return JSONResponse({"release-group-count": len(groups), "release-group-offset": 0,
+                                 "release-groups": groups})
+        return JSONResponse({"error": "Not Found"}, status_code=404)
+
+    return handle
+
+
+def spotify_handler(catalog: Catalog) -> Callable[[Request], Response]:
+    def artist_item(name: str) -> dict:
+        return fixture_json("spotify/artist.json", id=catalog.spotify_id(name), artist=name,
+                            popularity=40 + zlib.crc32(name.encode()) % 60)
+
+    def album_item(artist: str, album: str, year: int) -> dict:
+        catalog.remember(artist, album)
+        return fixture_json("spotify/album.json", id=catalog.spotify_album_id(artist, album), album=album,
+                            artist=artist, artist_id=catalog.spotify_id(artist), year=str(year))
+
+    async def handle(request: Request) -> Response:
+        path = request.url.path
+        params = request.query_params
+        if request.url.hostname == "accounts.spotify.com":
+            return JSONResponse(fixture_json("spotify/token.json"))
+        if path == "/v1/search":
+            query = params.get("q", "")
+            limit = int(params.get("limit") or 10)
+            if params.get("type") == "album":
+                artist, album = catalog.split_query(query)
+                return JSONResponse({"albums": {"items": [album_item(artist, album, 1997)]}})
+            q = _norm(query)
+            names = [n for n in catalog.artist_names if q and q in _norm(n)][:limit]
+            return JSONResponse({"artists": {"items": [artist_item(n) for n in names], "limit": limit,
+                                             "total": len(names)}})
+        match = re.match(r"^/v1/artists/([^/]+)/albums$", path)
+        if match:
+            artist = catalog.artist_for_spotify_id(match.group(1))
+            items = [album_item(artist, album, 1990 + i) for i, album in enumerate(catalog.albums(artist))]
+            return JSONResponse({"items": items, "total": len(items), "next": None})
+        if path == "/v1/albums":
+            ids = [i for i in params.get("ids", "").split(",") if i]
+            return JSONResponse({"albums": [album_item(*catalog.album_for_spotify_id(i), 1997) for i in ids]})
+        if path == "/v1/artists":
+            ids = [i for i in params.get("ids", "").split(",") if i]
+            return JSONResponse({"artists": [artist_item(catalog.artist_for_spotify_id(i)) for i in ids]})
+        return JSONResponse({"error": {"status": 404, "message": "Service not found"}}, status_code=404)
+
+    return handle
+
+
+def lastfm_handler(catalog: Catalog, items_per_user: int = 300) -> Callable[[Request], Response]:
+    kinds = {
+        "user.gettopartists": ("topartists", "artist", "lastfm/top_artist.json"),
+        "user.gettopalbums": ("topalbums", "album", "lastfm/top_album.json"),
+        "user.gettoptracks": ("toptracks", "track", "lastfm/top_track.json"),
+    }
+
+    def user_items(user: str, kind: str) -> List[Tuple[str, str]]:
+        """A stable per-user ranking drawn from the catalog"""
+        rnd = random.Random(f"{user}|{kind}")
+        names = rnd.sample(catalog.artist_names, min(len(catalog.artist_names), items_per_user))
+        if kind == "artist":
+            return [(name, "") for name in names]
+        return [(name, rnd.choice(catalog.albums(name))) for name in names]
+
+    def handle(request: Request) -> Response:
+        params = request.query_params
+        method = (params.get("method") or "").lower()
+        if method == "auth.gettoken":
+            return JSONResponse(fixture_json("lastfm/token.json", token=f"stubtoken{random.getrandbits(48):012x}"))
+        if method == "auth.getsession":
+            return JSONResponse(fixture_json("lastfm/session.json", user="loadtest_user", token=params.get("token", "")))
+        if method == "user.getinfo":
+            user = params.get("user", "")
+            return JSONResponse({"user": {"name": user, "playcount": "48213", "realname": "", "country": "Spain"}})
+        if method in kinds:
+            root, kind, fixture = kinds[method]
+            user = params.get("user", "")
+            page, limit = int(params.get("page") or 1), int(params.get("limit") or 50)
+            ranking = user_items(user, kind)
+            start = (page - 1) * limit
+            entries = []
+            for rank, (artist, album) in enumerate(ranking[start:start + limit], start + 1):
+                entries.append(fixture_json(
+                    fixture, artist=artist, album=album, track=f"{album or artist} (Track {rank % 12 + 1})",
+                    artist_slug=_slug(artist), album_slug=_slug(album), track_slug=f"track-{rank}",
+                    mbid=catalog.mbid(artist), playcount=str(max(1, 2000 - rank * 6)), rank=str(rank),
+                ))
+            total_pages = max(1, -(-len(ranking) // limit))
+            return JSONResponse({root: {kind: entries, "@attr": {
+                "user": user, "page": str(page), "perPage": str(limit),
+                "totalPages": str(total_pages), "total": str(len(ranking)),
+            }}})
+        if method == "artist.search":
+            q = _norm(params.get("artist", ""))
+            names = [n for n in catalog.artist_names if q in _norm(n)][:int(params.get("limit") or 30)]
+            return JSONResponse({"results": {"artistmatches": {"artist": [
+                {"name": n, "mbid": catalog.mbid(n), "listeners": "100000", "image": []} for n in names
+            ]}}})
+        return JSONResponse({"error": 3, "message": "Invalid Method - No method with that name in this package"})
+
+    return handle
+
+
+def ebay_handler(catalog: Catalog) -> Callable[[Request], Response]:
+    countries = ("ES", "DE", "FR", "IT", "GB", "US")
+    conditions = ("Nuevo", "Usado", "Nuevo")
+
+    def handle(request: Request) -> Response:
+        path = request.url.path
+        if path.startswith("/identity/v1/oauth2/token"):
+            return JSONResponse(fixture_json("ebay/token.json"))
+        if path.startswith("/buy/browse/v1/item_summary/search"):
+            query = request.query_params.get("q", "")
+            artist, album = catalog.split_query(query.replace(" vinyl", "").replace(" LP", ""))
+            items = []
+            for i in range(8):
+                items.append(fixture_json(
+                    "ebay/item_summary.json", id=str(_stable_id("ebay", query, str(i))), artist=artist,
+                    album=album, price=f"{_price('ebay', query, str(i)):.2f}",
+                    shipping=f"{4.5 + i % 3 * 2:.2f}", country=countries[i % len(countries)],
+                    condition=conditions[i % len(conditions)],
+                ))
+            return JSONResponse({"href": str(request.url), "total": len(items), "limit": 50, "offset": 0,
+                                 "itemSummaries": items})
+        return JSONResponse({"errors": [{"errorId": 11001, "message": "Not found"}]}, status_code=404)
+
+    return handle
+
+
+def _store_page(fixture: str, query: str, store: str) -> str:
+    return fixture_html(fixture, id=_stable_id(store, query), slug=_slug(query), query=query,
+                        title_text=query, artist_text=query, price=f"{_price(store, query):.2f}".replace(".", ","))
+
+
+def zenrows_handler(catalog: Catalog) -> Callable[[Request], Response]:
+    def handle(request: Request) -> Response:
+        target = request.query_params.get("url", "")
+        parts = urlsplit(target)
+        if not parts.hostname or "marilians.com" not in parts.hostname:
+            return JSONResponse({"code": "RESP001", "detail": "Could not get content"}, status_code=422)
+        query = (parse_qs(parts.query).get("s") or [""])[0].replace("+", " ")
+        return HTMLResponse(_store_page("stores/marilians.html", query, "marilians"))
+
+    return handle
+
+
+def bajoelvolcan_handler(catalog: Catalog) -> Callable[[Request], Response]:
+    def handle(request: Request) -> Response:
+        query = request.query_params.get("palabrasBusqueda", "").replace("+", " ")
+        return HTMLResponse(_store_page("stores/bajoelvolcan.html", query, "bajoelvolcan"))
+
+    return handle
+
+
+def borabora_handler(catalog: Catalog) -> Callable[[Request], Response]:
+    def handle(request: Request) -> Response:
+        match = re.match(r"^/producto/([^/]+)/?$", request.url.path)
+        if match:
+            slug = match.group(1)
+            return HTMLResponse(fixture_html("stores/borabora_product.html", slug=slug,
+                                             price=f"{_price('borabora', slug):.2f}".replace(".", ",")))
+        query = request.query_params.get("s", "").replace("+", " ")
+        return HTMLResponse(_store_page("stores/borabora_search.html", query, "borabora"))
+
+    return handle
+
+
+HANDLERS = {
+    "discogs": discogs_handler,
+    "musicbrainz": musicbrainz_handler,
+    "spotify": spotify_handler,
+    "lastfm": lastfm_handler,
+    "ebay": ebay_handler,
+    "zenrows": zenrows_handler,
+    "store_bajoelvolcan": bajoelvolcan_handler,
+    "store_borabora": borabora_handler,
+}
+
+
+# ---------------------------------------------------------------------------
+# ASGI wrapper and installation
+# ---------------------------------------------------------------------------
+
+class StubUpstream:
+    """ASGI app: injected latency and 429s in front of one upstream's handler"""
+
+    def __init__(self, name: str, handler: Callable, behavior: StubBehavior):
+        self.name = name
+        self.handler = handler
+        self.behavior = behavior
+        self.stats = StubStats()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        request = Request(scope, receive)
+        self.stats.requests += 1
+        route = re.sub(r"/\d+|/stub\w+", "/{id}", request.url.path)
+        self.stats.by_route[route] = self.stats.by_route.get(route, 0) + 1
+
+        behavior = self.behavior
+        delay = behavior.latency_ms + random.uniform(-behavior.jitter_ms, behavior.jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+        if behavior.rate_429 and random.random() < behavior.rate_429:
+            self.stats.throttled += 1
+            response = JSONResponse({"message": "You are making requests too quickly."}, status_code=429,
+                                    headers={"Retry-After": str(behavior.retry_after)})
+        else:
+            response = self.handler(request)
+            if asyncio.iscoroutine(response):
+                response = await response
+        await response(scope, receive, send)
+
+
+class SyncASGIBridge(httpx.BaseTransport):
+    """
+    Lets a synchronous httpx.Client reach the ASGI stubs. Requests run on a
+    private event loop thread, so callers that block the service's own loop
+    (the recommender's Discogs fallback does) cannot deadlock.
+    """
+
+    def __init__(self, mounts: Dict[str, httpx.AsyncBaseTransport]):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="stub-bridge", daemon=True)
+        self._thread.start()
+        self._client = httpx.AsyncClient(mounts=mounts, timeout=60.0)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        async_request = httpx.Request(request.method, request.url, headers=request.headers, content=request.read())
+        future = asyncio.run_coroutine_threadsafe(self._client.send(async_request), self._loop)
+        response = future.result()
+        return httpx.Response(response.status_code, headers=response.headers, content=response.content,
+                              request=request)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def build_stubs(catalog: Catalog, behaviors: Dict[str, StubBehavior]) -> Dict[str, StubUpstream]:
+    default = behaviors.get("default", StubBehavior())
+    return {name: StubUpstream(name, factory(catalog), behaviors.get(name, default))
+            for name, factory in HANDLERS.items()}
+
+
+def install_stubs(stubs: Dict[str, StubUpstream]) -> Dict[str, httpx.AsyncBaseTransport]:
+    """Route every stubbed base URL to its stub; returns the mounts for SyncASGIBridge"""
+    from libs.shared.inprocess import register_inprocess_app
+
+    mounts: Dict[str, httpx.AsyncBaseTransport] = {}
+    for name, stub in stubs.items():
+        for base_url in UPSTREAM_HOSTS[name]:
+            register_inprocess_app(base_url, stub)
+            mounts[base_url] = httpx.ASGITransport(app=stub)
+    return mounts
+
+
+def parse_behaviors(latency: List[str], rate_429: List[str], jitter_ms: Optional[float] = None) -> Dict[str, StubBehavior]:
+    """--latency discogs=300 default=80 / --rate-429 discogs=0.05 into per-stub behaviors"""
+    behaviors: Dict[str, StubBehavior] = {"default": StubBehavior()}
+
+    def get(name: str) -> StubBehavior:
+        if name not in behaviors:
+            base = behaviors["default"]
+            behaviors[name] = StubBehavior(base.latency_ms, base.jitter_ms, base.rate_429, base.retry_after)
+        return behaviors[name]
+
+    entries = [("latency_ms", item) for item in latency or []] + [("rate_429", item) for item in rate_429 or []]
+    # "default=" entries first, so per-stub entries override them whatever the order
+    for attr, item in sorted(entries, key=lambda e: not e[1].startswith("default=")):
+        name, _, value = item.partition("=")
+        if name != "default" and name not in HANDLERS:
+            raise ValueError(f"Unknown stub '{name}' (choose from: default, {', '.join(HANDLERS)})")
+        setattr(get(name), attr, float(value))
+    if jitter_ms is not None:
+        for behavior in behaviors.values():
+            behavior.jitter_ms = jitter_ms
+    return behaviors
@@ -0,0 +1,388 @@
+"""
+Synthetic vinylbe.db generator for query benchmarks at production scale.
+
+Builds a database with the production schema (copied from vinylbe.db, then
+the gateway/recommender migrations applied) and fills it with skewed data:
+
+- artists with Zipf popularity; albums assigned to artists by popularity,
+  so a few artists have hundreds of albums and most have one or two
+- realistic gaps: missing covers/ratings/MBIDs/Spotify ids, ~5% partial rows
+- users split between Last.fm and Google logins, with Last.fm profiles and
+  selected artists
+- recommendations per user Pareto-distributed (median ~40, capped at
+  5000 per user), albums picked by popularity, statuses mostly neutral
+
+Names are built from word lists so LIKE searches behave like real text.
+Explicit indexes are created after the bulk load; no ANALYZE is run unless
+--analyze is given, matching a production database without sqlite_stat1.
+
+Usage:
+    python -m benchmarks.synthetic_db --out /tmp/vinylbe-large.db
+    python -m benchmarks.synthetic_db --out /tmp/vinylbe-small.db --albums 20000 --users 2000 --recommendations 200000
+"""
+import argparse
+import itertools
+import json
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Sequence
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+BATCH = 50_000
+MAX_RECS_PER_USER = 5_000
+
+ARTIST_WORDS = (
+    "Black Silver Velvet Electric Midnight Crystal Golden Broken Northern Paper Iron Lunar Static Wild "
+    "Quiet Neon Hollow Burning Sonic Glass Royal Little Eastern Savage Radio Dead Young Cosmic Violet "
+    "Holy Blue Red White Stone Fire Ghost Wolf Tiger Sparrow Raven Echo Harbor Machine Garden River "
+    "Ocean Canyon Desert Temple Empire Riot Orchestra Brothers Sisters Collective Society Club Union "
+    "Kings Queens Saints Lovers Drifters Strangers Mirrors Arcade Parade Signal Circus Division Factory "
+    "Hotel Motel Disco Lounge Cartel Assembly Academy Chorus Band Trio Quartet Ensemble Sound System"
+).split()
+ALBUM_WORDS = (
+    "Love Night Day Dream Light Dark Heart Time Fire Rain Summer Winter Blue Gold Road Home City Sky "
+    "Moon Sun Star Song Dance Paradise Heaven Hell Ocean River Mountain Island Kingdom Revolution Memory "
+    "Silence Noise Shadow Mirror Window Door Garden Forest Desert Storm Thunder Lightning Machine Radio "
+    "Television Electric Magnetic Atomic Cosmic Digital Analog Secret Lost Found Broken Perfect Strange "
+    "Sweet Bitter Golden Silver Velvet Crystal Wild Quiet Loud Slow Fast Young Old New Last First Final "
+    "Endless Eternal Modern Ancient Northern Southern Western Eastern Morning Evening Midnight Sunrise"
+).split()
+SUFFIXES = ["", "", "", "", " (Deluxe Edition)", " (Remastered)", " (Live)", " Vol. 2", " (Expanded Edition)"]
+
+
+def name_from_index(idx: int, words: Sequence[str], salt: int) -> str:
+    """Unique multi-word name for idx (bijective base-len(words), scrambled by salt)"""
+    n = len(words)
+    scrambled = (idx * 2654435761 + salt) % (1 << 40)
+    parts = [words[scrambled % n]]
+    rest = idx
+    while True:
+        rest, digit = divmod(rest, n)
+        parts.append(words[digit])
+        if rest == 0:
+            break
+    return " ".join(parts)
+
+
+def artist_name(idx: int) -> str:
+    return name_from_index(idx, ARTIST_WORDS, 17)
+
+
+def album_title(idx: int) -> str:
+    return name_from_index(idx, ALBUM_WORDS, 91) + SUFFIXES[idx % len(SUFFIXES)]
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+
+
+BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def hex_id(rnd: random.Random, length: int) -> str:
+    return f"{rnd.getrandbits(length * 4):0{length}x}"
+
+
+def spotify_id(rnd: random.Random) -> str:
+    value, chars = rnd.getrandbits(131), []
+    for _ in range(22):
+        value, digit = divmod(value, 62)
+        chars.append(BASE62[digit])
+    return "".join(chars)
+
+
+def mbid(rnd: random.Random) -> str:
+    h = hex_id(rnd, 32)
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+EPOCH = datetime(2025, 12, 1)
+
+
+def timestamp(rnd: random.Random, days_back: int) -> str:
+    moment = EPOCH - timedelta(seconds=int(rnd.random() * days_back * 86400))
+    return moment.isoformat(sep=" ", timespec="seconds")
+
+
+def batched(rows: Iterator[tuple], size: int = BATCH) -> Iterator[List[tuple]]:
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+def create_schema(conn: sqlite3.Connection, schema_from: Path) -> List[str]:
+    """Create the tables from the reference DB; returns its CREATE INDEX statements for after the load"""
+    src = sqlite3.connect(f"file:{schema_from}?mode=ro&immutable=1", uri=True)
+    try:
+        rows = src.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+    finally:
+        src.close()
+    for kind, _, sql in rows:
+        if kind == "table":
+            conn.execute(sql)
+    conn.commit()
+    return [sql for kind, _, sql in rows if kind == "index"]
+
+
+def apply_migrations(db_path: Path):
+    """Run the same schema code the services run at startup"""
+    from gateway import db as gateway_db
+    from services.recommender import db_utils as recommender_db
+
+    gateway_db.DB_PATH = str(db_path)
+    recommender_db.DB_PATH = str(db_path)
+    gateway_db.init_db()
+    recommender_db.get_db_connection().close()
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+def generate(conn: sqlite3.Connection, args, rnd: random.Random):
+    n_artists = args.artists or max(1, args.albums // 8)
+    cur = conn.cursor()
+
+    def progress(label: str, done: int, total: int, started: float):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        print(f"\r  {label:<16} {done:>11,}/{total:,}  ({rate:,.0f} rows/s)", end="", flush=True)
+
+    # artists
+    started = time.perf_counter()
+
+    def artist_rows():
+        for i in range(n_artists):
+            partial = rnd.random() < 0.03
+            yield (
+                i + 1,
+                artist_name(i),
+                None if partial or rnd.random() < 0.3 else mbid(rnd),
+                None if partial or rnd.random() < 0.15 else f"https://i.scdn.co/image/{hex_id(rnd, 40)}",
+                timestamp(rnd, 400),
+                int(partial),
+            )
+
+    done = 0
+    for batch in batched(artist_rows()):
+        cur.executemany(
+            "INSERT INTO artists (id, name, mbid, image_url, last_updated, is_partial) VALUES (?, ?, ?, ?, ?, ?)", batch
+        )
+        done += len(batch)
+        progress("artists", done, n_artists, started)
+    conn.commit()
+    print()
+
+    # albums: owner artist drawn by artist popularity (artist i is rank i)
+    started = time.perf_counter()
+    artist_weights = zipf_cum_weights(n_artists, 0.9)
+    album_artist = rnd.choices(range(n_artists), cum_weights=artist_weights, k=args.albums)
+    has_mbid = bytearray(args.albums)
+
+    def album_rows():
+        for i in range(args.albums):
+            partial = rnd.random() < 0.05
+            has_mbid[i] = not partial and rnd.random() < 0.7
+            has_discogs = not partial and rnd.random() < 0.85
+            rated = has_discogs and rnd.random() < 0.9
+            yield (
+                i + 1,
+                album_artist[i] + 1,
+                album_title(i),
+                None if partial else str(int(min(2025, 1955 + rnd.betavariate(2.5, 1.4) * 71))),
+                str(rnd.randrange(1, 4_000_000)) if has_discogs else None,
+                str(rnd.randrange(1, 30_000_000)) if has_discogs else None,
+                round(rnd.uniform(2.6, 4.8), 2) if rated else None,
+                int(rnd.paretovariate(1.2) * 5) if rated else None,
+                None if partial or rnd.random() < 0.08 else f"https://i.discogs.com/{hex_id(rnd, 40)}.jpg",
+                timestamp(rnd, 400),
+                mbid(rnd) if has_mbid[i] else None,
+                int(partial),
+                spotify_id(rnd) if not partial and rnd.random() < 0.6 else None,
+            )
+
+    done = 0
+    for batch in batched(album_rows()):
+        cur.executemany(
+            """
+            INSERT INTO albums (id, artist_id, title, year, discogs_master_id, discogs_release_id, rating, votes,
+                                cover_url, last_updated, mbid, is_partial, spotify_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            batch,
+        )
+        done += len(batch)
+        progress("albums", done, args.albums, started)
+    conn.commit()
+    print()
+
+    # users, identities, Last.fm profiles, selected artists
+    started = time.perf_counter()
+    lastfm_users = set()
+
+    def user_rows():
+        for i in range(args.users):
+            user_id = i + 1
+            created = timestamp(rnd, 730)
+            if rnd.random() < 0.7:
+                lastfm_users.add(user_id)
+                yield (user_id, None, f"lastfm_user_{user_id}", created, timestamp(rnd, 60))
+            else:
+                yield (user_id, f"user{user_id}@example.com", f"Google User {user_id}", created, timestamp(rnd, 60))
+
+    done = 0
+    for batch in batched(user_rows()):
+        cur.executemany("INSERT INTO user (id, email, display_name, created_at, last_login_at) VALUES (?, ?, ?, ?, ?)", batch)
+        cur.executemany(
+            "INSERT INTO auth_identity (user_id, provider, provider_user_id, created_at) VALUES (?, ?, ?, ?)",
+            [
+                (uid, "lastfm", name, created) if uid in lastfm_users else (uid, "google", f"google-sub-{uid}", created)
+                for uid, _, name, created, _ in batch
+            ],
+        )
+        cur.executemany(
+            "INSERT INTO user_profile_lastfm (user_id, lastfm_username, top_artists_json, generated_at) VALUES (?, ?, ?, ?)",
+            [
+                (uid, name, json.dumps([
+                    {"name": artist_name(a), "playcount": rnd.randrange(10, 5000)}
+                    for a in set(rnd.choices(range(n_artists), cum_weights=artist_weights, k=20))
+                ]), created)
+                for uid, _, name, created, _ in batch if uid in lastfm_users
+            ],
+        )
+        selected = []
+        for uid, *_ in batch:
+            picks = set(rnd.choices(range(n_artists), cum_weights=artist_weights, k=min(30, int(rnd.paretovariate(1.5)) - 1)))
+            selected.extend(
+                (uid, artist_name(a), rnd.choice(("manual", "lastfm_suggestion")), timestamp(rnd, 365)) for a in picks
+            )
+        cur.executemany(
+            "INSERT INTO user_selected_artist (user_id, artist_name, source, created_at) VALUES (?, ?, ?, ?)", selected
+        )
+        done += len(batch)
+        progress("users", done, args.users, started)
+    conn.commit()
+    print()
+
+    # recommendations: per-user counts Pareto-distributed, scaled to the requested total
+    started = time.perf_counter()
+    raw = [rnd.paretovariate(1.3) for _ in range(args.users)]
+    cap = min(args.albums, MAX_RECS_PER_USER)
+    scale = args.recommendations / sum(raw)
+    for _ in range(5):  # re-fit the scale so the capped counts still add up to the target
+        per_user = [max(1, min(cap, int(r * scale))) for r in raw]
+        scale *= args.recommendations / sum(per_user)
+    album_weights = zipf_cum_weights(args.albums, 0.8)
+    album_rank = list(range(args.albums))
+    rnd.shuffle(album_rank)  # popularity independent of album id
+    statuses = ["neutral"] * 80 + ["favorite"] * 10 + ["disliked"] * 7 + ["owned"] * 3
+    sources = ["lastfm"] * 6 + ["manual"] * 3 + ["mixed"]
+    total = sum(per_user)
+
+    def rec_rows():
+        for uid, count in enumerate(per_user, start=1):
+            picks = set()
+            while len(picks) < count:
+                picks.update(rnd.choices(album_rank, cum_weights=album_weights, k=count - len(picks)))
+            for album_idx in picks:
+                status = statuses[int(rnd.random() * 100)]
+                created = timestamp(rnd, 365)
+                yield (
+                    uid,
+                    artist_name(album_artist[album_idx]),
+                    album_title(album_idx),
+                    mbid(rnd) if has_mbid[album_idx] and rnd.random() < 0.5 else None,
+                    sources[int(rnd.random() * 10)],
+                    status,
+                    created,
+                    created if status != "neutral" or rnd.random() < 0.3 else None,
+                )
+
+    done = 0
+    for batch in batched(rec_rows()):
+        cur.executemany(
+            """
+            INSERT INTO recommendation (user_id, artist_name, album_title, album_mbid, source, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            batch,
+        )
+        done += len(batch)
+        progress("recommendations", done, total, started)
+    conn.commit()
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large synthetic vinylbe.db")
+    parser.add_argument("--out", required=True, type=Path, help="database file to create")
+    parser.add_argument("--albums", type=int, default=1_000_000)
+    parser.add_argument("--artists", type=int, help="default: albums / 8")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--recommendations", type=int, default=10_000_000, help="approximate total")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema-from", type=Path, default=ROOT / "vinylbe.db", help="database to copy the schema from")
+    parser.add_argument("--analyze", action="store_true", help="run ANALYZE after loading")
+    parser.add_argument("--force", action="store_true", help="overwrite --out if it exists")
+    args = parser.parse_args()
+
+    if args.out.resolve() == (ROOT / "vinylbe.db").resolve():
+        parser.error("refusing to overwrite the real vinylbe.db")
+    if args.out.exists():
+        if not args.force:
+            parser.error(f"{args.out} exists (use --force to overwrite)")
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            Path(f"{args.out}{suffix}").unlink(missing_ok=True)
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.out)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    try:
+        indexes = create_schema(conn, args.schema_from)
+        generate(conn, args, random.Random(args.seed))
+        print(f"  creating {len(indexes)} indexes")
+        for sql in indexes:
+            conn.execute(sql)
+        if args.analyze:
+            print("  ANALYZE")
+            conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    # user_selected_artist.spotify_id and friends come from the services' own migrations
+    apply_migrations(args.out)
+
+    conn = sqlite3.connect(args.out)
+    try:
+        counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("artists", "albums", "user", "auth_identity", "user_profile_lastfm",
+                          "user_selected_artist", "recommendation")
+        }
+    finally:
+        conn.close()
+
+    size_mb = args.out.stat().st_size / 1024 / 1024
+    print(f"\n{args.out} ({size_mb:,.0f} MB) in {time.perf_counter() - started:.0f}s")
+    for table, count in counts.items():
+        print(f"  {table:<22} {count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
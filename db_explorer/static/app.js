@@ -168,9 +168,9 @@ class DatabaseExplorer {
 
         container.innerHTML = artists.map(artist => `
             <div class="list-item" onclick="app.showArtistDetail(${artist.id || 0})">
-                <img src="${artist.image_url || 'https://via.placeholder.com/48?text=🎤'}" 
+                <img src="${artist.image_url || '/static/no-cover.svg'}" 
                      class="list-item-image" 
-                     onerror="this.src='https://via.placeholder.com/48?text=🎤'">
+                     onerror="this.src='/static/no-cover.svg'">
                 <div class="list-item-content">
                     <div class="list-item-title">${this.escapeHtml(artist.name)}</div>
                     <div class="list-item-subtitle">${artist.album_count} álbumes</div>
@@ -188,9 +188,9 @@ class DatabaseExplorer {
 
         container.innerHTML = albums.map(album => `
             <div class="list-item">
-                <img src="${album.cover_url || 'https://via.placeholder.com/48?text=💿'}" 
+                <img src="${album.cover_url || '/static/no-cover.svg'}" 
                      class="list-item-image"
-                     onerror="this.src='https://via.placeholder.com/48?text=💿'">
+                     onerror="this.src='/static/no-cover.svg'">
                 <div class="list-item-content">
                     <div class="list-item-title">${this.escapeHtml(album.title)}</div>
                     <div class="list-item-subtitle">${this.escapeHtml(album.artist)} • ${album.year}</div>
@@ -239,9 +239,9 @@ class DatabaseExplorer {
                         🗑️
                     </button>
                 </div>
-                <img src="${artist.image_url || 'https://via.placeholder.com/200?text=🎤'}" 
+                <img src="${artist.image_url || '/static/no-cover.svg'}" 
                      class="grid-item-image"
-                     onerror="this.src='https://via.placeholder.com/200?text=🎤'"
+                     onerror="this.src='/static/no-cover.svg'"
                      onclick="app.showArtistDetail(${artist.id})">
                 <div class="grid-item-content" onclick="app.showArtistDetail(${artist.id})">
                     <div class="grid-item-title">${this.escapeHtml(artist.name)}</div>
@@ -394,9 +394,9 @@ class DatabaseExplorer {
 
             body.innerHTML = `
                 <div style="display: flex; gap: 24px; margin-bottom: 24px;">
-                    <img src="${data.artist.image_url || 'https://via.placeholder.com/150?text=🎤'}" 
+                    <img src="${data.artist.image_url || '/static/no-cover.svg'}" 
                          style="width: 150px; height: 150px; border-radius: var(--radius-lg); object-fit: cover;"
-                         onerror="this.src='https://via.placeholder.com/150?text=🎤'">
+                         onerror="this.src='/static/no-cover.svg'">
                     <div style="flex: 1;">
                         <h3 style="margin-bottom: 8px;">${this.escapeHtml(data.artist.name)}</h3>
                         <p style="color: var(--text-tertiary); margin-bottom: 16px;">${data.albums.length} álbumes en la colección</p>
@@ -408,9 +408,9 @@ class DatabaseExplorer {
                 <div style="display: grid; gap: 12px;">
                     ${data.albums.map(album => `
                         <div style="display: flex; gap: 16px; padding: 12px; background: var(--bg-tertiary); border-radius: var(--radius-md);">
-                            <img src="${album.cover_url || 'https://via.placeholder.com/60?text=💿'}" 
+                            <img src="${album.cover_url || '/static/no-cover.svg'}" 
                                  style="width: 60px; height: 60px; border-radius: var(--radius-md); object-fit: cover;"
-                                 onerror="this.src='https://via.placeholder.com/60?text=💿'">
+                                 onerror="this.src='/static/no-cover.svg'">
                             <div style="flex: 1;">
                                 <div style="font-weight: 600; margin-bottom: 4px;">${this.escapeHtml(album.title)}</div>
                                 <div style="font-size: 13px; color: var(--text-tertiary);">
@@ -474,9 +474,9 @@ class DatabaseExplorer {
                         🗑️
                     </button>
                 </div>
-                <img src="${album.cover_url || 'https://via.placeholder.com/200?text=💿'}" 
+                <img src="${album.cover_url || '/static/no-cover.svg'}" 
                      class="grid-item-image"
-                     onerror="this.src='https://via.placeholder.com/200?text=💿'">
+                     onerror="this.src='/static/no-cover.svg'">
                 <div class="grid-item-content">
                     <div class="grid-item-title">${this.escapeHtml(album.title)}</div>
                     <div class="grid-item-subtitle">${this.escapeHtml(album.artist_name)}</div>
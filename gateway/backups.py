@@ -0,0 +1,322 @@
+"""
+Online backups, streamed download and validated upload of the SQLite database.
+
+Backups are taken with SQLite's online backup API in steps of
+BACKUP_STEP_PAGES pages, so writers get the database between steps instead
+of waiting for a whole-file copy. The snapshot is consistent even while
+other connections write (a step that sees a change restarts the copy). It
+is gzip-compressed into BACKUP_DIR as vinylbe-YYYYmmdd-HHMMSS-<reason>.db.gz.
+
+    create_backup("manual")         snapshot + compress + retention
+    stream_snapshot()               snapshot, streamed gzip-compressed, never buffered whole
+    restore_upload(chunks)          temp file -> integrity_check -> backup -> restore
+
+Uploads (raw or gzip) are written chunk by chunk to a temp file next to the
+database, off the event loop and decompressed at most CHUNK_SIZE at a time up
+to BACKUP_MAX_UPLOAD_BYTES (so a gzip bomb is refused, not inflated), and must pass `PRAGMA integrity_check` and contain the catalogue
+tables. The upload is then copied into the live database with the backup
+API, never renamed over it: the copy holds SQLite's write lock, so other
+writers (the services, the gateway workers) wait on their busy timeout
+instead of committing into a file that is being replaced, and every
+connection, open or new, sees either the old contents or the new ones
+through the live database's own WAL. The restored file may predate the
+gateway's own tables (import jobs, rating refresh, promotion), so their
+modules recreate them on their next connection.
+
+Retention keeps the BACKUP_KEEP newest backups. That includes the legacy
+vinylbe.db.backup* / vinylbe.db.*backup* copies next to the database, so
+they are pruned too. Versioned snapshots in subdirectories of backups/ are
+never touched.
+
+Configuration (environment):
+    BACKUP_DIR              where backups go              (default backups/db next to the database)
+    BACKUP_KEEP             backups kept by retention     (default 10)
+    BACKUP_INTERVAL_HOURS   scheduled backups; 0 disables (default 24)
+    BACKUP_STEP_PAGES       pages copied per backup step  (default 256)
+    BACKUP_MAX_UPLOAD_BYTES largest upload accepted, after decompression (default 4 GiB)
+"""
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from gateway import csv_import, db_utils, promotion, rating_refresh
+from libs.shared.utils import log_event
+
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "10"))
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+BACKUP_STEP_PAGES = int(os.getenv("BACKUP_STEP_PAGES", "256"))
+BACKUP_MAX_UPLOAD_BYTES = int(os.getenv("BACKUP_MAX_UPLOAD_BYTES", str(4 * 1024 ** 3)))
+
+CHUNK_SIZE = 1024 * 1024
+SQLITE_HEADER = b"SQLite format 3\x00"
+GZIP_MAGIC = b"\x1f\x8b"
+# An upload without these is not a Vinylbe database
+REQUIRED_TABLES = ("artists", "albums")
+# Legacy copies made by hand and by the old upload endpoint, next to the database
+LEGACY_PATTERNS = ("vinylbe.db.backup*", "vinylbe.db.*backup*")
+
+_restore_lock = asyncio.Lock()
+_task: Optional[asyncio.Task] = None
+
+
+class InvalidDatabase(ValueError):
+    """An uploaded file that is not a usable SQLite database"""
+
+
+def _db_path() -> Path:
+    return Path(db_utils.DB_PATH)
+
+
+def backup_dir() -> Path:
+    return Path(os.getenv("BACKUP_DIR") or _db_path().parent / "backups" / "db")
+
+
+# ---------------------------------------------------------------------------
+# Snapshots
+# ---------------------------------------------------------------------------
+
+def _snapshot(target: Path) -> None:
+    """Copy the live database to `target` with the online backup API, in paged steps"""
+    source = sqlite3.connect(str(_db_path()), timeout=30.0)
+    dest = sqlite3.connect(str(target))
+    try:
+        source.backup(dest, pages=BACKUP_STEP_PAGES, sleep=0.005)
+        # A self-contained file: no -wal needed to read it
+        dest.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dest.close()
+        source.close()
+
+
+def _temp_path(directory: Path, prefix: str) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(dir=str(directory), prefix=prefix, suffix=".db")
+    os.close(fd)
+    return Path(name)
+
+
+def _remove(path: Path) -> None:
+    for candidate in (path, Path(f"{path}-wal"), Path(f"{path}-shm"), Path(f"{path}-journal")):
+        try:
+            candidate.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def create_backup(reason: str = "manual") -> Dict[str, Any]:
+    """Compressed snapshot in BACKUP_DIR, then retention"""
+    directory = backup_dir()
+    snapshot = _temp_path(directory, ".snapshot-")
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    name = f"vinylbe-{stamp}-{reason}.db.gz"
+    n = 1
+    while (directory / name).exists():
+        n += 1
+        name = f"vinylbe-{stamp}-{reason}-{n}.db.gz"
+    target = directory / name
+    partial = directory / f".{name}.part"
+    try:
+        _snapshot(snapshot)
+        with open(snapshot, "rb") as src, gzip.open(partial, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.replace(partial, target)
+    finally:
+        _remove(snapshot)
+        if partial.exists():
+            partial.unlink()
+    pruned = prune_backups()
+    size = target.stat().st_size
+    log_event("gateway", "INFO", f"[BACKUP] Created {name} ({size} bytes), pruned {len(pruned)}")
+    return {"name": name, "size_bytes": size, "pruned": pruned}
+
+
+def stream_snapshot(chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """gzip stream of a fresh snapshot; the snapshot file is removed when the stream ends"""
+    snapshot = _temp_path(backup_dir(), ".download-")
+    try:
+        _snapshot(snapshot)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        with open(snapshot, "rb") as f:
+            while chunk := f.read(chunk_size):
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+        yield compressor.flush()
+    finally:
+        _remove(snapshot)
+
+
+# ---------------------------------------------------------------------------
+# Retention
+# ---------------------------------------------------------------------------
+
+def _backup_files() -> List[Path]:
+    files = set(backup_dir().glob("vinylbe-*.db.gz"))
+    for pattern in LEGACY_PATTERNS:
+        files.update(p for p in _db_path().parent.glob(pattern) if p.is_file())
+    return sorted(files, key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def list_backups() -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": path.name,
+            "size_bytes": path.stat().st_size,
+            "created_at": datetime.fromtimestamp(path.stat().st_mtime).isoformat(timespec="seconds"),
+            "legacy": path.parent != backup_dir(),
+        }
+        for path in _backup_files()
+    ]
+
+
+def prune_backups(keep: Optional[int] = None) -> List[str]:
+    """Delete all but the `keep` (default BACKUP_KEEP) newest backups; returns the deleted names"""
+    pruned = []
+    for path in _backup_files()[max(keep or BACKUP_KEEP, 1):]:
+        try:
+            path.unlink()
+            pruned.append(path.name)
+        except OSError as e:
+            log_event("gateway", "WARNING", f"[BACKUP] Could not delete {path.name}: {e}")
+    return pruned
+
+
+# ---------------------------------------------------------------------------
+# Upload
+# ---------------------------------------------------------------------------
+
+def _validate(path: Path) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+            raise InvalidDatabase("Invalid SQLite database file")
+    conn = sqlite3.connect(str(path))
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+        if problems != ["ok"]:
+            raise InvalidDatabase(f"integrity_check failed: {'; '.join(problems[:5])}")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [t for t in REQUIRED_TABLES if t not in tables]
+        if missing:
+            raise InvalidDatabase(f"Missing tables: {', '.join(missing)}")
+        counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in REQUIRED_TABLES}
+        # Read as a single file; the live database keeps its own journal mode
+        conn.execute("PRAGMA journal_mode=DELETE")
+        return counts
+    except sqlite3.DatabaseError as e:
+        raise InvalidDatabase(f"Unreadable database: {e}")
+    finally:
+        conn.close()
+
+
+def _write_upload(f, decompressor, chunk: bytes, written: int) -> int:
+    """Write one uploaded chunk, inflated piece by piece when gzip; returns the bytes written so far"""
+    data = chunk
+    while True:
+        if decompressor:
+            out = decompressor.decompress(data, CHUNK_SIZE)
+            data = decompressor.unconsumed_tail
+        else:
+            out, data = data, b""
+        written += len(out)
+        if written > BACKUP_MAX_UPLOAD_BYTES:
+            raise InvalidDatabase(f"Upload larger than {BACKUP_MAX_UPLOAD_BYTES} bytes")
+        f.write(out)
+        if not data:
+            return written
+
+
+def _restore(upload: Path) -> None:
+    """Copy `upload` into the live database through SQLite, under its write lock"""
+    source = sqlite3.connect(str(upload))
+    dest = sqlite3.connect(str(_db_path()), timeout=60.0)
+    try:
+        # A WAL database can only be backed up into at its own page size
+        page_size = dest.execute("PRAGMA page_size").fetchone()[0]
+        if source.execute("PRAGMA page_size").fetchone()[0] != page_size:
+            source.execute(f"PRAGMA page_size={int(page_size)}")
+            source.execute("VACUUM")
+        # One step: the write lock is held for the whole copy, so no commit interleaves
+        source.backup(dest)
+    finally:
+        dest.close()
+        source.close()
+
+
+async def restore_upload(chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """Write an uploaded database (raw or gzip) to a temp file, validate it, back up the live one and restore"""
+    upload = _temp_path(_db_path().parent, ".vinylbe-upload-")
+    size = 0
+    written = 0
+    try:
+        decompressor = None
+        with open(upload, "wb") as f:
+            async for chunk in chunks:
+                if size == 0 and decompressor is None and chunk[:2] == GZIP_MAGIC:
+                    decompressor = zlib.decompressobj(31)
+                size += len(chunk)
+                written = await asyncio.to_thread(_write_upload, f, decompressor, chunk, written)
+            if decompressor:
+                await asyncio.to_thread(_write_upload, f, None, decompressor.flush(), written)
+        counts = await asyncio.to_thread(_validate, upload)
+
+        async with _restore_lock:
+            backup = await asyncio.to_thread(create_backup, "pre-upload") if _db_path().exists() else None
+            await asyncio.to_thread(_restore, upload)
+            # Their cached schema check describes the old file
+            for module in (csv_import, rating_refresh, promotion):
+                module.reset_schema()
+    except zlib.error as e:
+        raise InvalidDatabase(f"Corrupt gzip upload: {e}")
+    finally:
+        _remove(upload)
+
+    log_event("gateway", "INFO", f"[BACKUP] Database replaced by upload ({size} bytes, {counts})")
+    return {
+        "size_bytes": size,
+        "tables": counts,
+        "backup_created": backup["name"] if backup else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Schedule
+# ---------------------------------------------------------------------------
+
+async def _run_forever():
+    while True:
+        await asyncio.sleep(BACKUP_INTERVAL_HOURS * 3600)
+        try:
+            async with _restore_lock:
+                await asyncio.to_thread(create_backup, "scheduled")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_event("gateway", "ERROR", f"[BACKUP] Scheduled backup failed: {e}")
+
+
+def start() -> None:
+    """Schedule periodic backups (gateway startup); a no-op when disabled"""
+    global _task
+    if BACKUP_INTERVAL_HOURS <= 0:
+        return
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run_forever())
+
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -0,0 +1,537 @@
+"""
+Durable, concurrent CSV artist import.
+
+An uploaded CSV becomes an import_job row and one import_job_item per
+distinct artist (case-insensitive). Artists already in the catalogue with
+complete albums are marked `existing` up front and never sent upstream. The
+rest are seeded by CSV_IMPORT_CONCURRENCY workers through the recommender:
+
+    /artist-recommendations (csv_mode)    full MusicBrainz + Discogs lookup
+    /artist-single-recommendation         Discogs search fallback (partial records)
+
+The recommender paces every csv_mode lookup on CSV_IMPORT_RATE (a background
+share of its Discogs and MusicBrainz budgets) before the shared limiters, so
+workers overlap the waiting but together never send more than that rate, and
+interactive cache misses in the recommender are not queued behind them.
+
+Item status is committed as it changes. resume_jobs() (gateway startup) puts
+items that were in flight back to pending and restarts every running job, so
+a crash or redeploy continues where it stopped instead of from zero.
+
+event_stream() replays the finished items of a job and then follows it live,
+so the SSE progress stream can be reattached to at any time.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set
+
+import httpx
+
+from gateway.db_utils import get_db_connection
+from libs.shared.utils import log_event
+
+RECOMMENDER_SERVICE_URL = os.getenv("RECOMMENDER_SERVICE_URL", "http://127.0.0.1:3002")
+CSV_IMPORT_CONCURRENCY = int(os.getenv("CSV_IMPORT_CONCURRENCY", "4"))
+
+MAX_ATTEMPTS = 3
+# csv_mode lookups wait on the recommender's import pace (about 20 upstream
+# calls per artist, shared by every worker), so one artist can take minutes
+ARTIST_TIMEOUT = 900.0
+TOP_ALBUMS = 10
+KEEPALIVE_SECONDS = 15.0
+
+FINISHED_STATUSES = ("success", "partial", "existing", "not_found", "error")
+
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS import_job (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT,
+            status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'completed', 'cancelled')),
+            total INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT,
+            finished_at TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS import_job_item (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            artist_name TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending'
+                CHECK (status IN ('pending', 'running', 'success', 'partial', 'existing', 'not_found', 'error')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            albums INTEGER,
+            top_album TEXT,
+            rating REAL,
+            elapsed REAL,
+            error TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (job_id) REFERENCES import_job(id) ON DELETE CASCADE,
+            UNIQUE (job_id, position)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_import_job_item_job_status ON import_job_item(job_id, status);
+        """
+    )
+    _schema_ready = True
+
+
+def reset_schema() -> None:
+    """Check the tables again on the next connection (the database was replaced by an upload)"""
+    global _schema_ready
+    _schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    conn = get_db_connection()
+    _ensure_schema(conn)
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# Job table
+# ---------------------------------------------------------------------------
+
+def _existing_artists(cur, names: List[str]) -> Set[str]:
+    """Lower-cased names of artists already seeded with complete albums"""
+    found: Set[str] = set()
+    for i in range(0, len(names), 500):
+        chunk = [n.lower() for n in names[i:i + 500]]
+        try:
+            cur.execute(
+                f"""SELECT LOWER(ar.name) AS name FROM artists ar
+                    WHERE LOWER(ar.name) IN ({','.join('?' * len(chunk))})
+                      AND COALESCE(ar.is_partial, 0) = 0
+                      AND EXISTS (SELECT 1 FROM albums al WHERE al.artist_id = ar.id)""",
+                chunk,
+            )
+        except sqlite3.OperationalError:
+            return found  # no catalogue tables yet
+        found.update(row["name"] for row in cur.fetchall())
+    return found
+
+
+def create_job(filename: Optional[str], artist_names: List[str]) -> int:
+    """Store a new job with one item per distinct artist; returns its id"""
+    unique: List[str] = []
+    seen: Set[str] = set()
+    for name in artist_names:
+        key = name.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(name.strip())
+
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        existing = _existing_artists(cur, unique)
+        now = datetime.now().isoformat()
+        cur.execute(
+            "INSERT INTO import_job (filename, total, updated_at) VALUES (?, ?, ?)",
+            (filename, len(unique), now),
+        )
+        job_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO import_job_item (job_id, position, artist_name, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [(job_id, i, name, "existing" if name.lower() in existing else "pending", now)
+             for i, name in enumerate(unique, 1)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    log_event("gateway", "INFO", f"CSV import job {job_id}: {len(unique)} artists "
+              f"({len(artist_names) - len(unique)} duplicates dropped, {len(existing)} already in catalogue)")
+    return job_id
+
+
+def _counts(cur, job_id: int) -> Dict[str, int]:
+    cur.execute("SELECT status, COUNT(*) AS n FROM import_job_item WHERE job_id = ? GROUP BY status", (job_id,))
+    return {row["status"]: row["n"] for row in cur.fetchall()}
+
+
+def get_job(job_id: int, include_items: bool = False) -> Optional[Dict[str, Any]]:
+    """Job row with per-status counts and, optionally, its finished items in completion order"""
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM import_job WHERE id = ?", (job_id,))
+        job = cur.fetchone()
+        if not job:
+            return None
+        job["counts"] = _counts(cur, job_id)
+        if include_items:
+            cur.execute(
+                f"""SELECT id, position, artist_name, status, attempts, albums, top_album, rating, elapsed, error, updated_at
+                    FROM import_job_item
+                    WHERE job_id = ? AND status IN ({','.join('?' * len(FINISHED_STATUSES))})
+                    ORDER BY updated_at, id""",
+                (job_id, *FINISHED_STATUSES),
+            )
+            job["items"] = cur.fetchall()
+        return job
+    finally:
+        conn.close()
+
+
+def list_jobs(limit: int = 20) -> List[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM import_job ORDER BY id DESC LIMIT ?", (limit,))
+        jobs = cur.fetchall()
+        for job in jobs:
+            job["counts"] = _counts(cur, job["id"])
+        return jobs
+    finally:
+        conn.close()
+
+
+def _pending_items(job_id: int) -> List[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, position, artist_name, attempts FROM import_job_item "
+            "WHERE job_id = ? AND status = 'pending' ORDER BY position",
+            (job_id,),
+        )
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def _claim_item(item_id: int) -> bool:
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "UPDATE import_job_item SET status = 'running', attempts = attempts + 1, updated_at = ? "
+            "WHERE id = ? AND status = 'pending'",
+            (datetime.now().isoformat(), item_id),
+        )
+        conn.commit()
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def _save_item(item_id: int, status: str, result: Dict[str, Any]) -> None:
+    conn = _connect()
+    try:
+        conn.execute(
+            """UPDATE import_job_item
+               SET status = ?, albums = ?, top_album = ?, rating = ?, elapsed = ?, error = ?, updated_at = ?
+               WHERE id = ?""",
+            (status, result.get("albums"), result.get("top_album"), result.get("rating"),
+             result.get("time"), result.get("error"), datetime.now().isoformat(), item_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _set_job_status(job_id: int, status: str) -> None:
+    conn = _connect()
+    try:
+        now = datetime.now().isoformat()
+        conn.execute(
+            "UPDATE import_job SET status = ?, updated_at = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (status, now, now, job_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _set_job_running(job_id: int) -> bool:
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "UPDATE import_job SET status = 'running', updated_at = ?, finished_at = NULL WHERE id = ?",
+            (datetime.now().isoformat(), job_id),
+        )
+        conn.commit()
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def _requeue_running_items(job_ids: Optional[List[int]] = None) -> List[int]:
+    """
+    Items left running (by a crash, a restart or a cancel) go back to pending.
+    Without job_ids this covers every running job; returns the job ids.
+    """
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        if job_ids is None:
+            cur.execute("SELECT id FROM import_job WHERE status = 'running' ORDER BY id")
+            job_ids = [row["id"] for row in cur.fetchall()]
+        cur.executemany(
+            "UPDATE import_job_item SET status = 'pending' WHERE job_id = ? AND status = 'running'",
+            [(job_id,) for job_id in job_ids],
+        )
+        conn.commit()
+        return job_ids
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+class _TransientError(Exception):
+    pass
+
+
+def _summarize(recommendations: List[Dict[str, Any]], started: float) -> Dict[str, Any]:
+    top = recommendations[0] if recommendations else {}
+    return {
+        "albums": len(recommendations),
+        "top_album": top.get("album_name"),
+        "rating": top.get("rating"),
+        "time": round(time.time() - started, 2),
+    }
+
+
+async def _post(client: httpx.AsyncClient, path: str, payload: Dict[str, Any]) -> httpx.Response:
+    try:
+        response = await client.post(f"{RECOMMENDER_SERVICE_URL}{path}", json=payload, timeout=ARTIST_TIMEOUT)
+    except httpx.TimeoutException:
+        raise _TransientError("Request timeout")
+    except httpx.TransportError as e:
+        raise _TransientError(f"Recommender unavailable: {e}")
+    if response.status_code >= 500 or response.status_code == 429:
+        raise _TransientError(f"HTTP {response.status_code}: {response.text[:100]}")
+    return response
+
+
+async def _import_artist(client: httpx.AsyncClient, artist_name: str) -> tuple:
+    """(status, result) for one artist; raises _TransientError when worth retrying"""
+    started = time.time()
+
+    response = await _post(client, "/artist-recommendations",
+                           {"artist_names": [artist_name], "top_per_artist": TOP_ALBUMS, "csv_mode": True})
+    if response.status_code == 200 and response.json().get("recommendations"):
+        return "success", _summarize(response.json()["recommendations"], started)
+
+    # Nothing usable from MusicBrainz: fall back to the Discogs search (partial records)
+    response = await _post(client, "/artist-single-recommendation",
+                           {"artist_name": artist_name, "top_albums": TOP_ALBUMS, "csv_mode": True})
+    if response.status_code == 200 and response.json().get("recommendations"):
+        recommendations = response.json()["recommendations"]
+        status = "partial" if any(r.get("is_partial") for r in recommendations) else "success"
+        return status, _summarize(recommendations, started)
+    if response.status_code in (200, 404):
+        return "not_found", {"error": "No albums found", "time": round(time.time() - started, 2)}
+    return "error", {"error": response.text[:100], "time": round(time.time() - started, 2)}
+
+
+def _progress_event(job_id: int, item: Dict[str, Any], current: int, total: int) -> Dict[str, Any]:
+    return {
+        "type": "progress",
+        "job_id": job_id,
+        "item_id": item["id"],
+        "current": current,
+        "total": total,
+        "position": item["position"],
+        "artist": item["artist_name"],
+        "status": item["status"],
+        "albums": item.get("albums"),
+        "time": item.get("elapsed"),
+        "top_album": item.get("top_album"),
+        "rating": item.get("rating"),
+        "error": item.get("error"),
+    }
+
+
+def _complete_event(job: Dict[str, Any]) -> Dict[str, Any]:
+    counts = job["counts"]
+    return {
+        "type": "complete",
+        "job_id": job["id"],
+        "status": job["status"],
+        "total": job["total"],
+        "successful": counts.get("success", 0) + counts.get("partial", 0),
+        "partial": counts.get("partial", 0),
+        "existing": counts.get("existing", 0),
+        "failed": counts.get("not_found", 0) + counts.get("error", 0),
+        "pending": counts.get("pending", 0) + counts.get("running", 0),
+        "counts": counts,
+    }
+
+
+class _ActiveJob:
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.finished = 0
+        self.total = 0
+
+    def publish(self, event: Dict[str, Any]):
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+
+_active: Dict[int, _ActiveJob] = {}
+
+
+async def _run_job(job: _ActiveJob, client: httpx.AsyncClient):
+    snapshot = await asyncio.to_thread(get_job, job.job_id)
+    job.total = snapshot["total"]
+    job.finished = sum(snapshot["counts"].get(s, 0) for s in FINISHED_STATUSES)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in await asyncio.to_thread(_pending_items, job.job_id):
+        queue.put_nowait(item)
+
+    async def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if not await asyncio.to_thread(_claim_item, item["id"]):
+                continue
+            item["attempts"] += 1
+            try:
+                status, result = await _import_artist(client, item["artist_name"])
+            except _TransientError as e:
+                if item["attempts"] < MAX_ATTEMPTS:
+                    log_event("gateway", "WARNING", f"CSV import: retrying '{item['artist_name']}' "
+                              f"(attempt {item['attempts']}/{MAX_ATTEMPTS}): {e}")
+                    await asyncio.sleep(5.0 * item["attempts"])
+                    await asyncio.to_thread(_save_item, item["id"], "pending", {"error": str(e)})
+                    queue.put_nowait(item)
+                    continue
+                status, result = "error", {"error": str(e)}
+            except Exception as e:
+                status, result = "error", {"error": str(e)[:200]}
+
+            await asyncio.to_thread(_save_item, item["id"], status, result)
+            job.finished += 1
+            job.publish(_progress_event(job.job_id, {
+                **item, "status": status, "albums": result.get("albums"), "elapsed": result.get("time"),
+                "top_album": result.get("top_album"), "rating": result.get("rating"), "error": result.get("error"),
+            }, job.finished, job.total))
+
+    started = time.time()
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, CSV_IMPORT_CONCURRENCY))))
+        await asyncio.to_thread(_set_job_status, job.job_id, "completed")
+        final = await asyncio.to_thread(get_job, job.job_id)
+        log_event("gateway", "INFO", f"CSV import job {job.job_id} completed in {time.time() - started:.1f}s: {final['counts']}")
+        job.publish(_complete_event(final))
+    except Exception as e:
+        log_event("gateway", "ERROR", f"CSV import job {job.job_id} failed: {e}")
+        job.publish({"type": "error", "job_id": job.job_id, "message": str(e)})
+    finally:
+        _active.pop(job.job_id, None)
+
+
+def start_job(job_id: int, client: httpx.AsyncClient) -> None:
+    if job_id in _active:
+        return
+    job = _ActiveJob(job_id)
+    _active[job_id] = job
+    job.task = asyncio.create_task(_run_job(job, client))
+
+
+async def cancel_job(job_id: int) -> bool:
+    job = _active.get(job_id)
+    if job is None:
+        return False
+    await asyncio.to_thread(_set_job_status, job_id, "cancelled")
+    job.task.cancel()
+    await asyncio.gather(job.task, return_exceptions=True)
+    # Items the workers had claimed stay importable by a later resume
+    await asyncio.to_thread(_requeue_running_items, [job_id])
+    final = await asyncio.to_thread(get_job, job_id)
+    job.publish(_complete_event(final))
+    return True
+
+
+async def resume_job(job_id: int, client: httpx.AsyncClient) -> bool:
+    """Continue a cancelled (or interrupted) job from its pending items"""
+    if job_id in _active:
+        return True
+    if not await asyncio.to_thread(_set_job_running, job_id):
+        return False
+    await asyncio.to_thread(_requeue_running_items, [job_id])
+    start_job(job_id, client)
+    return True
+
+
+async def resume_jobs(client: httpx.AsyncClient) -> List[int]:
+    """Restart every job that was running when the gateway last stopped"""
+    job_ids = await asyncio.to_thread(_requeue_running_items)
+    for job_id in job_ids:
+        start_job(job_id, client)
+    if job_ids:
+        log_event("gateway", "INFO", f"Resuming CSV import jobs {job_ids}")
+    return job_ids
+
+
+async def shutdown() -> None:
+    tasks = [job.task for job in _active.values() if job.task]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def event_stream(job_id: int) -> AsyncGenerator[str, None]:
+    """Server-Sent Events for a job: replay of finished items, then live progress"""
+    queue: asyncio.Queue = asyncio.Queue()
+    # Subscribe before reading the snapshot so nothing falls in between
+    active = _active.get(job_id)
+    if active:
+        active.subscribers.add(queue)
+    try:
+        job = await asyncio.to_thread(get_job, job_id, True)
+        if job is None:
+            yield _sse({"type": "error", "message": f"Import job {job_id} not found"})
+            return
+
+        replayed = {item["id"] for item in job["items"]}
+        yield _sse({"type": "start", "job_id": job_id, "total": job["total"], "status": job["status"],
+                    "counts": job["counts"], "replayed": len(replayed)})
+        for current, item in enumerate(job["items"], 1):
+            yield _sse(_progress_event(job_id, item, current, job["total"]))
+
+        if active is None or active.task.done():
+            yield _sse(_complete_event(job))
+            return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event["type"] == "progress" and event["item_id"] in replayed:
+                continue
+            yield _sse(event)
+            if event["type"] in ("complete", "error"):
+                return
+    finally:
+        if active:
+            active.subscribers.discard(queue)
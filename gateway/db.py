@@ -4,6 +4,8 @@ import sqlite3
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+from libs.shared.metrics import TimedConnection
+
 # Path to the SQLite database file (same as used elsewhere in the project)
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "vinylbe.db")
 
@@ -21,7 +23,7 @@ def get_connection() -> sqlite3.Connection:
 
     The connection uses a row factory that returns dictionaries.
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
     conn.row_factory = dict_factory
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
@@ -3,6 +3,8 @@ import sqlite3
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+from libs.shared.metrics import TimedConnection
+
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "vinylbe.db")
 
 def dict_factory(cursor, row):
@@ -12,7 +14,7 @@ def dict_factory(cursor, row):
     return d
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
     conn.row_factory = dict_factory
     return conn
 
@@ -0,0 +1,393 @@
+"""
+Cover image proxy with an on-disk thumbnail cache.
+
+The frontend loads covers from /api/image?url=<cover_url>&w=<width> instead
+of hotlinking Discogs, Spotify or the Cover Art Archive. Each source image is
+downloaded once and kept; thumbnails are resized from it at the requested
+width (snapped up to one of IMAGE_WIDTHS) and encoded as WebP, or as JPEG for
+browsers that do not accept WebP.
+
+    get_image(url, width, accept)   -> CachedImage(path, etag, media_type)
+
+Files are stored in IMAGE_CACHE_DIR under the SHA-256 of (url, width,
+format). A cached file never changes, so it is served with a one-year
+immutable Cache-Control and its key as ETag. Concurrent cold requests for
+the same image share one download and one resize.
+
+The cache is bounded by IMAGE_CACHE_MAX_MB. A hit refreshes the file's mtime
+(at most once per TOUCH_INTERVAL) and a write that takes the total over the
+limit deletes the least recently used files down to 90% of it.
+
+Only hosts in IMAGE_PROXY_HOSTS (and their subdomains) are fetched, so the
+endpoint is not an open proxy. Redirects are followed by hand, at most
+MAX_REDIRECTS of them, and every hop is checked before it is requested. Sources that fail are not retried for
+IMAGE_FAILURE_TTL seconds.
+
+Pillow is optional: without it the original image is cached and served as is.
+
+Configuration (environment):
+    IMAGE_CACHE_DIR       cache location               (default cache/images next to the database)
+    IMAGE_CACHE_MAX_MB    cache size limit             (default 512)
+    IMAGE_QUALITY         WebP/JPEG quality            (default 80)
+    IMAGE_FAILURE_TTL     seconds a failed source is skipped (default 600)
+    IMAGE_PROXY_HOSTS     comma-separated allowed hosts
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from gateway import db_utils
+from libs.shared.cache import LRUTTLCache
+from libs.shared.http_clients import get_http_client
+from libs.shared.metrics import gauge, record_cache
+from libs.shared.utils import log_event
+
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+    WEBP_AVAILABLE = features.check("webp")
+except ImportError:
+    PIL_AVAILABLE = False
+    WEBP_AVAILABLE = False
+
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_FAILURE_TTL = float(os.getenv("IMAGE_FAILURE_TTL", "600"))
+IMAGE_PROXY_HOSTS = tuple(
+    host.strip().lower()
+    for host in os.getenv(
+        "IMAGE_PROXY_HOSTS",
+        "i.discogs.com,st.discogs.com,img.discogs.com,i.scdn.co,mosaic.scdn.co,"
+        "coverartarchive.org,archive.org,lastfm.freetls.fastly.net",
+    ).split(",")
+    if host.strip()
+)
+
+# Widths thumbnails are made at; a request is snapped up to the next one
+IMAGE_WIDTHS = (64, 150, 300, 600)
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+MAX_REDIRECTS = 5
+TOUCH_INTERVAL = 3600.0
+EVICT_TO = 0.9
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+PLACEHOLDER_PATH = "/static/img/no-cover.svg"
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+CACHE_BYTES = gauge("image_cache_bytes", "Size of the on-disk cover image cache")
+
+_in_flight: Dict[str, asyncio.Future] = {}
+_failures = LRUTTLCache(maxsize=4096, ttl=IMAGE_FAILURE_TTL)
+_cache_bytes: Optional[int] = None
+_eviction: Optional[asyncio.Task] = None
+
+
+class ImageNotAllowed(ValueError):
+    """A URL the proxy does not fetch (scheme or host not allowed)"""
+
+
+class ImageUnavailable(Exception):
+    """The source image could not be fetched or decoded"""
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    path: Path
+    etag: str
+    media_type: str
+
+
+def cache_dir() -> Path:
+    return Path(os.getenv("IMAGE_CACHE_DIR") or Path(db_utils.DB_PATH).parent / "cache" / "images")
+
+
+def _max_bytes() -> int:
+    return int(IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def _key(url: str, width: int, fmt: str) -> str:
+    return hashlib.sha256(f"{url}\n{width}\n{fmt}".encode()).hexdigest()
+
+
+def _path(key: str, ext: str) -> Path:
+    return cache_dir() / key[:2] / f"{key}.{ext}"
+
+
+def snap_width(width: int) -> int:
+    for allowed in IMAGE_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return IMAGE_WIDTHS[-1]
+
+
+def _host_allowed(host: str) -> bool:
+    host = host.lower()
+    return any(host == allowed or host.endswith("." + allowed) for allowed in IMAGE_PROXY_HOSTS)
+
+
+def check_url(url: str) -> None:
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL:
+        raise ImageNotAllowed("Invalid image URL")
+    if parsed.scheme not in ("http", "https"):
+        raise ImageNotAllowed(f"Unsupported image URL scheme: {parsed.scheme!r}")
+    if not _host_allowed(parsed.host):
+        raise ImageNotAllowed(f"Images from {parsed.host!r} are not proxied")
+
+
+def _sniff(head: bytes) -> Optional[str]:
+    """Media type from the file signature; None for anything that is not an image"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Disk cache
+# ---------------------------------------------------------------------------
+
+def _hit(path: Path, count: bool = True) -> bool:
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        if count:
+            record_cache("image", hit=False)
+        return False
+    if count:
+        record_cache("image", hit=True)
+    # mtime is the LRU clock; refreshed coarsely so hits do not all write
+    now = time.time()
+    if now - mtime > TOUCH_INTERVAL:
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+    return True
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _cache_files() -> List[Tuple[float, int, Path]]:
+    files = []
+    for path in cache_dir().glob("*/*"):
+        if path.name.startswith("."):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    return files
+
+
+def _evict(target: int) -> Tuple[int, int]:
+    """Delete least recently used files until the cache is at most `target` bytes; returns (size, deleted)"""
+    files = sorted(_cache_files())
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for _, size, path in files:
+        if total <= target:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+    return total, deleted
+
+
+async def _run_eviction() -> None:
+    global _cache_bytes
+    try:
+        _cache_bytes, deleted = await asyncio.to_thread(_evict, int(_max_bytes() * EVICT_TO))
+        CACHE_BYTES.set(_cache_bytes)
+        log_event("gateway", "INFO", f"[IMAGES] Evicted {deleted} files, cache now {_cache_bytes} bytes")
+    except Exception as e:
+        log_event("gateway", "ERROR", f"[IMAGES] Eviction failed: {e}")
+
+
+async def _stored(size: int) -> None:
+    global _cache_bytes, _eviction
+    if _cache_bytes is None:
+        files = await asyncio.to_thread(_cache_files)
+        _cache_bytes = sum(size for _, size, _ in files)
+    else:
+        _cache_bytes += size
+    CACHE_BYTES.set(_cache_bytes)
+    if _cache_bytes > _max_bytes() and (_eviction is None or _eviction.done()):
+        _eviction = asyncio.create_task(_run_eviction())
+
+
+# ---------------------------------------------------------------------------
+# Fetch and resize
+# ---------------------------------------------------------------------------
+
+def _settle(key: str, future: asyncio.Future) -> None:
+    _in_flight.pop(key, None)
+    # Retrieved here so a failure nobody waits for any more is not reported as unhandled
+    if not future.cancelled():
+        future.exception()
+
+
+async def _coalesced(key: str, make: Callable[[], Awaitable[Any]]) -> Any:
+    """Run make() once per key at a time; concurrent callers share its result"""
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(make())
+        _in_flight[key] = future
+        future.add_done_callback(lambda f: _settle(key, f))
+    # A caller that goes away (client disconnect) does not cancel the shared work
+    return await asyncio.shield(future)
+
+
+async def _fetch(url: str) -> bytes:
+    client = get_http_client("images")
+    target = url
+    for _ in range(MAX_REDIRECTS + 1):
+        async with client.stream("GET", target) as response:
+            if response.is_redirect:
+                location = response.headers.get("location", "")
+                target = str(response.url.join(location))
+                try:
+                    check_url(target)
+                except ImageNotAllowed as e:
+                    raise ImageUnavailable(f"Redirect refused: {e}")
+                continue
+            if response.status_code != 200:
+                raise ImageUnavailable(f"HTTP {response.status_code}")
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > MAX_SOURCE_BYTES:
+                    raise ImageUnavailable("Source image too large")
+                chunks.append(chunk)
+            return b"".join(chunks)
+    raise ImageUnavailable(f"More than {MAX_REDIRECTS} redirects")
+
+
+async def _download(url: str, path: Path) -> None:
+    reason = _failures.get(url)
+    if reason:
+        raise ImageUnavailable(reason)
+    try:
+        data = await _fetch(url)
+        if _sniff(data[:12]) is None:
+            raise ImageUnavailable("Not an image")
+    except httpx.HTTPError as e:
+        reason = f"{type(e).__name__}: {e}"
+        _failures.set(url, reason)
+        log_event("gateway", "WARNING", f"[IMAGES] Fetch failed for {url}: {reason}")
+        raise ImageUnavailable(reason)
+    except ImageUnavailable as e:
+        _failures.set(url, str(e))
+        log_event("gateway", "WARNING", f"[IMAGES] Fetch failed for {url}: {e}")
+        raise
+    await asyncio.to_thread(_write, path, data)
+    await _stored(len(data))
+
+
+async def _original(url: str) -> Path:
+    key = _key(url, 0, "src")
+    path = _path(key, "src")
+    if not _hit(path, count=not PIL_AVAILABLE):
+        await _coalesced(key, lambda: _download(url, path))
+    return path
+
+
+def _resize(source: Path, width: int, fmt: str) -> bytes:
+    with Image.open(source) as img:
+        # JPEG sources decode straight at a reduced scale
+        img.draft("RGB", (width, width))
+        img.thumbnail((width, width), Image.LANCZOS)
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        out = io.BytesIO()
+        if fmt == "webp":
+            img = img.convert("RGBA" if has_alpha else "RGB")
+            img.save(out, "WEBP", quality=IMAGE_QUALITY, method=4)
+        else:
+            if has_alpha:
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                img = img.convert("RGB")
+            img.save(out, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+async def _make_thumbnail(url: str, width: int, fmt: str, path: Path) -> None:
+    source = await _original(url)
+    try:
+        data = await asyncio.to_thread(_resize, source, width, fmt)
+    except FileNotFoundError:
+        # The original was evicted in between; not the source's fault
+        raise ImageUnavailable("Source evicted from cache")
+    except Exception as e:
+        reason = f"Undecodable image: {e}"
+        _failures.set(url, reason)
+        log_event("gateway", "WARNING", f"[IMAGES] {reason} ({url})")
+        raise ImageUnavailable(reason)
+    await asyncio.to_thread(_write, path, data)
+    await _stored(len(data))
+
+
+async def get_image(url: str, width: int = 300, accept: str = "") -> CachedImage:
+    """Cached thumbnail of `url` at `width` (WebP when `accept` allows it), fetched and resized on a miss"""
+    check_url(url)
+    if not PIL_AVAILABLE:
+        path = await _original(url)
+        with open(path, "rb") as f:
+            media_type = _sniff(f.read(12))
+        return CachedImage(path, path.stem, media_type or "application/octet-stream")
+
+    width = snap_width(width)
+    fmt = "webp" if WEBP_AVAILABLE and "image/webp" in accept else "jpeg"
+    key = _key(url, width, fmt)
+    path = _path(key, fmt)
+    if not _hit(path):
+        await _coalesced(key, lambda: _make_thumbnail(url, width, fmt, path))
+    return CachedImage(path, key, MEDIA_TYPES[fmt])
+
+
+def get_status() -> Dict[str, Any]:
+    files = _cache_files()
+    size = sum(size for _, size, _ in files)
+    return {
+        "cache_dir": str(cache_dir()),
+        "files": len(files),
+        "originals": sum(1 for _, _, path in files if path.suffix == ".src"),
+        "size_bytes": size,
+        "max_bytes": _max_bytes(),
+        "in_flight": len(_in_flight),
+        "failed_sources": len(_failures),
+        "pillow": PIL_AVAILABLE,
+        "webp": WEBP_AVAILABLE,
+        "widths": list(IMAGE_WIDTHS),
+    }
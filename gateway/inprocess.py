@@ -0,0 +1,69 @@
+"""
+Single-process deployment: the gateway plus every backend service in one
+uvicorn worker.
+
+Service apps are registered with libs.shared.inprocess under their usual
+base URLs, so gateway -> service and service -> service calls keep the same
+URLs and JSON payloads but go through httpx.ASGITransport instead of
+localhost TCP. The split topology (one process per service) is unaffected.
+
+Run with:
+    uvicorn gateway.inprocess:app --port 5000
+or
+    INPROCESS=1 python start_services.py
+
+Note: all services share one event loop here, so a service endpoint that
+blocks the loop also delays gateway requests.
+"""
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.shared.inprocess import register_inprocess_app, unregister_inprocess_app
+from libs.shared.utils import log_event
+from gateway import main as gateway_main
+from services.discogs.main import app as discogs_app
+from services.recommender.main import app as recommender_app
+from services.pricing.main import app as pricing_app
+from services.lastfm.main import app as lastfm_app
+from services.spotify.main import app as spotify_app
+
+SERVICE_APPS = [
+    ("discogs-service", gateway_main.DISCOGS_SERVICE_URL, discogs_app),
+    ("recommender-service", gateway_main.RECOMMENDER_SERVICE_URL, recommender_app),
+    ("pricing-service", gateway_main.PRICING_SERVICE_URL, pricing_app),
+    ("lastfm-service", gateway_main.LASTFM_SERVICE_URL, lastfm_app),
+    ("spotify-service", gateway_main.SPOTIFY_SERVICE_URL, spotify_app),
+]
+
+gateway_lifespan = gateway_main.app.router.lifespan_context
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncExitStack() as stack:
+        for name, base_url, service_app in SERVICE_APPS:
+            register_inprocess_app(base_url, service_app)
+            try:
+                await stack.enter_async_context(service_app.router.lifespan_context(service_app))
+            except Exception as e:
+                # Same outcome as a crashed service process in the split
+                # deployment: calls to it fail, everything else keeps running.
+                unregister_inprocess_app(base_url)
+                log_event("gateway", "ERROR", f"In-process {name} failed to start: {e}")
+
+        # Gateway last, so its http_client is created with the in-process mounts
+        await stack.enter_async_context(gateway_lifespan(app))
+        log_event("gateway", "INFO", "Running in in-process mode")
+        yield
+
+    for _, base_url, _ in SERVICE_APPS:
+        unregister_inprocess_app(base_url)
+
+
+gateway_main.app.router.lifespan_context = lifespan
+app = gateway_main.app
@@ -1,7 +1,7 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
 import os
 import sys
@@ -10,15 +10,20 @@ import httpx
 import asyncio
 import time
 import csv
-import json
-from typing import AsyncGenerator, Optional, List, Dict, Any
+import re
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from libs.shared.models import ServiceHealth
-from libs.shared.utils import log_event
-from gateway import db_utils, seeder, db, recommendation_logger
+from libs.shared.utils import log_event, normalize_text
+from libs.shared.http_clients import close_http_clients, get_http_client, http_client_stats
+from libs.shared.inprocess import is_inprocess
+from libs.shared.metrics import install_metrics, merge_expositions, render as render_metrics
+from libs.shared.tracing import get_exporter, install_tracing, slowest_traces
+from libs.shared.profiling import install_profiling, list_profiles, read_profile
+from gateway import db_utils, seeder, db, recommendation_logger, csv_import, rating_refresh, promotion, backups, images
 
 DISCOGS_SERVICE_URL = os.getenv("DISCOGS_SERVICE_URL", "http://127.0.0.1:3001")
 RECOMMENDER_SERVICE_URL = os.getenv("RECOMMENDER_SERVICE_URL", "http://127.0.0.1:3002")
@@ -32,10 +37,19 @@ http_client: Optional[httpx.AsyncClient] = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global http_client
-    http_client = httpx.AsyncClient(timeout=60.0)
+    http_client = get_http_client("services")
     log_event("gateway", "INFO", "API Gateway started")
+    await csv_import.resume_jobs(http_client)
+    rating_refresh.start()
+    promotion.start()
+    backups.start()
     yield
-    await http_client.aclose()
+    await backups.stop()
+    await promotion.stop()
+    await rating_refresh.stop()
+    await csv_import.shutdown()
+    await close_http_clients()
+    recommendation_logger.flush()
     log_event("gateway", "INFO", "API Gateway stopped")
 
 
@@ -48,6 +62,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_metrics(app, "gateway")
+install_tracing(app, "gateway")
+install_profiling(app, "gateway")
 
 # Mount static files
 static_path = Path(__file__).parent / "static"
@@ -70,6 +87,10 @@ async def callback_page():
 async def admin():
     return FileResponse(static_path / "admin.html")
 
+@app.get("/admin/traces")
+async def admin_traces_page():
+    return FileResponse(static_path / "traces.html")
+
 
 @app.get("/health")
 async def health_check():
@@ -104,6 +125,42 @@ async def health_check():
     }
 
 
+@app.get("/metrics/cluster", include_in_schema=False)
+async def cluster_metrics():
+    """Gateway metrics merged with every service's /metrics, one scrape target for the whole stack"""
+    if is_inprocess():
+        # Every app shares this process's registry, so the local exposition already covers them
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    services = [
+        ("discogs", DISCOGS_SERVICE_URL),
+        ("recommender", RECOMMENDER_SERVICE_URL),
+        ("pricing", PRICING_SERVICE_URL),
+        ("lastfm", LASTFM_SERVICE_URL),
+        ("spotify", SPOTIFY_SERVICE_URL),
+    ]
+
+    async def scrape(service_url: str) -> Optional[str]:
+        try:
+            resp = await http_client.get(f"{service_url}/metrics", timeout=5.0)
+            resp.raise_for_status()
+            return resp.text
+        except Exception as e:
+            log_event("gateway", "WARNING", f"Metrics scrape failed for {service_url}: {e}")
+            return None
+
+    results = await asyncio.gather(*(scrape(url) for _, url in services))
+    texts = {"gateway": render_metrics()}
+    up_lines = ["# HELP service_up Whether the gateway could scrape the service's /metrics", "# TYPE service_up gauge"]
+    for (name, _), text in zip(services, results):
+        up_lines.append(f'service_up{{service="{name}"}} {0 if text is None else 1}')
+        if text is not None:
+            texts[name] = text
+
+    body = merge_expositions(texts) + "\n".join(up_lines) + "\n"
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
 
 
 @app.get("/auth/lastfm/login")
@@ -213,7 +270,7 @@ async def lastfm_login_endpoint(request: LastFmLoginRequest):
         
         if request.selected_artists:
             log_event("gateway", "INFO", f"Syncing {len(request.selected_artists)} guest artists for user {user_id}")
-            print(f"[DEBUG] Syncing guest artists: {request.selected_artists}")
+            log_event("gateway", "DEBUG", "Syncing guest artists: %s", request.selected_artists)
             with open("/tmp/vinylbe_sync_debug.log", "a") as f:
                 f.write(f"[{datetime.now()}] Starting sync of {len(request.selected_artists)} artists\n")
             for artist_name in request.selected_artists:
@@ -234,7 +291,8 @@ async def lastfm_login_endpoint(request: LastFmLoginRequest):
                                 (artist_name,)
                             )
                             conn.commit()
-                            print(f"[DEBUG] Created partial artist record for: {artist_name}")
+                            promotion.notify(artist_name)
+                            log_event("gateway", "DEBUG", "Created partial artist record for: %s", artist_name)
                             with open("/tmp/vinylbe_sync_debug.log", "a") as f:
                                 f.write(f"[{datetime.now()}] Created partial artist: {artist_name}\n")
                     finally:
@@ -244,12 +302,12 @@ async def lastfm_login_endpoint(request: LastFmLoginRequest):
                     with open("/tmp/vinylbe_sync_debug.log", "a") as f:
                         f.write(f"[{datetime.now()}] Calling add_user_selected_artist for: {artist_name}\n")
                     db.add_user_selected_artist(user_id, artist_name, source="manual")
-                    print(f"[DEBUG] Successfully added guest artist: {artist_name}")
+                    log_event("gateway", "DEBUG", "Successfully added guest artist: %s", artist_name)
                     with open("/tmp/vinylbe_sync_debug.log", "a") as f:
                         f.write(f"[{datetime.now()}] Successfully added: {artist_name}\n")
                 except Exception as e:
                     log_event("gateway", "WARNING", f"Failed to sync guest artist {artist_name}: {e}")
-                    print(f"[DEBUG] Failed to add guest artist {artist_name}: {e}")
+                    log_event("gateway", "WARNING", "Failed to add guest artist %s: %s", artist_name, e)
                     with open("/tmp/vinylbe_sync_debug.log", "a") as f:
                         f.write(f"[{datetime.now()}] ERROR for {artist_name}: {str(e)}\n")
                     
@@ -322,16 +380,23 @@ async def lastfm_login_endpoint(request: LastFmLoginRequest):
                 except Exception as e:
                     log_event("gateway", "WARNING", f"Failed to sync manual album {artist_name} - {album_title}: {e}")
 
-        # Fetch and save Last.fm profile (Top Artists)
+        # Fetch and save Last.fm profile (Top Artists). The snapshot call also stores
+        # the default-period (medium_term) top albums, so the /top-albums call of the
+        # recommendation flow that usually follows a login is served from the snapshot
         try:
             if http_client:
                 log_event("gateway", "INFO", f"Fetching Last.fm profile for {request.lastfm_username}")
                 resp = await http_client.post(
-                    f"{LASTFM_SERVICE_URL}/top-artists",
-                    json={"username": request.lastfm_username, "limit": 50}
+                    f"{LASTFM_SERVICE_URL}/profile-snapshot",
+                    json={"username": request.lastfm_username}
                 )
                 if resp.status_code == 200:
-                    top_artists = resp.json()
+                    snapshot = resp.json()
+                    top_artists = {
+                        "artists": snapshot.get("artists", []),
+                        "total": len(snapshot.get("artists", [])),
+                        "source": snapshot.get("sources", {}).get("artist"),
+                    }
                     db.upsert_user_profile_lastfm(user_id, request.lastfm_username, top_artists)
                     log_event("gateway", "INFO", f"Saved Last.fm profile for {request.lastfm_username}")
                 else:
@@ -488,6 +553,27 @@ async def get_mosaic_albums():
         log_event("gateway", "ERROR", f"Mosaic fetch failed: {str(e)}")
         return {"albums": []}
 
+
+@app.get("/api/image")
+async def proxy_image(
+    request: Request,
+    url: str = Query(..., max_length=2048),
+    w: int = Query(300, ge=16, le=1200),
+):
+    """Resized, disk-cached cover image (see gateway/images.py); the placeholder when the source fails"""
+    try:
+        image = await images.get_image(url, w, request.headers.get("accept", ""))
+    except images.ImageNotAllowed as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except images.ImageUnavailable:
+        return RedirectResponse(images.PLACEHOLDER_PATH, status_code=302,
+                                headers={"Cache-Control": "public, max-age=300"})
+    headers = {"Cache-Control": images.CACHE_CONTROL, "ETag": f'"{image.etag}"', "Vary": "Accept"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image.path, media_type=image.media_type, headers=headers)
+
+
 # ---------------------------------------------------------------------------
 # API aliases for frontend compatibility (prefixed with /api)
 # ---------------------------------------------------------------------------
@@ -584,6 +670,8 @@ async def add_album_to_user(user_id: int, album_data: dict):
             )
             
             conn.commit()
+            if not album_row:
+                promotion.notify(artist_name)
             
             return {
                 "status": "added",
@@ -606,6 +694,36 @@ async def api_remove_selected_artist(user_id: int, selection_id: int):
     """Alias for removing selected artist under /api prefix."""
     return await remove_selected_artist(user_id, selection_id)
 
+
+# "(Remastered 2011)", "[Deluxe Edition]", " - 2009 Remaster": edition tags Spotify appends
+_EDITION_SUFFIX = re.compile(r"\s*(\([^)]*\)|\[[^\]]*\]|\s-\s.*)$")
+_NON_ALNUM = re.compile(r"[^\w]+")
+
+
+def _album_match_key(title: Optional[str]) -> str:
+    """Title without edition suffixes and punctuation, for matching our albums to Spotify's"""
+    text = normalize_text(title)
+    while True:
+        stripped = _EDITION_SUFFIX.sub("", text)
+        if stripped == text or not stripped:
+            break
+        text = stripped
+    return _NON_ALNUM.sub("", text)
+
+
+def _match_spotify_album(albums: List[Dict[str, Any]], title: str) -> Optional[str]:
+    """Spotify id of `title` in an artist's albums: exact normalized title first, then edition-insensitive"""
+    wanted = normalize_text(title)
+    for a in albums:
+        if normalize_text(a.get("name")) == wanted:
+            return a["id"]
+    key = _album_match_key(title)
+    for a in albums:
+        if key and _album_match_key(a.get("name")) == key:
+            return a["id"]
+    return None
+
+
 @app.get("/album-pricing")
 async def get_album_pricing(artist: str = Query(..., description="Artist name"), album: str = Query(..., description="Album name")):
     """
@@ -689,13 +807,14 @@ async def get_album_pricing(artist: str = Query(..., description="Artist name"),
         # Exclude FNAC from initial load to avoid 30s delay
         stores_task = http_client.get(f"{PRICING_SERVICE_URL}/local-stores", params={"artist": artist, "album": album, "exclude_fnac": True})
         
-        # If no spotify_id in database, search Spotify as fallback
+        # If no spotify_id in database, match the whole artist once (fills every album of
+        # this artist in the DB, so the next modal for any of them skips Spotify entirely)
         spotify_task = None
         if not spotify_id:
-            log_event("gateway", "INFO", f"No Spotify ID in database, searching Spotify for: {artist} - {album}")
+            log_event("gateway", "INFO", f"No Spotify ID in database, enriching artist from Spotify: {artist}")
             spotify_task = http_client.get(
-                f"{SPOTIFY_SERVICE_URL}/search/album",
-                params={"artist": artist, "album": album}
+                f"{SPOTIFY_SERVICE_URL}/enrich/artist",
+                params={"artist": artist, "fail_fast": "true"}
             )
         
         # Gather all parallel tasks
@@ -722,17 +841,35 @@ async def get_album_pricing(artist: str = Query(..., description="Artist name"),
         else:
             stores_data = stores_resp.json()
         
-        # Parse Spotify response (fallback search)
+        # Parse Spotify response (artist-level enrichment)
         if spotify_resp and not isinstance(spotify_resp, Exception):
             try:
-                spotify_data = spotify_resp.json()
-                spotify_id = spotify_data.get("id")
-                if spotify_id:
-                    log_event("gateway", "INFO", f"Found Spotify ID via search: {spotify_id}")
+                if spotify_resp.status_code == 200:
+                    spotify_id = _match_spotify_album(spotify_resp.json().get("albums", []), album)
+                    if spotify_id:
+                        log_event("gateway", "INFO", f"Found Spotify ID via artist enrichment: {spotify_id}")
+                else:
+                    log_event("gateway", "WARNING", f"Spotify enrichment returned {spotify_resp.status_code}")
             except Exception as e:
-                log_event("gateway", "WARNING", f"Spotify search parsing failed: {str(e)}")
+                log_event("gateway", "WARNING", f"Spotify enrichment parsing failed: {str(e)}")
         elif spotify_resp and isinstance(spotify_resp, Exception):
             log_event("gateway", "WARNING", f"Spotify search failed: {str(spotify_resp)}")
+
+        # The discography covers the artist's first 50 albums under their Spotify titles;
+        # when it has no match, search the album itself (unless Spotify is rate limiting us)
+        rate_limited = spotify_resp is not None and not isinstance(spotify_resp, Exception) and spotify_resp.status_code == 503
+        if spotify_task and not spotify_id and not rate_limited:
+            try:
+                search_resp = await http_client.get(
+                    f"{SPOTIFY_SERVICE_URL}/search/album",
+                    params={"artist": artist, "album": album, "fail_fast": "true"}
+                )
+                if search_resp.status_code == 200:
+                    spotify_id = search_resp.json().get("id")
+                    if spotify_id:
+                        log_event("gateway", "INFO", f"Found Spotify ID via album search: {spotify_id}")
+            except Exception as e:
+                log_event("gateway", "WARNING", f"Spotify album search failed: {str(e)}")
         
         # Step 5: Fetch tracklist based on type (release takes priority)
         tracklist_data = {"tracklist": []}
@@ -824,6 +961,9 @@ async def get_fnac_pricing(artist: str = Query(..., description="Artist name"),
     # except Exception as e:
     #     print(f"Error fetching FNAC price: {str(e)}")
     #     return {"fnac": None}
+
+
+def get_vinyl_releases(releases: list) -> tuple[list, dict]:
     """Get all vinyl releases ordered by preference (originals first, then reissues)
     
     Returns:
@@ -883,7 +1023,7 @@ async def enrich_album_with_discogs(album: dict, idx: int, total: int, semaphore
         artist_name = album_info.get("artists", [{}])[0].get("name", "Unknown")
         album_name = album_info.get("name", "Unknown")
         
-        log_event("gateway", "INFO", f"[{idx}/{total}] Processing: {artist_name} - {album_name}")
+        log_event("gateway", "INFO", "[%d/%d] Processing: %s - %s", idx, total, artist_name, album_name)
         
         debug_info = {
             "status": None,
@@ -904,7 +1044,7 @@ async def enrich_album_with_discogs(album: dict, idx: int, total: int, semaphore
                 debug_info["status"] = "not_found"
                 debug_info["message"] = "No se encontró en Discogs"
                 debug_info["details"] = {"total_releases_found": 0}
-                log_event("gateway", "INFO", f"[{idx}/{total}] ○ Not found on Discogs: {album_name}")
+                log_event("gateway", "INFO", "[%d/%d] ○ Not found on Discogs: %s", idx, total, album_name)
                 album["discogs_debug_info"] = debug_info
                 return album
             
@@ -917,7 +1057,7 @@ async def enrich_album_with_discogs(album: dict, idx: int, total: int, semaphore
                 album["discogs_stats"] = None
                 debug_info["status"] = "not_found"
                 debug_info["message"] = "No se encontraron vinilos"
-                log_event("gateway", "INFO", f"[{idx}/{total}] ○ No vinyl: {album_name}")
+                log_event("gateway", "INFO", "[%d/%d] ○ No vinyl: %s", idx, total, album_name)
                 album["discogs_debug_info"] = debug_info
                 return album
             
@@ -937,7 +1077,7 @@ async def enrich_album_with_discogs(album: dict, idx: int, total: int, semaphore
                 else:
                     format_str = str(format_value)
                 
-                log_event("gateway", "INFO", f"[{idx}/{total}] Trying release {attempt_idx}/{max_attempts}: ID {release_id} ({format_str})")
+                log_event("gateway", "DEBUG", "[%d/%d] Trying release %d/%d: ID %s (%s)", idx, total, attempt_idx, max_attempts, release_id, format_str)
                 
                 try:
                     stats_resp = await http_client.get(
@@ -954,13 +1094,13 @@ async def enrich_album_with_discogs(album: dict, idx: int, total: int, semaphore
                         selected_stats = stats
                         debug_info["details"]["selected_release_index"] = attempt_idx
                         debug_info["details"]["selected_format"] = format_str
-                        log_event("gateway", "INFO", f"[{idx}/{total}] ✓ Found price on attempt {attempt_idx}: €{stats['lowest_price_eur']:.2f}")
+                        log_event("gateway", "INFO", "[%d/%d] ✓ Found price on attempt %d: €%.2f", idx, total, attempt_idx, stats["lowest_price_eur"])
                         break
                     else:
-                        log_event("gateway", "INFO", f"[{idx}/{total}] ○ Release {release_id} has no price, trying next...")
+                        log_event("gateway", "DEBUG", "[%d/%d] ○ Release %s has no price, trying next...", idx, total, release_id)
                         
                 except Exception as e:
-                    log_event("gateway", "WARNING", f"[{idx}/{total}] Failed to get stats for release {release_id}: {str(e)}")
+                    log_event("gateway", "WARNING", "[%d/%d] Failed to get stats for release %s: %s", idx, total, release_id, e)
                     continue
             
             # If we didn't find any with price, use the first release anyway
@@ -982,7 +1122,7 @@ async def enrich_album_with_discogs(album: dict, idx: int, total: int, semaphore
                     )
                     selected_stats = stats_resp.json()
                 except Exception as e:
-                    log_event("gateway", "WARNING", f"[{idx}/{total}] Failed to get stats for fallback release: {str(e)}")
+                    log_event("gateway", "WARNING", "[%d/%d] Failed to get stats for fallback release: %s", idx, total, e)
                     
                     # Get sell list URL with master_id from Discogs service
                     sell_url = f"https://www.discogs.com/sell/list?release_id={release_id}&currency=EUR&format=Vinyl"
@@ -1039,14 +1179,13 @@ async def enrich_album_with_discogs(album: dict, idx: int, total: int, semaphore
 async def search_spotify_artists(q: str, limit: int = 10):
     """Search artists using Spotify Service"""
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{SPOTIFY_SERVICE_URL}/search/artists", 
-                params={"q": q, "limit": limit},
-                timeout=10.0
-            )
-            resp.raise_for_status()
-            return resp.json()
+        client = get_http_client("services")
+        resp = await client.get(
+            f"{SPOTIFY_SERVICE_URL}/search/artists", 
+            params={"q": q, "limit": limit}
+        )
+        resp.raise_for_status()
+        return resp.json()
     except httpx.ConnectError:
         log_event("gateway", "ERROR", f"Could not connect to Spotify Service at {SPOTIFY_SERVICE_URL}")
         raise HTTPException(status_code=503, detail="Spotify Service unavailable (Connection Refused)")
@@ -1080,12 +1219,15 @@ async def unified_search(q: str, limit: int = 20):
         try:
             resp = await http_client.get(
                 f"{SPOTIFY_SERVICE_URL}/search/artists",
-                params={"q": q, "limit": 10},
+                params={"q": q, "limit": 10, "fail_fast": "true"},
                 timeout=5.0
             )
             if resp.status_code == 200:
                 spotify_data = resp.json()
                 spotify_artists = spotify_data.get("artists", [])
+            elif resp.status_code == 503:
+                # Spotify is cooling down after a 429, just use DB/Discogs results
+                log_event("gateway", "WARNING", "Spotify rate limited, skipping artist search")
         except Exception as e:
             log_event("gateway", "WARNING", f"Spotify search failed: {str(e)}")
         
@@ -1495,7 +1637,9 @@ async def merge_recommendations(request: dict):
             f"{RECOMMENDER_SERVICE_URL}/merge-recommendations",
             json={
                 "lastfm_recommendations": lastfm_recs,
-                "artist_recommendations": artist_recs
+                "artist_recommendations": artist_recs,
+                "sources": request.get("sources", []),
+                "weights": request.get("weights", [])
             }
         )
         
@@ -1555,7 +1699,11 @@ async def admin_update_entity(entity_type: str, entity_id: int, data: Dict[str,
 
 @app.post("/api/admin/import-csv")
 async def import_artists_csv(file: UploadFile = File(...)):
-    """Import artists from CSV file with real-time progress updates via SSE"""
+    """
+    Import artists from a CSV as a durable background job (see gateway/csv_import.py).
+    Returns the job's SSE progress stream; the job keeps running if the client
+    disconnects and can be followed again at /api/admin/import-csv/{job_id}/events.
+    """
     
     if not http_client:
         raise HTTPException(status_code=500, detail="HTTP client not initialized")
@@ -1563,7 +1711,6 @@ async def import_artists_csv(file: UploadFile = File(...)):
     if not file.filename or not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
-    # Read file content before creating the stream
     content = await file.read()
     csv_text = content.decode('utf-8')
     csv_reader = csv.DictReader(csv_text.splitlines())
@@ -1576,123 +1723,153 @@ async def import_artists_csv(file: UploadFile = File(...)):
     if not artists:
         raise HTTPException(status_code=400, detail="No artists found in CSV")
     
-    async def event_stream() -> AsyncGenerator[str, None]:
-        """Server-Sent Events stream for progress updates"""
-        try:
-            total = len(artists)
-            yield f"data: {json.dumps({'type': 'start', 'total': total})}\n\n"
-            
-            successful = 0
-            cached = 0
-            failed = 0
-            failed_artists = []
-            
-            for i, artist_name in enumerate(artists, 1):
-                try:
-                    start_time = time.time()
-                    
-                    response = await http_client.post(
-                        f"{RECOMMENDER_SERVICE_URL}/artist-recommendations",
-                        json={"artist_name": artist_name, "top_albums": 10, "csv_mode": True},
-                        timeout=180.0
-                    )
-                    
-                    elapsed = time.time() - start_time
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        total_albums = data.get('total', 0)
-                        top_album = None
-                        rating = None
-                        
-                        if data.get('recommendations'):
-                            top_album = data['recommendations'][0].get('album_name')
-                            rating = data['recommendations'][0].get('rating')
-                        
-                        if elapsed < 1.0:
-                            cached += 1
-                            status = 'cached'
-                        else:
-                            successful += 1
-                            status = 'success'
-                        
-                        yield f"data: {json.dumps({'type': 'progress', 'current': i, 'total': total, 'artist': artist_name, 'status': status, 'albums': total_albums, 'time': round(elapsed, 2), 'top_album': top_album, 'rating': rating})}\n\n"
-                    
-                    elif response.status_code == 404:
-                        failed += 1
-                        failed_artists.append(artist_name)
-                        yield f"data: {json.dumps({'type': 'progress', 'current': i, 'total': total, 'artist': artist_name, 'status': 'not_found', 'error': 'No albums found'})}\n\n"
-                    
-                    else:
-                        failed += 1
-                        failed_artists.append(artist_name)
-                        error_msg = response.text[:100]
-                        yield f"data: {json.dumps({'type': 'progress', 'current': i, 'total': total, 'artist': artist_name, 'status': 'error', 'error': error_msg})}\n\n"
-                
-                except asyncio.TimeoutError:
-                    failed += 1
-                    failed_artists.append(artist_name)
-                    yield f"data: {json.dumps({'type': 'progress', 'current': i, 'total': total, 'artist': artist_name, 'status': 'timeout', 'error': 'Request timeout'})}\n\n"
-                
-                except Exception as e:
-                    failed += 1
-                    failed_artists.append(artist_name)
-                    yield f"data: {json.dumps({'type': 'progress', 'current': i, 'total': total, 'artist': artist_name, 'status': 'error', 'error': str(e)})}\n\n"
-                
-                await asyncio.sleep(0.1)
-            
-            if failed_artists:
-                yield f"data: {json.dumps({'type': 'retry_start', 'failed_count': len(failed_artists), 'artists': failed_artists})}\n\n"
-                
-                retry_successful = 0
-                retry_failed = 0
-                
-                for i, artist_name in enumerate(failed_artists, 1):
-                    try:
-                        start_time = time.time()
-                        
-                        response = await http_client.post(
-                            f"{RECOMMENDER_SERVICE_URL}/artist-single-recommendation",
-                            json={"artist_name": artist_name, "top_albums": 10, "csv_mode": True},
-                            timeout=180.0
-                        )
-                        
-                        elapsed = time.time() - start_time
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            total_albums = data.get('total', 0)
-                            top_album = None
-                            rating = None
-                            
-                            if data.get('recommendations'):
-                                top_album = data['recommendations'][0].get('album_name')
-                                rating = data['recommendations'][0].get('rating')
-                            
-                            retry_successful += 1
-                            successful += 1
-                            failed -= 1
-                            
-                            yield f"data: {json.dumps({'type': 'retry_progress', 'current': i, 'total': len(failed_artists), 'artist': artist_name, 'status': 'success', 'albums': total_albums, 'time': round(elapsed, 2), 'top_album': top_album, 'rating': rating})}\n\n"
-                        else:
-                            retry_failed += 1
-                            error_msg = response.text[:100] if hasattr(response, 'text') else 'Unknown error'
-                            yield f"data: {json.dumps({'type': 'retry_progress', 'current': i, 'total': len(failed_artists), 'artist': artist_name, 'status': 'error', 'error': error_msg})}\n\n"
-                    
-                    except Exception as e:
-                        retry_failed += 1
-                        yield f"data: {json.dumps({'type': 'retry_progress', 'current': i, 'total': len(failed_artists), 'artist': artist_name, 'status': 'error', 'error': str(e)})}\n\n"
-                    
-                    await asyncio.sleep(0.1)
-                
-                yield f"data: {json.dumps({'type': 'retry_complete', 'retry_successful': retry_successful, 'retry_failed': retry_failed})}\n\n"
-            
-            yield f"data: {json.dumps({'type': 'complete', 'successful': successful, 'cached': cached, 'failed': failed, 'total': total})}\n\n"
-        
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+    job_id = await asyncio.to_thread(csv_import.create_job, file.filename, artists)
+    csv_import.start_job(job_id, http_client)
     
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+    return StreamingResponse(csv_import.event_stream(job_id), media_type="text/event-stream",
+                             headers={"X-Import-Job-Id": str(job_id)})
+
+
+@app.get("/api/admin/import-csv/jobs")
+async def list_import_jobs(limit: int = Query(20, ge=1, le=200)):
+    """Recent CSV import jobs with per-status item counts"""
+    jobs = await asyncio.to_thread(csv_import.list_jobs, limit)
+    return {"jobs": jobs, "total": len(jobs)}
+
+
+@app.get("/api/admin/import-csv/{job_id}")
+async def get_import_job(job_id: int, items: bool = False):
+    """One import job; items=true adds its finished items in completion order"""
+    job = await asyncio.to_thread(csv_import.get_job, job_id, items)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+@app.get("/api/admin/import-csv/{job_id}/events")
+async def import_job_events(job_id: int):
+    """Reattach to an import job's SSE progress stream (finished items are replayed first)"""
+    job = await asyncio.to_thread(csv_import.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return StreamingResponse(csv_import.event_stream(job_id), media_type="text/event-stream")
+
+
+@app.post("/api/admin/import-csv/{job_id}/cancel")
+async def cancel_import_job(job_id: int):
+    if not await csv_import.cancel_job(job_id):
+        raise HTTPException(status_code=409, detail="Import job is not running")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@app.post("/api/admin/import-csv/{job_id}/resume")
+async def resume_import_job(job_id: int):
+    if not http_client:
+        raise HTTPException(status_code=500, detail="HTTP client not initialized")
+    if not await csv_import.resume_job(job_id, http_client):
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return {"job_id": job_id, "status": "running"}
+
+
+@app.get("/api/admin/rating-refresh")
+async def rating_refresh_status():
+    """Progress of the scheduled rating refresh (see gateway/rating_refresh.py)"""
+    return await asyncio.to_thread(rating_refresh.get_state)
+
+
+@app.post("/api/admin/rating-refresh/run")
+async def run_rating_refresh(max_calls: Optional[int] = Query(None, ge=2, le=1000)):
+    """Refresh the next batch now; still bounded by the daily Discogs budget"""
+    return await rating_refresh.run_batch(max_calls)
+
+
+@app.get("/api/admin/promotion")
+async def promotion_status():
+    """Partial-record promotion queue depth and progress (see gateway/promotion.py)"""
+    return await asyncio.to_thread(promotion.get_status)
+
+
+@app.post("/api/admin/promotion/run")
+async def run_promotion(limit: int = Query(promotion.PROMOTION_BATCH_SIZE, ge=1, le=50)):
+    """Promote the next batch of partial artists now"""
+    picked = await promotion.run_batch(limit)
+    return {"picked": picked, **await asyncio.to_thread(promotion.get_status)}
+
+
+@app.get("/api/admin/images")
+async def image_cache_status():
+    """Cover image cache size and configuration (see gateway/images.py)"""
+    return await asyncio.to_thread(images.get_status)
+
+
+class SpotifyEnrichRequest(BaseModel):
+    max_albums: int = 200
+    max_artists: int = 25
+    after_artist_id: int = 0
+    after_image_artist_id: int = 0
+    after_album_id: int = 0
+
+
+@app.post("/api/admin/spotify/enrich")
+async def spotify_enrich(request: SpotifyEnrichRequest):
+    """Run one batch pass of the Spotify metadata backfill (see services/spotify/enrichment.py)"""
+    try:
+        response = await get_http_client("services").post(
+            f"{SPOTIFY_SERVICE_URL}/enrich/batch",
+            json=request.dict(),
+            timeout=300.0
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    except httpx.RequestError as e:
+        log_event("gateway", "ERROR", f"Spotify enrichment request failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Spotify service unavailable")
+
+
+@app.get("/api/admin/http-clients")
+async def get_http_client_stats():
+    """Connection reuse and request counts for the gateway's pooled HTTP clients"""
+    return http_client_stats()
+
+
+@app.get("/api/admin/traces/slowest")
+async def get_slowest_traces(
+    limit: int = Query(20, ge=1, le=200),
+    minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    route: Optional[str] = None,
+):
+    """Slowest request traces from the span export, with every span across services"""
+    exporter = get_exporter()
+
+    def load():
+        # Make this process's latest spans visible before reading the file back
+        exporter.flush()
+        return slowest_traces(limit=limit, since=time.time() - minutes * 60, route=route)
+
+    traces = await asyncio.to_thread(load)
+    return {"traces": traces, "total": len(traces), "exporter": exporter.stats()}
+
+
+@app.get("/api/admin/profiles")
+async def get_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    service: Optional[str] = None,
+    route: Optional[str] = None,
+):
+    """Recorded request profiles, newest first (see libs/shared/profiling.py)"""
+    profiles = await asyncio.to_thread(list_profiles, limit, service, route)
+    return {"profiles": profiles, "total": len(profiles)}
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Collapsed stacks of one profile, for flamegraph.pl / speedscope / inferno"""
+    collapsed = await asyncio.to_thread(read_profile, profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(collapsed, headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed"'})
 
 
 # ---------------------------------------------------------------------------
@@ -1701,59 +1878,57 @@ async def import_artists_csv(file: UploadFile = File(...)):
 
 @app.get("/api/admin/db/download")
 async def download_database():
-    """Download the current database file for backup purposes."""
-    db_path = Path(__file__).parent.parent / "vinylbe.db"
-    
-    if not db_path.exists():
+    """Download a consistent snapshot of the live database, gzip-compressed (see gateway/backups.py)"""
+    if not Path(db_utils.DB_PATH).exists():
         raise HTTPException(status_code=404, detail="Database file not found")
     
     log_event("gateway", "INFO", "Database download requested")
-    return FileResponse(
-        path=str(db_path),
-        filename="vinylbe.db",
-        media_type="application/octet-stream"
+    filename = f"vinylbe-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db.gz"
+    return StreamingResponse(
+        backups.stream_snapshot(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
 @app.post("/api/admin/db/upload")
 async def upload_database(database: UploadFile = File(...)):
-    """Upload and replace the production database. USE WITH CAUTION!"""
-    db_path = Path(__file__).parent.parent / "vinylbe.db"
-    backup_path = Path(__file__).parent.parent / f"vinylbe.db.backup.{int(time.time())}"
+    """
+    Upload and replace the production database (raw or gzip). USE WITH CAUTION!
+    The upload is validated before it replaces anything, and the current
+    database is backed up first.
+    """
+    async def chunks():
+        while chunk := await database.read(backups.CHUNK_SIZE):
+            yield chunk
     
     try:
-        # Create backup of current database
-        if db_path.exists():
-            import shutil
-            shutil.copy2(db_path, backup_path)
-            log_event("gateway", "INFO", f"Created database backup: {backup_path.name}")
-        
-        # Write uploaded file
-        content = await database.read()
-        
-        # Validate it's a SQLite database
-        if not content.startswith(b'SQLite format 3'):
-            raise HTTPException(status_code=400, detail="Invalid SQLite database file")
-        
-        with open(db_path, "wb") as f:
-            f.write(content)
-        
-        log_event("gateway", "INFO", f"Database updated successfully (size: {len(content)} bytes)")
-        
-        return {
-            "status": "success",
-            "message": "Database updated successfully",
-            "backup_created": backup_path.name,
-            "size_bytes": len(content)
-        }
-    
-    except HTTPException:
-        raise
+        result = await backups.restore_upload(chunks())
+    except backups.InvalidDatabase as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         log_event("gateway", "ERROR", f"Database upload failed: {str(e)}")
-        # Restore from backup if it exists
-        if backup_path.exists():
-            import shutil
-            shutil.copy2(backup_path, db_path)
-            log_event("gateway", "INFO", "Restored database from backup after failed upload")
         raise HTTPException(status_code=500, detail=f"Database upload failed: {str(e)}")
+    
+    return {
+        "status": "success",
+        "message": "Database updated successfully",
+        **result
+    }
+
+
+@app.get("/api/admin/db/backups")
+async def list_database_backups():
+    """Backups kept by the retention policy, newest first"""
+    items = await asyncio.to_thread(backups.list_backups)
+    return {"backups": items, "total": len(items), "keep": backups.BACKUP_KEEP}
+
+
+@app.post("/api/admin/db/backups")
+async def create_database_backup():
+    """Take an online backup now"""
+    try:
+        return await asyncio.to_thread(backups.create_backup, "manual")
+    except Exception as e:
+        log_event("gateway", "ERROR", f"Database backup failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database backup failed: {str(e)}")
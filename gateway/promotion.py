@@ -0,0 +1,385 @@
+"""
+Background promotion of partial catalogue records to full ones.
+
+The Spotify and Discogs-search fallbacks, the guest sync in /auth/lastfm and
+manually added albums create artists and albums with is_partial=1 (a name, a
+title, maybe a cover). This worker promotes them continuously, in the
+gateway, without any request waiting on it:
+
+1. Artists with partial records are picked by how many users reference
+   them (selected artists, recommendations, library albums), most first.
+   Artists passed to notify() jump the queue. Only partial artists are
+   counted, through indexes, and the counts are kept for the rest of the
+   pass over the queue.
+2. Each batch runs through the seeding engine (libs/shared/seeding.py): MBID,
+   studio albums, Discogs ids, ratings and covers. The upsert clears
+   is_partial on the artist and on every album it matches.
+3. Partial albums the discography did not match (compilations, Spotify-only
+   titles) get a Discogs search of their own, and are promoted when Discogs
+   has a rating for them.
+
+An artist is in flight at most once: notify() calls for a queued or running
+artist coalesce, and the queue skips in-flight artists. Artists that still
+have partial records afterwards are retried with exponential backoff
+(promotion_attempt), so an artist MusicBrainz/Discogs do not know is not
+looked up every cycle.
+
+Queue depth is reported by get_status() (/api/admin/promotion) and the
+catalogue_partial_records gauge.
+
+Configuration (environment):
+    PROMOTION_POLL_SECONDS   idle wait between queue checks; 0 disables (default 60)
+    PROMOTION_BATCH_SIZE     artists per batch                          (default 4)
+    PROMOTION_RATE           upstream requests per second                (default 0.2)
+"""
+import asyncio
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from gateway import db_utils
+from libs.shared.metrics import gauge
+from libs.shared.seeding import RateLimiter, SeedAlbum, SeedingEngine, SeedResult
+from libs.shared.utils import log_event
+
+PROMOTION_POLL_SECONDS = float(os.getenv("PROMOTION_POLL_SECONDS", "60"))
+PROMOTION_BATCH_SIZE = int(os.getenv("PROMOTION_BATCH_SIZE", "4"))
+PROMOTION_RATE = float(os.getenv("PROMOTION_RATE", "0.2"))
+
+MAX_BACKOFF = timedelta(days=7)
+# Let the gateway finish starting up before the first batch
+STARTUP_DELAY = 30.0
+
+PARTIAL_RECORDS = gauge(
+    "catalogue_partial_records", "Partial catalogue records waiting for promotion",
+    ("kind",),
+)
+
+_pace = RateLimiter("promotion", PROMOTION_RATE)
+_requested: Dict[str, str] = {}
+_in_flight: Set[str] = set()
+_wake = asyncio.Event()
+_task: Optional[asyncio.Task] = None
+_totals = {"artists_promoted": 0, "albums_promoted": 0, "artists_failed": 0, "batches": 0}
+_schema_ready = False
+# Users per artist id, counted once per pass over the queue: cleared when the
+# queue runs dry, so only artists that became partial mid-pass are counted again
+_users: Dict[int, int] = {}
+USER_COUNT_CHUNK = 500
+
+# Artists with partial records, read from the partial indexes created below
+_PARTIAL_ARTISTS = """
+    SELECT id AS artist_id FROM artists WHERE is_partial = 1
+    UNION
+    SELECT artist_id FROM albums WHERE is_partial = 1
+"""
+
+# Distinct users referencing artist `ar` (selected artists, recommendations,
+# library albums); counted per candidate through indexes, never over whole tables
+_USERS_OF_ARTIST = """
+    (SELECT COUNT(DISTINCT user_id) FROM (
+        SELECT CAST(user_id AS TEXT) AS user_id FROM user_selected_artist
+        WHERE LOWER(artist_name) = LOWER(ar.name)
+        UNION ALL
+        SELECT CAST(user_id AS TEXT) FROM recommendation
+        WHERE LOWER(artist_name) = LOWER(ar.name)
+        UNION ALL
+        SELECT CAST(ua.user_id AS TEXT) FROM albums al
+        JOIN user_albums ua ON ua.album_id = al.id
+        WHERE al.artist_id = ar.id
+    ))
+"""
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS promotion_attempt (
+            artist_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_attempt_at TEXT,
+            next_attempt_at TEXT,
+            last_status TEXT,
+            last_error TEXT,
+            FOREIGN KEY (artist_id) REFERENCES artists(id) ON DELETE CASCADE
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_artists_partial ON artists(id) WHERE is_partial = 1;
+        CREATE INDEX IF NOT EXISTS idx_albums_partial ON albums(artist_id) WHERE is_partial = 1;
+        CREATE INDEX IF NOT EXISTS idx_user_selected_artist_name_lower
+            ON user_selected_artist(LOWER(artist_name), user_id);
+        CREATE INDEX IF NOT EXISTS idx_recommendation_artist_lower
+            ON recommendation(LOWER(artist_name), user_id);
+        CREATE INDEX IF NOT EXISTS idx_user_albums_album_id ON user_albums(album_id, user_id);
+        """
+    )
+    _schema_ready = True
+
+
+def reset_schema() -> None:
+    """Check the tables again on the next connection (the database was replaced by an upload)"""
+    global _schema_ready
+    _schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    conn = db_utils.get_db_connection()
+    _ensure_schema(conn)
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# Queue
+# ---------------------------------------------------------------------------
+
+def _count_users(conn: sqlite3.Connection, artist_ids: List[int]) -> Dict[int, int]:
+    """Users per artist, from the pass cache; artists not counted yet this pass are counted now"""
+    missing = [artist_id for artist_id in artist_ids if artist_id not in _users]
+    for start in range(0, len(missing), USER_COUNT_CHUNK):
+        chunk = missing[start:start + USER_COUNT_CHUNK]
+        rows = conn.execute(
+            f"SELECT ar.id, {_USERS_OF_ARTIST} AS users FROM artists ar WHERE ar.id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall()
+        _users.update({row["id"]: row["users"] for row in rows})
+    return _users
+
+
+def _due_artists(limit: int, exclude: List[str], requested: List[str]) -> List[Dict[str, Any]]:
+    """Next artists with partial records: requested ones first, then by users referencing them"""
+    wanted = set(requested)
+    requested = requested or [""]
+    exclude = exclude or [""]
+    conn = _connect()
+    try:
+        artists = conn.execute(
+            f"""
+            SELECT ar.id, ar.name, ar.mbid,
+                   (SELECT COUNT(*) FROM albums al WHERE al.artist_id = ar.id AND al.is_partial = 1) AS partial_albums
+            FROM ({_PARTIAL_ARTISTS}) pa
+            JOIN artists ar ON ar.id = pa.artist_id
+            LEFT JOIN promotion_attempt p ON p.artist_id = ar.id
+            WHERE LOWER(ar.name) NOT IN ({','.join('?' * len(exclude))})
+              AND (p.next_attempt_at IS NULL OR p.next_attempt_at <= ?
+                   OR LOWER(ar.name) IN ({','.join('?' * len(requested))}))
+            """,
+            (*exclude, datetime.now(), *requested),
+        ).fetchall()
+        users = _count_users(conn, [artist["id"] for artist in artists])
+    finally:
+        conn.close()
+    for artist in artists:
+        artist["users"] = users.get(artist["id"], 0)
+    artists.sort(key=lambda a: (a["name"].lower() not in wanted, -a["users"], a["id"]))
+    return artists[:limit]
+
+
+def _queue_depth() -> Dict[str, int]:
+    conn = _connect()
+    try:
+        return conn.execute(
+            f"""
+            SELECT
+                (SELECT COUNT(*) FROM artists WHERE is_partial = 1) AS partial_artists,
+                (SELECT COUNT(*) FROM albums WHERE is_partial = 1) AS partial_albums,
+                (SELECT COUNT(*) FROM ({_PARTIAL_ARTISTS}) pa
+                 LEFT JOIN promotion_attempt p ON p.artist_id = pa.artist_id
+                 WHERE p.next_attempt_at IS NULL OR p.next_attempt_at <= ?) AS due_artists,
+                (SELECT COUNT(*) FROM ({_PARTIAL_ARTISTS}) pa
+                 JOIN promotion_attempt p ON p.artist_id = pa.artist_id
+                 WHERE p.next_attempt_at > ?) AS backing_off
+            """,
+            (datetime.now(), datetime.now()),
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def get_status() -> Dict[str, Any]:
+    """Queue depth, work in flight and totals since the gateway started"""
+    depth = _queue_depth()
+    for kind, value in depth.items():
+        PARTIAL_RECORDS.set(value, kind=kind)
+    return {
+        **depth,
+        "requested": len(_requested),
+        "in_flight": sorted(_in_flight),
+        "running": _task is not None and not _task.done(),
+        **_totals,
+    }
+
+
+def notify(artist_name: str) -> None:
+    """Ask for an artist to be promoted next; returns at once and coalesces with queued or running work"""
+    if not artist_name or _task is None:
+        return
+    key = artist_name.lower()
+    if key in _in_flight or key in _requested:
+        return
+    _requested[key] = artist_name
+    _wake.set()
+
+
+# ---------------------------------------------------------------------------
+# Promotion
+# ---------------------------------------------------------------------------
+
+def _partial_albums(artist_id: int) -> List[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        return conn.execute(
+            """SELECT id, title, year, discogs_master_id, discogs_release_id
+               FROM albums WHERE artist_id = ? AND is_partial = 1""",
+            (artist_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def _record(artist_id: int, updates: List[tuple], status: str, error: Optional[str]) -> Dict[str, int]:
+    """Album promotions and the artist's attempt in one transaction; returns what is still partial"""
+    now = datetime.now()
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            """UPDATE albums
+               SET year = COALESCE(NULLIF(year, ''), NULLIF(?, '')),
+                   discogs_master_id = COALESCE(discogs_master_id, ?),
+                   discogs_release_id = COALESCE(discogs_release_id, ?),
+                   rating = ?, votes = ?,
+                   cover_url = COALESCE(cover_url, ?),
+                   last_updated = ?, is_partial = 0
+               WHERE id = ?""",
+            [(*update[:-1], now, update[-1]) for update in updates],
+        )
+        left = cur.execute(
+            """SELECT COALESCE(ar.is_partial, 0) AS artist,
+                      (SELECT COUNT(*) FROM albums al WHERE al.artist_id = ar.id AND al.is_partial = 1) AS albums
+               FROM artists ar WHERE ar.id = ?""",
+            (artist_id,),
+        ).fetchone() or {"artist": 0, "albums": 0}
+        if not (left["artist"] or left["albums"]):
+            cur.execute("DELETE FROM promotion_attempt WHERE artist_id = ?", (artist_id,))
+        else:
+            row = cur.execute("SELECT attempts FROM promotion_attempt WHERE artist_id = ?", (artist_id,)).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            retry_in = min(timedelta(hours=2 ** (attempts - 1)), MAX_BACKOFF)
+            cur.execute(
+                """INSERT INTO promotion_attempt (artist_id, attempts, last_attempt_at, next_attempt_at, last_status, last_error)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(artist_id) DO UPDATE SET
+                       attempts = excluded.attempts,
+                       last_attempt_at = excluded.last_attempt_at,
+                       next_attempt_at = excluded.next_attempt_at,
+                       last_status = excluded.last_status,
+                       last_error = excluded.last_error""",
+                (artist_id, attempts, now, now + retry_in, status, error),
+            )
+        conn.commit()
+        return left
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+async def _promote_leftovers(engine: SeedingEngine, result: SeedResult, partial_albums: int) -> None:
+    """Album-level Discogs lookups for partial albums the discography did not cover"""
+    rows = await asyncio.to_thread(_partial_albums, result.artist_id)
+    updates = []
+    error = result.error
+    for row in rows:
+        album = SeedAlbum(title=row["title"], year=row["year"] or "",
+                          discogs_master_id=row["discogs_master_id"],
+                          discogs_release_id=row["discogs_release_id"])
+        try:
+            await engine.find_discogs_ids(result.name, album)
+            await engine.fetch_discogs_data(album)
+        except Exception as e:
+            error = f"{row['title']}: {e}"
+            continue
+        if album.rating is not None:
+            updates.append((album.year, album.discogs_master_id, album.discogs_release_id,
+                            album.rating, album.votes, album.cover_url, row["id"]))
+
+    left = await asyncio.to_thread(_record, result.artist_id, updates, result.status, error)
+    _totals["albums_promoted"] += max(0, partial_albums - left["albums"])
+    if left["artist"] or left["albums"]:
+        _totals["artists_failed"] += 1
+        log_event("gateway", "INFO", f"[PROMOTION] {result.name}: {result.status}, {left['albums']} albums still partial "
+                                     f"({error or 'no Discogs rating'})")
+    else:
+        _totals["artists_promoted"] += 1
+        log_event("gateway", "INFO", f"[PROMOTION] ✓ {result.name}: {result.added} albums added, "
+                                     f"{partial_albums} partial albums promoted")
+
+
+async def run_batch(limit: int = PROMOTION_BATCH_SIZE) -> int:
+    """Promote the next `limit` artists; returns how many were picked"""
+    requested = list(_requested)
+    artists = await asyncio.to_thread(_due_artists, limit, sorted(_in_flight), requested)
+    if not artists:
+        # End of the pass: count users afresh on the next one
+        _users.clear()
+        return 0
+
+    keys = [artist["name"].lower() for artist in artists]
+    _in_flight.update(keys)
+    for key in keys:
+        _requested.pop(key, None)
+    try:
+        engine = SeedingEngine(db_utils.DB_PATH, service="gateway", pace=_pace)
+        results = await engine.seed_many(
+            SeedResult(name=artist["name"], artist_id=artist["id"], mbid=artist["mbid"]) for artist in artists
+        )
+        partial = {artist["id"]: artist["partial_albums"] for artist in artists}
+        await asyncio.gather(*(_promote_leftovers(engine, result, partial[result.artist_id]) for result in results))
+    finally:
+        _in_flight.difference_update(keys)
+        _totals["batches"] += 1
+    return len(artists)
+
+
+async def _run_forever():
+    await asyncio.sleep(STARTUP_DELAY)
+    while True:
+        try:
+            _wake.clear()
+            if await run_batch():
+                continue
+            await asyncio.to_thread(get_status)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_event("gateway", "ERROR", f"[PROMOTION] Batch failed: {e}")
+        try:
+            await asyncio.wait_for(_wake.wait(), PROMOTION_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start() -> None:
+    """Start the worker (gateway startup); a no-op when disabled"""
+    global _task
+    if PROMOTION_POLL_SECONDS <= 0:
+        return
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run_forever())
+
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
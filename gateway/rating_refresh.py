@@ -0,0 +1,350 @@
+"""
+Scheduled, incremental refresh of album ratings from Discogs.
+
+Every RATING_REFRESH_INTERVAL seconds the gateway refreshes one small batch
+of albums: rating, votes and cover (and the Discogs id, for albums that have
+none) through the shared seeding engine (libs/shared/seeding.py).
+
+Which albums, and in what order, is decided once per pass. A pass queues
+every album that is due, ranked by priority:
+
+    missing data     NULL rating, is_partial rows
+    staleness        days since last_updated (capped at a year)
+    popularity       users' recommendations and library entries
+
+Albums are due when never refreshed, older than RATING_REFRESH_STALE_DAYS,
+or missing data and not checked for RATING_REFRESH_RETRY_DAYS. The queue
+and the cursor into it live in the database, so a restart continues where
+the last batch stopped. A new pass is planned when the queue is done.
+
+Discogs calls are bounded by RATING_REFRESH_DAILY_BUDGET requests per day,
+spread evenly over the runs of a day, and paced at RATING_REFRESH_RATE
+requests per second on top of the shared Discogs limiter. So the job never
+bursts and stays inside its share of the per-key Discogs limit (see the
+split in libs/shared/seeding.py), leaving the rest to interactive lookups. It also skips
+a run while Discogs has us in a 429 cooldown.
+
+Each batch is written in one transaction together with the cursor and the
+day's call count.
+
+Configuration (environment):
+    RATING_REFRESH_INTERVAL       seconds between batches; 0 disables (default 900)
+    RATING_REFRESH_DAILY_BUDGET   Discogs requests per day            (default 1500)
+    RATING_REFRESH_RATE           Discogs requests per second         (default 0.1)
+    RATING_REFRESH_STALE_DAYS     refresh ratings older than this     (default 30)
+    RATING_REFRESH_RETRY_DAYS     re-check missing data after this    (default 3)
+"""
+import asyncio
+import math
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from gateway import db_utils
+from libs.shared.seeding import RateLimiter, SeedAlbum, SeedingEngine, discogs_cooldown
+from libs.shared.utils import log_event
+
+RATING_REFRESH_INTERVAL = float(os.getenv("RATING_REFRESH_INTERVAL", "900"))
+RATING_REFRESH_DAILY_BUDGET = int(os.getenv("RATING_REFRESH_DAILY_BUDGET", "1500"))
+RATING_REFRESH_RATE = float(os.getenv("RATING_REFRESH_RATE", "0.1"))
+RATING_REFRESH_STALE_DAYS = int(os.getenv("RATING_REFRESH_STALE_DAYS", "30"))
+RATING_REFRESH_RETRY_DAYS = int(os.getenv("RATING_REFRESH_RETRY_DAYS", "3"))
+
+# Let the gateway finish starting up before the first batch
+STARTUP_DELAY = 60.0
+# Worst case Discogs calls per album: master + main release, plus two
+# searches when the album has no Discogs id yet
+CALLS_WITH_ID = 2
+CALLS_WITHOUT_ID = 4
+
+_pace = RateLimiter("rating-refresh", RATING_REFRESH_RATE)
+_lock = asyncio.Lock()
+_task: Optional[asyncio.Task] = None
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS rating_refresh_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            pass_id INTEGER NOT NULL DEFAULT 0,
+            pass_started_at TEXT,
+            pass_size INTEGER NOT NULL DEFAULT 0,
+            cursor INTEGER NOT NULL DEFAULT 0,
+            budget_day TEXT,
+            calls_today INTEGER NOT NULL DEFAULT 0,
+            refreshed_total INTEGER NOT NULL DEFAULT 0,
+            last_run_at TEXT,
+            last_error TEXT
+        );
+
+        INSERT OR IGNORE INTO rating_refresh_state (id) VALUES (1);
+
+        CREATE TABLE IF NOT EXISTS rating_refresh_queue (
+            position INTEGER PRIMARY KEY,
+            album_id INTEGER NOT NULL,
+            priority REAL NOT NULL
+        );
+        """
+    )
+    _schema_ready = True
+
+
+def reset_schema() -> None:
+    """Check the tables again on the next connection (the database was replaced by an upload)"""
+    global _schema_ready
+    _schema_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    conn = db_utils.get_db_connection()
+    _ensure_schema(conn)
+    return conn
+
+
+def _run_allowance() -> int:
+    """Calls one scheduled run may spend, so the daily budget is spread over the day"""
+    runs_per_day = 86400 / RATING_REFRESH_INTERVAL if RATING_REFRESH_INTERVAL > 0 else 1
+    return max(CALLS_WITHOUT_ID, math.ceil(RATING_REFRESH_DAILY_BUDGET / runs_per_day))
+
+
+# ---------------------------------------------------------------------------
+# State and queue
+# ---------------------------------------------------------------------------
+
+def get_state() -> Dict[str, Any]:
+    """Pass progress and today's Discogs budget"""
+    conn = _connect()
+    try:
+        state = conn.execute("SELECT * FROM rating_refresh_state WHERE id = 1").fetchone()
+    finally:
+        conn.close()
+    state.pop("id", None)
+    if state["budget_day"] != date.today().isoformat():
+        state["calls_today"] = 0
+    state["daily_budget"] = RATING_REFRESH_DAILY_BUDGET
+    state["remaining_today"] = max(0, RATING_REFRESH_DAILY_BUDGET - state["calls_today"])
+    state["interval"] = RATING_REFRESH_INTERVAL
+    state["scheduled"] = _task is not None and not _task.done()
+    return state
+
+
+def _plan_pass() -> int:
+    """Queue every due album, highest priority first, and reset the cursor"""
+    now = datetime.now()
+    stale = now - timedelta(days=RATING_REFRESH_STALE_DAYS)
+    retry = now - timedelta(days=RATING_REFRESH_RETRY_DAYS)
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM rating_refresh_queue")
+        cur.execute(
+            """
+            INSERT INTO rating_refresh_queue (position, album_id, priority)
+            SELECT ROW_NUMBER() OVER (ORDER BY priority DESC, id), id, priority
+            FROM (
+                SELECT a.id,
+                       (CASE WHEN a.rating IS NULL THEN 30 ELSE 0 END)
+                       + (CASE WHEN COALESCE(a.is_partial, 0) = 1 THEN 20 ELSE 0 END)
+                       + MIN(COALESCE(julianday(:now) - julianday(a.last_updated), 365), 365) / 12.0
+                       + MIN(COALESCE(r.n, 0) + COALESCE(u.n, 0), 20) * 2 AS priority
+                FROM albums a
+                JOIN artists ar ON ar.id = a.artist_id
+                LEFT JOIN (
+                    SELECT LOWER(artist_name) AS artist, LOWER(album_title) AS title, COUNT(*) AS n
+                    FROM recommendation WHERE status != 'disliked'
+                    GROUP BY 1, 2
+                ) r ON r.artist = LOWER(ar.name) AND r.title = LOWER(a.title)
+                LEFT JOIN (
+                    SELECT album_id, COUNT(*) AS n FROM user_albums GROUP BY album_id
+                ) u ON u.album_id = a.id
+                WHERE a.last_updated IS NULL
+                   OR a.last_updated < :stale
+                   OR ((a.rating IS NULL OR COALESCE(a.is_partial, 0) = 1) AND a.last_updated < :retry)
+            )
+            """,
+            {"now": now, "stale": stale, "retry": retry},
+        )
+        size = cur.execute("SELECT COUNT(*) AS n FROM rating_refresh_queue").fetchone()["n"]
+        cur.execute(
+            """UPDATE rating_refresh_state
+               SET pass_id = pass_id + 1, pass_started_at = ?, pass_size = ?, cursor = 0
+               WHERE id = 1""",
+            (now, size),
+        )
+        conn.commit()
+        return size
+    finally:
+        conn.close()
+
+
+def _next_albums(cursor: int, limit: int) -> List[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        return conn.execute(
+            """SELECT q.position, q.priority, a.id, a.title, a.year, a.discogs_master_id,
+                      a.discogs_release_id, a.rating, ar.name AS artist_name
+               FROM rating_refresh_queue q
+               LEFT JOIN albums a ON a.id = q.album_id
+               LEFT JOIN artists ar ON ar.id = a.artist_id
+               WHERE q.position > ?
+               ORDER BY q.position
+               LIMIT ?""",
+            (cursor, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def _save_batch(updates: List[tuple], cursor: int, calls: int, error: Optional[str]) -> None:
+    """Album updates, the cursor and the day's call count in one transaction"""
+    now = datetime.now()
+    today = date.today().isoformat()
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            """UPDATE albums
+               SET rating = COALESCE(?, rating),
+                   votes = COALESCE(?, votes),
+                   cover_url = COALESCE(cover_url, ?),
+                   discogs_master_id = COALESCE(discogs_master_id, ?),
+                   discogs_release_id = COALESCE(discogs_release_id, ?),
+                   last_updated = ?
+               WHERE id = ?""",
+            [(*update[:-1], now, update[-1]) for update in updates],
+        )
+        cur.execute(
+            """UPDATE rating_refresh_state
+               SET cursor = ?,
+                   calls_today = CASE WHEN budget_day = ? THEN calls_today + ? ELSE ? END,
+                   budget_day = ?,
+                   refreshed_total = refreshed_total + ?,
+                   last_run_at = ?,
+                   last_error = ?
+               WHERE id = 1""",
+            (cursor, today, calls, calls, today, len(updates), now, error),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Batches
+# ---------------------------------------------------------------------------
+
+async def _refresh_album(engine: SeedingEngine, row: Dict[str, Any]) -> SeedAlbum:
+    album = SeedAlbum(title=row["title"], year=row["year"] or "",
+                      discogs_master_id=row["discogs_master_id"],
+                      discogs_release_id=row["discogs_release_id"])
+    await engine.find_discogs_ids(row["artist_name"], album)
+    await engine.fetch_discogs_data(album)
+    return album
+
+
+async def run_batch(max_calls: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Refresh the next albums of the current pass within `max_calls` Discogs
+    requests (default: this run's share of the daily budget).
+    """
+    async with _lock:
+        state = await asyncio.to_thread(get_state)
+        stats = {"status": "ok", "pass_id": state["pass_id"], "refreshed": 0, "rated": 0,
+                 "failed": 0, "discogs_calls": 0, "cursor": state["cursor"]}
+
+        if discogs_cooldown.remaining() > 0:
+            stats["status"] = "cooldown"
+            return stats
+        allowance = min(state["remaining_today"], max_calls or _run_allowance())
+        if allowance < CALLS_WITH_ID:
+            stats["status"] = "budget_exhausted"
+            return stats
+
+        if state["cursor"] >= state["pass_size"]:
+            size = await asyncio.to_thread(_plan_pass)
+            log_event("gateway", "INFO", f"[RATING REFRESH] Planned pass with {size} due albums")
+            state = await asyncio.to_thread(get_state)
+            stats["pass_id"], stats["cursor"] = state["pass_id"], 0
+            if not size:
+                stats["status"] = "idle"
+                return stats
+
+        rows = await asyncio.to_thread(_next_albums, state["cursor"], allowance)
+        engine = SeedingEngine(db_utils.DB_PATH, service="gateway", pace=_pace)
+        updates: List[tuple] = []
+        cursor, error = state["cursor"], None
+        planned = 0
+
+        for row in rows:
+            cost = CALLS_WITH_ID if row["discogs_master_id"] or row["discogs_release_id"] else CALLS_WITHOUT_ID
+            if planned + cost > allowance:
+                break
+            planned += cost
+            if row["id"] is not None:
+                try:
+                    album = await _refresh_album(engine, row)
+                except Exception as e:
+                    # Left as it was: still due, so the next pass queues it again
+                    stats["failed"] += 1
+                    error = f"{row['artist_name']} - {row['title']}: {e}"
+                    log_event("gateway", "WARNING", f"[RATING REFRESH] {error}")
+                    if discogs_cooldown.remaining() > 0:
+                        break
+                else:
+                    updates.append((album.rating, album.votes, album.cover_url,
+                                    album.discogs_master_id, album.discogs_release_id, row["id"]))
+                    stats["rated"] += album.rating is not None
+            cursor = row["position"]
+
+        await asyncio.to_thread(_save_batch, updates, cursor, engine.calls["discogs"], error)
+        stats.update(refreshed=len(updates), discogs_calls=engine.calls["discogs"], cursor=cursor)
+        log_event("gateway", "INFO",
+                  f"[RATING REFRESH] Pass {stats['pass_id']}: {cursor}/{state['pass_size']}, "
+                  f"{len(updates)} refreshed ({stats['rated']} rated), {stats['failed']} failed, "
+                  f"{engine.calls['discogs']} Discogs calls")
+        return stats
+
+
+async def _run_forever():
+    await asyncio.sleep(STARTUP_DELAY)
+    while True:
+        try:
+            await run_batch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_event("gateway", "ERROR", f"[RATING REFRESH] Batch failed: {e}")
+        await asyncio.sleep(RATING_REFRESH_INTERVAL)
+
+
+def start() -> None:
+    """Schedule the refresh (gateway startup); a no-op when disabled or without Discogs credentials"""
+    global _task
+    if RATING_REFRESH_INTERVAL <= 0 or RATING_REFRESH_DAILY_BUDGET <= 0:
+        return
+    if not (os.getenv("DISCOGS_KEY") or os.getenv("DISCOGS_CONSUMER_KEY")):
+        log_event("gateway", "WARNING", "[RATING REFRESH] Discogs credentials not configured, not scheduled")
+        return
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run_forever())
+
+
+async def stop() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
@@ -1,12 +1,29 @@
 """
 Recommendation Generation Logger
 Logs all recommendations generated from artist search with detailed metadata.
+
+Events are appended to an in-memory buffer and written by a background
+flusher thread every FLUSH_INTERVAL seconds (or when the buffer fills), so a
+request only pays for building its entry. JSONL files rotate by size and by
+UTC day; rotated files are gzip-compressed and the newest MAX_BACKUPS kept.
+Reads walk the files newest first and stop once they have what they need, so
+recent entries never decompress the rotated history.
+Daily summary counters live in memory and are written to daily_summary.json
+atomically (temp file + rename) on each flush.
 """
+import atexit
+import gzip
 import json
 import os
+import re
+import shutil
+import threading
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+
+from libs.shared.utils import log_event
 
 # Create logs directory if it doesn't exist
 LOGS_DIR = Path(__file__).parent.parent / "logs"
@@ -14,8 +31,245 @@ LOGS_DIR.mkdir(exist_ok=True)
 
 # Log file paths
 RECOMMENDATIONS_LOG = LOGS_DIR / "recommendations_generation.jsonl"
+SESSIONS_LOG = LOGS_DIR / "search_sessions.jsonl"
 DAILY_SUMMARY_LOG = LOGS_DIR / "daily_summary.json"
 
+FLUSH_INTERVAL = float(os.getenv("RECOMMENDATION_LOG_FLUSH_INTERVAL", "2.0"))
+MAX_BUFFERED = 500
+MAX_BYTES = int(os.getenv("RECOMMENDATION_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+MAX_BACKUPS = int(os.getenv("RECOMMENDATION_LOG_BACKUPS", "30"))
+READ_BLOCK = 64 * 1024
+
+# <stem>.<last write, UTC>[-n].jsonl.gz
+_ROTATED_STAMP = re.compile(r"\.(\d{8}-\d{6})(?:-\d+)?\.jsonl\.gz$")
+
+
+def _read_lines_reversed(path: Path) -> Iterator[str]:
+    """Lines of a text file, last first, reading backwards in READ_BLOCK chunks"""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0:
+            step = min(READ_BLOCK, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + tail).split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8")
+        if tail.strip():
+            yield tail.decode("utf-8")
+
+
+class RotatingJsonlWriter:
+    """Append-only JSONL writer with buffering, size/day rotation and gzip of rotated files"""
+
+    def __init__(self, path: Path, max_bytes: int = MAX_BYTES, max_backups: int = MAX_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_backups = max_backups
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any]) -> bool:
+        """Buffer an entry; returns True when the buffer is full and should be flushed"""
+        with self._lock:
+            self._buffer.append(entry)
+            return len(self._buffer) >= MAX_BUFFERED
+
+    def flush(self):
+        # Held for the whole flush so a caller never returns while another
+        # thread is still writing entries it already took from the buffer
+        with self._write_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+            if not entries:
+                return
+            data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+            self._rotate_if_needed(len(data))
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+
+    def _rotate_if_needed(self, incoming: int):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        last_write = datetime.utcfromtimestamp(stat.st_mtime)
+        if stat.st_size + incoming <= self.max_bytes and last_write.date() == datetime.utcnow().date():
+            return
+
+        stamp = f"{last_write:%Y%m%d-%H%M%S}"
+        rotated = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        suffix = 1
+        while rotated.exists() or Path(f"{rotated}.gz").exists():
+            rotated = self.path.with_name(f"{self.path.stem}.{stamp}-{suffix}{self.path.suffix}")
+            suffix += 1
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+
+        backups = self.rotated_files()
+        for old in backups[:-self.max_backups] if self.max_backups else backups:
+            old.unlink(missing_ok=True)
+
+    def rotated_files(self) -> List[Path]:
+        """Compressed rotated files, oldest first"""
+        def order(path: Path) -> Tuple[datetime, float]:
+            return (self._stamp(path) or datetime.min, path.stat().st_mtime)
+        return sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}.gz"), key=order)
+
+    def iter_entries_reversed(self, since: Optional[datetime] = None,
+                              until: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Entries newest first: the current file read from its end, then rotated
+        files newest first, each decompressed only when reached. A rotated file's
+        name carries its last write time, so files entirely after `until` are
+        skipped and the walk stops at the first file entirely before `since`.
+        """
+        self.flush()
+        if self.path.exists():
+            yield from (json.loads(line) for line in _read_lines_reversed(self.path))
+        rotated = list(reversed(self.rotated_files()))
+        stamps = [self._stamp(path) for path in rotated]
+        for i, path in enumerate(rotated):
+            newest = stamps[i]
+            # Everything in this file was written after the next older file was rotated
+            oldest = stamps[i + 1] if i + 1 < len(stamps) else None
+            if since and newest and newest < since:
+                return
+            if until and oldest and oldest > until:
+                continue
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+            yield from (json.loads(line) for line in reversed(lines))
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[datetime]:
+        match = _ROTATED_STAMP.search(path.name)
+        return datetime.strptime(match.group(1), "%Y%m%d-%H%M%S") if match else None
+
+
+class DailySummary:
+    """In-memory per-day counters, loaded once and saved atomically"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._days: Optional[Dict[str, Dict[str, Any]]] = None
+        self._artists: Dict[str, set] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._days is None:
+            days = {}
+            if self.path.exists():
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        days = json.load(f)
+                except (OSError, ValueError):
+                    days = {}
+            self._days = days
+            self._artists = {day: set(data.get("unique_artists", [])) for day, data in days.items()}
+        return self._days
+
+    def record(self, source: str, count: int, artist_name: str):
+        today = datetime.utcnow().date().isoformat()
+        with self._lock:
+            days = self._load()
+            day = days.get(today)
+            if day is None:
+                day = days[today] = {
+                    "date": today,
+                    "canonical_recommendations": 0,
+                    "spotify_recommendations": 0,
+                    "total_recommendations": 0,
+                    "unique_artists": []
+                }
+                self._artists[today] = set()
+
+            if source == "canonical":
+                day["canonical_recommendations"] += count
+            elif source == "spotify":
+                day["spotify_recommendations"] += count
+            day["total_recommendations"] += count
+
+            if artist_name and artist_name not in self._artists[today]:
+                self._artists[today].add(artist_name)
+                day["unique_artists"].append(artist_name)
+            self._dirty = True
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return json.loads(json.dumps(self._load()))
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = json.dumps(self._days, indent=2, ensure_ascii=False)
+                self._dirty = False
+            tmp = self.path.with_suffix(".json.tmp")
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except OSError:
+                self._dirty = True
+                raise
+
+
+_recommendations = RotatingJsonlWriter(RECOMMENDATIONS_LOG)
+_sessions = RotatingJsonlWriter(SESSIONS_LOG)
+_summary = DailySummary(DAILY_SUMMARY_LOG)
+
+_flush_requested = threading.Event()
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+
+
+def flush():
+    """Write buffered entries and the daily summary now"""
+    for writer in (_recommendations, _sessions):
+        try:
+            writer.flush()
+        except OSError as e:
+            log_event("gateway", "ERROR", "Recommendation log flush failed for %s: %s", writer.path.name, e)
+    try:
+        _summary.flush()
+    except OSError as e:
+        log_event("gateway", "ERROR", "Daily summary flush failed: %s", e)
+
+
+def _flush_loop():
+    while True:
+        _flush_requested.wait(FLUSH_INTERVAL)
+        _flush_requested.clear()
+        flush()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is None:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="recommendation-log-flusher", daemon=True)
+                _flusher.start()
+                atexit.register(flush)
+
+
+def _enqueue(writer: RotatingJsonlWriter, entry: Dict[str, Any]):
+    _ensure_flusher()
+    if writer.append(entry):
+        _flush_requested.set()
+
 
 def log_recommendation_generation(
     user_id: int,
@@ -58,12 +312,11 @@ def log_recommendation_generation(
         "metadata": metadata or {}
     }
     
-    # Append to JSONL file (one JSON object per line)
-    with open(RECOMMENDATIONS_LOG, "a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+    # Buffered append to the JSONL file (one JSON object per line)
+    _enqueue(_recommendations, log_entry)
     
-    # Update daily summary
-    _update_daily_summary(source, len(recommendations))
+    # Update daily summary counters (written on the next flush)
+    _summary.record(source, len(recommendations), artist_name)
     
     return log_entry
 
@@ -95,91 +348,37 @@ def log_search_session(
     }
     
     # Log to sessions file
-    sessions_log = LOGS_DIR / "search_sessions.jsonl"
-    with open(sessions_log, "a", encoding="utf-8") as f:
-        f.write(json.dumps(session_entry, ensure_ascii=False) + "\n")
+    _enqueue(_sessions, session_entry)
     
     return session_entry
 
 
-def _update_daily_summary(source: str, count: int):
-    """Update daily summary statistics."""
-    today = datetime.utcnow().date().isoformat()
-    
-    # Load existing summary
-    summary = {}
-    if DAILY_SUMMARY_LOG.exists():
-        with open(DAILY_SUMMARY_LOG, "r", encoding="utf-8") as f:
-            summary = json.load(f)
-    
-    # Initialize today's entry if needed
-    if today not in summary:
-        summary[today] = {
-            "date": today,
-            "canonical_recommendations": 0,
-            "spotify_recommendations": 0,
-            "total_recommendations": 0,
-            "unique_artists": set()
-        }
-    
-    # Update counts
-    if source == "canonical":
-        summary[today]["canonical_recommendations"] += count
-    elif source == "spotify":
-        summary[today]["spotify_recommendations"] += count
-    
-    summary[today]["total_recommendations"] += count
-    
-    # Convert sets to lists for JSON serialization
-    for date_key in summary:
-        if isinstance(summary[date_key].get("unique_artists"), set):
-            summary[date_key]["unique_artists"] = list(summary[date_key]["unique_artists"])
-    
-    # Save summary
-    with open(DAILY_SUMMARY_LOG, "w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2, ensure_ascii=False)
-
-
 def get_recent_logs(limit: int = 100) -> List[Dict[str, Any]]:
-    """Get the most recent log entries."""
-    if not RECOMMENDATIONS_LOG.exists():
-        return []
-    
-    logs = []
-    with open(RECOMMENDATIONS_LOG, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                logs.append(json.loads(line))
-    
-    # Return most recent entries
-    return logs[-limit:]
+    """Get the most recent log entries (oldest first), reading only as far back as needed."""
+    logs = list(islice(_recommendations.iter_entries_reversed(), limit))
+    logs.reverse()
+    return logs
 
 
 def get_logs_by_timerange(start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
-    """Get logs within a specific time range."""
-    if not RECOMMENDATIONS_LOG.exists():
-        return []
-    
+    """Get logs within a specific time range (UTC), oldest first."""
     logs = []
-    with open(RECOMMENDATIONS_LOG, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                entry = json.loads(line)
-                entry_time = datetime.fromisoformat(entry["timestamp"])
-                if start_time <= entry_time <= end_time:
-                    logs.append(entry)
-    
+    for entry in _recommendations.iter_entries_reversed(since=start_time, until=end_time):
+        entry_time = datetime.fromisoformat(entry["timestamp"])
+        if entry_time < start_time:
+            break
+        if entry_time <= end_time:
+            logs.append(entry)
+    logs.reverse()
     return logs
 
 
 def get_stats_summary(days: int = 7) -> Dict[str, Any]:
     """Get summary statistics for the last N days."""
-    if not DAILY_SUMMARY_LOG.exists():
+    summary = _summary.snapshot()
+    if not summary:
         return {"error": "No summary data available"}
     
-    with open(DAILY_SUMMARY_LOG, "r", encoding="utf-8") as f:
-        summary = json.load(f)
-    
     # Get recent days
     from datetime import timedelta
     today = datetime.utcnow().date()
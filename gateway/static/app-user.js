@@ -444,7 +444,7 @@ async function loadMosaic() {
 
         grid.innerHTML = finalSet.map(album => `
             <div class="mosaic-item" title="${escapeHtml(album.title)}">
-                <img src="${album.cover_url}" 
+                <img src="${imageUrl(album.cover_url, 150)}" 
                      loading="lazy"
                      alt="${escapeHtml(album.title)}"
                      onerror="this.parentElement.style.display='none'">
@@ -968,7 +968,7 @@ function createAlbumCard(rec) {
 
     card.innerHTML = `
         <div class="album-cover">
-            <img src="${cover}" alt="${album}" loading="lazy">
+            <img src="${imageUrl(cover, 300)}" alt="${album}" loading="lazy">
             ${rec.is_partial ? '<div class="partial-badge" title="Información pendiente de enriquecer">⏳</div>' : ''}
         </div>
         <div class="album-info">
@@ -1069,7 +1069,7 @@ async function openAlbumDetail(rec) {
     document.getElementById('recommendations-view').classList.remove('active');
     document.getElementById('album-detail-view').style.display = 'block';
 
-    document.getElementById('detail-cover').src = cover;
+    document.getElementById('detail-cover').src = imageUrl(cover, 600);
     document.getElementById('detail-title').textContent = album;
     document.getElementById('detail-artist').textContent = artist;
 
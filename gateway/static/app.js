@@ -12,6 +12,13 @@ function getUserId() {
     return id;
 }
 
+// Cover images go through the gateway's resizing cache (/api/image);
+// local paths and data: URIs are used as they are
+function imageUrl(src, width = 300) {
+    if (!src || !/^https?:\/\//.test(src)) return src;
+    return `${API_BASE}/api/image?url=${encodeURIComponent(src)}&w=${width}`;
+}
+
 function showToast(message, type = 'info') {
     let container = document.querySelector('.toast-container');
     if (!container) {
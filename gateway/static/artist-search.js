@@ -42,7 +42,7 @@ class ArtistSearch {
             return `
                 <div class="album-pill">
                     ${album.cover_url
-                    ? `<img src="${album.cover_url}" alt="${album.title}" class="pill-image" />`
+                    ? `<img src="${imageUrl(album.cover_url, 64)}" alt="${album.title}" class="pill-image" />`
                     : '<div class="pill-placeholder">💿</div>'
                 }
                     <div class="pill-album-info">
@@ -295,7 +295,7 @@ class ArtistSearch {
                         <div class="artist-card-content">
                             <div class="artist-image-wrapper">
                                 ${artist.image_url
-                        ? `<img src="${artist.image_url}" alt="${artist.name}" class="artist-image" />`
+                        ? `<img src="${imageUrl(artist.image_url, 150)}" alt="${artist.name}" class="artist-image" />`
                         : `<div class="artist-image-placeholder">🎵</div>`
                     }
                             </div>
@@ -353,7 +353,7 @@ class ArtistSearch {
                         <div class="album-card-content">
                             <div class="album-image-wrapper">
                                 ${album.cover_url
-                        ? `<img src="${album.cover_url}" alt="${album.title}" class="album-image" />`
+                        ? `<img src="${imageUrl(album.cover_url, 150)}" alt="${album.title}" class="album-image" />`
                         : `<div class="album-image-placeholder">💿</div>`
                     }
                             </div>
@@ -728,7 +728,7 @@ class ArtistSearch {
             return `
                 <div class="artist-pill ${isLoading ? 'loading' : ''} ${hasSuccess ? 'cached' : ''} ${hasError ? 'error' : ''}">
                     ${artist.image_url
-                    ? `<img src="${artist.image_url}" alt="${artist.name}" class="pill-image" />`
+                    ? `<img src="${imageUrl(artist.image_url, 64)}" alt="${artist.name}" class="pill-image" />`
                     : ''
                 }
                     <span class="pill-name">${artist.name}</span>
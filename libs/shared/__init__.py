@@ -10,7 +10,10 @@ from .models import (
     ServiceHealth,
     LogEvent,
 )
-from .utils import create_http_client, log_event
+from .utils import create_http_client, log_enabled, log_event, normalize_text
+from .cache import LRUTTLCache
+from .metrics import install_metrics, record_cache
+from .http_clients import UpstreamConfig, close_http_client, close_http_clients, configure_upstream, get_http_client, http_client_stats
 
 __all__ = [
     "Track",
@@ -25,4 +28,15 @@ __all__ = [
     "LogEvent",
     "create_http_client",
     "log_event",
+    "log_enabled",
+    "normalize_text",
+    "LRUTTLCache",
+    "UpstreamConfig",
+    "close_http_client",
+    "close_http_clients",
+    "configure_upstream",
+    "get_http_client",
+    "http_client_stats",
+    "install_metrics",
+    "record_cache",
 ]
@@ -0,0 +1,120 @@
+"""
+Small in-memory LRU cache with per-entry TTL.
+
+Expired entries are dropped lazily on access, or proactively with expire(),
+which pops deadlines off a timer heap instead of scanning every entry.
+
+Not thread-safe; meant for use from a single asyncio event loop.
+"""
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from .metrics import record_cache
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Named caches also report cache_requests_total{cache=name}
+        self.name = name
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # (expires_at, seq, key); entries for overwritten or removed keys are skipped when popped
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            if count:
+                self.misses += 1
+                if self.name:
+                    record_cache(self.name, hit=False)
+            return default
+
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+            if self.name:
+                record_cache(self.name, hit=True)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        heapq.heappush(self._heap, (expires_at, next(self._seq), key))
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        if len(self._heap) > 2 * len(self._data) + 64:
+            self._heap = [(expires_at, next(self._seq), key) for key, (expires_at, _) in self._data.items()]
+            heapq.heapify(self._heap)
+
+    def _is_live_deadline(self, expires_at: float, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] == expires_at
+
+    def expire(self) -> int:
+        """Drop every entry whose TTL has passed; returns how many were removed"""
+        now = time.monotonic()
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, _, key = heapq.heappop(self._heap)
+            if self._is_live_deadline(expires_at, key):
+                del self._data[key]
+                removed += 1
+        self.expirations += removed
+        return removed
+
+    def next_expiry(self) -> Optional[float]:
+        """Seconds until the next entry expires, or None when empty"""
+        while self._heap and not self._is_live_deadline(self._heap[0][0], self._heap[0][2]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Live (unexpired) entries, oldest first"""
+        now = time.monotonic()
+        for key, (expires_at, value) in list(self._data.items()):
+            if expires_at > now:
+                yield key, value
+
+    def clear(self):
+        self._data.clear()
+        self._heap.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,283 @@
+"""
+Shared HTTP client registry.
+
+One pooled httpx.AsyncClient per upstream, created lazily and reused for the
+life of the process, instead of a new client (and new TCP/TLS handshakes)
+per request. Each upstream has explicit pool limits, keep-alive, HTTP/2 when
+the upstream supports it, and optional per-route timeouts.
+
+    client = get_http_client("spotify")
+    resp = await client.get("https://api.spotify.com/v1/search", params=...)
+
+Connection reuse is tracked with httpx's "trace" extension and reported by
+http_client_stats(). Base URLs registered with libs.shared.inprocess (the
+service apps in single-process mode, or the upstream stubs of
+benchmarks/loadtest) are routed in-process.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Optional
+
+import httpx
+
+from .inprocess import inprocess_mounts
+from .metrics import record_upstream, upstream_api
+from .profiling import PROFILE_HEADER, propagation_header
+from .tracing import Span, start_child_span
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    name: str
+    timeout: float = 15.0
+    connect_timeout: float = 5.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    follow_redirects: bool = False
+    headers: Dict[str, str] = field(default_factory=dict)
+    # Path prefix ("/artist-recommendations") or host/path prefix
+    # ("api.zenrows.com") -> read timeout in seconds
+    route_timeouts: Dict[str, float] = field(default_factory=dict)
+
+
+UPSTREAMS: Dict[str, UpstreamConfig] = {
+    # Gateway -> backend services, and service -> service
+    "services": UpstreamConfig(
+        name="services",
+        timeout=60.0,
+        max_connections=100,
+        max_keepalive_connections=50,
+        route_timeouts={
+            "/health": 5.0,
+            "/progress": 5.0,
+            "/artist-recommendations": 180.0,
+            "/artist-single-recommendation": 180.0,
+            "/spotify-recommendations": 30.0,
+            "/merge-recommendations": 30.0,
+            "/search/artists": 10.0,
+            "/artist/": 10.0,
+        },
+    ),
+    "spotify": UpstreamConfig(name="spotify", timeout=10.0, http2=True),
+    "lastfm": UpstreamConfig(name="lastfm", timeout=15.0, max_connections=10, max_keepalive_connections=10),
+    "discogs": UpstreamConfig(
+        name="discogs",
+        timeout=30.0,
+        max_connections=5,
+        max_keepalive_connections=5,
+        headers={"User-Agent": "VinylRecommender/1.0"},
+    ),
+    # MusicBrainz + Discogs lookups of the seeding engine (libs/shared/seeding.py);
+    # MusicBrainz asks for a contact in the User-Agent
+    "metadata": UpstreamConfig(
+        name="metadata",
+        timeout=30.0,
+        max_connections=5,
+        max_keepalive_connections=5,
+        headers={"User-Agent": "Vinilogy/1.0 (+https://vinilogy.com; contact@vinilogy.com)"},
+    ),
+    # Cover images for the gateway image proxy (gateway/images.py). Redirects
+    # (the Cover Art Archive sends to archive.org) are followed by the proxy
+    # itself, so every hop is checked against its host allow-list
+    "images": UpstreamConfig(
+        name="images",
+        timeout=15.0,
+        max_connections=20,
+        max_keepalive_connections=10,
+        http2=True,
+        headers={"User-Agent": "Vinilogy/1.0 (+https://vinilogy.com; contact@vinilogy.com)"},
+    ),
+    # eBay + store scraping (ZenRows renders pages, so it gets a longer timeout)
+    "pricing": UpstreamConfig(
+        name="pricing",
+        timeout=20.0,
+        follow_redirects=True,
+        route_timeouts={"api.zenrows.com": 60.0},
+    ),
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def configure_upstream(config: UpstreamConfig) -> None:
+    """Register or replace an upstream config; takes effect on the next get_http_client()"""
+    UPSTREAMS[config.name] = config
+
+
+def _route_timeout(config: UpstreamConfig, url: httpx.URL) -> Optional[float]:
+    path = url.path
+    host_path = f"{url.host}{path}"
+    for prefix, timeout in config.route_timeouts.items():
+        if path.startswith(prefix) or host_path.startswith(prefix):
+            return timeout
+    return None
+
+
+def _make_hooks(config: UpstreamConfig, default_timeout: httpx.Timeout):
+    stats = _stats.setdefault(config.name, {
+        "requests": 0,
+        "connections_opened": 0,
+        "http2_requests": 0,
+        "errors": 0,
+    })
+
+    async def trace(event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            stats["connections_opened"] += 1
+        elif event == "http2.send_request_headers.started":
+            stats["http2_requests"] += 1
+
+    async def on_request(request: httpx.Request):
+        stats["requests"] += 1
+        request.extensions["trace"] = trace
+        # Route timeouts only replace the client default, never an explicit per-call timeout
+        if request.extensions.get("timeout") == default_timeout.as_dict():
+            route_timeout = _route_timeout(config, request.url)
+            if route_timeout is not None:
+                request.extensions["timeout"] = httpx.Timeout(route_timeout, connect=config.connect_timeout).as_dict()
+
+    async def on_response(response: httpx.Response):
+        if response.status_code >= 500:
+            stats["errors"] += 1
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def _service_hosts() -> FrozenSet[str]:
+    """Hosts of the configured *_SERVICE_URLs (our services in a split deployment)"""
+    hosts = set()
+    for key, value in os.environ.items():
+        if key.endswith("_SERVICE_URL") and value:
+            try:
+                hosts.add(httpx.URL(value).host)
+            except httpx.InvalidURL:
+                pass
+    return frozenset(hosts)
+
+
+def is_internal(url: httpx.URL) -> bool:
+    """True for our own services; anything unknown is treated as third-party"""
+    return upstream_api(url.host) == "internal" or url.host in _service_hosts()
+
+
+def _start_client_span(request: httpx.Request) -> Optional[Span]:
+    url = request.url
+    api = upstream_api(url.host)
+    span = start_child_span(f"{request.method} {url.netloc.decode()}{url.path}", "client",
+                            **{"http.method": request.method, "http.url": str(url.copy_with(query=None)),
+                               "upstream.api": api})
+    # Trace context goes to our own services only, never to third-party hosts
+    if span is not None and is_internal(url):
+        request.headers["traceparent"] = span.traceparent
+    # ...and so does the profiling opt-in (it carries the admin token), so a
+    # profiled request is profiled in every service
+    profile = propagation_header()
+    if profile and is_internal(url):
+        request.headers[PROFILE_HEADER] = profile
+    return span
+
+
+def _finish_client_span(span: Optional[Span], status: Optional[int], error: Optional[Exception] = None):
+    if span is None:
+        return
+    if status is not None:
+        span.attributes["http.status_code"] = status
+    span.finish(error=f"{type(error).__name__}: {error}" if error else (f"HTTP {status}" if status and status >= 500 else None))
+
+
+class InstrumentedAsyncClient(httpx.AsyncClient):
+    """Records upstream latency/error metrics per external API and a client span per call"""
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        span = _start_client_span(request)
+        start = time.perf_counter()
+        try:
+            response = await super().send(request, **kwargs)
+        except httpx.TransportError as e:
+            record_upstream(request.url.host, None, time.perf_counter() - start)
+            _finish_client_span(span, None, e)
+            raise
+        record_upstream(request.url.host, response.status_code, time.perf_counter() - start)
+        _finish_client_span(span, response.status_code)
+        return response
+
+
+class InstrumentedClient(httpx.Client):
+    """Synchronous httpx.Client with the same upstream metrics (for thread-pool code)"""
+
+    def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        span = _start_client_span(request)
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except httpx.TransportError as e:
+            record_upstream(request.url.host, None, time.perf_counter() - start)
+            _finish_client_span(span, None, e)
+            raise
+        record_upstream(request.url.host, response.status_code, time.perf_counter() - start)
+        _finish_client_span(span, response.status_code)
+        return response
+
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """Shared pooled client for an upstream. Do not close it; see close_http_clients()"""
+    client = _clients.get(upstream)
+    if client is not None and not client.is_closed:
+        return client
+
+    config = UPSTREAMS.get(upstream) or UpstreamConfig(name=upstream)
+    timeout = httpx.Timeout(config.timeout, connect=config.connect_timeout)
+    client = InstrumentedAsyncClient(
+        timeout=timeout,
+        headers=config.headers,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        http2=config.http2 and HTTP2_AVAILABLE,
+        follow_redirects=config.follow_redirects,
+        event_hooks=_make_hooks(config, timeout),
+        mounts=inprocess_mounts() or None,
+    )
+    _clients[upstream] = client
+    return client
+
+
+async def close_http_client(upstream: str) -> None:
+    """Close one upstream's pooled client (a component shutting down its own connections)"""
+    client = _clients.pop(upstream, None)
+    if client is not None:
+        await client.aclose()
+
+
+async def close_http_clients() -> None:
+    """Close every pooled client (call from the service lifespan on shutdown)"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def http_client_stats() -> Dict[str, Dict[str, float]]:
+    """Per-upstream request counts and connection reuse ratio"""
+    result = {}
+    for name, stats in _stats.items():
+        requests = stats["requests"]
+        opened = stats["connections_opened"]
+        result[name] = {
+            **stats,
+            "reused_requests": max(requests - opened, 0),
+            "reuse_ratio": round(1 - opened / requests, 3) if requests else 0.0,
+        }
+    return result
@@ -0,0 +1,41 @@
+"""
+In-process service routing.
+
+When every service runs in one process (see gateway/inprocess.py), service
+base URLs are registered here. The pooled "services" client
+(libs.shared.http_clients) and create_http_client() then send those
+requests straight to the service's ASGI app instead of over localhost TCP.
+URLs and payloads are unchanged, so the same code works for split
+deployments where nothing is registered.
+"""
+from typing import Dict
+
+import httpx
+from httpx import URL
+
+_mounts: Dict[str, httpx.AsyncBaseTransport] = {}
+
+
+def _mount_key(base_url: str) -> str:
+    url = URL(base_url)
+    port = f":{url.port}" if url.port else ""
+    return f"{url.scheme}://{url.host}{port}"
+
+
+def register_inprocess_app(base_url: str, app) -> None:
+    """Route requests for base_url to the given ASGI app"""
+    # raise_app_exceptions=False keeps HTTP semantics: an unhandled error in
+    # the service becomes a 500 response, as it would over the network.
+    _mounts[_mount_key(base_url)] = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+
+def unregister_inprocess_app(base_url: str) -> None:
+    _mounts.pop(_mount_key(base_url), None)
+
+
+def inprocess_mounts() -> Dict[str, httpx.AsyncBaseTransport]:
+    return dict(_mounts)
+
+
+def is_inprocess() -> bool:
+    return bool(_mounts)
@@ -0,0 +1,182 @@
+"""
+Asynchronous structured log pipeline behind log_event().
+
+The request path only does a level check, an optional sampling draw and a
+deque append of the raw record (service, level, message, args, data). A
+daemon writer thread formats records (text or JSON lines) and writes them
+in batches, so message interpolation, JSON encoding and stream I/O never
+block the event loop.
+
+Configuration (environment):
+    LOG_LEVEL               DEBUG | INFO | WARNING | ERROR   (default INFO)
+    LOG_FORMAT              text | json                      (default text)
+    LOG_DEBUG_SAMPLE_RATE   fraction of DEBUG events kept    (default 0.1)
+    LOG_QUEUE_SIZE          max pending records; the oldest are dropped
+                            when the writer falls behind     (default 10000)
+"""
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, TextIO
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+
+class LogPipeline:
+    def __init__(self, stream: Optional[TextIO] = None, level: str = "INFO", json_output: bool = False,
+                 debug_sample_rate: float = 0.1, max_queue: int = 10000, flush_interval: float = 0.05):
+        self.stream = stream
+        self.threshold = LEVELS.get(level.upper(), 20)
+        self.json_output = json_output
+        self.debug_sample_rate = debug_sample_rate
+        self.flush_interval = flush_interval
+        self._queue: deque = deque(maxlen=max_queue)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._busy = False
+        self.submitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+
+    @classmethod
+    def from_env(cls) -> "LogPipeline":
+        return cls(
+            level=os.getenv("LOG_LEVEL", "INFO"),
+            json_output=os.getenv("LOG_FORMAT", "text").lower() == "json",
+            debug_sample_rate=float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1")),
+            max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        )
+
+    def enabled(self, level: str) -> bool:
+        return LEVELS.get(level, 10) >= self.threshold
+
+    def submit(self, service: str, level: str, message: str, args: tuple, data: Optional[dict],
+               sample: Optional[float] = None):
+        levelno = LEVELS.get(level, 10)
+        if levelno < self.threshold:
+            return
+        rate = sample if sample is not None else (self.debug_sample_rate if levelno == 10 else 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return
+
+        if self._thread is None:
+            self._start()
+        queue = self._queue
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append((time.time(), service, level, message, args, data))
+        self.submitted += 1
+        if levelno >= 40:
+            # Errors are written promptly instead of waiting for the next poll
+            self._wakeup.set()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _format(self, record: tuple) -> str:
+        ts, service, level, message, args, data = record
+        if args:
+            try:
+                message = message % args
+            except (TypeError, ValueError):
+                message = f"{message} {args!r}"
+        timestamp = datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+        if self.json_output:
+            entry: Dict[str, Any] = {"timestamp": timestamp, "service": service, "level": level, "message": message}
+            if data is not None:
+                entry["data"] = data
+            return json.dumps(entry, default=str, ensure_ascii=False) + "\n"
+
+        line = f"[{timestamp}] [{service}] [{level}] {message}"
+        if data is not None:
+            line += f" {json.dumps(data, default=str, ensure_ascii=False)}"
+        return line + "\n"
+
+    def _drain(self):
+        self._busy = True
+        try:
+            self._write_pending()
+        finally:
+            self._busy = False
+
+    def _write_pending(self):
+        queue = self._queue
+        lines = []
+        while queue:
+            try:
+                lines.append(self._format(queue.popleft()))
+            except IndexError:
+                break
+            except Exception as e:  # never let a bad record kill the writer
+                lines.append(f"[log-pipeline] failed to format record: {e}\n")
+        if lines:
+            stream = self.stream or sys.stderr
+            try:
+                stream.write("".join(lines))
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+            self.written += len(lines)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def flush(self, timeout: float = 1.0):
+        """Block until the records queued so far are written (tests, shutdown)"""
+        deadline = time.monotonic() + timeout
+        while (self._queue or self._busy) and time.monotonic() < deadline:
+            self._wakeup.set()
+            time.sleep(0.001)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._stopped.set()
+            self._wakeup.set()
+            self._thread.join(timeout=2.0)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "written": self.written,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "pending": len(self._queue),
+        }
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def get_pipeline() -> LogPipeline:
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline.from_env()
+    return _pipeline
+
+
+def set_pipeline(pipeline: LogPipeline) -> LogPipeline:
+    """Replace the process-wide pipeline (the previous one is flushed and stopped)"""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.close()
+    _pipeline = pipeline
+    return pipeline
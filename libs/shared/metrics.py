@@ -0,0 +1,430 @@
+"""
+Prometheus-style metrics without extra dependencies.
+
+Counters, gauges and histograms live in a process-wide registry and are rendered in
+the Prometheus text exposition format by render(). install_metrics() adds a
+request-latency middleware and GET /metrics to a FastAPI app; the gateway
+also merges every service's /metrics (merge_expositions()).
+
+Built-in metrics:
+    http_request_duration_seconds{service,method,route,status}
+    upstream_request_duration_seconds{api,status}   (pooled HTTP clients)
+    upstream_errors_total{api,kind}                 (http_5xx, rate_limited, transport)
+    cache_requests_total{cache,result}
+    db_query_duration_seconds{db,operation,table}   (connections made with TimedConnection)
+"""
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .tracing import Span, start_child_span
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [count per bucket (non-cumulative, last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+HTTP_REQUESTS = histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ("service", "method", "route", "status"),
+)
+UPSTREAM_REQUESTS = histogram(
+    "upstream_request_duration_seconds", "External API call latency",
+    ("api", "status"),
+)
+UPSTREAM_ERRORS = counter(
+    "upstream_errors_total", "External API failures (http_5xx, rate_limited, transport)",
+    ("api", "kind"),
+)
+CACHE_REQUESTS = counter(
+    "cache_requests_total", "Cache lookups by result (hit/miss)",
+    ("cache", "result"),
+)
+DB_QUERIES = histogram(
+    "db_query_duration_seconds", "SQLite statement execution time",
+    ("db", "operation", "table"), buckets=DB_BUCKETS,
+)
+
+
+# ---------------------------------------------------------------------------
+# Upstream APIs
+# ---------------------------------------------------------------------------
+
+# Host suffix -> API name; anything else is reported by host
+UPSTREAM_APIS = {
+    "api.discogs.com": "discogs",
+    "discogs.com": "discogs",
+    "musicbrainz.org": "musicbrainz",
+    "coverartarchive.org": "coverartarchive",
+    "archive.org": "coverartarchive",
+    "scdn.co": "spotify",
+    "lastfm.freetls.fastly.net": "lastfm",
+    "api.spotify.com": "spotify",
+    "accounts.spotify.com": "spotify",
+    "ws.audioscrobbler.com": "lastfm",
+    "api.ebay.com": "ebay",
+    "api.zenrows.com": "zenrows",
+    "api.scraping-bot.io": "scrapingbot",
+    "googleapis.com": "google_search",
+    "marilians.com": "store_marilians",
+    "bajoelvolcan.es": "store_bajoelvolcan",
+    "discosborabora.com": "store_borabora",
+    "revolverrecords.es": "store_revolver",
+    "fnac.es": "store_fnac",
+}
+
+
+@lru_cache(maxsize=256)
+def upstream_api(host: str) -> str:
+    host = host.lower()
+    for suffix, api in UPSTREAM_APIS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return api
+    if host in ("localhost", "127.0.0.1", "0.0.0.0"):
+        return "internal"
+    return host
+
+
+def record_upstream(host: str, status: Optional[int], seconds: float):
+    api = upstream_api(host)
+    UPSTREAM_REQUESTS.observe(seconds, api=api, status=str(status) if status else "error")
+    if status is None:
+        UPSTREAM_ERRORS.inc(api=api, kind="transport")
+    elif status == 429:
+        UPSTREAM_ERRORS.inc(api=api, kind="rate_limited")
+    elif status >= 500:
+        UPSTREAM_ERRORS.inc(api=api, kind="http_5xx")
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+_SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+([A-Za-z_][A-Za-z0-9_]*)", re.I)
+
+
+@lru_cache(maxsize=1024)
+def _classify_sql(sql: str) -> Tuple[str, str]:
+    stripped = sql.lstrip()
+    operation = stripped.split(None, 1)[0].upper() if stripped else ""
+    match = _SQL_TABLE.search(sql)
+    return operation, match.group(1) if match else ""
+
+
+class TimedCursor(sqlite3.Cursor):
+    db_name = "vinylbe"
+
+    def _observe(self, sql: str, start: float, span: Optional[Span], error: Optional[BaseException]):
+        operation, table = _classify_sql(sql)
+        DB_QUERIES.observe(time.perf_counter() - start, db=self.db_name, operation=operation, table=table)
+        if span is not None:
+            span.name = f"{operation} {table}".strip()
+            span.finish(error=f"{type(error).__name__}: {error}" if error else None)
+
+    def execute(self, sql, parameters=()):
+        span = start_child_span("sql", "client", **{"db.system": "sqlite", "db.statement": sql[:500]})
+        start = time.perf_counter()
+        error = None
+        try:
+            return super().execute(sql, parameters)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._observe(sql, start, span, error)
+
+    def executemany(self, sql, seq_of_parameters):
+        span = start_child_span("sql", "client", **{"db.system": "sqlite", "db.statement": sql[:500]})
+        start = time.perf_counter()
+        error = None
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._observe(sql, start, span, error)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3.connect(path, factory=TimedConnection) records db_query_duration_seconds and SQL spans"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ---------------------------------------------------------------------------
+# FastAPI integration
+# ---------------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """ASGI middleware recording http_request_duration_seconds by route template"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Route templates keep cardinality bounded; unmatched paths (404s) share one label
+            route_path = getattr(route, "path", None) or "<unmatched>"
+            HTTP_REQUESTS.observe(
+                time.perf_counter() - start,
+                service=self.service, method=scope.get("method", ""), route=route_path, status=str(status),
+            )
+
+
+def install_metrics(app, service: str):
+    """Add the latency middleware and GET /metrics to a FastAPI app"""
+    from fastapi.responses import PlainTextResponse
+
+    app.add_middleware(MetricsMiddleware, service=service)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+def _with_service_label(sample: str, service: str) -> str:
+    name_labels, _, value = sample.rpartition(" ")
+    if 'service="' in name_labels:
+        return sample
+    label = f'service="{_escape(service)}"'
+    if name_labels.endswith("}"):
+        return f"{name_labels[:-1]},{label}}} {value}"
+    return f"{name_labels}{{{label}}} {value}"
+
+
+def merge_expositions(texts: Dict[str, str]) -> str:
+    """
+    Merge per-service text expositions ({service: text}) into one, keeping a
+    single HELP/TYPE header per metric family and adding a service label to
+    samples that lack one, so series from different services stay distinct.
+    """
+    headers: Dict[str, Dict[str, str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for service, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    headers.setdefault(family, {}).setdefault(parts[1], line)
+                    samples.setdefault(family, [])
+                continue
+            if family is None:
+                family = line.split("{", 1)[0].split(" ", 1)[0]
+                samples.setdefault(family, [])
+            samples[family].append(_with_service_label(line, service))
+
+    out = []
+    for family, lines in samples.items():
+        header = headers.get(family, {})
+        out.extend(header[kind] for kind in ("HELP", "TYPE") if kind in header)
+        out.extend(lines)
+    return "\n".join(out) + "\n"
@@ -0,0 +1,432 @@
+"""
+Opt-in statistical profiling of individual requests.
+
+A request is profiled when it carries `X-Profile: <PROFILE_ADMIN_TOKEN>`
+(ignored unless a token is configured) or is picked by PROFILE_SAMPLE_RATE.
+While it runs, a sampler thread records the request's stack every
+PROFILE_INTERVAL_MS:
+
+  - when the request's task (or a task it is awaiting through gather /
+    create_task) is on the event loop, the live frames of the loop thread,
+    i.e. where the CPU goes;
+  - otherwise the suspended coroutine chain ending in an "[await ...]" (or
+    "[ready]", waiting for the loop) leaf, i.e. where the wall time goes:
+    upstream calls, to_thread, sleeps, a busy loop.
+
+Samples are stored as collapsed stacks ("root;frame;frame count"), the input
+format of flamegraph.pl, speedscope and inferno, one file per request under
+PROFILE_DIR plus a line in PROFILE_DIR/index.jsonl. Pruning old profiles
+also drops their index lines, so the index stays about PROFILE_MAX_FILES
+long. The shared HTTP clients forward the header to our own services, so
+one admin request produces a profile in every service it touches.
+
+With no token and a zero sample rate the middleware is not installed at all,
+so the disabled cost is nothing.
+
+Configuration (environment):
+    PROFILE_ADMIN_TOKEN   secret enabling the X-Profile header          (default unset)
+    PROFILE_SAMPLE_RATE   fraction of requests profiled                   (default 0)
+    PROFILE_INTERVAL_MS   sampling interval in milliseconds               (default 5)
+    PROFILE_DIR           where profiles are written        (default logs/profiles)
+    PROFILE_MAX_FILES     profiles kept before the oldest are deleted     (default 500)
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is not shared between processes there
+    fcntl = None
+
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+DEFAULT_PROFILE_DIR = Path(__file__).parent.parent.parent / "logs" / "profiles"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(DEFAULT_PROFILE_DIR)))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "500"))
+
+PROFILE_HEADER = "x-profile"
+MAX_STACK_DEPTH = 128
+
+_profiling: ContextVar[bool] = ContextVar("profiling", default=False)
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def propagation_header() -> Optional[str]:
+    """X-Profile value to forward to our own services while profiling a request"""
+    if PROFILE_ADMIN_TOKEN and _profiling.get():
+        return PROFILE_ADMIN_TOKEN
+    return None
+
+
+def _authorized(value: bytes) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(value, PROFILE_ADMIN_TOKEN.encode())
+
+
+# ---------------------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------------------
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+def _coro_frame(coro):
+    return getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+
+
+def _awaiting(coro):
+    return getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+
+
+def _suspended_chain(task: asyncio.Task):
+    """
+    (labels, leaf) for a task that is not running: its coroutine frames from
+    the outermost in, and the object the innermost one is waiting on.
+    """
+    labels: List[str] = []
+    coro = task.get_coro()
+    while coro is not None and len(labels) < MAX_STACK_DEPTH:
+        frame = _coro_frame(coro)
+        if frame is None:
+            break
+        labels.append(_frame_label(frame))
+        awaited = _awaiting(coro)
+        if awaited is None or not (hasattr(awaited, "cr_frame") or hasattr(awaited, "gi_frame")):
+            # the innermost await is a future's iterator; the task knows the future itself
+            return labels, getattr(task, "_fut_waiter", None) or awaited
+        coro = awaited
+    return labels, None
+
+
+def _child_tasks(waiting_on) -> List[asyncio.Task]:
+    if isinstance(waiting_on, asyncio.Task):
+        return [waiting_on]
+    # asyncio.gather's future keeps its children
+    return [c for c in getattr(waiting_on, "_children", None) or () if isinstance(c, asyncio.Task)]
+
+
+def _running_chain(task: asyncio.Task, frame) -> Optional[List[str]]:
+    """
+    Live frames of the running task, from its outermost coroutine to the
+    leaf; None if the frame snapshot is from before the task was resumed.
+    """
+    root = _coro_frame(task.get_coro())
+    labels: List[str] = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        if frame is root:
+            labels.reverse()
+            return labels
+        frame = frame.f_back
+    return None
+
+
+def _sample_task(task: asyncio.Task, running: Optional[asyncio.Task], frame, depth: int = 0) -> Optional[List[str]]:
+    """
+    Stack for one sample: the live stack if `task` or one of the tasks it is
+    waiting on is running, else the suspended chain of the first waiting task.
+    """
+    if task is running:
+        live = _running_chain(task, frame)
+        if live is not None:
+            return live
+    labels, waiting_on = _suspended_chain(task)
+    children = _child_tasks(waiting_on) if depth < 8 else []
+    fallback = None
+    for child in children:
+        if child.done():
+            continue
+        stack = _sample_task(child, running, frame, depth + 1)
+        if stack is None:
+            continue
+        if stack and not _off_cpu(stack):
+            return labels + stack  # a child is on the CPU
+        fallback = fallback or labels + stack
+    if fallback:
+        return fallback
+    # leaves in brackets mark samples where the request was off the CPU
+    labels.append(f"[await {type(waiting_on).__name__}]" if waiting_on is not None else "[ready]")
+    return labels
+
+
+def _off_cpu(stack: List[str]) -> bool:
+    return stack[-1].startswith("[")
+
+
+class ActiveProfile:
+    __slots__ = ("id", "service", "method", "path", "task", "loop", "thread_id", "started",
+                 "stacks", "samples", "on_cpu")
+
+    def __init__(self, service: str, method: str, path: str, task: asyncio.Task):
+        self.id = uuid.uuid4().hex[:16]
+        self.service = service
+        self.method = method
+        self.path = path
+        self.task = task
+        self.loop = task.get_loop()
+        self.thread_id = threading.get_ident()
+        self.started = time.time()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.on_cpu = 0
+
+    def sample(self, frames: Dict[int, Any]):
+        running = asyncio.current_task(self.loop)
+        stack = _sample_task(self.task, running, frames.get(self.thread_id))
+        if not stack:
+            return
+        # the frames above this middleware are the same in every sample
+        for i, label in enumerate(stack):
+            if label.startswith("ProfilingMiddleware.__call__"):
+                stack = stack[i + 1:]
+                break
+        self.samples += 1
+        if not _off_cpu(stack):
+            self.on_cpu += 1
+        self.stacks[";".join(label.replace(";", ",") for label in stack)] += 1
+
+
+class Sampler:
+    """One daemon thread sampling every active profile in the process"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Dict[str, ActiveProfile] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: ActiveProfile):
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, profile: ActiveProfile):
+        with self._lock:
+            self._active.pop(profile.id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                self._wakeup.wait(60.0)
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            for profile in active:
+                try:
+                    profile.sample(frames)
+                except Exception:
+                    # the task's frames can change under us; skip this sample
+                    pass
+            del frames
+            time.sleep(self.interval)
+
+
+_sampler: Optional[Sampler] = None
+
+
+def get_sampler() -> Sampler:
+    global _sampler
+    if _sampler is None:
+        _sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+    return _sampler
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+_write_lock = threading.Lock()
+
+
+def _lock_index(f) -> None:
+    """Exclusive lock on the open index file, released when it is closed (shared by the service processes)"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def save_profile(profile: ActiveProfile, route: str, status: int, duration_ms: float,
+                 trigger: str, trace_id: Optional[str]) -> Dict[str, Any]:
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(profile.started))
+    filename = f"{stamp}-{profile.service}-{profile.id}.collapsed"
+    root = f"{profile.service} {profile.method} {route}".replace(";", ",")
+    body = "".join(f"{root};{stack} {count}\n" for stack, count in profile.stacks.most_common())
+    entry = {
+        "id": profile.id,
+        "service": profile.service,
+        "method": profile.method,
+        "route": route,
+        "path": profile.path,
+        "status": status,
+        "start": profile.started,
+        "duration_ms": round(duration_ms, 2),
+        "samples": profile.samples,
+        "on_cpu_samples": profile.on_cpu,
+        "interval_ms": PROFILE_INTERVAL_MS,
+        "trigger": trigger,
+        "trace_id": trace_id,
+        "file": filename,
+    }
+    with _write_lock:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        (PROFILE_DIR / filename).write_text(body, encoding="utf-8")
+        # One append per profile so several service processes can share the index
+        with open(PROFILE_DIR / "index.jsonl", "a", encoding="utf-8") as f:
+            _lock_index(f)
+            f.write(json.dumps(entry) + "\n")
+        _prune()
+    return entry
+
+
+def _prune():
+    files = sorted(PROFILE_DIR.glob("*.collapsed"))
+    stale = files[:max(0, len(files) - PROFILE_MAX_FILES)]
+    for old in stale:
+        old.unlink(missing_ok=True)
+    if stale:
+        _compact_index()
+
+
+def _compact_index():
+    """Rewrite the index in place, keeping only entries whose profile file still exists"""
+    try:
+        f = open(PROFILE_DIR / "index.jsonl", "r+", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        _lock_index(f)
+        kept = []
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("file") and (PROFILE_DIR / entry["file"]).exists():
+                kept.append(line)
+        f.seek(0)
+        f.writelines(kept)
+        f.truncate()
+
+
+def list_profiles(limit: int = 50, service: Optional[str] = None, route: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Newest profiles first, skipping index entries whose file was pruned"""
+    index = PROFILE_DIR / "index.jsonl"
+    if not index.exists():
+        return []
+    entries = []
+    with open(index, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if service and entry.get("service") != service:
+                continue
+            if route and route not in entry.get("route", ""):
+                continue
+            entries.append(entry)
+    entries.sort(key=lambda e: e.get("start", 0), reverse=True)
+    result = []
+    for entry in entries:
+        if (PROFILE_DIR / entry["file"]).exists():
+            result.append(entry)
+            if len(result) >= limit:
+                break
+    return result
+
+
+def read_profile(profile_id: str) -> Optional[str]:
+    """Collapsed stacks of one profile, or None"""
+    if not profile_id.isalnum():
+        return None
+    for path in PROFILE_DIR.glob(f"*-{profile_id}.collapsed"):
+        return path.read_text(encoding="utf-8")
+    return None
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """Profiles requests selected by X-Profile or the sample rate"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trigger = None
+        for key, value in scope.get("headers", ()):
+            if key == b"x-profile":
+                if _authorized(value):
+                    trigger = "header"
+                break
+        if trigger is None and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            trigger = "sampled"
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        method = scope.get("method", "")
+        profile = ActiveProfile(self.service, method, scope.get("path", ""), asyncio.current_task())
+        status = 500
+        trace_id = None
+
+        async def send_wrapper(message):
+            nonlocal status, trace_id
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for key, value in message.get("headers", ()):
+                    if key == b"x-trace-id":
+                        trace_id = value.decode("latin-1")
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _profiling.set(True)
+        sampler = get_sampler()
+        sampler.add(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            sampler.remove(profile)
+            _profiling.reset(token)
+            route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+            try:
+                await asyncio.to_thread(save_profile, profile, route, status, duration_ms, trigger, trace_id)
+            except OSError:
+                pass
+
+
+def install_profiling(app, service: str):
+    # Not installed at all when disabled, so unprofiled deployments pay nothing
+    if profiling_enabled():
+        app.add_middleware(ProfilingMiddleware, service=service)
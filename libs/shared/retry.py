@@ -0,0 +1,125 @@
+"""
+Async retry engine for upstream APIs.
+
+- Jittered exponential backoff ("full jitter") for transport errors and
+  transient 5xx responses, slept with asyncio so the event loop keeps serving
+  other requests.
+- A shared 429 cooldown window: when an upstream answers 429, every caller
+  using the same CooldownWindow waits until Retry-After has passed instead of
+  hammering the API in parallel.
+- fail_fast: a single attempt, and CooldownActive is raised immediately when
+  the upstream is cooling down, so latency-sensitive callers can degrade.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from .utils import log_event
+
+
+class CooldownActive(Exception):
+    """Raised in fail-fast mode while the upstream is rate limiting us"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is rate limited, retry after {retry_after:.1f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CooldownWindow:
+    """Shared "do not call before" deadline for one upstream"""
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self._until = 0.0
+
+    def trigger(self, seconds: float):
+        self._until = max(self._until, time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self._until - time.monotonic())
+
+    async def wait(self):
+        # Re-check after sleeping: another caller may have extended the window
+        while (remaining := self.remaining()) > 0:
+            await asyncio.sleep(remaining)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    # Used when a 429 has no Retry-After header; server values are capped at max_retry_after
+    default_retry_after: float = 5.0
+    max_retry_after: float = 60.0
+    retry_statuses: tuple = (500, 502, 503, 504)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def retry_after(self, response: httpx.Response) -> float:
+        try:
+            seconds = float(response.headers.get("Retry-After", self.default_retry_after))
+        except ValueError:
+            seconds = self.default_retry_after
+        return min(max(seconds, 0.0), self.max_retry_after)
+
+
+async def send_with_retry(
+    send: Callable[[], Awaitable[httpx.Response]],
+    policy: RetryPolicy,
+    cooldown: Optional[CooldownWindow] = None,
+    fail_fast: bool = False,
+    service: str = "http-retry",
+) -> httpx.Response:
+    """
+    Call send() until it returns a non-retryable response. 429s trigger the
+    shared cooldown; the caller decides what to do with the final response.
+    """
+    upstream = cooldown.upstream if cooldown else "upstream"
+    max_attempts = 1 if fail_fast else policy.max_attempts
+
+    for attempt in range(1, max_attempts + 1):
+        if cooldown and cooldown.remaining() > 0:
+            if fail_fast:
+                raise CooldownActive(upstream, cooldown.remaining())
+            await cooldown.wait()
+
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            if attempt == max_attempts:
+                log_event(service, "ERROR", f"{upstream} request failed after {attempt} attempts: {e}")
+                raise
+            delay = policy.backoff(attempt)
+            log_event(service, "WARNING", f"{upstream} request failed (attempt {attempt}/{max_attempts}): {e}; retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        if response.status_code == 429:
+            retry_after = policy.retry_after(response)
+            if cooldown:
+                cooldown.trigger(retry_after)
+            log_event(service, "WARNING", f"{upstream} rate limited, cooling down {retry_after:.1f}s")
+            if fail_fast:
+                raise CooldownActive(upstream, retry_after)
+            if attempt == max_attempts:
+                return response
+            if not cooldown:
+                await asyncio.sleep(retry_after)
+            continue
+
+        if response.status_code in policy.retry_statuses and attempt < max_attempts:
+            delay = policy.backoff(attempt)
+            log_event(service, "WARNING", f"{upstream} returned {response.status_code} (attempt {attempt}/{max_attempts}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        return response
+
+    raise RuntimeError("Max retries exceeded")
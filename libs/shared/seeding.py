@@ -0,0 +1,516 @@
+"""
+MusicBrainz -> Discogs catalogue seeding engine.
+
+The one implementation of "look an artist up and store its studio albums",
+used by the bulk CLI (scripts/seed_database.py), the admin sync
+(gateway/seeder.py) and the recommender's cache-miss path
+(services/recommender/artist_recommendations.py).
+
+Artists flow through an async pipeline:
+
+    resolve       name -> MusicBrainz artist id
+    discography   MBID -> studio albums (release groups, Discogs master links)
+    discogs_ids   albums without a master link -> Discogs master/release search
+    ratings       rating, votes and cover per album, plus the artist image
+    write         one transaction per artist
+
+Stages are connected by bounded queues, so a bulk run keeps a few artists in
+flight (MusicBrainz lookups for one while another waits on Discogs) without
+buffering the whole input. Every upstream call takes a token from the API's
+RateLimiter, shared by all stages and all callers in the process (sync code
+included), so throughput is whatever the rate limits allow; a 429 sets the
+API's shared cooldown (libs.shared.retry).
+
+Configuration (environment):
+    SEED_MB_RATE          MusicBrainz requests per second       (default 1.0)
+    SEED_DISCOGS_RATE     Discogs requests per second           (default 0.5)
+    SEED_DISCOGS_BURST    Discogs requests allowed in a burst   (default 10)
+
+The limiters are per process, and Discogs allows 60 authenticated requests
+per minute per key across all of them. The defaults split that budget:
+
+    recommender   cache misses and CSV import, this limiter 40/min (10 burst + 30 refilled)
+    gateway       promotion (PROMOTION_RATE 0.2)            13/min
+                  rating refresh (RATING_REFRESH_RATE 0.1)   7/min
+
+Background callers pass a slower `pace` limiter to SeedingEngine and wait on
+it before the shared one, so they only ever hold a few reservations here and
+interactive lookups are not queued behind them. CSV import runs inside the
+recommender paced by CSV_IMPORT_RATE (0.2, part of the recommender's 40/min);
+promotion and rating refresh are paced by their own rates in the gateway.
+
+Admin sync (gateway/seeder.py) and seed_database.py are not paced: they use
+the full limiter of the gateway or of their own process on top of that
+budget, so schedule them off-peak or lower SEED_DISCOGS_RATE for them.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+import httpx
+
+from .http_clients import get_http_client
+from .metrics import TimedConnection
+from .retry import CooldownWindow, RetryPolicy, send_with_retry
+from .utils import log_event
+
+MB_BASE = "https://musicbrainz.org/ws/2"
+DISCOGS_BASE = "https://api.discogs.com"
+
+SEED_MB_RATE = float(os.getenv("SEED_MB_RATE", "1.0"))
+SEED_DISCOGS_RATE = float(os.getenv("SEED_DISCOGS_RATE", "0.5"))
+SEED_DISCOGS_BURST = int(os.getenv("SEED_DISCOGS_BURST", "10"))
+
+_RE_DISCOGS_MASTER = re.compile(
+    r"https?://(?:www\.)?discogs\.com/(?:[a-z]{2}/)?master/(\d+)", re.I
+)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every caller in the process. Reservations are
+    made under a threading lock and slept outside it, so async stages and
+    thread-pool code draw from the same budget in arrival order.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int = 1):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def wait(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def wait_blocking(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+
+musicbrainz_limiter = RateLimiter("musicbrainz", SEED_MB_RATE)
+discogs_limiter = RateLimiter("discogs", SEED_DISCOGS_RATE, SEED_DISCOGS_BURST)
+
+musicbrainz_cooldown = CooldownWindow("musicbrainz")
+discogs_cooldown = CooldownWindow("discogs")
+
+_COOLDOWNS = {"musicbrainz": musicbrainz_cooldown, "discogs": discogs_cooldown}
+_LIMITERS = {"musicbrainz": musicbrainz_limiter, "discogs": discogs_limiter}
+# MusicBrainz answers 503 when we go over its limit, so it is retried like a 5xx
+_POLICY = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=10.0)
+
+
+@dataclass
+class SeedAlbum:
+    title: str
+    year: str = ""
+    mbid: Optional[str] = None
+    discogs_master_id: Optional[str] = None
+    discogs_release_id: Optional[str] = None
+    rating: Optional[float] = None
+    votes: Optional[int] = None
+    cover_url: Optional[str] = None
+
+    @property
+    def discogs_type(self) -> str:
+        return "master" if self.discogs_master_id else "release"
+
+
+@dataclass
+class SeedResult:
+    """One artist moving through the pipeline, and what became of it"""
+    name: str
+    artist_id: Optional[int] = None
+    mbid: Optional[str] = None
+    image_url: Optional[str] = None
+    albums: List[SeedAlbum] = field(default_factory=list)
+    # pending -> seeded | skipped | not_found | error
+    status: str = "pending"
+    error: Optional[str] = None
+    added: int = 0
+    updated: int = 0
+    discarded: int = 0
+    elapsed: float = 0.0
+    _started: float = field(default_factory=time.monotonic, repr=False)
+
+    @property
+    def rated_albums(self) -> List[SeedAlbum]:
+        """Albums with a Discogs rating, best first"""
+        rated = [a for a in self.albums if a.rating is not None]
+        rated.sort(key=lambda a: (a.rating or 0, a.votes or 0), reverse=True)
+        return rated
+
+
+def _dict_factory(cursor, row):
+    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+
+def _year(item: Dict[str, Any]) -> str:
+    date = item.get("first-release-date") or ""
+    return date.split("-")[0] if date else ""
+
+
+def _first_image(data: Dict[str, Any]) -> Optional[str]:
+    images = data.get("images") or []
+    return images[0].get("uri") if images else None
+
+
+def _community_rating(data: Dict[str, Any]):
+    rating = (data.get("community") or {}).get("rating") or {}
+    if rating.get("average") is None:
+        return None, None
+    try:
+        return float(rating["average"]), int(rating.get("count", 0))
+    except (TypeError, ValueError):
+        return None, None
+
+
+class SeedingEngine:
+    """
+    engine = SeedingEngine(DB_PATH)
+    results = await engine.seed_many(["Radiohead", "Björk"], on_result=print)
+    result = await engine.seed_one("Portishead")
+
+    rated_only stores only albums Discogs has a rating for (the recommender's
+    catalogue rule); skip_existing leaves artists already in the DB alone.
+    The lookup methods can be used on their own; `calls` counts what they sent.
+    """
+
+    STAGE_WORKERS = {"resolve": 2, "discography": 2, "discogs_ids": 3, "ratings": 3, "write": 1}
+
+    def __init__(self, db_path: str, client: Optional[httpx.AsyncClient] = None,
+                 discogs_key: Optional[str] = None, discogs_secret: Optional[str] = None,
+                 rated_only: bool = False, skip_existing: bool = False, queue_size: int = 4,
+                 service: str = "seeding", pace: Optional[RateLimiter] = None):
+        self.db_path = db_path
+        self.client = client
+        self.discogs_key = discogs_key or os.getenv("DISCOGS_CONSUMER_KEY", "") or os.getenv("DISCOGS_KEY", "")
+        self.discogs_secret = discogs_secret or os.getenv("DISCOGS_CONSUMER_SECRET", "") or os.getenv("DISCOGS_SECRET", "")
+        self.rated_only = rated_only
+        self.skip_existing = skip_existing
+        self.queue_size = queue_size
+        self.service = service
+        # An extra, slower limiter for background jobs that must leave the
+        # API budget to interactive lookups (see gateway/rating_refresh.py)
+        self.pace = pace
+        # Requests sent per API, retries included
+        self.calls = {"musicbrainz": 0, "discogs": 0}
+
+    # -----------------------------------------------------------------------
+    # Upstream calls
+    # -----------------------------------------------------------------------
+
+    async def _get(self, api: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        client = self.client or get_http_client("metadata")
+        limiter = _LIMITERS[api]
+
+        async def send():
+            if self.pace:
+                await self.pace.wait()
+            await limiter.wait()
+            self.calls[api] += 1
+            return await client.get(url, params=params)
+
+        response = await send_with_retry(send, _POLICY, _COOLDOWNS[api], service=self.service)
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        return response.json()
+
+    async def _mb(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._get("musicbrainz", f"{MB_BASE}{path}", {**params, "fmt": "json"})
+
+    async def _discogs(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._get("discogs", f"{DISCOGS_BASE}{path}",
+                               {**params, "key": self.discogs_key, "secret": self.discogs_secret})
+
+    async def find_artist_mbid(self, name: str) -> Optional[str]:
+        data = await self._mb("/artist", {"query": f'artist:"{name}"', "limit": 10})
+        artists = data.get("artists") or []
+        if not artists:
+            return None
+        exact = [a for a in artists if (a.get("name") or "").lower() == name.lower()]
+        return (exact[0] if exact else artists[0]).get("id")
+
+    async def fetch_studio_albums(self, artist_mbid: str) -> List[SeedAlbum]:
+        """Single-artist, no-secondary-type album release groups, with their Discogs master link"""
+        data = await self._mb("/release-group", {
+            "artist": artist_mbid,
+            "primary-type": "Album",
+            "inc": "artist-credits+url-rels",
+            "limit": 100,
+        })
+        albums: List[SeedAlbum] = []
+        seen = set()
+        for rg in data.get("release-groups") or []:
+            if rg.get("primary-type") != "Album" or rg.get("secondary-types"):
+                continue
+            credits = rg.get("artist-credit") or []
+            if len(credits) != 1 or (credits[0].get("artist") or {}).get("id") != artist_mbid:
+                continue
+            title = rg.get("title") or ""
+            if not title or title.lower() in seen:
+                continue
+            seen.add(title.lower())
+
+            master_id = None
+            for rel in rg.get("relations") or []:
+                if rel.get("type") == "discogs":
+                    match = _RE_DISCOGS_MASTER.search((rel.get("url") or {}).get("resource", ""))
+                    if match:
+                        master_id = match.group(1)
+                        break
+            albums.append(SeedAlbum(title=title, year=_year(rg), mbid=rg.get("id"), discogs_master_id=master_id))
+        return albums
+
+    async def _search_discogs(self, artist_name: str, album_title: str, kind: str) -> Optional[str]:
+        params = {"q": f"{artist_name} {album_title}", "type": kind, "per_page": 5}
+        if kind == "release":
+            params["format"] = "vinyl"
+        results = (await self._discogs("/database/search", params)).get("results") or []
+        for result in results:
+            if album_title.lower() in (result.get("title") or "").lower():
+                return str(result.get("id", ""))
+        return str(results[0].get("id", "")) if results else None
+
+    async def find_discogs_ids(self, artist_name: str, album: SeedAlbum) -> None:
+        """Fill a missing Discogs id by searching masters, then vinyl releases"""
+        if album.discogs_master_id or album.discogs_release_id:
+            return
+        master_id = await self._search_discogs(artist_name, album.title, "master")
+        if master_id:
+            album.discogs_master_id = master_id
+            return
+        album.discogs_release_id = await self._search_discogs(artist_name, album.title, "release")
+
+    async def fetch_discogs_data(self, album: SeedAlbum) -> None:
+        """Rating, votes and cover from the master (falling back to its main release) or the release"""
+        if album.discogs_master_id:
+            master = await self._discogs(f"/masters/{album.discogs_master_id}", {})
+            album.cover_url = _first_image(master) or album.cover_url
+            rating, votes = _community_rating(master)
+            release_id = master.get("main_release") if rating is None else None
+        else:
+            rating, votes, release_id = None, None, album.discogs_release_id
+
+        if release_id:
+            release = await self._discogs(f"/releases/{release_id}", {})
+            album.cover_url = album.cover_url or _first_image(release)
+            rating, votes = _community_rating(release)
+
+        if rating is not None:
+            album.rating, album.votes = rating, votes
+
+    async def fetch_artist_image(self, artist_name: str) -> Optional[str]:
+        results = (await self._discogs("/database/search", {"q": artist_name, "type": "artist", "per_page": 1})).get("results") or []
+        return results[0].get("cover_image") if results else None
+
+    # -----------------------------------------------------------------------
+    # Stages
+    # -----------------------------------------------------------------------
+
+    async def _resolve(self, job: SeedResult):
+        if self.skip_existing and await asyncio.to_thread(self._artist_exists, job.name):
+            job.status = "skipped"
+            return
+        # A stored MBID is only a fallback: re-resolving fixes earlier wrong matches
+        job.mbid = await self.find_artist_mbid(job.name) or job.mbid
+        if not job.mbid:
+            job.status = "not_found"
+
+    async def _discography(self, job: SeedResult):
+        job.albums = await self.fetch_studio_albums(job.mbid)
+        if not job.albums:
+            job.status = "not_found"
+
+    async def _discogs_ids(self, job: SeedResult):
+        await asyncio.gather(*(self._quietly(self.find_discogs_ids(job.name, album)) for album in job.albums))
+
+    async def _ratings(self, job: SeedResult):
+        async def image():
+            job.image_url = await self.fetch_artist_image(job.name)
+
+        await asyncio.gather(
+            *(self._quietly(self.fetch_discogs_data(album)) for album in job.albums
+              if album.discogs_master_id or album.discogs_release_id),
+            self._quietly(image()),
+        )
+
+    async def _write(self, job: SeedResult):
+        if self.rated_only:
+            job.discarded = sum(1 for a in job.albums if a.rating is None)
+            job.albums = job.rated_albums
+            if not job.albums:
+                job.status = "not_found"
+                return
+        await asyncio.to_thread(self._save, job)
+        job.status = "seeded"
+
+    async def _quietly(self, lookup: Awaitable[Any]):
+        # One album failing its Discogs lookup must not fail the artist
+        try:
+            await lookup
+        except Exception as e:
+            log_event(self.service, "WARNING", f"Discogs lookup failed: {e}")
+
+    # -----------------------------------------------------------------------
+    # Database
+    # -----------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, factory=TimedConnection, timeout=30.0)
+        conn.row_factory = _dict_factory
+        return conn
+
+    def _artist_exists(self, name: str) -> bool:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT 1 FROM artists WHERE LOWER(name) = LOWER(?)", (name,)).fetchone()
+            return row is not None
+        finally:
+            conn.close()
+
+    def _save(self, job: SeedResult):
+        """Artist and all its albums in one transaction; existing rows are updated, never blanked"""
+        now = datetime.now()
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            if job.artist_id:
+                cur.execute("SELECT id FROM artists WHERE id = ?", (job.artist_id,))
+            else:
+                cur.execute("SELECT id FROM artists WHERE LOWER(name) = LOWER(?)", (job.name,))
+            row = cur.fetchone()
+            if row:
+                job.artist_id = row["id"]
+                cur.execute(
+                    """UPDATE artists SET mbid = ?, image_url = COALESCE(?, image_url),
+                              last_updated = ?, is_partial = 0
+                       WHERE id = ?""",
+                    (job.mbid, job.image_url, now, job.artist_id),
+                )
+            else:
+                cur.execute(
+                    "INSERT INTO artists (name, mbid, image_url, last_updated, is_partial) VALUES (?, ?, ?, ?, 0)",
+                    (job.name, job.mbid, job.image_url, now),
+                )
+                job.artist_id = cur.lastrowid
+
+            cur.execute("SELECT id, title FROM albums WHERE artist_id = ?", (job.artist_id,))
+            existing = {}
+            for album_row in cur.fetchall():
+                existing.setdefault(album_row["title"].lower(), album_row["id"])
+
+            updates, inserts = [], []
+            for album in job.albums:
+                album_id = existing.get(album.title.lower())
+                if album_id:
+                    updates.append((album.year, album.mbid, album.discogs_master_id, album.discogs_release_id,
+                                    album.rating, album.votes, album.cover_url, now, album_id))
+                else:
+                    inserts.append((job.artist_id, album.title, album.year, album.mbid, album.discogs_master_id,
+                                    album.discogs_release_id, album.rating, album.votes, album.cover_url, now))
+            cur.executemany(
+                """UPDATE albums
+                   SET year = COALESCE(NULLIF(?, ''), year),
+                       mbid = COALESCE(?, mbid),
+                       discogs_master_id = COALESCE(?, discogs_master_id),
+                       discogs_release_id = COALESCE(?, discogs_release_id),
+                       rating = COALESCE(?, rating),
+                       votes = COALESCE(?, votes),
+                       cover_url = COALESCE(?, cover_url),
+                       last_updated = ?,
+                       is_partial = 0
+                   WHERE id = ?""",
+                updates,
+            )
+            cur.executemany(
+                """INSERT OR IGNORE INTO albums (artist_id, title, year, mbid, discogs_master_id, discogs_release_id,
+                                                 rating, votes, cover_url, last_updated, is_partial)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)""",
+                inserts,
+            )
+            conn.commit()
+            job.added, job.updated = len(inserts), len(updates)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # -----------------------------------------------------------------------
+    # Pipeline
+    # -----------------------------------------------------------------------
+
+    async def seed_many(self, artists: Iterable[Union[str, SeedResult]],
+                        on_result: Optional[Callable[[SeedResult], Any]] = None) -> List[SeedResult]:
+        """Seed artists through the pipeline; results are returned (and reported) in completion order"""
+        stages = [
+            ("resolve", self._resolve),
+            ("discography", self._discography),
+            ("discogs_ids", self._discogs_ids),
+            ("ratings", self._ratings),
+            ("write", self._write),
+        ]
+        done = object()
+        queues = [asyncio.Queue(self.queue_size) for _ in range(len(stages) + 1)]
+        results: List[SeedResult] = []
+
+        async def feed():
+            for artist in artists:
+                await queues[0].put(artist if isinstance(artist, SeedResult) else SeedResult(name=artist))
+            for _ in range(self.STAGE_WORKERS[stages[0][0]]):
+                await queues[0].put(done)
+
+        async def run_stage(index: int, name: str, handler):
+            inbox, outbox = queues[index], queues[index + 1]
+
+            async def worker():
+                while (job := await inbox.get()) is not done:
+                    # finished jobs (skipped, not found, failed) pass straight through
+                    if job.status == "pending":
+                        try:
+                            await handler(job)
+                        except Exception as e:
+                            job.status, job.error = "error", f"{name}: {e}"
+                            log_event(self.service, "WARNING", f"Seeding '{job.name}' failed at {name}: {e}")
+                    await outbox.put(job)
+
+            await asyncio.gather(*(worker() for _ in range(self.STAGE_WORKERS[name])))
+            downstream = self.STAGE_WORKERS[stages[index + 1][0]] if index + 1 < len(stages) else 1
+            for _ in range(downstream):
+                await outbox.put(done)
+
+        async def collect():
+            while (job := await queues[-1].get()) is not done:
+                job.elapsed = round(time.monotonic() - job._started, 2)
+                results.append(job)
+                if on_result:
+                    outcome = on_result(job)
+                    if asyncio.iscoroutine(outcome):
+                        await outcome
+
+        await asyncio.gather(feed(), collect(),
+                             *(run_stage(i, name, handler) for i, (name, handler) in enumerate(stages)))
+        return results
+
+    async def seed_one(self, artist: Union[str, SeedResult]) -> SeedResult:
+        return (await self.seed_many([artist]))[0]
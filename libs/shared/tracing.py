@@ -0,0 +1,447 @@
+"""
+Distributed request tracing with W3C trace context.
+
+Each incoming request gets a server span (TracingMiddleware), continuing the
+caller's trace when a `traceparent` header is present. The shared HTTP
+clients open a client span per call and forward `traceparent` to our own
+services (never to third-party APIs), and TimedConnection cursors record a
+span per SQL statement, so one trace shows every hop of e.g. /album-pricing:
+gateway DB lookups, service calls, and the Discogs/eBay/ZenRows requests
+behind them.
+
+Only requests already inside a sampled trace produce child spans; background
+jobs without a request context cost nothing.
+
+Finished spans are queued and written by a daemon thread to a JSONL file
+(one span per line) and, if configured, posted to an OpenTelemetry collector
+as OTLP/HTTP JSON. The file rotates at TRACE_EXPORT_MAX_BYTES; rotated files
+are gzip-compressed and the newest TRACE_EXPORT_BACKUPS kept.
+
+Sampling is low by default: a sampled request also records a span per SQL
+statement. A caller can still force a trace by sending a sampled traceparent.
+
+Configuration (environment):
+    TRACING_ENABLED       1 | 0                                  (default 1)
+    TRACE_SAMPLE_RATE     fraction of new traces recorded         (default 0.01)
+    TRACE_EXPORT_PATH     JSONL file, empty to disable   (default logs/traces.jsonl)
+    TRACE_EXPORT_MAX_BYTES  size at which the file rotates         (default 20 MB)
+    TRACE_EXPORT_BACKUPS  rotated files kept                      (default 3)
+    TRACE_OTLP_ENDPOINT   collector base URL, e.g. http://localhost:4318
+"""
+import atexit
+import gzip
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1").lower() not in ("0", "false", "no")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+DEFAULT_EXPORT_PATH = Path(__file__).parent.parent.parent / "logs" / "traces.jsonl"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", str(DEFAULT_EXPORT_PATH))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+TRACE_EXPORT_MAX_BYTES = int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_EXPORT_BACKUPS = int(os.getenv("TRACE_EXPORT_BACKUPS", "3"))
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "service", "kind", "sampled",
+                 "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, service: str, kind: str, trace_id: str, parent_id: Optional[str],
+                 sampled: bool, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.kind = kind
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def finish(self, error: Optional[str] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error:
+            self.error = error
+        if self.sampled:
+            get_exporter().export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "kind": self.kind,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None"""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def start_child_span(name: str, kind: str = "internal", **attributes) -> Optional[Span]:
+    """
+    Child of the current span, or None outside a sampled trace. The caller
+    finishes it; it does not become the current span.
+    """
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return None
+    return Span(name, parent.service, kind, parent.trace_id, parent.span_id, True, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Optional[Span]]:
+    """
+    `with span("seed_artist", artist=name):` records a child span of the
+    current one and makes it current for the block (no-op outside a trace).
+    """
+    child = start_child_span(name, kind, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+# ---------------------------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------------------------
+
+class TracingMiddleware:
+    """Opens the server span for each request and returns its id as X-Trace-Id"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            return await self.app(scope, receive, send)
+
+        incoming = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                incoming = parse_traceparent(value.decode("latin-1"))
+                break
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = TRACE_SAMPLE_RATE >= 1.0 or random.random() < TRACE_SAMPLE_RATE
+
+        method = scope.get("method", "")
+        server_span = Span(method, self.service, "server", trace_id, parent_id, sampled,
+                           {"http.method": method, "http.target": scope.get("path", "")})
+        token = _current_span.set(server_span)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-trace-id", trace_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+            server_span.name = f"{method} {route}"
+            server_span.attributes["http.route"] = route
+            server_span.attributes["http.status_code"] = status
+            server_span.finish(error=error or (f"HTTP {status}" if status >= 500 else None))
+
+
+def install_tracing(app, service: str):
+    app.add_middleware(TracingMiddleware, service=service)
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+class SpanExporter:
+    """Batches finished spans to a JSONL file and/or an OTLP/HTTP collector"""
+
+    def __init__(self, path: Optional[str] = None, otlp_endpoint: Optional[str] = None,
+                 max_queue: int = 20000, flush_interval: float = 1.0,
+                 max_bytes: int = TRACE_EXPORT_MAX_BYTES, max_backups: int = TRACE_EXPORT_BACKUPS):
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes
+        self.max_backups = max_backups
+        self.otlp_endpoint = otlp_endpoint.rstrip("/") if otlp_endpoint else None
+        self.flush_interval = flush_interval
+        self._queue: deque = deque(maxlen=max_queue)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._busy = False
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def export(self, finished: Span):
+        if self._thread is None:
+            self._start()
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(finished)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        self._busy = True
+        try:
+            batch: List[Span] = []
+            while self._queue:
+                try:
+                    batch.append(self._queue.popleft())
+                except IndexError:
+                    break
+            if batch:
+                self._write(batch)
+        finally:
+            self._busy = False
+
+    def _write(self, batch: List[Span]):
+        if self.path:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                data = "".join(json.dumps(s.to_dict(), default=str, ensure_ascii=False) + "\n" for s in batch)
+                self._rotate_if_needed(len(data))
+                # One append per batch so several service processes can share the file
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(data)
+            except OSError:
+                self.failed += len(batch)
+        if self.otlp_endpoint:
+            try:
+                httpx.post(f"{self.otlp_endpoint}/v1/traces", json=_otlp_payload(batch), timeout=5.0)
+            except httpx.HTTPError:
+                self.failed += len(batch)
+        self.exported += len(batch)
+
+    def _rotate_if_needed(self, incoming: int):
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return
+        if not self.max_bytes or size + incoming <= self.max_bytes:
+            return
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        rotated = self.path.with_name(f"{self.path.stem}.{stamp}-{os.getpid()}{self.path.suffix}")
+        suffix = 1
+        while rotated.exists() or Path(f"{rotated}.gz").exists():
+            rotated = self.path.with_name(f"{self.path.stem}.{stamp}-{os.getpid()}-{suffix}{self.path.suffix}")
+            suffix += 1
+        try:
+            os.replace(self.path, rotated)
+        except FileNotFoundError:
+            return  # another service process rotated it first
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+        backups = sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}.gz"),
+                         key=lambda p: p.stat().st_mtime)
+        for old in backups[:-self.max_backups] if self.max_backups else backups:
+            old.unlink(missing_ok=True)
+
+    def flush(self, timeout: float = 2.0):
+        deadline = time.monotonic() + timeout
+        while (self._queue or self._busy) and time.monotonic() < deadline:
+            self._wakeup.set()
+            time.sleep(0.005)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._stopped.set()
+            self._wakeup.set()
+            self._thread.join(timeout=5.0)
+
+    def stats(self) -> Dict[str, int]:
+        return {"exported": self.exported, "dropped": self.dropped, "failed": self.failed,
+                "pending": len(self._queue)}
+
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_payload(batch: List[Span]) -> Dict[str, Any]:
+    by_service: Dict[str, List[Span]] = {}
+    for s in batch:
+        by_service.setdefault(s.service, []).append(s)
+    return {"resourceSpans": [
+        {
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+            "scopeSpans": [{
+                "scope": {"name": "vinylbe"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": _OTLP_KINDS.get(s.kind, 1),
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                } for s in spans],
+            }],
+        }
+        for service, spans in by_service.items()
+    ]}
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def get_exporter() -> SpanExporter:
+    global _exporter
+    if _exporter is None:
+        _exporter = SpanExporter(path=TRACE_EXPORT_PATH or None, otlp_endpoint=TRACE_OTLP_ENDPOINT or None)
+    return _exporter
+
+
+def set_exporter(exporter: SpanExporter) -> SpanExporter:
+    global _exporter
+    if _exporter is not None:
+        _exporter.close()
+    _exporter = exporter
+    return exporter
+
+
+# ---------------------------------------------------------------------------
+# Reading traces back
+# ---------------------------------------------------------------------------
+
+def iter_exported_spans(path: Optional[str] = None, max_bytes: int = 50 * 1024 * 1024) -> Iterator[Dict[str, Any]]:
+    """Spans from the tail (last max_bytes) of the JSONL export"""
+    file_path = Path(path or TRACE_EXPORT_PATH)
+    if not file_path.exists():
+        return
+    with open(file_path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - max_bytes))
+        if size > max_bytes:
+            f.readline()  # skip the partial first line
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def slowest_traces(limit: int = 20, since: Optional[float] = None, route: Optional[str] = None,
+                   path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Root spans (requests that entered the system) ordered by duration, each
+    with its spans sorted by start time.
+    """
+    spans_by_trace: Dict[str, List[Dict[str, Any]]] = {}
+    roots: Dict[str, Dict[str, Any]] = {}
+    for s in iter_exported_spans(path):
+        if since and s.get("start", 0) < since:
+            continue
+        spans_by_trace.setdefault(s["trace_id"], []).append(s)
+        if s.get("parent_id") is None:
+            roots[s["trace_id"]] = s
+
+    candidates = [r for r in roots.values() if not route or route in r.get("name", "")]
+    candidates.sort(key=lambda r: r.get("duration_ms", 0), reverse=True)
+
+    result = []
+    for root in candidates[:limit]:
+        spans = sorted(spans_by_trace[root["trace_id"]], key=lambda s: s.get("start", 0))
+        result.append({
+            "trace_id": root["trace_id"],
+            "name": root["name"],
+            "service": root["service"],
+            "start": root["start"],
+            "duration_ms": root["duration_ms"],
+            "error": root.get("error"),
+            "span_count": len(spans),
+            "spans": spans,
+        })
+    return result
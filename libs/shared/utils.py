@@ -1,32 +1,46 @@
 import httpx
-from typing import Optional
-from datetime import datetime
-import logging
+import re
+import unicodedata
+from typing import Any, Optional
+from functools import lru_cache
 
-logger = logging.getLogger(__name__)
+from .http_clients import InstrumentedAsyncClient
+from .inprocess import inprocess_mounts
+from .log_pipeline import get_pipeline
 
 
 def create_http_client(timeout: float = 15.0, headers: Optional[dict] = None) -> httpx.AsyncClient:
-    return httpx.AsyncClient(timeout=timeout, headers=headers or {})
-
-
-def log_event(service: str, level: str, message: str, data: Optional[dict] = None):
-    timestamp = datetime.utcnow().isoformat()
-    log_msg = f"[{timestamp}] [{service}] [{level}] {message}"
-    
-    if level == "ERROR":
-        logger.error(log_msg, extra={"data": data})
-    elif level == "WARNING":
-        logger.warning(log_msg, extra={"data": data})
-    elif level == "INFO":
-        logger.info(log_msg, extra={"data": data})
-    else:
-        logger.debug(log_msg, extra={"data": data})
-    
-    return {
-        "service": service,
-        "level": level,
-        "message": message,
-        "timestamp": timestamp,
-        "data": data,
-    }
+    return InstrumentedAsyncClient(timeout=timeout, headers=headers or {}, mounts=inprocess_mounts() or None)
+
+
+def log_event(service: str, level: str, message: str, *args: Any, data: Optional[dict] = None,
+              sample: Optional[float] = None) -> None:
+    """
+    Queue a structured log record (see libs/shared/log_pipeline.py).
+
+    `message` may use %-style placeholders filled from `args` on the writer
+    thread, so hot loops should pass values as args rather than build
+    f-strings. `sample` keeps only that fraction of the events (DEBUG events
+    default to LOG_DEBUG_SAMPLE_RATE).
+    """
+    get_pipeline().submit(service, level, message, args, data, sample)
+
+
+def log_enabled(level: str) -> bool:
+    """Check before building an expensive message or payload"""
+    return get_pipeline().enabled(level)
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=8192)
+def normalize_text(text: Optional[str]) -> str:
+    """Case- and accent-insensitive form of a title or artist name, for use in dedupe keys"""
+    if not text:
+        return ""
+    if text.isascii():
+        return " ".join(text.split()).lower()
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _WHITESPACE.sub(" ", text).casefold().strip()
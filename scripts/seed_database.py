@@ -1,61 +1,46 @@
+import asyncio
 import json
 import os
-import time
+import sys
 import sqlite3
-import httpx
-import re
-from typing import Optional, Dict, Any, List, Tuple
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-MB_BASE = "https://musicbrainz.org/ws/2"
-DISCOGS_BASE = "https://api.discogs.com"
-HEADERS = {"User-Agent": "VinylRecommendationSystem/1.0"}
+from libs.shared.http_clients import close_http_clients
+from libs.shared.seeding import SeedingEngine, SeedResult
 
 DISCOGS_KEY = os.getenv("DISCOGS_CONSUMER_KEY", "") or os.getenv("DISCOGS_KEY", "")
 DISCOGS_SECRET = os.getenv("DISCOGS_CONSUMER_SECRET", "") or os.getenv("DISCOGS_SECRET", "")
 
 DB_PATH = "vinylbe.db"
 
-_RE_DISCOGS_MASTER = re.compile(
-    r"https?://(?:www\.)?discogs\.com/(?:[a-z]{2}/)?master/(\d+)", re.I
-)
-
-CLIENT = httpx.Client(
-    headers=HEADERS,
-    http2=False,
-    timeout=httpx.Timeout(30.0),
-    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
-    follow_redirects=True,
-)
-
-def dict_factory(cursor, row):
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
 
 def get_db_connection():
     """Get SQLite connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = dict_factory
-    return conn
+    return sqlite3.connect(DB_PATH)
+
 
 def create_tables():
     """Create necessary tables if they don't exist"""
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
-        
+
         # Artists table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS artists (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
+                name TEXT NOT NULL UNIQUE,
                 mbid TEXT,
                 image_url TEXT,
-                last_updated TIMESTAMP
+                last_updated TIMESTAMP,
+                is_partial INTEGER DEFAULT 0
             )
         """)
-        
+
         # Albums table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS albums (
@@ -63,247 +48,53 @@ def create_tables():
                 artist_id INTEGER,
                 title TEXT NOT NULL,
                 year TEXT,
+                mbid TEXT,
                 discogs_master_id TEXT,
                 discogs_release_id TEXT,
                 rating REAL,
                 votes INTEGER,
                 cover_url TEXT,
                 last_updated TIMESTAMP,
+                is_partial INTEGER DEFAULT 0,
                 FOREIGN KEY(artist_id) REFERENCES artists(id),
                 UNIQUE(artist_id, title, year)
             )
         """)
-        
+
         conn.commit()
         print("✓ Tables created/verified")
     finally:
         conn.close()
 
-def _mb_get(path: str, params: Dict[str, Any], tries: int = 5,
-            sleep_after_ok: float = 1.0) -> Dict[str, Any]:
-    """MusicBrainz API call with retry"""
-    url = f"{MB_BASE}{path}"
-    params = {**params, "fmt": "json"}
-    last_exc = None
-    backoff = 0.6
-
-    for attempt in range(1, tries + 1):
-        try:
-            r = CLIENT.get(url, params=params)
-            if r.status_code in (429, 500, 502, 503, 504):
-                raise httpx.HTTPStatusError("Transient", request=r.request, response=r)
-            r.raise_for_status()
-            time.sleep(sleep_after_ok)
-            return r.json()
-        except Exception as e:
-            last_exc = e
-            time.sleep(backoff)
-            backoff = min(backoff * 1.7, 5.0)
-
-    raise RuntimeError(f"MusicBrainz failed: {last_exc}")
-
 
-def _discogs_get(path: str, params: Dict[str, Any],
-                 sleep_after_ok: float = 0.5,
-                 tries: int = 5):
-    """Discogs API call with retry and rate limiting"""
-    url = f"{DISCOGS_BASE}{path}"
-    params = {**params, "key": DISCOGS_KEY, "secret": DISCOGS_SECRET}
-    last_exc = None
-    backoff = 1.0
-    
-    for attempt in range(1, tries + 1):
-        try:
-            r = CLIENT.get(url, params=params)
-            if r.status_code == 429:
-                if attempt < tries:
-                    print(f"  [DISCOGS] Rate limit hit, retrying in {backoff}s... (attempt {attempt}/{tries})")
-                    time.sleep(backoff)
-                    backoff = min(backoff * 2.0, 10.0)
-                    continue
-            r.raise_for_status()
-            time.sleep(sleep_after_ok)
-            return r.json()
-        except Exception as e:
-            last_exc = e
-            if attempt < tries:
-                time.sleep(backoff)
-                backoff = min(backoff * 2.0, 10.0)
-    
-    raise RuntimeError(f"Discogs API failed after {tries} attempts: {last_exc}")
+def print_result(index: int, total: int, result: SeedResult):
+    prefix = f"[{index}/{total}] {result.name}:"
+    if result.status == "seeded":
+        rated = len(result.rated_albums)
+        print(f"{prefix} ✓ {result.added} albums added, {result.updated} updated "
+              f"({rated} rated) in {result.elapsed:.1f}s")
+    elif result.status == "skipped":
+        print(f"{prefix} already in database, skipping")
+    elif result.status == "not_found":
+        print(f"{prefix} ✗ not found on MusicBrainz")
+    else:
+        print(f"{prefix} ✗ FAILED: {result.error}")
 
 
-def find_artist_mbid(name: str) -> Optional[str]:
-    """Find artist MBID from MusicBrainz"""
-    try:
-        data = _mb_get("/artist", {"query": f'artist:"{name}"', "limit": 10})
-        artists = data.get("artists", []) or []
-        if not artists:
-            return None
-        exact = [a for a in artists if a.get("name", "").lower() == name.lower()]
-        chosen = exact[0] if exact else artists[0]
-        return chosen.get("id")
-    except Exception as e:
-        print(f"  [ERROR] Could not find MBID for {name}: {e}")
-        return None
-
-
-def fetch_studio_albums(artist_mbid: str, artist_name: str) -> List[Dict[str, Any]]:
-    """Fetch studio albums from MusicBrainz"""
-    try:
-        data = _mb_get(
-            "/release-group",
-            {
-                "artist": artist_mbid,
-                "primary-type": "Album",
-                "inc": "artist-credits+url-rels",
-                "limit": 100,
-            }
-        )
-        release_groups = data.get("release-groups", []) or []
-        
-        studio_albums = []
-        for rg in release_groups:
-            if rg.get("primary-type") != "Album":
-                continue
-            if rg.get("secondary-types"):
-                continue
-            
-            ac = rg.get("artist-credit") or []
-            if len(ac) != 1:
-                continue
-            if (ac[0].get("artist") or {}).get("id") != artist_mbid:
-                continue
-            
-            title = rg.get("title", "")
-            first_release = rg.get("first-release-date", "")
-            year = first_release.split("-")[0] if first_release else ""
-            
-            relations = rg.get("relations") or []
-            discogs_master_id = None
-            for rel in relations:
-                if rel.get("type") == "discogs":
-                    url = (rel.get("url") or {}).get("resource", "")
-                    m = _RE_DISCOGS_MASTER.search(url)
-                    if m:
-                        discogs_master_id = m.group(1)
-                        break
-            
-            studio_albums.append({
-                "title": title,
-                "year": year,
-                "discogs_master_id": discogs_master_id
-            })
-        
-        return studio_albums
-    except Exception as e:
-        print(f"  [ERROR] Could not fetch albums for {artist_name}: {e}")
-        return []
+async def seed(artist_names):
+    engine = SeedingEngine(DB_PATH, discogs_key=DISCOGS_KEY, discogs_secret=DISCOGS_SECRET,
+                           skip_existing=True, service="seed-database")
+    done = 0
 
+    def on_result(result: SeedResult):
+        nonlocal done
+        done += 1
+        print_result(done, len(artist_names), result)
 
-def get_discogs_master_data(master_id: str) -> Tuple[Optional[float], Optional[int], Optional[str]]:
-    """Get rating, votes, and cover from Discogs master"""
-    if not master_id:
-        return None, None, None
-    
     try:
-        data = _discogs_get(f"/masters/{master_id}", {})
-        r = (data.get("community") or {}).get("rating") or {}
-        
-        cover_url = None
-        images = data.get("images", [])
-        if images and len(images) > 0:
-            cover_url = images[0].get("uri")
-        
-        rating = float(r["average"]) if r.get("average") is not None else None
-        votes = int(r.get("count", 0)) if r.get("average") is not None else None
-        
-        return rating, votes, cover_url
-    except Exception as e:
-        print(f"  [WARNING] Could not get Discogs data for master {master_id}: {e}")
-        return None, None, None
-
-
-def get_artist_image_from_discogs(artist_name: str) -> Optional[str]:
-    """Get artist image from Discogs search"""
-    try:
-        data = _discogs_get("/database/search", {
-            "q": artist_name,
-            "type": "artist",
-            "per_page": 1
-        })
-        results = data.get("results", [])
-        if results:
-            return results[0].get("cover_image")
-    except Exception as e:
-        print(f"  [WARNING] Could not get artist image for {artist_name}: {e}")
-    return None
-
-
-def seed_artist(artist_name: str):
-    """Seed a single artist with all albums"""
-    conn = get_db_connection()
-    
-    try:
-        cursor = conn.cursor()
-        
-        print(f"\n{'='*60}")
-        print(f"Processing: {artist_name}")
-        print(f"{'='*60}")
-        
-        cursor.execute("SELECT id FROM artists WHERE name = ?", (artist_name,))
-        existing = cursor.fetchone()
-        if existing:
-            print(f"✓ Artist '{artist_name}' already exists in database (ID: {existing['id']}), skipping...")
-            return
-        
-        print(f"[1/4] Finding MusicBrainz ID...")
-        mbid = find_artist_mbid(artist_name)
-        if not mbid:
-            print(f"✗ Could not find MBID for {artist_name}, skipping...")
-            return
-        print(f"✓ Found MBID: {mbid}")
-        
-        print(f"[2/4] Fetching discography...")
-        albums = fetch_studio_albums(mbid, artist_name)
-        print(f"✓ Found {len(albums)} studio albums")
-        
-        print(f"[3/4] Getting artist image...")
-        image_url = get_artist_image_from_discogs(artist_name)
-        if image_url:
-            print(f"✓ Got artist image")
-        
-        print(f"[4/4] Saving to database...")
-        cursor.execute(
-            "INSERT INTO artists (name, mbid, image_url) VALUES (?, ?, ?)",
-            (artist_name, mbid, image_url)
-        )
-        artist_id = cursor.lastrowid
-        print(f"✓ Artist saved (ID: {artist_id})")
-        
-        albums_saved = 0
-        for i, album in enumerate(albums, 1):
-            print(f"  [{i}/{len(albums)}] Processing: {album['title']} ({album['year']})")
-            
-            rating, votes, cover_url = None, None, None
-            if album["discogs_master_id"]:
-                rating, votes, cover_url = get_discogs_master_data(album["discogs_master_id"])
-                if rating:
-                    print(f"    ✓ Rating: {rating:.1f}/5 ({votes} votes)")
-            
-            cursor.execute(
-                """INSERT OR IGNORE INTO albums (artist_id, title, year, discogs_master_id, rating, votes, cover_url) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (artist_id, album["title"], album["year"], album["discogs_master_id"], rating, votes, cover_url)
-            )
-            albums_saved += 1
-        
-        conn.commit()
-        print(f"✓ Saved {albums_saved} albums for {artist_name}")
-        print(f"{'='*60}\n")
-    
+        return await engine.seed_many(artist_names, on_result=on_result)
     finally:
-        conn.close()
+        await close_http_clients()
 
 
 def main():
@@ -311,37 +102,33 @@ def main():
     print("\n" + "="*60)
     print("VINYL RECOMMENDATION SYSTEM - DATABASE SEEDER (SQLite)")
     print("="*60 + "\n")
-    
+
     create_tables()
-    
+
     if not DISCOGS_KEY or not DISCOGS_SECRET:
         print("⚠ WARNING: DISCOGS_CONSUMER_KEY and DISCOGS_CONSUMER_SECRET not set. Tables created but seeding skipped.")
         return
-    
+
     with open("seed_artists.json", "r") as f:
         artist_names = json.load(f)
-    
+
     print(f"📋 Loaded {len(artist_names)} artists to seed")
-    print(f"⏱️  Estimated time: ~{len(artist_names) * 2} minutes (with rate limiting)\n")
-    
-    successful = 0
-    failed = 0
-    
-    for i, artist_name in enumerate(artist_names, 1):
-        print(f"[{i}/{len(artist_names)}] ", end="")
-        try:
-            seed_artist(artist_name)
-            successful += 1
-        except Exception as e:
-            print(f"✗ FAILED to seed {artist_name}: {e}")
-            failed += 1
-    
+    print("⏱️  Throughput is bounded by the MusicBrainz/Discogs rate limits (SEED_MB_RATE, SEED_DISCOGS_RATE)\n")
+
+    start = time.monotonic()
+    results = asyncio.run(seed(artist_names))
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+
     print("\n" + "="*60)
     print("SEEDING COMPLETE")
     print("="*60)
-    print(f"✓ Successful: {successful}")
-    print(f"✗ Failed: {failed}")
-    print(f"📊 Total: {len(artist_names)}")
+    print(f"✓ Successful: {counts.get('seeded', 0)}")
+    print(f"↷ Skipped (already in database): {counts.get('skipped', 0)}")
+    print(f"✗ Not found: {counts.get('not_found', 0)}")
+    print(f"✗ Failed: {counts.get('error', 0)}")
+    print(f"📊 Total: {len(artist_names)} in {time.monotonic() - start:.0f}s")
     print("="*60 + "\n")
 
 
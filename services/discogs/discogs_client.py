@@ -3,6 +3,7 @@ import asyncio
 import time
 from typing import List, Dict, Optional
 from libs.shared.utils import log_event
+from libs.shared.http_clients import close_http_client, get_http_client
 
 
 class DiscogsClient:
@@ -54,12 +55,12 @@ class DiscogsClient:
         return filtered_tracks
     
     async def start(self):
-        headers = {"User-Agent": "VinylRecommender/1.0"}
-        self.client = httpx.AsyncClient(timeout=30.0, headers=headers)
+        self.client = get_http_client("discogs")
     
     async def stop(self):
         if self.client:
-            await self.client.aclose()
+            await close_http_client("discogs")
+            self.client = None
     
     def is_ready(self) -> bool:
         return self.client is not None and bool(self.key) and bool(self.secret)
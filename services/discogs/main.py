@@ -9,6 +9,10 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from libs.shared.models import DiscogsRelease, DiscogsStats, ServiceHealth
 from libs.shared.utils import create_http_client, log_event
+from libs.shared.http_clients import close_http_clients
+from libs.shared.metrics import install_metrics
+from libs.shared.tracing import install_tracing
+from libs.shared.profiling import install_profiling
 from .discogs_client import DiscogsClient
 
 discogs_client = None
@@ -24,6 +28,7 @@ async def lifespan(app: FastAPI):
     log_event("discogs-service", "INFO", "Discogs Service started")
     yield
     await discogs_client.stop()
+    await close_http_clients()
     log_event("discogs-service", "INFO", "Discogs Service stopped")
 
 
@@ -36,6 +41,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_metrics(app, "discogs")
+install_tracing(app, "discogs")
+install_profiling(app, "discogs")
 
 
 @app.get("/health")
@@ -1,8 +1,9 @@
 import os
 import hashlib
 from urllib.parse import urlencode
-import httpx
 from typing import Optional
+from libs.shared.http_clients import get_http_client
+from libs.shared.utils import log_event
 
 
 class LastFMAuthManager:
@@ -33,13 +34,13 @@ class LastFMAuthManager:
         }
         params["api_sig"] = self._generate_signature(params)
         
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(self.api_base, params=params)
-            if resp.status_code != 200:
-                return None
-            
-            data = resp.json()
-            return data.get("token")
+        client = get_http_client("lastfm")
+        resp = await client.get(self.api_base, params=params)
+        if resp.status_code != 200:
+            return None
+        
+        data = resp.json()
+        return data.get("token")
 
     def get_auth_url(self) -> str:
         """Get authorization URL for user to approve"""
@@ -62,27 +63,27 @@ class LastFMAuthManager:
         }
         params["api_sig"] = self._generate_signature(params)
         
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(self.api_base, params=params)
-            
-            if resp.status_code != 200:
-                print(f"Last.fm API error: status={resp.status_code}, body={resp.text}")
-                return False
-            
-            data = resp.json()
-            
-            if "error" in data:
-                error_msg = data.get("message", "Unknown error")
-                print(f"Last.fm error response: {error_msg}")
-                return False
-            
-            session = data.get("session", {})
-            self.session_key = session.get("key")
-            self.username = session.get("name")
-            
-            success = bool(self.session_key)
-            print(f"Session key obtained: {success}, username: {self.username}")
-            return success
+        client = get_http_client("lastfm")
+        resp = await client.get(self.api_base, params=params)
+        
+        if resp.status_code != 200:
+            log_event("lastfm-service", "WARNING", "Last.fm API error: status=%s, body=%s", resp.status_code, resp.text)
+            return False
+        
+        data = resp.json()
+        
+        if "error" in data:
+            error_msg = data.get("message", "Unknown error")
+            log_event("lastfm-service", "WARNING", "Last.fm error response: %s", error_msg)
+            return False
+        
+        session = data.get("session", {})
+        self.session_key = session.get("key")
+        self.username = session.get("name")
+        
+        success = bool(self.session_key)
+        log_event("lastfm-service", "INFO", "Session key obtained: %s, username: %s", success, self.username)
+        return success
 
     def get_session_key(self) -> Optional[str]:
         return self.session_key
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from libs.shared.utils import log_event
+from libs.shared.metrics import TimedConnection
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "vinylbe.db")
+
+# Snapshot kinds and the key the Last.fm API (and our endpoints) use for each list
+KINDS = {"track": "tracks", "artist": "artists", "album": "albums"}
+
+
+def dict_factory(cursor, row):
+    d = {}
+    for idx, col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+
+def get_db_connection():
+    conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
+    conn.row_factory = dict_factory
+    _ensure_schema(conn)
+    return conn
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    """
+    Per-user, per-period top lists. One row per ranked item instead of a JSON
+    blob, so a snapshot can be read back partially (e.g. only albums) and
+    replaced one kind at a time.
+    """
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS lastfm_snapshot (
+            lastfm_username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('track', 'artist', 'album')),
+            item_count INTEGER NOT NULL,
+            generated_at TEXT NOT NULL,
+            PRIMARY KEY (lastfm_username, period, kind)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS lastfm_snapshot_item (
+            lastfm_username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            artist_name TEXT,
+            mbid TEXT,
+            playcount INTEGER NOT NULL DEFAULT 0,
+            image_url TEXT,
+            PRIMARY KEY (lastfm_username, period, kind, rank)
+        ) WITHOUT ROWID;
+        """
+    )
+
+
+def _image_url(item: dict) -> Optional[str]:
+    """Largest non-empty image from a Last.fm image list"""
+    images = item.get("image") or []
+    for image in reversed(images):
+        if isinstance(image, dict) and image.get("#text"):
+            return image["#text"]
+    return None
+
+
+def _compact(kind: str, rank: int, item: dict) -> tuple:
+    artist = item.get("artist")
+    artist_name = artist if isinstance(artist, str) else (artist or {}).get("name")
+    try:
+        playcount = int(item.get("playcount") or 0)
+    except (TypeError, ValueError):
+        playcount = 0
+    return (kind, rank, item.get("name") or "", artist_name if kind != "artist" else None,
+            item.get("mbid") or None, playcount, _image_url(item))
+
+
+def _expand(row: dict) -> dict:
+    """Rebuild the subset of the Last.fm item shape our consumers read"""
+    item = {"name": row["name"], "mbid": row["mbid"] or "", "playcount": str(row["playcount"])}
+    if row["artist_name"] is not None:
+        item["artist"] = {"name": row["artist_name"]}
+    if row["image_url"]:
+        item["image"] = [{"#text": row["image_url"], "size": "extralarge"}]
+    return item
+
+
+def load_snapshot(lastfm_username: str, period: str, kinds) -> Dict[str, Tuple[datetime, List[dict]]]:
+    """{kind: (generated_at, items)} for the stored kinds among `kinds`"""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        placeholders = ",".join("?" * len(kinds))
+        cur.execute(
+            f"""SELECT kind, generated_at FROM lastfm_snapshot
+                WHERE lastfm_username = ? AND period = ? AND kind IN ({placeholders})""",
+            (lastfm_username, period, *kinds)
+        )
+        stored = {row["kind"]: datetime.fromisoformat(row["generated_at"]) for row in cur.fetchall()}
+        if not stored:
+            return {}
+
+        placeholders = ",".join("?" * len(stored))
+        cur.execute(
+            f"""SELECT kind, name, artist_name, mbid, playcount, image_url FROM lastfm_snapshot_item
+                WHERE lastfm_username = ? AND period = ? AND kind IN ({placeholders})
+                ORDER BY kind, rank""",
+            (lastfm_username, period, *stored)
+        )
+        items: Dict[str, List[dict]] = {kind: [] for kind in stored}
+        for row in cur.fetchall():
+            items[row["kind"]].append(_expand(row))
+        return {kind: (generated_at, items[kind]) for kind, generated_at in stored.items()}
+    finally:
+        conn.close()
+
+
+def save_snapshot(lastfm_username: str, period: str, lists: Dict[str, List[dict]]) -> datetime:
+    """Replace the stored lists for the given kinds ({kind: raw Last.fm items})"""
+    generated_at = datetime.utcnow()
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        for kind, items in lists.items():
+            cur.execute(
+                "DELETE FROM lastfm_snapshot_item WHERE lastfm_username = ? AND period = ? AND kind = ?",
+                (lastfm_username, period, kind)
+            )
+            cur.executemany(
+                """INSERT INTO lastfm_snapshot_item
+                   (lastfm_username, period, kind, rank, name, artist_name, mbid, playcount, image_url)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(lastfm_username, period, *_compact(kind, rank, item)) for rank, item in enumerate(items, 1)]
+            )
+            cur.execute(
+                """INSERT OR REPLACE INTO lastfm_snapshot (lastfm_username, period, kind, item_count, generated_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (lastfm_username, period, kind, len(items), generated_at.isoformat())
+            )
+        conn.commit()
+        log_event("lastfm-db", "INFO", f"Saved {'/'.join(lists)} snapshot for {lastfm_username}, period={period}")
+        return generated_at
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
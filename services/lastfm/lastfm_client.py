@@ -1,10 +1,24 @@
+import asyncio
 import os
 import hashlib
-import httpx
 from typing import List, Dict, Any, Optional
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from libs.shared.utils import log_event
+from libs.shared.http_clients import get_http_client
+
+PER_PAGE = 50
+# In-flight request cap for the Last.fm API (about 5 req/s are allowed per key).
+# Shared by every LastFMClient in the process so concurrent users stay under it together
+MAX_CONCURRENT_REQUESTS = int(os.getenv("LASTFM_MAX_CONCURRENCY", "5"))
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _request_slots() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return _semaphore
 
 
 class LastFMClient:
@@ -15,11 +29,11 @@ class LastFMClient:
         self.client = None
     
     async def start(self):
-        self.client = httpx.AsyncClient()
+        self.client = get_http_client("lastfm")
     
     async def close(self):
-        if self.client:
-            await self.client.aclose()
+        # The pooled client is shared by all users; it is closed on service shutdown
+        self.client = None
     
     async def _request(self, method: str, params: Dict[str, Any]) -> dict:
         if not self.client:
@@ -32,119 +46,80 @@ class LastFMClient:
         resp.raise_for_status()
         return resp.json()
     
-    async def get_top_tracks(self, period: str = "3month", limit: int = 300) -> List[dict]:
+    async def _get(self, params: Dict[str, Any]) -> dict:
+        async with _request_slots():
+            return await self._request("GET", params)
+    
+    async def _get_paged(self, method: str, root: str, item: str, period: str, limit: int) -> List[dict]:
         """
-        Get user's top tracks for a given period
-        period: overall | 7day | 1month | 3month | 6month | 12month
+        Fetch up to `limit` items of a paged user.getTop* method. Page 1 tells
+        us totalPages; the remaining pages are fetched concurrently (bounded by
+        the shared per-API cap) and concatenated in page order.
         """
-        all_tracks = []
-        page = 1
-        per_page = 50
-        
-        while len(all_tracks) < limit:
-            log_event("lastfm-client", "INFO", f"Fetching tracks page={page}, period={period}")
-            
-            params = {
-                "method": "user.getTopTracks",
+        def params(page: int) -> Dict[str, Any]:
+            return {
+                "method": method,
                 "user": self.username,
                 "period": period,
-                "limit": per_page,
+                "limit": PER_PAGE,
                 "page": page
             }
-            
-            data = await self._request("GET", params)
-            tracks_data = data.get("toptracks", {}).get("track", [])
-            
-            if not tracks_data:
-                break
-            
-            if isinstance(tracks_data, dict):
-                tracks_data = [tracks_data]
-            
-            all_tracks.extend(tracks_data)
-            
-            if len(tracks_data) < per_page:
-                break
-            
-            page += 1
         
-        return all_tracks[:limit]
+        def items(data: dict) -> List[dict]:
+            page_items = data.get(root, {}).get(item, [])
+            return [page_items] if isinstance(page_items, dict) else page_items
+        
+        log_event("lastfm-client", "INFO", f"Fetching {item}s page=1, period={period}")
+        first = await self._get(params(1))
+        collected = items(first)
+        
+        try:
+            total_pages = int(first.get(root, {}).get("@attr", {}).get("totalPages", 1))
+        except (TypeError, ValueError):
+            total_pages = 1
+        last_page = min(total_pages, -(-limit // PER_PAGE))
+        
+        if len(collected) == PER_PAGE and last_page > 1:
+            log_event("lastfm-client", "INFO", f"Fetching {item}s pages 2-{last_page} concurrently, period={period}")
+            pages = await asyncio.gather(*(self._get(params(page)) for page in range(2, last_page + 1)))
+            for data in pages:
+                page_items = items(data)
+                collected.extend(page_items)
+                if len(page_items) < PER_PAGE:
+                    break
+        
+        return collected[:limit]
+    
+    async def get_top_tracks(self, period: str = "3month", limit: int = 300) -> List[dict]:
+        """
+        Get user's top tracks for a given period
+        period: overall | 7day | 1month | 3month | 6month | 12month
+        """
+        return await self._get_paged("user.getTopTracks", "toptracks", "track", period, limit)
     
     async def get_top_artists(self, period: str = "3month", limit: int = 300) -> List[dict]:
         """
         Get user's top artists for a given period
         period: overall | 7day | 1month | 3month | 6month | 12month
         """
-        all_artists = []
-        page = 1
-        per_page = 50
-        
-        while len(all_artists) < limit:
-            log_event("lastfm-client", "INFO", f"Fetching artists page={page}, period={period}")
-            
-            params = {
-                "method": "user.getTopArtists",
-                "user": self.username,
-                "period": period,
-                "limit": per_page,
-                "page": page
-            }
-            
-            data = await self._request("GET", params)
-            artists_data = data.get("topartists", {}).get("artist", [])
-            
-            if not artists_data:
-                break
-            
-            if isinstance(artists_data, dict):
-                artists_data = [artists_data]
-            
-            all_artists.extend(artists_data)
-            
-            if len(artists_data) < per_page:
-                break
-            
-            page += 1
-        
-        return all_artists[:limit]
+        return await self._get_paged("user.getTopArtists", "topartists", "artist", period, limit)
     
     async def get_top_albums(self, period: str = "3month", limit: int = 50) -> List[dict]:
         """
         Get user's top albums for a given period
         period: overall | 7day | 1month | 3month | 6month | 12month
         """
-        all_albums = []
-        page = 1
-        per_page = 50
-        
-        while len(all_albums) < limit:
-            log_event("lastfm-client", "INFO", f"Fetching albums page={page}, period={period}")
-            
-            params = {
-                "method": "user.getTopAlbums",
-                "user": self.username,
-                "period": period,
-                "limit": per_page,
-                "page": page
-            }
-            
-            data = await self._request("GET", params)
-            albums_data = data.get("topalbums", {}).get("album", [])
-            
-            if not albums_data:
-                break
-            
-            if isinstance(albums_data, dict):
-                albums_data = [albums_data]
-            
-            all_albums.extend(albums_data)
-            
-            if len(albums_data) < per_page:
-                break
-            
-            page += 1
-        
-        return all_albums[:limit]
+        return await self._get_paged("user.getTopAlbums", "topalbums", "album", period, limit)
+    
+    async def get_profile_snapshot(self, period: str = "3month", tracks_limit: int = 300,
+                                   artists_limit: int = 300, albums_limit: int = 50) -> Dict[str, List[dict]]:
+        """Top tracks, artists and albums for one period, fetched concurrently"""
+        tracks, artists, albums = await asyncio.gather(
+            self.get_top_tracks(period, tracks_limit),
+            self.get_top_artists(period, artists_limit),
+            self.get_top_albums(period, albums_limit),
+        )
+        return {"tracks": tracks, "artists": artists, "albums": albums}
     
     async def search_artist(self, query: str, limit: int = 30) -> List[dict]:
         """
@@ -158,7 +133,7 @@ class LastFMClient:
             "limit": limit
         }
         
-        data = await self._request("GET", params)
+        data = await self._get(params)
         results = data.get("results", {})
         artist_matches = results.get("artistmatches", {})
         artists = artist_matches.get("artist", [])
@@ -174,5 +149,5 @@ class LastFMClient:
             "method": "user.getInfo",
             "user": self.username
         }
-        data = await self._request("GET", params)
+        data = await self._get(params)
         return data.get("user", {})
@@ -7,18 +7,27 @@ from contextlib import asynccontextmanager
 from typing import List, Optional, Tuple
 from pydantic import BaseModel
 from libs.shared.utils import log_event
+from libs.shared.http_clients import close_http_clients
+from libs.shared.cache import LRUTTLCache
+from libs.shared.metrics import install_metrics
+from libs.shared.tracing import install_tracing
+from libs.shared.profiling import install_profiling
 from .auth import LastFMAuthManager
 from .lastfm_client import LastFMClient
+from . import snapshots
 
-from typing import Dict
 import time
 import asyncio
 import httpx
 import re
 
-auth_managers: Dict[str, tuple[LastFMAuthManager, float]] = {}
-lastfm_clients: Dict[str, LastFMClient] = {}
-AUTH_TOKEN_TTL = 600
+# Per-user clients only hold a username and a reference to the shared pooled
+# HTTP client, so evicting one is free: the next request recreates it. A client
+# expires CLIENT_TTL seconds after it was created, however often it is used
+CLIENT_TTL = int(os.getenv("LASTFM_CLIENT_TTL", "3600"))
+MAX_CLIENTS = int(os.getenv("LASTFM_MAX_CLIENTS", "1024"))
+
+lastfm_clients = LRUTTLCache(maxsize=MAX_CLIENTS, ttl=CLIENT_TTL, name="lastfm_clients")
 
 DISCOGS_BASE = "https://api.discogs.com"
 
@@ -33,29 +42,49 @@ class SearchResponse(BaseModel):
     artists: List[ArtistSearchResult]
 
 
-async def cleanup_expired_tokens():
-    """Remove expired auth tokens (older than 10 minutes)"""
+async def cleanup_expired_entries():
+    """Drop clients past their TTL, sleeping until the next deadline"""
     while True:
         try:
-            await asyncio.sleep(60)
-            now = time.time()
-            expired = [token for token, (_, created) in auth_managers.items() if now - created > AUTH_TOKEN_TTL]
-            for token in expired:
-                log_event("lastfm-service", "INFO", f"Removing expired auth token: {token[:10]}...")
-                del auth_managers[token]
+            deadline = lastfm_clients.next_expiry()
+            await asyncio.sleep(min(deadline if deadline is not None else 60.0, 60.0) + 0.1)
+            expired_clients = lastfm_clients.expire()
+            if expired_clients:
+                log_event("lastfm-service", "INFO", f"Expired {expired_clients} clients past their TTL")
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            log_event("lastfm-service", "ERROR", f"Error cleaning tokens: {str(e)}")
+            log_event("lastfm-service", "ERROR", f"Error expiring clients: {str(e)}")
+
+
+async def get_client(username: str) -> LastFMClient:
+    """Cached client for a user, created on the fly when missing or evicted"""
+    client = lastfm_clients.get(username)
+    if client:
+        return client
+    
+    api_key = os.getenv("LASTFM_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="LASTFM_API_KEY not configured")
+    
+    client = LastFMClient(api_key, username)
+    await client.start()
+    lastfm_clients.set(username, client)
+    log_event("lastfm-service", "INFO", f"Created new client for {username} (stateless fallback)")
+    return client
 
 
 class TimeRangeRequest(BaseModel):
     time_range: str = "medium_term"
     username: str
+    # Skip the stored snapshot and fetch from Last.fm
+    refresh: bool = False
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     log_event("lastfm-service", "INFO", "Starting Last.fm service")
-    cleanup_task = asyncio.create_task(cleanup_expired_tokens())
+    cleanup_task = asyncio.create_task(cleanup_expired_entries())
     try:
         yield
     finally:
@@ -64,12 +93,18 @@ async def lifespan(app: FastAPI):
             await cleanup_task
         except asyncio.CancelledError:
             pass
-        for client in list(lastfm_clients.values()):
+        await snapshots.drain_background()
+        for _, client in lastfm_clients.items():
             await client.close()
+        lastfm_clients.clear()
+        await close_http_clients()
         log_event("lastfm-service", "INFO", "Shutting down Last.fm service")
 
 
 app = FastAPI(lifespan=lifespan)
+install_metrics(app, "lastfm")
+install_tracing(app, "lastfm")
+install_profiling(app, "lastfm")
 
 
 @app.get("/health")
@@ -98,7 +133,7 @@ async def get_auth_url():
 async def auth_callback(token: str):
     try:
         # Web Flow: We receive the token from Last.fm redirect
-        # We don't have state in auth_managers, so we create a new manager
+        # No auth state is kept between requests, so we create a new manager
         auth_manager = LastFMAuthManager()
         
         success = await auth_manager.get_session(token)
@@ -108,16 +143,15 @@ async def auth_callback(token: str):
         username = auth_manager.get_username()
         log_event("lastfm-service", "INFO", f"User authenticated: {username}")
         
-        if username in lastfm_clients:
+        old_client = lastfm_clients.pop(username)
+        if old_client:
             log_event("lastfm-service", "INFO", f"Closing existing client for {username}")
-            old_client = lastfm_clients[username]
             await old_client.close()
-            del lastfm_clients[username]
         
         api_key = os.getenv("LASTFM_API_KEY")
         client = LastFMClient(api_key, username)
         await client.start()
-        lastfm_clients[username] = client
+        lastfm_clients.set(username, client)
         
         return {
             "status": "success",
@@ -130,7 +164,7 @@ async def auth_callback(token: str):
 
 @app.get("/auth/status")
 async def auth_status(username: str = None):
-    if username and username in lastfm_clients:
+    if username and lastfm_clients.get(username, count=False):
         return {
             "authenticated": True,
             "username": username
@@ -143,10 +177,7 @@ async def auth_status(username: str = None):
 
 @app.post("/top-tracks")
 async def get_top_tracks(request: TimeRangeRequest):
-    if request.username not in lastfm_clients:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    client = lastfm_clients[request.username]
+    client = await get_client(request.username)
     
     period_map = {
         "short_term": "7day",
@@ -157,9 +188,10 @@ async def get_top_tracks(request: TimeRangeRequest):
     period = period_map.get(request.time_range, "3month")
     
     try:
-        tracks = await client.get_top_tracks(period=period)
-        log_event("lastfm-service", "INFO", f"Retrieved {len(tracks)} top tracks for {request.username}, period={period}")
-        return {"tracks": tracks, "total": len(tracks)}
+        lists = await snapshots.get_lists(client, period, ["track"], force_refresh=request.refresh)
+        tracks = lists["tracks"]
+        log_event("lastfm-service", "INFO", f"Retrieved {len(tracks)} top tracks for {request.username}, period={period} ({lists['sources']['track']})")
+        return {"tracks": tracks, "total": len(tracks), "source": lists["sources"]["track"]}
     except Exception as e:
         log_event("lastfm-service", "ERROR", f"Failed to get top tracks: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -167,10 +199,7 @@ async def get_top_tracks(request: TimeRangeRequest):
 
 @app.post("/top-artists")
 async def get_top_artists(request: TimeRangeRequest):
-    if request.username not in lastfm_clients:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    client = lastfm_clients[request.username]
+    client = await get_client(request.username)
     
     period_map = {
         "short_term": "7day",
@@ -181,9 +210,10 @@ async def get_top_artists(request: TimeRangeRequest):
     period = period_map.get(request.time_range, "3month")
     
     try:
-        artists = await client.get_top_artists(period=period)
-        log_event("lastfm-service", "INFO", f"Retrieved {len(artists)} top artists for {request.username}, period={period}")
-        return {"artists": artists, "total": len(artists)}
+        lists = await snapshots.get_lists(client, period, ["artist"], force_refresh=request.refresh)
+        artists = lists["artists"]
+        log_event("lastfm-service", "INFO", f"Retrieved {len(artists)} top artists for {request.username}, period={period} ({lists['sources']['artist']})")
+        return {"artists": artists, "total": len(artists), "source": lists["sources"]["artist"]}
     except Exception as e:
         log_event("lastfm-service", "ERROR", f"Failed to get top artists: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -191,18 +221,9 @@ async def get_top_artists(request: TimeRangeRequest):
 
 @app.post("/top-albums")
 async def get_top_albums(request: TimeRangeRequest):
-    client = lastfm_clients.get(request.username)
-    if not client:
-        # Fallback: Create a new client on the fly (Stateless mode)
-        # This is crucial for serverless environments (Railway) where memory is not persistent across requests/restarts
-        api_key = os.getenv("LASTFM_API_KEY")
-        if not api_key:
-             raise HTTPException(status_code=500, detail="LASTFM_API_KEY not configured")
-        
-        client = LastFMClient(api_key, request.username)
-        await client.start()
-        lastfm_clients[request.username] = client
-        log_event("lastfm-service", "INFO", f"Created new client for {request.username} (stateless fallback)")
+    # Stateless fallback: memory is not persistent across restarts (Railway) and
+    # clients are evicted from the bounded cache, so a missing client is recreated
+    client = await get_client(request.username)
     
     period_map = {
         "short_term": "7day",
@@ -213,12 +234,46 @@ async def get_top_albums(request: TimeRangeRequest):
     period = period_map.get(request.time_range, "3month")
     
     try:
-        albums = await client.get_top_albums(period=period)
-        log_event("lastfm-service", "INFO", f"Retrieved {len(albums)} top albums for {request.username}, period={period}")
-        return {"albums": albums, "total": len(albums)}
+        lists = await snapshots.get_lists(client, period, ["album"], force_refresh=request.refresh)
+        albums = lists["albums"]
+        log_event("lastfm-service", "INFO", f"Retrieved {len(albums)} top albums for {request.username}, period={period} ({lists['sources']['album']})")
+        return {"albums": albums, "total": len(albums), "source": lists["sources"]["album"]}
     except Exception as e:
         log_event("lastfm-service", "ERROR", f"Failed to get top albums: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 
+
+
+@app.post("/profile-snapshot")
+async def get_profile_snapshot(request: TimeRangeRequest):
+    """Top tracks, artists and albums for one period in a single call"""
+    client = await get_client(request.username)
+    
+    period_map = {
+        "short_term": "7day",
+        "medium_term": "3month",
+        "long_term": "12month"
+    }
+    
+    period = period_map.get(request.time_range, "3month")
+    
+    try:
+        start = time.time()
+        snapshot = await snapshots.get_lists(client, period, ["track", "artist", "album"], force_refresh=request.refresh)
+        log_event("lastfm-service", "INFO",
+                  f"Profile snapshot for {request.username}, period={period}: "
+                  f"{len(snapshot['tracks'])} tracks, {len(snapshot['artists'])} artists, "
+                  f"{len(snapshot['albums'])} albums in {time.time() - start:.2f}s")
+        return {**snapshot, "period": period}
+    except Exception as e:
+        log_event("lastfm-service", "ERROR", f"Failed to get profile snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "clients": lastfm_clients.stats(),
+    }
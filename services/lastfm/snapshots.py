@@ -0,0 +1,109 @@
+"""
+Stored Last.fm top lists with stale-while-revalidate refresh.
+
+- fresh (younger than SNAPSHOT_TTL): served from the DB, no Last.fm calls
+- stale (younger than SNAPSHOT_MAX_AGE): served from the DB, and a refresh
+  is started in the background for the next visit
+- missing or too old: fetched from Last.fm, stored, then served
+
+Concurrent requests for the same user/period share one Last.fm fetch.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from libs.shared.metrics import record_cache
+from libs.shared.utils import log_event
+from . import db_utils
+from .lastfm_client import LastFMClient
+
+SNAPSHOT_TTL = timedelta(seconds=int(os.getenv("LASTFM_SNAPSHOT_TTL", str(6 * 3600))))
+SNAPSHOT_MAX_AGE = timedelta(seconds=int(os.getenv("LASTFM_SNAPSHOT_MAX_AGE", str(7 * 24 * 3600))))
+
+# Same limits the client uses by default
+LIMITS = {"track": 300, "artist": 300, "album": 50}
+
+_inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+_background: set = set()
+
+
+async def _fetch_kind(client: LastFMClient, period: str, kind: str) -> List[dict]:
+    if kind == "track":
+        return await client.get_top_tracks(period, LIMITS[kind])
+    if kind == "artist":
+        return await client.get_top_artists(period, LIMITS[kind])
+    return await client.get_top_albums(period, LIMITS[kind])
+
+
+async def _refresh_kind(client: LastFMClient, period: str, kind: str) -> List[dict]:
+    items = await _fetch_kind(client, period, kind)
+    await asyncio.to_thread(db_utils.save_snapshot, client.username, period, {kind: items})
+    return items
+
+
+def _refresh(client: LastFMClient, period: str, kind: str) -> asyncio.Task:
+    """Start (or join) the Last.fm fetch for one list"""
+    key = (client.username, period, kind)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_refresh_kind(client, period, kind))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return task
+
+
+def _refresh_in_background(client: LastFMClient, period: str, kind: str):
+    task = _refresh(client, period, kind)
+    if task not in _background:
+        _background.add(task)
+
+        def done(t: asyncio.Task):
+            _background.discard(t)
+            if not t.cancelled() and t.exception():
+                log_event("lastfm-snapshots", "WARNING",
+                          f"Background refresh failed for {client.username} {kind}s ({period}): {t.exception()}")
+
+        task.add_done_callback(done)
+
+
+async def get_lists(client: LastFMClient, period: str, kinds: Iterable[str], force_refresh: bool = False) -> Dict:
+    """
+    Top lists for one user/period, keyed by "tracks"/"artists"/"albums",
+    plus a "sources" map telling whether each came from "cache", "stale" or "lastfm".
+    """
+    kinds = list(kinds)
+    stored = {} if force_refresh else await asyncio.to_thread(db_utils.load_snapshot, client.username, period, kinds)
+    now = datetime.utcnow()
+
+    result: Dict = {"sources": {}}
+    missing = []
+    for kind in kinds:
+        entry = stored.get(kind)
+        age = now - entry[0] if entry else None
+        if entry and age < SNAPSHOT_TTL:
+            result[db_utils.KINDS[kind]] = entry[1]
+            result["sources"][kind] = "cache"
+        elif entry and age < SNAPSHOT_MAX_AGE:
+            result[db_utils.KINDS[kind]] = entry[1]
+            result["sources"][kind] = "stale"
+            _refresh_in_background(client, period, kind)
+        else:
+            missing.append(kind)
+
+    if missing:
+        fetched = await asyncio.gather(*(_refresh(client, period, kind) for kind in missing))
+        for kind, items in zip(missing, fetched):
+            result[db_utils.KINDS[kind]] = items
+            result["sources"][kind] = "lastfm"
+
+    for source in result["sources"].values():
+        record_cache("lastfm_snapshot", hit=source != "lastfm")
+    log_event("lastfm-snapshots", "INFO", f"Snapshot for {client.username} ({period}): {result['sources']}")
+    return result
+
+
+async def drain_background():
+    """Wait for pending background refreshes (used on shutdown)"""
+    if _background:
+        await asyncio.gather(*list(_background), return_exceptions=True)
@@ -16,6 +16,10 @@ sys.path.insert(0, str(PathLib(__file__).parent.parent.parent))
 
 from libs.shared.models import ServiceHealth
 from libs.shared.utils import log_event
+from libs.shared.http_clients import close_http_clients
+from libs.shared.metrics import install_metrics
+from libs.shared.tracing import install_tracing
+from libs.shared.profiling import install_profiling
 from .pricing_client import PricingClient
 
 pricing_client = None
@@ -35,6 +39,7 @@ async def lifespan(app: FastAPI):
     
     yield
     await pricing_client.stop()
+    await close_http_clients()
     log_event("pricing-service", "INFO", "Pricing Service stopped")
 
 
@@ -47,6 +52,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_metrics(app, "pricing")
+install_tracing(app, "pricing")
+install_profiling(app, "pricing")
 
 
 @app.get("/health")
@@ -91,7 +99,7 @@ async def get_ebay_price(
             "pricing-service",
             "INFO",
             f"eBay offer found for {artist} - {album}",
-            {"price": result["total_price"]}
+            data={"price": result["total_price"]}
         )
         
         return {
@@ -5,8 +5,10 @@ import asyncio
 import time
 import requests
 import re
+from dataclasses import replace
 from bs4 import BeautifulSoup
 from libs.shared.utils import log_event
+from libs.shared.http_clients import UPSTREAMS, close_http_client, configure_upstream, get_http_client
 from urllib.parse import quote_plus
 
 EBAY_OAUTH_URL = "https://api.ebay.com/identity/v1/oauth2/token"
@@ -54,13 +56,15 @@ class PricingClient:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1'
         }
-        self.http_client = httpx.AsyncClient(timeout=20.0, headers=default_headers, follow_redirects=True)
+        configure_upstream(replace(UPSTREAMS["pricing"], headers=default_headers))
+        self.http_client = get_http_client("pricing")
         await self._get_access_token()
 
     async def stop(self):
         """Cierra el cliente HTTP."""
         if self.http_client:
-            await self.http_client.aclose()
+            await close_http_client("pricing")
+            self.http_client = None
 
     def is_ready(self) -> bool:
         """Verifica si el cliente está listo."""
@@ -114,11 +118,7 @@ class PricingClient:
             if not item_country or item_country not in eu_country_codes:
                 # Log warning cuando eBay devuelve item fuera de UE
                 if item_country:
-                    log_event(
-                        "pricing-service", 
-                        "WARNING", 
-                        f"eBay returned non-EU item from {item_country}, filtering out"
-                    )
+                    log_event("pricing-service", "DEBUG", "eBay returned non-EU item from %s, filtering out", item_country)
                 continue
             
             title = item.get("title", "")
@@ -1,98 +1,134 @@
-from typing import List, Dict, Set, Any
-from collections import defaultdict
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple
+import numpy as np
 from libs.shared.utils import log_event
 
+PERIODS = ("short_term", "medium_term", "long_term")
+_PERIOD_CODES = {period: code for code, period in enumerate(PERIODS)}
 
+
+@dataclass(frozen=True, slots=True)
 class AlbumData:
-    def __init__(self):
-        self.tracks: List[dict] = []
-        self.total_score: float = 0
-        self.artists: Set[str] = set()
-        self.album_info: Optional[dict] = None
-        self.score_by_period: Dict[str, float] = {"short_term": 0, "medium_term": 0, "long_term": 0}
-        self.tracks_by_period: Dict[str, int] = {"short_term": 0, "medium_term": 0, "long_term": 0}
+    """
+    Aggregated totals for one album. Only counts and sums are kept; the
+    tracks themselves are never stored on the record.
+    """
+    album_id: str
+    album_info: dict
+    track_count: int
+    total_score: float
+    artist_boost: bool
+    score_by_period: Tuple[float, float, float]
+    tracks_by_period: Tuple[int, int, int]
+
+    def to_recommendation(self, boost_multiplier: float) -> dict:
+        final_score = self.total_score
+        if self.artist_boost:
+            final_score *= boost_multiplier
+
+        return {
+            "album_id": self.album_id,
+            "album_info": self.album_info,
+            "track_count": self.track_count,
+            "score": final_score,
+            "artist_boost": self.artist_boost,
+            "score_breakdown": {
+                "base_score": round(self.total_score, 2),
+                "artist_boost_applied": self.artist_boost,
+                "artist_boost_multiplier": boost_multiplier if self.artist_boost else 1.0,
+                "final_score": round(final_score, 2),
+                "score_by_period": dict(zip(PERIODS, self.score_by_period)),
+                "tracks_by_period": dict(zip(PERIODS, self.tracks_by_period)),
+            },
+        }
 
 
 class AlbumAggregator:
     def __init__(self):
         self.favorite_artist_boost = 5.0
-    
+
+    @staticmethod
+    def _has_favorite_artist(album: dict, artist_scores: Dict[str, Any]) -> bool:
+        for artist in album.get("artists", []):
+            artist_id = artist.get("id") or artist.get("name")
+            if artist_id and artist_id in artist_scores:
+                return True
+        return False
+
     def aggregate_albums(self, scored_tracks: List[dict], scored_artists: List[dict]) -> List[dict]:
         log_event("album-aggregator", "INFO", "Starting album aggregation")
-        
+
         artist_scores = {artist.get("id") or artist.get("name"): artist["score"] for artist in scored_artists}
-        
-        album_data: Dict[str, AlbumData] = {}
-        
-        for track in scored_tracks:
-            album_id = track.get("album", {}).get("id")
-            if not album_id:
-                continue
-            
-            if album_id not in album_data:
-                album_data[album_id] = AlbumData()
-            
-            track_score = track.get("score", 0)
-            time_range = track.get("time_range", "unknown")
-            
-            album_data[album_id].tracks.append(track)
-            album_data[album_id].total_score += track_score
-            
-            if time_range in album_data[album_id].score_by_period:
-                album_data[album_id].score_by_period[time_range] += track_score
-                album_data[album_id].tracks_by_period[time_range] += 1
-            
-            album_artists = track.get("album", {}).get("artists", [])
-            for artist in album_artists:
-                artist_id = artist.get("id") or artist.get("name")
-                if artist_id:
-                    album_data[album_id].artists.add(artist_id)
-            
-            if album_data[album_id].album_info is None:
-                album_data[album_id].album_info = track.get("album", {})
-        
-        log_event("album-aggregator", "INFO", f"Found {len(album_data)} unique albums")
-        
+
+        # Build the columns with flat comprehensions: album code (in order of
+        # first appearance), score and period code per track.
+        tracks = scored_tracks
+        albums = [track.get("album", {}) for track in tracks]
+        track_album_ids = [album.get("id") for album in albums]
+        if not all(track_album_ids):
+            keep = [i for i, album_id in enumerate(track_album_ids) if album_id]
+            tracks = [tracks[i] for i in keep]
+            albums = [albums[i] for i in keep]
+            track_album_ids = [track_album_ids[i] for i in keep]
+
+        album_codes: Dict[str, int] = {}
+        codes = [album_codes.setdefault(album_id, len(album_codes)) for album_id in track_album_ids]
+        scores: List[Any] = [track.get("score", 0) for track in tracks]
+        periods = [_PERIOD_CODES.get(track.get("time_range", "unknown"), -1) for track in tracks]
+        album_ids = list(album_codes)
+
+        log_event("album-aggregator", "INFO", f"Found {len(album_ids)} unique albums")
+
+        # Grouped sums per album (and per album x period) via np.bincount.
+        # bincount accumulates in input order, so float sums match a sequential loop.
+        n_albums = len(album_ids)
+        code_arr = np.asarray(codes, dtype=np.intp)
+        score_arr = np.asarray(scores, dtype=np.float64)
+        period_arr = np.asarray(periods, dtype=np.intp)
+
+        track_counts = np.bincount(code_arr, minlength=n_albums)
+        total_scores = np.bincount(code_arr, weights=score_arr, minlength=n_albums)
+
+        known = period_arr >= 0
+        cell = code_arr[known] * len(PERIODS) + period_arr[known]
+        period_scores = np.bincount(cell, weights=score_arr[known], minlength=n_albums * len(PERIODS)).reshape(n_albums, len(PERIODS))
+        period_counts = np.bincount(cell, minlength=n_albums * len(PERIODS)).reshape(n_albums, len(PERIODS))
+
+        # Track indices grouped by album (stable, so each group keeps track order).
+        # The first index of each group is the album's first appearance.
+        order = np.argsort(code_arr, kind="stable").tolist()
+        group_starts = (np.cumsum(track_counts) - track_counts).tolist()
+
+        # Integer scores stay integers, as they did when summed one by one
+        to_score = float if any(isinstance(s, float) for s in scores) else int
+
         filtered_albums = []
-        for album_id, data in album_data.items():
-            track_count = len(data.tracks)
-            
-            if track_count < 5:
-                continue
-            
-            artist_boost = any(artist_id in artist_scores for artist_id in data.artists)
-            
-            base_score = data.total_score
-            final_score = base_score
-            if artist_boost:
-                final_score *= self.favorite_artist_boost
-                log_event("album-aggregator", "INFO", f"Applied artist boost to album {album_id}")
-            
-            album_recommendation = {
-                "album_id": album_id,
-                "album_info": data.album_info,
-                "track_count": track_count,
-                "score": final_score,
-                "artist_boost": artist_boost,
-                "score_breakdown": {
-                    "base_score": round(base_score, 2),
-                    "artist_boost_applied": artist_boost,
-                    "artist_boost_multiplier": self.favorite_artist_boost if artist_boost else 1.0,
-                    "final_score": round(final_score, 2),
-                    "score_by_period": {
-                        "short_term": round(data.score_by_period["short_term"], 2),
-                        "medium_term": round(data.score_by_period["medium_term"], 2),
-                        "long_term": round(data.score_by_period["long_term"], 2),
-                    },
-                    "tracks_by_period": data.tracks_by_period,
-                },
-            }
-            filtered_albums.append(album_recommendation)
-        
+        for code in np.flatnonzero(track_counts >= 5).tolist():
+            track_count = int(track_counts[code])
+            start = group_starts[code]
+            group = order[start:start + track_count]
+            counts = period_counts[code].tolist()
+            sums = period_scores[code].tolist()
+
+            data = AlbumData(
+                album_id=album_ids[code],
+                album_info=albums[group[0]],
+                track_count=track_count,
+                total_score=to_score(total_scores[code]),
+                # Only albums that pass the threshold are checked for favorite artists
+                artist_boost=any(self._has_favorite_artist(albums[i], artist_scores) for i in group),
+                score_by_period=tuple(round(to_score(sums[i]), 2) if counts[i] else 0 for i in range(len(PERIODS))),
+                tracks_by_period=tuple(counts),
+            )
+            if data.artist_boost:
+                log_event("album-aggregator", "INFO", f"Applied artist boost to album {data.album_id}")
+
+            filtered_albums.append(data.to_recommendation(self.favorite_artist_boost))
+
         log_event("album-aggregator", "INFO", f"Filtered to {len(filtered_albums)} albums (>= 5 tracks)")
-        
+
         filtered_albums.sort(key=lambda x: x["score"], reverse=True)
-        
+
         log_event("album-aggregator", "INFO", "Albums sorted by score")
-        
+
         return filtered_albums
@@ -1,25 +1,28 @@
 import os
 import time
 import re
-import threading
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+from datetime import datetime
 import httpx
 import sqlite3
 
-MB_BASE = "https://musicbrainz.org/ws/2"
+from libs.shared.utils import log_event
+from libs.shared.metrics import TimedConnection
+from libs.shared.http_clients import InstrumentedClient
+from libs.shared.seeding import RateLimiter, SeedingEngine, SeedAlbum, SeedResult, discogs_limiter
+
 DISCOGS_BASE = "https://api.discogs.com"
+# Served by the gateway, which also serves the frontend
+NO_COVER_URL = "/static/img/no-cover.svg"
 
 HEADERS = {
     "User-Agent": "Vinilogy/1.0 (+https://vinilogy.com; contact@vinilogy.com)"
 }
 
-_RE_DISCOGS_MASTER = re.compile(
-    r"https?://(?:www\.)?discogs\.com/(?:[a-z]{2}/)?master/(\d+)", re.I
-)
-
-CLIENT = httpx.Client(
+# Sync client for the Discogs vinyl searches below; MusicBrainz/Discogs
+# catalogue lookups go through the seeding engine (libs/shared/seeding.py)
+CLIENT = InstrumentedClient(
     headers=HEADERS,
     http2=False,
     timeout=httpx.Timeout(30.0),
@@ -27,9 +30,13 @@ CLIENT = httpx.Client(
     follow_redirects=True,
 )
 
-_last_discogs_call_time = 0.0
-_MIN_DISCOGS_DELAY = 1.5
-_discogs_lock = threading.Lock()
+
+# CSV import lookups (csv_mode) run in this process next to interactive cache
+# misses. They first wait on this slower pace, so however many import workers
+# are running, they only ever hold a few reservations on the shared Discogs and
+# MusicBrainz buckets and an interactive miss is not queued behind them.
+CSV_IMPORT_RATE = float(os.getenv("CSV_IMPORT_RATE", "0.2"))
+_csv_pace = RateLimiter("csv-import", CSV_IMPORT_RATE)
 
 # SQLite database path
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "vinylbe.db")
@@ -116,12 +123,12 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
 def _get_db_connection():
     """Get SQLite connection"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
         conn.row_factory = dict_factory
         _ensure_schema(conn)
         return conn
     except Exception as e:
-        print(f"[DB] Connection failed: {e}")
+        log_event("recommender-service", "WARNING", "[DB] Connection failed: %s", e)
         return None
 
 
@@ -170,185 +177,37 @@ def _get_cached_artist_albums(artist_name: str, ignore_expiry: bool = False) ->
         if not albums:
             return None
         
-        print(f"[DB] ✓ Found {len(albums)} cached albums for '{artist_name}' (age: {cache_age.days}d, never expires)")
+        log_event("recommender-service", "INFO", "[DB] ✓ Found %s cached albums for '%s' (age: %sd, never expires)", len(albums), artist_name, cache_age.days)
         return [dict(album) for album in albums]
     
     except Exception as e:
-        print(f"[DB] Error reading cache for '{artist_name}': {e}")
+        log_event("recommender-service", "WARNING", "[DB] Error reading cache for '%s': %s", artist_name, e)
         return None
     finally:
         conn.close()
 
 
-def _save_artist_albums(artist_name: str, mbid: str, albums: List['StudioAlbum'], 
-                        image_url: Optional[str] = None):
-    """Save artist and albums to SQLite"""
-    conn = _get_db_connection()
-    if not conn:
-        print(f"[DB] Cannot save '{artist_name}' - no database connection")
-        return
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Insert or update artist
-        cursor.execute(
-            """INSERT INTO artists (name, mbid, image_url, last_updated) 
-               VALUES (?, ?, ?, ?)
-               ON CONFLICT(name) DO UPDATE SET 
-                   mbid = excluded.mbid,
-                   image_url = excluded.image_url,
-                   last_updated = excluded.last_updated""",
-            (artist_name, mbid, image_url, datetime.now())
-        )
-        
-        # Get artist_id
-        cursor.execute("SELECT id FROM artists WHERE LOWER(name) = LOWER(?)", (artist_name,))
-        result = cursor.fetchone()
-        if not result:
-            return
-        artist_id = result["id"]
-        
-        # Delete old albums
-        cursor.execute("DELETE FROM albums WHERE artist_id = ?", (artist_id,))
-        
-        # Insert new albums
-        for album in albums:
-            cursor.execute(
-                """INSERT INTO albums (artist_id, title, year, discogs_master_id, 
-                                      discogs_release_id, rating, votes, cover_url, last_updated)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (artist_id, album.title, album.year, album.discogs_master_id,
-                 album.discogs_release_id, album.rating, album.votes, album.cover_image, datetime.now())
-            )
-        
-        conn.commit()
-        print(f"[DB] ✓ Saved {len(albums)} albums for '{artist_name}' to cache")
-    
-    except Exception as e:
-        conn.rollback()
-        print(f"[DB] Error saving '{artist_name}': {e}")
-    finally:
-        conn.close()
-
-
+@dataclass(frozen=True, slots=True)
 class StudioAlbum:
-    def __init__(self, title: str, year: str, discogs_master_id: Optional[str],
-                 artist_name: str, rating: Optional[float] = None,
-                 votes: Optional[int] = None, cover_image: Optional[str] = None,
-                 discogs_release_id: Optional[str] = None, discogs_type: str = "master"):
-        self.title = title
-        self.year = year
-        self.discogs_master_id = discogs_master_id
-        self.discogs_release_id = discogs_release_id
-        self.discogs_type = discogs_type
-        self.artist_name = artist_name
-        self.rating = rating
-        self.votes = votes
-        self.cover_image = cover_image
-
-
-def _mb_get(path: str, params: Dict[str, Any], tries: int = 5,
-            sleep_after_ok: float = 1.0) -> Dict[str, Any]:
-    url = f"{MB_BASE}{path}"
-    params = {**params, "fmt": "json"}
-    last_exc = None
-    backoff = 0.6
-
-    for attempt in range(1, tries + 1):
-        try:
-            r = CLIENT.get(url, params=params)
-            if r.status_code in (429, 500, 502, 503, 504):
-                raise httpx.HTTPStatusError("Transient", request=r.request, response=r)
-            r.raise_for_status()
-            time.sleep(sleep_after_ok)
-            return r.json()
-        except Exception as e:
-            last_exc = e
-            time.sleep(backoff)
-            backoff = min(backoff * 1.7, 5.0)
-
-    raise RuntimeError(f"MB failed: {last_exc}")
-
-
-def _find_artist_mbid(name: str) -> Optional[str]:
-    try:
-        data = _mb_get("/artist", {"query": f'artist:"{name}"', "limit": 10})
-        artists = data.get("artists", []) or []
-        if not artists:
-            return None
-        exact = [a for a in artists if a.get("name", "").lower() == name.lower()]
-        chosen = exact[0] if exact else artists[0]
-        return chosen.get("id")
-    except Exception:
-        return None
-
-
-def _fetch_release_groups(artist_mbid: str, limit: int = 100):
-    try:
-        data = _mb_get(
-            "/release-group",
-            {
-                "artist": artist_mbid,
-                "primary-type": "Album",
-                "inc": "artist-credits+url-rels",
-                "limit": min(limit, 100),
-            }
-        )
-        return data.get("release-groups", []) or []
-    except Exception:
-        return []
-
-
-def _is_studio_album(rg: Dict[str, Any], artist_mbid: str) -> bool:
-    if rg.get("primary-type") != "Album":
-        return False
-    if rg.get("secondary-types"):
-        return False
-    ac = rg.get("artist-credit") or []
-    if len(ac) != 1:
-        return False
-    return (ac[0].get("artist") or {}).get("id") == artist_mbid
-
-
-def _year_from_date(item: Dict[str, Any]) -> str:
-    d = item.get("first-release-date") or ""
-    return d.split("-")[0] if d else ""
-
-
-def _discogs_master_from_rels(relations: Any) -> str:
-    if not relations:
-        return ""
-    for rel in relations:
-        if rel.get("type") == "discogs":
-            url = (rel.get("url") or {}).get("resource", "")
-            m = _RE_DISCOGS_MASTER.search(url)
-            if m:
-                return m.group(1)
-    return ""
-
-
-def _get_artist_image_from_discogs(artist_name: str, discogs_key: str, discogs_secret: str, csv_mode: bool = False) -> Optional[str]:
-    """Get artist image from Discogs search"""
-    try:
-        sleep_time = 1.0 if csv_mode else 0.25
-        data = _discogs_get("/database/search", {
-            "q": artist_name,
-            "type": "artist",
-            "per_page": 1
-        }, discogs_key, discogs_secret, sleep_after_ok=sleep_time)
-        results = data.get("results", [])
-        if results:
-            return results[0].get("cover_image")
-    except Exception as e:
-        print(f"[ARTIST IMAGE] Could not get image for {artist_name}: {e}")
-    return None
+    """Immutable album record; use dataclasses.replace() to fill in Discogs data"""
+    title: str
+    year: str
+    discogs_master_id: Optional[str]
+    artist_name: str
+    rating: Optional[float] = None
+    votes: Optional[int] = None
+    cover_image: Optional[str] = None
+    discogs_release_id: Optional[str] = None
+    discogs_type: str = "master"
 
 
 def _discogs_get(path: str, params: Dict[str, Any],
                  key: str, secret: str,
-                 sleep_after_ok: float = 0.25,
-                 tries: int = 5):
+                 tries: int = 5, csv_mode: bool = False):
+    """
+    Every call takes a token from the process-wide Discogs budget shared with
+    the seeding engine; csv_mode calls wait on the CSV import pace first.
+    """
     url = f"{DISCOGS_BASE}{path}"
     params = {**params, "key": key, "secret": secret}
     last_exc = None
@@ -356,15 +215,17 @@ def _discogs_get(path: str, params: Dict[str, Any],
     
     for attempt in range(1, tries + 1):
         try:
+            if csv_mode:
+                _csv_pace.wait_blocking()
+            discogs_limiter.wait_blocking()
             r = CLIENT.get(url, params=params)
             if r.status_code == 429:
                 if attempt < tries:
                     wait_time = 60.0
-                    print(f"[DISCOGS] ⚠️  RATE LIMIT HIT (429) - sleeping {wait_time}s before retry (attempt {attempt}/{tries})")
+                    log_event("recommender-service", "WARNING", "[DISCOGS] ⚠️  RATE LIMIT HIT (429) - sleeping %ss before retry (attempt %s/%s)", wait_time, attempt, tries)
                     time.sleep(wait_time)
                     continue
             r.raise_for_status()
-            time.sleep(sleep_after_ok)
             return r.json()
         except Exception as e:
             last_exc = e
@@ -375,274 +236,104 @@ def _discogs_get(path: str, params: Dict[str, Any],
     raise RuntimeError(f"Discogs API failed after {tries} attempts: {last_exc}")
 
 
-def _search_discogs_master(artist_name: str, album_title: str, key: str, secret: str, csv_mode: bool = False) -> Optional[str]:
-    """Fallback: Search Discogs for master_id by artist + album title"""
-    try:
-        query = f"{artist_name} {album_title}"
-        sleep_time = 1.0 if csv_mode else 0.25
-        data = _discogs_get("/database/search", {
-            "q": query,
-            "type": "master",
-            "per_page": 5
-        }, key, secret, sleep_after_ok=sleep_time)
-        
-        results = data.get("results", [])
-        if not results:
-            return None
-        
-        for result in results:
-            result_title = result.get("title", "").lower()
-            if album_title.lower() in result_title:
-                return str(result.get("id", ""))
-        
-        return str(results[0].get("id", "")) if results else None
-    except Exception:
-        return None
+def _to_studio_album(album: SeedAlbum, artist_name: str) -> StudioAlbum:
+    return StudioAlbum(
+        title=album.title,
+        year=album.year,
+        discogs_master_id=album.discogs_master_id,
+        discogs_release_id=album.discogs_release_id,
+        discogs_type=album.discogs_type,
+        artist_name=artist_name,
+        rating=album.rating,
+        votes=album.votes,
+        cover_image=album.cover_url,
+    )
 
 
-def _search_discogs_release(artist_name: str, album_title: str, key: str, secret: str, csv_mode: bool = False) -> Optional[str]:
-    """Second fallback: Search Discogs for release_id by artist + album title"""
-    try:
-        query = f"{artist_name} {album_title}"
-        sleep_time = 1.0 if csv_mode else 0.25
-        data = _discogs_get("/database/search", {
-            "q": query,
-            "type": "release",
-            "format": "vinyl",
-            "per_page": 5
-        }, key, secret, sleep_after_ok=sleep_time)
-        
-        results = data.get("results", [])
-        if not results:
-            return None
-        
-        for result in results:
-            result_title = result.get("title", "").lower()
-            if album_title.lower() in result_title:
-                return str(result.get("id", ""))
-        
-        return str(results[0].get("id", "")) if results else None
-    except Exception:
+def _cached_studio_albums(artist_name: str, top_n: int, ignore_expiry: bool = False) -> Optional[List[StudioAlbum]]:
+    cached_albums = _get_cached_artist_albums(artist_name, ignore_expiry=ignore_expiry)
+    if not cached_albums:
         return None
+    result = []
+    for album_data in cached_albums[:top_n]:
+        discogs_type = "master" if album_data.get("discogs_master_id") else "release"
+        album = StudioAlbum(
+            title=album_data["title"],
+            year=album_data["year"],
+            discogs_master_id=album_data.get("discogs_master_id"),
+            discogs_release_id=album_data.get("discogs_release_id"),
+            discogs_type=discogs_type,
+            artist_name=artist_name,
+            rating=album_data.get("rating"),
+            votes=album_data.get("votes"),
+            cover_image=album_data.get("cover_url")
+        )
+        result.append(album)
+    return result
 
 
-def _discogs_release_data(release_id: str, key: str, secret: str, csv_mode: bool = False) -> Tuple[Optional[float], Optional[int], Optional[str]]:
-    """Get rating and cover from a Discogs release (not master)"""
-    if not release_id:
-        return None, None, None
-    
-    try:
-        sleep_time = 1.0 if csv_mode else 0.25
-        rel = _discogs_get(f"/releases/{release_id}", {}, key, secret, sleep_after_ok=sleep_time)
-        rr = (rel.get("community") or {}).get("rating") or {}
-        
-        cover_image = None
-        rel_images = rel.get("images", [])
-        if rel_images and len(rel_images) > 0:
-            cover_image = rel_images[0].get("uri")
-        
-        if rr.get("average") is None:
-            print(f"[RATING] Release {release_id}: NO RATING")
-            return None, None, cover_image
-        
-        rating = float(rr["average"])
-        votes = int(rr.get("count", 0))
-        print(f"[RATING] Release {release_id}: rating={rating}, votes={votes}")
-        return rating, votes, cover_image
-    except Exception as e:
-        print(f"[RATING] Release {release_id}: ERROR - {str(e)}")
-        return None, None, None
-
+def _seeding_engine(discogs_key: str, discogs_secret: str, csv_mode: bool = False) -> SeedingEngine:
+    # Only rated albums are kept: they are the ones recommendations can rank
+    return SeedingEngine(DB_PATH, discogs_key=discogs_key, discogs_secret=discogs_secret,
+                         rated_only=True, service="recommender-service",
+                         pace=_csv_pace if csv_mode else None)
 
-def _discogs_master_data(master_id: str, key: str, secret: str, csv_mode: bool = False) -> Tuple[Optional[float], Optional[int], Optional[str]]:
-    if not master_id:
-        return None, None, None
 
-    try:
-        sleep_time = 1.0 if csv_mode else 0.25
-        data = _discogs_get(f"/masters/{master_id}", {}, key, secret, sleep_after_ok=sleep_time)
-        r = (data.get("community") or {}).get("rating") or {}
-        
-        cover_image = None
-        images = data.get("images", [])
-        if images and len(images) > 0:
-            cover_image = images[0].get("uri")
-        
-        if r.get("average") is not None:
-            rating = float(r["average"])
-            votes = int(r.get("count", 0))
-            print(f"[RATING] Master {master_id}: rating={rating}, votes={votes} (from master)")
-            return rating, votes, cover_image
-
-        main_rel = data.get("main_release")
-        if not main_rel:
-            print(f"[RATING] Master {master_id}: NO RATING (no master rating, no main_release)")
-            return None, None, cover_image
-
-        print(f"[RATING] Master {master_id}: No master rating, checking main_release {main_rel}")
-        rel = _discogs_get(f"/releases/{main_rel}", {}, key, secret, sleep_after_ok=sleep_time)
-        rr = (rel.get("community") or {}).get("rating") or {}
-        
-        if not cover_image:
-            rel_images = rel.get("images", [])
-            if rel_images and len(rel_images) > 0:
-                cover_image = rel_images[0].get("uri")
-        
-        if rr.get("average") is None:
-            print(f"[RATING] Master {master_id}: NO RATING (main_release {main_rel} has no rating)")
-            return None, None, cover_image
-        
-        rating = float(rr["average"])
-        votes = int(rr.get("count", 0))
-        print(f"[RATING] Master {master_id}: rating={rating}, votes={votes} (from main_release {main_rel})")
-        return rating, votes, cover_image
-    except Exception as e:
-        print(f"[RATING] Master {master_id}: ERROR - {str(e)}")
-        return None, None, None
+def _log_seeded(result: SeedResult):
+    if result.discarded:
+        log_event("recommender-service", "WARNING", "[STATS] ⚠️  %s: %s albums discarded (no rating from Discogs)", result.name, result.discarded)
+    if result.status == "seeded":
+        log_event("recommender-service", "INFO", "[DB] ✓ Saved %s albums for '%s' to cache (discarded %s)", len(result.albums), result.name, result.discarded)
+    else:
+        log_event("recommender-service", "INFO", "[SEED] '%s': %s%s", result.name, result.status, f" ({result.error})" if result.error else "")
 
 
-def get_artist_studio_albums(artist_name: str, discogs_key: str, discogs_secret: str,
-                              top_n: int = 3, csv_mode: bool = False, cache_only: bool = False) -> List[StudioAlbum]:
+async def get_artist_studio_albums(artist_name: str, discogs_key: str, discogs_secret: str,
+                                   top_n: int = 3, csv_mode: bool = False, cache_only: bool = False) -> List[StudioAlbum]:
     # When cache_only=True, ignore expiry to prevent unnecessary Discogs searches
-    cached_albums = _get_cached_artist_albums(artist_name, ignore_expiry=cache_only)
-    if cached_albums:
-        result = []
-        for album_data in cached_albums[:top_n]:
-            discogs_type = "master" if album_data.get("discogs_master_id") else "release"
-            album = StudioAlbum(
-                title=album_data["title"],
-                year=album_data["year"],
-                discogs_master_id=album_data.get("discogs_master_id"),
-                discogs_release_id=album_data.get("discogs_release_id"),
-                discogs_type=discogs_type,
-                artist_name=artist_name,
-                rating=album_data.get("rating"),
-                votes=album_data.get("votes"),
-                cover_image=album_data.get("cover_url")
-            )
-            result.append(album)
-        return result
+    cached = _cached_studio_albums(artist_name, top_n, ignore_expiry=cache_only)
+    if cached:
+        return cached
     
     # If cache_only mode and not in cache, return empty list
     if cache_only:
-        print(f"[CACHE_ONLY] '{artist_name}' not in cache, skipping MusicBrainz/Discogs lookup")
-        return []
-    
-    mbid = _find_artist_mbid(artist_name)
-    if not mbid:
+        log_event("recommender-service", "DEBUG", "[CACHE_ONLY] '%s' not in cache, skipping MusicBrainz/Discogs lookup", artist_name)
         return []
-
-    release_groups = _fetch_release_groups(mbid, limit=100)
-    
-    studio_albums: List[StudioAlbum] = []
-    for rg in release_groups:
-        if not _is_studio_album(rg, mbid):
-            continue
-        
-        title = rg.get("title", "")
-        year = _year_from_date(rg)
-        rels = rg.get("relations", [])
-        discogs_master_id = _discogs_master_from_rels(rels)
-        
-        album = StudioAlbum(
-            title=title,
-            year=year,
-            discogs_master_id=discogs_master_id,
-            artist_name=artist_name,
-            rating=None,
-            votes=None
-        )
-        studio_albums.append(album)
-    
-    albums_with_discogs = []
-    albums_without_discogs = []
-    
-    for album in studio_albums:
-        if album.discogs_master_id:
-            albums_with_discogs.append(album)
-        else:
-            albums_without_discogs.append(album)
-    
-    for album in albums_without_discogs:
-        master_id = _search_discogs_master(artist_name, album.title, discogs_key, discogs_secret, csv_mode)
-        if master_id:
-            album.discogs_master_id = master_id
-            album.discogs_type = "master"
-            albums_with_discogs.append(album)
-        else:
-            release_id = _search_discogs_release(artist_name, album.title, discogs_key, discogs_secret, csv_mode)
-            if release_id:
-                album.discogs_release_id = release_id
-                album.discogs_type = "release"
-                albums_with_discogs.append(album)
-    
-    def fetch_data(album: StudioAlbum) -> StudioAlbum:
-        print(f"[ALBUM] Fetching rating for '{album.title}' ({album.year}) by {album.artist_name}")
-        
-        if album.discogs_type == "master" and album.discogs_master_id:
-            rating, votes, cover_image = _discogs_master_data(album.discogs_master_id, discogs_key, discogs_secret, csv_mode)
-        elif album.discogs_type == "release" and album.discogs_release_id:
-            rating, votes, cover_image = _discogs_release_data(album.discogs_release_id, discogs_key, discogs_secret, csv_mode)
-        else:
-            print(f"[ALBUM] '{album.title}': No Discogs ID available")
-            rating, votes, cover_image = None, None, None
-        
-        album.rating = rating
-        album.votes = votes
-        album.cover_image = cover_image
-        
-        if rating is not None:
-            print(f"[ALBUM] ✓ '{album.title}': FINAL rating={rating}, votes={votes}")
-        else:
-            print(f"[ALBUM] ✗ '{album.title}': NO RATING - will be discarded")
-        
-        return album
-    
-    # CSV mode: ultra-conservative (1 worker, slow)
-    # Normal mode: fast (5 workers, parallel)
-    max_workers = 1 if csv_mode else 5
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_album = {executor.submit(fetch_data, album): album for album in albums_with_discogs}
-        for future in as_completed(future_to_album):
-            try:
-                future.result()
-            except Exception:
-                pass
-    
-    rated_albums = [a for a in albums_with_discogs if a.rating is not None]
-    discarded_albums = [a for a in albums_with_discogs if a.rating is None]
-    rated_albums.sort(key=lambda a: (a.rating or 0, a.votes or 0), reverse=True)
     
-    total_found = len(albums_with_discogs)
-    with_rating = len(rated_albums)
-    without_rating = len(discarded_albums)
-    
-    if without_rating > 0:
-        print(f"[STATS] ⚠️  {artist_name}: {without_rating} albums discarded (no rating from Discogs)")
-        for album in discarded_albums:
-            print(f"  - '{album.title}' ({album.year})")
-    
-    if rated_albums and mbid:
-        artist_image = _get_artist_image_from_discogs(artist_name, discogs_key, discogs_secret, csv_mode)
-        _save_artist_albums(artist_name, mbid, rated_albums, artist_image)
-    
-    print(f"[DB] ✓ Saved {with_rating} albums for '{artist_name}' to cache (discarded {without_rating})")
-    
-    return rated_albums[:top_n]
+    result = await _seeding_engine(discogs_key, discogs_secret, csv_mode).seed_one(artist_name)
+    _log_seeded(result)
+    return [_to_studio_album(album, artist_name) for album in result.rated_albums[:top_n]]
 
 
-def get_artist_based_recommendations(artist_names: List[str], discogs_key: str,
-                                      discogs_secret: str, top_per_artist: int = 3,
-                                      progress_callback=None) -> List[Dict[str, Any]]:
+async def get_artist_based_recommendations(artist_names: List[str], discogs_key: str,
+                                           discogs_secret: str, top_per_artist: int = 3,
+                                           progress_callback=None, csv_mode: bool = False) -> List[Dict[str, Any]]:
+    """Cached artists are answered from the DB; the rest go through the seeding pipeline together"""
     all_albums: List[StudioAlbum] = []
+    misses: List[str] = []
+    done = 0
     
-    for idx, artist_name in enumerate(artist_names, 1):
+    for artist_name in artist_names:
+        cached = _cached_studio_albums(artist_name, top_per_artist)
+        if not cached:
+            misses.append(artist_name)
+            continue
+        all_albums.extend(cached)
+        done += 1
         if progress_callback:
-            progress_callback(idx, artist_name)
-        
-        artist_albums = get_artist_studio_albums(artist_name, discogs_key, discogs_secret, top_n=top_per_artist)
-        all_albums.extend(artist_albums)
+            progress_callback(done, artist_name)
+    
+    if misses:
+        def on_result(result: SeedResult):
+            nonlocal done
+            done += 1
+            _log_seeded(result)
+            if progress_callback:
+                progress_callback(done, result.name)
+        
+        results = await _seeding_engine(discogs_key, discogs_secret, csv_mode).seed_many(misses, on_result=on_result)
+        for result in results:
+            all_albums.extend(_to_studio_album(album, result.name) for album in result.rated_albums[:top_per_artist])
     
     all_albums.sort(key=lambda a: (a.rating or 0, a.votes or 0), reverse=True)
     
@@ -656,7 +347,7 @@ def get_artist_based_recommendations(artist_names: List[str], discogs_key: str,
             "votes": album.votes,
             "discogs_master_id": album.discogs_master_id or album.discogs_release_id,
             "discogs_type": album.discogs_type,
-            "image_url": album.cover_image or "https://via.placeholder.com/300x300?text=No+Cover",
+            "image_url": album.cover_image or NO_COVER_URL,
             "source": "artist_based"
         }
         recommendations.append(rec)
@@ -664,12 +355,13 @@ def get_artist_based_recommendations(artist_names: List[str], discogs_key: str,
     return recommendations
 
 
-def get_top_albums_from_discogs_search(artist_name: str, key: str, secret: str, limit: int = 3) -> List[Dict[str, Any]]:
+def get_top_albums_from_discogs_search(artist_name: str, key: str, secret: str, limit: int = 3,
+                                       csv_mode: bool = False) -> List[Dict[str, Any]]:
     """
     Search Discogs for Vinyl LPs by the artist, filter, sort by popularity, and return top albums.
     Used as a fallback when local DB has no data.
     """
-    print(f"[DISCOGS SEARCH] Searching top vinyls for: {artist_name}")
+    log_event("recommender-service", "INFO", "[DISCOGS SEARCH] Searching top vinyls for: %s", artist_name)
     
     try:
         # Search for Vinyl Albums/LPs by the artist
@@ -679,11 +371,11 @@ def get_top_albums_from_discogs_search(artist_name: str, key: str, secret: str,
             "format": "Vinyl,LP,Album",
             "type": "release",  # We want releases to get specific vinyl editions
             "per_page": 50      # Fetch enough to filter
-        }, key, secret, sleep_after_ok=1.0)
+        }, key, secret, csv_mode=csv_mode)
         
         results = data.get("results", [])
         if not results:
-            print(f"[DISCOGS SEARCH] No results found for {artist_name}")
+            log_event("recommender-service", "INFO", "[DISCOGS SEARCH] No results found for %s", artist_name)
             return []
             
         filtered_albums = []
@@ -747,14 +439,14 @@ def get_top_albums_from_discogs_search(artist_name: str, key: str, secret: str,
         # Take top N
         top_albums = filtered_albums[:limit]
         
-        print(f"[DISCOGS SEARCH] Found {len(filtered_albums)} valid albums, returning top {len(top_albums)}")
+        log_event("recommender-service", "INFO", "[DISCOGS SEARCH] Found %s valid albums, returning top %s", len(filtered_albums), len(top_albums))
         for alb in top_albums:
-            print(f"  - {alb['title']} (Score: {alb['score']}, Year: {alb['year']})")
+            log_event("recommender-service", "DEBUG", "  - %s (Score: %s, Year: %s)", alb['title'], alb['score'], alb['year'])
             
         return top_albums
         
     except Exception as e:
-        print(f"[DISCOGS SEARCH] Error searching for {artist_name}: {e}")
+        log_event("recommender-service", "WARNING", "[DISCOGS SEARCH] Error searching for %s: %s", artist_name, e)
         return []
 
 
@@ -772,7 +464,7 @@ def validate_album_with_discogs(artist_name: str, album_title: str, key: str, se
             "format": "Vinyl,LP,Album",
             "type": "release",
             "per_page": 5  # We only need to find one valid match
-        }, key, secret, sleep_after_ok=1.0)
+        }, key, secret)
         
         results = data.get("results", [])
         if not results:
@@ -817,5 +509,5 @@ def validate_album_with_discogs(artist_name: str, album_title: str, key: str, se
         return None
         
     except Exception as e:
-        print(f"[DISCOGS VALIDATION] Error validating {artist_name} - {album_title}: {e}")
+        log_event("recommender-service", "WARNING", "[DISCOGS VALIDATION] Error validating %s - %s: %s", artist_name, album_title, e)
         return None
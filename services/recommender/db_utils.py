@@ -4,6 +4,7 @@ from datetime import datetime
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from libs.shared.utils import log_event
+from libs.shared.metrics import TimedConnection
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "vinylbe.db")
 
@@ -15,7 +16,7 @@ def dict_factory(cursor, row):
 
 def get_db_connection():
     """Get SQLite connection and ensure required tables exist"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
     conn.row_factory = dict_factory
     _ensure_schema(conn)
     return conn
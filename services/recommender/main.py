@@ -1,8 +1,11 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
+import asyncio
 import sys
 import os
+import json
 from pathlib import Path
 from typing import List
 from pydantic import BaseModel
@@ -11,10 +14,15 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from libs.shared.models import ServiceHealth
 from libs.shared.utils import log_event
+from libs.shared.http_clients import close_http_clients, get_http_client
+from libs.shared.metrics import install_metrics, record_cache
+from libs.shared.tracing import install_tracing
+from libs.shared.profiling import install_profiling
 from . import db_utils
 from .scoring_engine import ScoringEngine
 from .album_aggregator import AlbumAggregator
-from .artist_recommendations import get_artist_based_recommendations, get_artist_studio_albums, get_top_albums_from_discogs_search
+from .merge import InterleavingMerge
+from .artist_recommendations import NO_COVER_URL, get_artist_based_recommendations, get_artist_studio_albums, get_top_albums_from_discogs_search
 
 SPOTIFY_SERVICE_URL = os.getenv("SPOTIFY_SERVICE_URL", "http://127.0.0.1:3005")
 
@@ -32,11 +40,17 @@ progress_state = {
 class ArtistRecommendationRequest(BaseModel):
     artist_names: List[str]
     top_per_artist: int = 3
+    # Background seeding (CSV import): any 1-10 artists, without touching the
+    # onboarding progress state
+    csv_mode: bool = False
 
 
 class MergeRecommendationsRequest(BaseModel):
-    artist_recommendations: List[dict]
+    artist_recommendations: List[dict] = []
     lastfm_recommendations: List[dict] = []
+    sources: List[List[dict]] = []
+    weights: List[int] = []
+    stream: bool = False
 
 
 class SingleArtistRequest(BaseModel):
@@ -53,6 +67,7 @@ async def lifespan(app: FastAPI):
     album_aggregator = AlbumAggregator()
     log_event("recommender-service", "INFO", "Recommendation Service started")
     yield
+    await close_http_clients()
     log_event("recommender-service", "INFO", "Recommendation Service stopped")
 
 
@@ -65,6 +80,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_metrics(app, "recommender")
+install_tracing(app, "recommender")
+install_profiling(app, "recommender")
 
 
 @app.get("/health")
@@ -79,8 +97,6 @@ async def health_check():
 async def lastfm_albums_recommendations(albums: List[dict]):
     """Simplified: user.gettopalbums → cache-first → fetch covers on-demand"""
     import time
-    import asyncio
-    import httpx
     from concurrent.futures import ThreadPoolExecutor
     from . import db_utils
     
@@ -96,94 +112,93 @@ async def lastfm_albums_recommendations(albums: List[dict]):
         """Run DB lookup in thread pool to avoid blocking"""
         return db_utils.get_cached_album(artist_name, album_name, mbid)
     
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            loop = asyncio.get_event_loop()
-            
-            for album_data in albums[:50]:
-                try:
-                    album_name = album_data.get("name", "").strip()
-                    mbid = album_data.get("mbid")
-                    artist_data = album_data.get("artist", {})
-                    
-                    if isinstance(artist_data, str):
-                        artist_name = artist_data.strip()
-                    else:
-                        artist_name = artist_data.get("name", "").strip()
-                    
-                    playcount = int(album_data.get("playcount", 0))
-                    
-                    if not album_name or not artist_name:
-                        continue
-                    
-                    cached_album = await loop.run_in_executor(
-                        executor, fetch_from_db, artist_name, album_name, mbid
-                    )
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        loop = asyncio.get_event_loop()
+        
+        for album_data in albums[:50]:
+            try:
+                album_name = album_data.get("name", "").strip()
+                mbid = album_data.get("mbid")
+                artist_data = album_data.get("artist", {})
+                
+                if isinstance(artist_data, str):
+                    artist_name = artist_data.strip()
+                else:
+                    artist_name = artist_data.get("name", "").strip()
+                
+                playcount = int(album_data.get("playcount", 0))
+                
+                if not album_name or not artist_name:
+                    continue
+                
+                cached_album = await loop.run_in_executor(
+                    executor, fetch_from_db, artist_name, album_name, mbid
+                )
+                
+                if cached_album:
+                    cache_hits += 1
+                    all_recommendations.append({
+                        "artist_name": artist_name,
+                        "album_name": cached_album["title"],
+                        "year": cached_album.get("year"),
+                        "discogs_master_id": cached_album.get("discogs_master_id"),
+                        "discogs_release_id": cached_album.get("discogs_release_id"),
+                        "rating": cached_album.get("rating"),
+                        "votes": cached_album.get("votes"),
+                        "cover_url": cached_album.get("cover_url"),
+                        "lastfm_playcount": playcount,
+                        "source": "lastfm"
+                    })
+                else:
+                    cache_misses += 1
                     
-                    if cached_album:
-                        cache_hits += 1
-                        all_recommendations.append({
-                            "artist_name": artist_name,
-                            "album_name": cached_album["title"],
-                            "year": cached_album.get("year"),
-                            "discogs_master_id": cached_album.get("discogs_master_id"),
-                            "discogs_release_id": cached_album.get("discogs_release_id"),
-                            "rating": cached_album.get("rating"),
-                            "votes": cached_album.get("votes"),
-                            "cover_url": cached_album.get("cover_url"),
-                            "lastfm_playcount": playcount,
-                            "source": "lastfm"
-                        })
-                    else:
-                        cache_misses += 1
+                    # Validate with Discogs instead of Spotify
+                    try:
+                        from .artist_recommendations import validate_album_with_discogs
                         
-                        # Validate with Discogs instead of Spotify
-                        try:
-                            from .artist_recommendations import validate_album_with_discogs
+                        discogs_album = await loop.run_in_executor(
+                            executor, validate_album_with_discogs,
+                            artist_name, album_name, discogs_key, discogs_secret
+                        )
+                        
+                        if discogs_album:
+                            # Album is valid in Discogs, use its data
+                            log_event("recommender-service", "INFO", 
+                                     f"✓ Validated with Discogs: {artist_name} - {album_name}")
                             
-                            discogs_album = await loop.run_in_executor(
-                                executor, validate_album_with_discogs,
-                                artist_name, album_name, discogs_key, discogs_secret
+                            # Save as partial record with Discogs IDs
+                            await loop.run_in_executor(
+                                executor, db_utils.create_basic_album_entry,
+                                artist_name, discogs_album["title"], discogs_album["cover_image"],
+                                mbid, None, None,
+                                discogs_album["discogs_master_id"], discogs_album["discogs_release_id"]
                             )
                             
-                            if discogs_album:
-                                # Album is valid in Discogs, use its data
-                                log_event("recommender-service", "INFO", 
-                                         f"✓ Validated with Discogs: {artist_name} - {album_name}")
-                                
-                                # Save as partial record with Discogs IDs
-                                await loop.run_in_executor(
-                                    executor, db_utils.create_basic_album_entry,
-                                    artist_name, discogs_album["title"], discogs_album["cover_image"],
-                                    mbid, None, None,
-                                    discogs_album["discogs_master_id"], discogs_album["discogs_release_id"]
-                                )
-                                
-                                all_recommendations.append({
-                                    "artist_name": artist_name,
-                                    "album_name": discogs_album["title"],
-                                    "year": discogs_album["year"],
-                                    "discogs_master_id": discogs_album["discogs_master_id"],
-                                    "discogs_release_id": discogs_album["discogs_release_id"],
-                                    "rating": None,
-                                    "votes": None,
-                                    "cover_url": discogs_album["cover_image"],
-                                    "lastfm_playcount": playcount,
-                                    "source": "lastfm",
-                                    "is_partial": 1
-                                })
-                            else:
-                                # Album not found or doesn't pass filters - SKIP IT
-                                log_event("recommender-service", "INFO", 
-                                         f"✗ Skipped (not in Discogs or filtered): {artist_name} - {album_name}")
-                        except Exception as e:
-                            log_event("recommender-service", "WARNING", 
-                                     f"Discogs validation failed: {artist_name} - {album_name}: {str(e)}")
-                        
-                except Exception as e:
-                    log_event("recommender-service", "ERROR", 
-                             f"Album error: {str(e)}")
-                    continue
+                            all_recommendations.append({
+                                "artist_name": artist_name,
+                                "album_name": discogs_album["title"],
+                                "year": discogs_album["year"],
+                                "discogs_master_id": discogs_album["discogs_master_id"],
+                                "discogs_release_id": discogs_album["discogs_release_id"],
+                                "rating": None,
+                                "votes": None,
+                                "cover_url": discogs_album["cover_image"],
+                                "lastfm_playcount": playcount,
+                                "source": "lastfm",
+                                "is_partial": 1
+                            })
+                        else:
+                            # Album not found or doesn't pass filters - SKIP IT
+                            log_event("recommender-service", "INFO", 
+                                     f"✗ Skipped (not in Discogs or filtered): {artist_name} - {album_name}")
+                    except Exception as e:
+                        log_event("recommender-service", "WARNING", 
+                                 f"Discogs validation failed: {artist_name} - {album_name}: {str(e)}")
+                    
+            except Exception as e:
+                log_event("recommender-service", "ERROR", 
+                         f"Album error: {str(e)}")
+                continue
     
     end_time = time.time()
     total_time = end_time - start_time
@@ -231,6 +246,7 @@ async def lastfm_recommendations(artists: List[dict]):
         
         cached_albums = artist_recommendations._get_cached_artist_albums(artist_name)
         
+        record_cache("recommender_artist_albums", hit=bool(cached_albums))
         if cached_albums:
             cache_hits += 1
             for album in cached_albums[:2]:
@@ -371,12 +387,25 @@ async def artist_recommendations(request: ArtistRecommendationRequest):
     if not discogs_key or not discogs_secret:
         raise HTTPException(status_code=500, detail="Discogs credentials not configured")
     
-    if len(request.artist_names) < 3:
+    if len(request.artist_names) < (1 if request.csv_mode else 3):
         raise HTTPException(status_code=400, detail="Minimum 3 artists required")
     
     if len(request.artist_names) > 10:
         raise HTTPException(status_code=400, detail="Maximum 10 artists allowed")
     
+    if request.csv_mode:
+        # No shared progress_state: concurrent import workers each seed their own artists
+        recommendations = await get_artist_based_recommendations(
+            request.artist_names,
+            discogs_key,
+            discogs_secret,
+            top_per_artist=request.top_per_artist,
+            csv_mode=True,
+        )
+        elapsed = time.time() - start_time
+        log_event("recommender-service", "INFO", f"Seeded {len(request.artist_names)} artists (CSV mode): {len(recommendations)} albums in {elapsed:.2f}s")
+        return {"recommendations": recommendations, "total": len(recommendations)}
+    
     progress_state = {
         "current": 0,
         "total": len(request.artist_names),
@@ -392,7 +421,7 @@ async def artist_recommendations(request: ArtistRecommendationRequest):
         progress_state["current_artist"] = artist_name
     
     try:
-        recommendations = get_artist_based_recommendations(
+        recommendations = await get_artist_based_recommendations(
             request.artist_names,
             discogs_key,
             discogs_secret,
@@ -412,68 +441,42 @@ async def artist_recommendations(request: ArtistRecommendationRequest):
 
 @app.post("/merge-recommendations")
 async def merge_recommendations(request: MergeRecommendationsRequest):
+    """
+    Weighted interleaving merge of ranked recommendation lists.
+    `sources`/`weights` merge any number of lists; without them the Last.fm
+    and artist lists are interleaved 1:1 as before. `stream=true` returns
+    NDJSON lines as they are merged.
+    """
     import time
     start_time = time.time()
     
-    artist_recs = request.artist_recommendations
-    lastfm_recs = request.lastfm_recommendations
+    if request.sources:
+        sources = request.sources
+    else:
+        sources = [request.lastfm_recommendations, request.artist_recommendations]
     
     log_event("recommender-service", "INFO", 
-              f"Merging {len(artist_recs)} artist + {len(lastfm_recs)} Last.fm recommendations")
+              f"Merging {' + '.join(str(len(source)) for source in sources)} recommendations from {len(sources)} sources")
     
-    seen_albums = set()
-    merged: List[dict] = []
-    max_len = max(len(artist_recs), len(lastfm_recs))
-    
-    def get_album_keys(rec: dict) -> list:
-        """Returns all possible keys for this album to handle metadata variations"""
-        keys = []
-        
-        if "album_info" in rec:
-            album_info = rec.get("album_info", {})
-            album = album_info.get("name", "").lower().strip()
-            artists_list = album_info.get("artists", [])
-            artist = artists_list[0].get("name", "") if artists_list else ""
-            artist = artist.lower().strip()
-        else:
-            album = rec.get("album_name", "").lower().strip()
-            artist = rec.get("artist_name", "").lower().strip()
-        
-        fallback_key = f"{artist}::{album}"
-        keys.append(fallback_key)
-        
-        discogs_master = rec.get("discogs_master_id")
-        if discogs_master:
-            keys.append(f"master::{discogs_master}")
-        
-        return keys
-    
-    def is_duplicate(rec: dict) -> bool:
-        """Check if album is already seen using any of its keys"""
-        rec_keys = get_album_keys(rec)
-        return any(key in seen_albums for key in rec_keys)
-    
-    def mark_as_seen(rec: dict):
-        """Mark all keys for this album as seen"""
-        rec_keys = get_album_keys(rec)
-        for key in rec_keys:
-            seen_albums.add(key)
-    
-    for i in range(max_len):
-        if i < len(lastfm_recs):
-            if not is_duplicate(lastfm_recs[i]):
-                mark_as_seen(lastfm_recs[i])
-                merged.append(lastfm_recs[i])
+    try:
+        merger = InterleavingMerge(sources, request.weights or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if request.stream:
+        def ndjson_stream():
+            for rec in merger.iter_merge():
+                yield json.dumps(rec) + "\n"
+            log_event("recommender-service", "INFO", 
+                      f"Streamed {merger.emitted} merged recommendations ({merger.duplicates_removed} duplicates removed)")
         
-        if i < len(artist_recs):
-            if not is_duplicate(artist_recs[i]):
-                mark_as_seen(artist_recs[i])
-                merged.append(artist_recs[i])
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    merged = merger.merge()
     
-    duplicates_removed = (len(artist_recs) + len(lastfm_recs)) - len(merged)
     elapsed = time.time() - start_time
     log_event("recommender-service", "INFO", 
-              f"Merged into {len(merged)} total recommendations ({duplicates_removed} duplicates removed) in {elapsed:.2f}s")
+              f"Merged into {len(merged)} total recommendations ({merger.duplicates_removed} duplicates removed) in {elapsed:.2f}s")
     return {"recommendations": merged, "total": len(merged)}
 
 
@@ -493,7 +496,7 @@ async def artist_single_recommendation(request: SingleArtistRequest):
     try:
         # 1. Try to get from DB (Cache Only)
         # This is FAST and checks if we already have quality data
-        albums = get_artist_studio_albums(
+        albums = await get_artist_studio_albums(
             request.artist_name,
             discogs_key,
             discogs_secret,
@@ -502,6 +505,7 @@ async def artist_single_recommendation(request: SingleArtistRequest):
             cache_only=True  # FORCE CACHE ONLY - Do not go to Discogs yet
         )
         
+        record_cache("recommender_artist_albums", hit=bool(albums))
         if albums:
             # CACHE HIT: We have data in DB, return it
             recommendations = []
@@ -514,7 +518,7 @@ async def artist_single_recommendation(request: SingleArtistRequest):
                     "votes": album.votes,
                     "discogs_master_id": album.discogs_master_id or album.discogs_release_id,
                     "discogs_type": album.discogs_type,
-                    "image_url": album.cover_image or "https://via.placeholder.com/300x300?text=No+Cover",
+                    "image_url": album.cover_image or NO_COVER_URL,
                     "source": "artist_based"
                 }
                 recommendations.append(rec)
@@ -529,11 +533,14 @@ async def artist_single_recommendation(request: SingleArtistRequest):
             log_event("recommender-service", "INFO", 
                      f"○ Cache MISS for {request.artist_name}. Using Discogs Search Fallback.")
             
-            discogs_albums = get_top_albums_from_discogs_search(
+            # Sync client that waits on the shared Discogs bucket: keep it off the event loop
+            discogs_albums = await asyncio.to_thread(
+                get_top_albums_from_discogs_search,
                 request.artist_name,
                 discogs_key,
                 discogs_secret,
-                limit=request.top_albums
+                limit=request.top_albums,
+                csv_mode=request.csv_mode
             )
             
             recommendations = []
@@ -555,7 +562,7 @@ async def artist_single_recommendation(request: SingleArtistRequest):
                     "votes": None,
                     "discogs_master_id": album["discogs_master_id"] or album["discogs_release_id"],
                     "discogs_type": "master" if album["discogs_master_id"] else "release",
-                    "image_url": album["cover_image"] or "https://via.placeholder.com/300x300?text=No+Cover",
+                    "image_url": album["cover_image"] or NO_COVER_URL,
                     "source": "artist_based_partial",
                     "is_partial": 1
                 }
@@ -576,94 +583,93 @@ async def artist_single_recommendation(request: SingleArtistRequest):
 async def _generate_spotify_recommendations(artist_name: str, top_albums: int, user_id: int = None):
     """Helper to generate recommendations using Spotify (fast fallback)"""
     import time
-    import httpx
     from . import db_utils
     
     start_time = time.time()
     log_event("recommender-service", "INFO", f"Generating Spotify recommendations for: {artist_name}")
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        # 1. Search artist to get ID
-        search_resp = await client.get(
-            f"{SPOTIFY_SERVICE_URL}/search/artists",
-            params={"q": artist_name, "limit": 1}
-        )
-        search_data = search_resp.json()
-        artists = search_data.get("artists", [])
-        
-        if not artists:
-            raise HTTPException(status_code=404, detail="Artist not found on Spotify")
-        
-        artist = artists[0]
-        spotify_artist_id = artist["id"]
-        artist_name = artist["name"]  # Use canonical name
-        
-        # 2. Get top albums
-        albums_resp = await client.get(
-            f"{SPOTIFY_SERVICE_URL}/artist/{spotify_artist_id}/albums",
-            params={"limit": top_albums + 5}  # Fetch a few more to filter
+    client = get_http_client("services")
+    # 1. Search artist to get ID
+    search_resp = await client.get(
+        f"{SPOTIFY_SERVICE_URL}/search/artists",
+        params={"q": artist_name, "limit": 1}
+    )
+    search_data = search_resp.json()
+    artists = search_data.get("artists", [])
+    
+    if not artists:
+        raise HTTPException(status_code=404, detail="Artist not found on Spotify")
+    
+    artist = artists[0]
+    spotify_artist_id = artist["id"]
+    artist_name = artist["name"]  # Use canonical name
+    
+    # 2. Get top albums
+    albums_resp = await client.get(
+        f"{SPOTIFY_SERVICE_URL}/artist/{spotify_artist_id}/albums",
+        params={"limit": top_albums + 5}  # Fetch a few more to filter
+    )
+    albums_data = albums_resp.json()
+    spotify_albums = albums_data.get("albums", [])
+    
+    recommendations = []
+    
+    # 3. Process albums (check cache or create partial)
+    for album in spotify_albums[:top_albums]:
+        # Check cache
+        cached = db_utils.get_cached_album(
+            artist_name, 
+            album["name"], 
+            spotify_id=album["id"]
         )
-        albums_data = albums_resp.json()
-        spotify_albums = albums_data.get("albums", [])
         
-        recommendations = []
-        
-        # 3. Process albums (check cache or create partial)
-        for album in spotify_albums[:top_albums]:
-            # Check cache
-            cached = db_utils.get_cached_album(
-                artist_name, 
-                album["name"], 
-                spotify_id=album["id"]
+        if cached:
+            # Use cached data (might be full or partial)
+            rec = {
+                "album_name": cached["title"],
+                "artist_name": cached["artist_name"],
+                "year": cached.get("year"),
+                "rating": cached.get("rating"),
+                "votes": cached.get("votes"),
+                "discogs_master_id": cached.get("discogs_master_id"),
+                "image_url": cached.get("cover_url"),
+                "spotify_id": cached.get("spotify_id"),
+                "is_partial": cached.get("is_partial", 0),
+                "source": "spotify"
+            }
+        else:
+            # Create partial entry
+            db_utils.create_basic_album_entry(
+                artist_name,
+                album["name"],
+                cover_url=album["image_url"],
+                spotify_id=album["id"],
+                artist_spotify_id=spotify_artist_id
             )
             
-            if cached:
-                # Use cached data (might be full or partial)
-                rec = {
-                    "album_name": cached["title"],
-                    "artist_name": cached["artist_name"],
-                    "year": cached.get("year"),
-                    "rating": cached.get("rating"),
-                    "votes": cached.get("votes"),
-                    "discogs_master_id": cached.get("discogs_master_id"),
-                    "image_url": cached.get("cover_url"),
-                    "spotify_id": cached.get("spotify_id"),
-                    "is_partial": cached.get("is_partial", 0),
-                    "source": "spotify"
-                }
-            else:
-                # Create partial entry
-                db_utils.create_basic_album_entry(
-                    artist_name,
-                    album["name"],
-                    cover_url=album["image_url"],
-                    spotify_id=album["id"],
-                    artist_spotify_id=spotify_artist_id
-                )
-                
-                rec = {
-                    "album_name": album["name"],
-                    "artist_name": artist_name,
-                    "year": album.get("release_date")[:4] if album.get("release_date") else None,
-                    "rating": None,
-                    "votes": None,
-                    "image_url": album["image_url"],
-                    "spotify_id": album["id"],
-                    "is_partial": 1,
-                    "source": "spotify"
-                }
-            
-            recommendations.append(rec)
-        
-        elapsed = time.time() - start_time
-        log_event("recommender-service", "INFO", 
-                 f"Generated {len(recommendations)} Spotify recommendations for {artist_name} in {elapsed:.2f}s")
+            rec = {
+                "album_name": album["name"],
+                "artist_name": artist_name,
+                "year": album.get("release_date")[:4] if album.get("release_date") else None,
+                "rating": None,
+                "votes": None,
+                "image_url": album["image_url"],
+                "spotify_id": album["id"],
+                "is_partial": 1,
+                "source": "spotify"
+            }
         
-        return {
-            "recommendations": recommendations, 
-            "total": len(recommendations), 
-            "artist_name": artist_name
-        }
+        recommendations.append(rec)
+    
+    elapsed = time.time() - start_time
+    log_event("recommender-service", "INFO", 
+             f"Generated {len(recommendations)} Spotify recommendations for {artist_name} in {elapsed:.2f}s")
+    
+    return {
+        "recommendations": recommendations, 
+        "total": len(recommendations), 
+        "artist_name": artist_name
+    }
 
 
 @app.post("/spotify-recommendations")
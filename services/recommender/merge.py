@@ -0,0 +1,91 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from libs.shared.utils import normalize_text
+
+
+def album_keys(rec: dict) -> Tuple[str, ...]:
+    """
+    All identity keys for a recommendation: normalized artist::album, plus the
+    Discogs master id when present, so metadata variations still dedupe.
+    """
+    if "album_info" in rec:
+        album_info = rec.get("album_info", {})
+        album = album_info.get("name", "")
+        artists_list = album_info.get("artists", [])
+        artist = artists_list[0].get("name", "") if artists_list else ""
+    else:
+        album = rec.get("album_name", "")
+        artist = rec.get("artist_name", "")
+
+    fallback_key = f"{normalize_text(artist)}::{normalize_text(album)}"
+
+    discogs_master = rec.get("discogs_master_id")
+    if discogs_master:
+        return (fallback_key, f"master::{discogs_master}")
+    return (fallback_key,)
+
+
+class InterleavingMerge:
+    """
+    Weighted k-way interleaving merge with key-based deduplication.
+
+    Each round takes up to `weights[i]` items from source i, in source order,
+    until every source is exhausted. An item is dropped when any of its keys
+    has already been emitted. Keys are computed once per item and looked up in
+    a single set, so each item costs O(1) regardless of how much was merged.
+
+    Sources may be lists or lazy iterators; `iter_merge` yields as it goes so
+    large inputs never need to be materialized twice.
+    """
+
+    def __init__(self, sources: Sequence[Iterable[dict]], weights: Optional[Sequence[int]] = None):
+        if weights is None:
+            weights = [1] * len(sources)
+        if len(weights) != len(sources):
+            raise ValueError("weights must have one entry per source")
+        if any(w < 1 for w in weights):
+            raise ValueError("weights must be positive integers")
+
+        self.sources = sources
+        self.weights = list(weights)
+        self.seen: set = set()
+        self.consumed = 0
+        self.emitted_by_source: List[int] = [0] * len(sources)
+
+    @property
+    def emitted(self) -> int:
+        return sum(self.emitted_by_source)
+
+    @property
+    def duplicates_removed(self) -> int:
+        return self.consumed - self.emitted
+
+    def iter_merge(self) -> Iterator[dict]:
+        seen = self.seen
+        emitted_by_source = self.emitted_by_source
+        active = [(idx, iter(source), weight) for idx, (source, weight) in enumerate(zip(self.sources, self.weights))]
+
+        while active:
+            still_active = []
+            for idx, items, weight in active:
+                taken = 0
+                for rec in islice(items, weight):
+                    taken += 1
+                    keys = album_keys(rec)
+                    if seen.isdisjoint(keys):
+                        seen.update(keys)
+                        emitted_by_source[idx] += 1
+                        yield rec
+                self.consumed += taken
+
+                if taken == weight:
+                    still_active.append((idx, items, weight))
+            active = still_active
+
+    def merge(self) -> List[dict]:
+        return list(self.iter_merge())
+
+
+def merge_recommendations(sources: Sequence[Iterable[dict]], weights: Optional[Sequence[int]] = None) -> List[dict]:
+    return InterleavingMerge(sources, weights).merge()
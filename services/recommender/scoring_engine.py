@@ -1,104 +1,108 @@
 from typing import List, Dict
+import numpy as np
 from libs.shared.utils import log_event
 
 
 class ScoringEngine:
+    """
+    Columnar scoring: playcounts, positions and period boosts are pulled into
+    NumPy arrays once and scored in a single vectorized pass. The returned
+    dicts are identical to the former per-track implementation.
+    """
+
     def __init__(self):
         self.time_range_boosts = {
             "short_term": 3.0,
             "medium_term": 2.0,
             "long_term": 1.0,
         }
-    
+
+    def _boosts(self, tracks: List[dict]) -> np.ndarray:
+        """Period boost per track (medium_term when time_range is missing)"""
+        boosts = self.time_range_boosts
+        return np.fromiter(
+            (boosts.get(track.get("time_range", "medium_term"), 1.0) for track in tracks),
+            dtype=np.float64,
+            count=len(tracks),
+        )
+
+    @staticmethod
+    def _playcounts(items: List[dict]) -> np.ndarray:
+        """Playcount column; Last.fm sends playcounts as strings"""
+        return np.fromiter(
+            (int(item.get("playcount", 0)) for item in items),
+            dtype=np.int64,
+            count=len(items),
+        )
+
     def score_tracks(self, tracks: List[dict]) -> List[dict]:
-        scored_tracks = []
-        
-        for idx, track in enumerate(tracks):
-            time_range = track.get("time_range", "medium_term")
-            boost = self.time_range_boosts.get(time_range, 1.0)
-            
-            position_score = 300 - (idx % 300)
-            
-            total_score = position_score * boost
-            
-            scored_track = {
-                **track,
-                "position": idx % 300,
-                "score": total_score,
-            }
-            scored_tracks.append(scored_track)
-        
-        return scored_tracks
-    
+        positions = np.arange(len(tracks)) % 300
+        scores = (300 - positions) * self._boosts(tracks)
+
+        return [
+            {**track, "position": position, "score": score}
+            for track, position, score in zip(tracks, positions.tolist(), scores.tolist())
+        ]
+
     def score_artists(self, artists: List[dict]) -> List[dict]:
-        scored_artists = []
-        
-        for idx, artist in enumerate(artists):
-            position_score = 300 - idx
-            
-            scored_artist = {
-                **artist,
-                "position": idx,
-                "score": position_score,
-            }
-            scored_artists.append(scored_artist)
-        
-        return scored_artists
-    
+        positions = np.arange(len(artists))
+        scores = 300 - positions
+
+        return [
+            {**artist, "position": position, "score": score}
+            for artist, position, score in zip(artists, positions.tolist(), scores.tolist())
+        ]
+
     def score_lastfm_tracks(self, tracks: List[dict]) -> List[dict]:
         """
         Score Last.fm tracks using playcount instead of position
         Last.fm tracks have: playcount, time_range (mapped from period)
         """
-        scored_tracks = []
-        
         if not tracks:
-            return scored_tracks
-        
-        max_playcount = max((int(t.get("playcount", 0)) for t in tracks), default=1)
-        
-        for idx, track in enumerate(tracks):
-            time_range = track.get("time_range", "medium_term")
-            boost = self.time_range_boosts.get(time_range, 1.0)
-            
-            playcount = int(track.get("playcount", 0))
-            playcount_score = (playcount / max_playcount) * 300 if max_playcount > 0 else 0
-            
-            total_score = playcount_score * boost
-            
-            scored_track = {
+            return []
+
+        playcounts = self._playcounts(tracks)
+        boosts = self._boosts(tracks)
+        max_playcount = int(playcounts.max())
+
+        if max_playcount > 0:
+            scores = (playcounts / max_playcount) * 300 * boosts
+        else:
+            scores = 0 * boosts
+
+        return [
+            {
                 **track,
                 "position": idx,
-                "score": total_score,
+                "score": score,
                 "playcount": playcount,
                 "source": "lastfm"
             }
-            scored_tracks.append(scored_track)
-        
-        return scored_tracks
-    
+            for idx, (track, playcount, score) in enumerate(zip(tracks, playcounts.tolist(), scores.tolist()))
+        ]
+
     def score_lastfm_artists(self, artists: List[dict]) -> List[dict]:
         """
         Score Last.fm artists using playcount
         """
-        scored_artists = []
-        
         if not artists:
-            return scored_artists
-        
-        max_playcount = max((int(a.get("playcount", 0)) for a in artists), default=1)
-        
-        for idx, artist in enumerate(artists):
-            playcount = int(artist.get("playcount", 0))
-            playcount_score = (playcount / max_playcount) * 300 if max_playcount > 0 else 0
-            
-            scored_artist = {
+            return []
+
+        playcounts = self._playcounts(artists)
+        max_playcount = int(playcounts.max())
+
+        if max_playcount > 0:
+            scores = ((playcounts / max_playcount) * 300).tolist()
+        else:
+            scores = [0] * len(artists)
+
+        return [
+            {
                 **artist,
                 "position": idx,
-                "score": playcount_score,
+                "score": score,
                 "playcount": playcount,
                 "source": "lastfm"
             }
-            scored_artists.append(scored_artist)
-        
-        return scored_artists
+            for idx, (artist, playcount, score) in enumerate(zip(artists, playcounts.tolist(), scores))
+        ]
@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import sys
+from typing import List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from libs.shared.utils import log_event, normalize_text
+from libs.shared.metrics import TimedConnection
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "vinylbe.db")
+
+
+def dict_factory(cursor, row):
+    d = {}
+    for idx, col in enumerate(cursor.description):
+        d[col[0]] = row[idx]
+    return d
+
+
+def get_db_connection():
+    conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
+    conn.row_factory = dict_factory
+    _ensure_schema(conn)
+    return conn
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    """spotify_id columns on artists/albums (albums.spotify_id is also added by the recommender)"""
+    cur = conn.cursor()
+    for table in ("artists", "albums"):
+        cur.execute(f"PRAGMA table_info({table})")
+        columns = [col["name"] for col in cur.fetchall()]
+        if columns and "spotify_id" not in columns:
+            try:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN spotify_id TEXT")
+                log_event("spotify-db", "INFO", f"✅ Added spotify_id column to {table}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e):
+                    log_event("spotify-db", "ERROR", f"Failed to add spotify_id to {table}: {e}")
+    try:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_artists_spotify_id ON artists(spotify_id)")
+    except sqlite3.OperationalError:
+        pass  # artists table not created yet
+    conn.commit()
+
+
+def save_artist_albums_spotify_ids(spotify_artist_id: str, albums: List[dict]) -> int:
+    """
+    Record Spotify ids for an artist and its albums on rows we already have.
+    Albums are matched by normalized title; existing spotify_id values are
+    never overwritten, and missing cover/year are filled in on the way.
+    Returns the number of albums updated.
+    """
+    if not albums:
+        return 0
+
+    artist_name = albums[0].get("artist_name")
+    if not artist_name:
+        return 0
+
+    try:
+        conn = get_db_connection()
+    except sqlite3.Error as e:
+        log_event("spotify-db", "WARNING", f"Cannot open DB to save Spotify ids: {e}")
+        return 0
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM artists WHERE LOWER(name) = LOWER(?)", (artist_name,))
+        artist = cur.fetchone()
+        if not artist:
+            return 0
+
+        cur.execute(
+            "UPDATE artists SET spotify_id = ? WHERE id = ? AND (spotify_id IS NULL OR spotify_id = '')",
+            (spotify_artist_id, artist["id"])
+        )
+
+        cur.execute(
+            "SELECT id, title FROM albums WHERE artist_id = ? AND (spotify_id IS NULL OR spotify_id = '')",
+            (artist["id"],)
+        )
+        by_title = {normalize_text(row["title"]): row["id"] for row in cur.fetchall()}
+
+        updates = [
+            (album["id"], album.get("image_url"), _year(album.get("release_date")), by_title[normalize_text(album["name"])])
+            for album in albums
+            if normalize_text(album.get("name")) in by_title
+        ]
+        cur.executemany(
+            """UPDATE OR IGNORE albums SET spotify_id = ?,
+                   cover_url = COALESCE(NULLIF(cover_url, ''), ?),
+                   year = COALESCE(NULLIF(year, ''), ?)
+               WHERE id = ?""",
+            updates
+        )
+        conn.commit()
+
+        if updates:
+            log_event("spotify-db", "INFO", f"Saved Spotify ids for {len(updates)} albums of '{artist_name}'")
+        return len(updates)
+    except sqlite3.Error as e:
+        conn.rollback()
+        log_event("spotify-db", "WARNING", f"Failed to save Spotify ids for '{artist_name}': {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+def _year(release_date: Optional[str]) -> Optional[str]:
+    return release_date[:4] if release_date else None
+
+
+def get_albums_missing_metadata(limit: int, after_album_id: int = 0) -> List[dict]:
+    """
+    Albums that have a spotify_id but no cover or year, in id order after
+    `after_album_id`, so rows Spotify has no cover or date for are not
+    fetched again on every pass.
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT id, spotify_id FROM albums
+               WHERE spotify_id IS NOT NULL AND spotify_id != ''
+                 AND (cover_url IS NULL OR cover_url = '' OR year IS NULL OR year = '')
+                 AND id > ?
+               ORDER BY id
+               LIMIT ?""",
+            (after_album_id, limit)
+        )
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def get_artists_missing_image(limit: int, after_artist_id: int = 0) -> List[dict]:
+    """Artists that have a spotify_id but no image, in id order after `after_artist_id`"""
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT id, spotify_id FROM artists
+               WHERE spotify_id IS NOT NULL AND spotify_id != ''
+                 AND (image_url IS NULL OR image_url = '')
+                 AND id > ?
+               ORDER BY id
+               LIMIT ?""",
+            (after_artist_id, limit)
+        )
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def get_artists_with_unmatched_albums(limit: int, after_artist_id: int = 0) -> List[dict]:
+    """
+    Artists with at least one album lacking a spotify_id, in id order after
+    `after_artist_id`, so a caller can walk the whole table with a cursor
+    without retrying artists Spotify could not match.
+    """
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT ar.id, ar.name, ar.spotify_id, COUNT(*) AS missing
+               FROM albums a
+               JOIN artists ar ON a.artist_id = ar.id
+               WHERE (a.spotify_id IS NULL OR a.spotify_id = '') AND ar.id > ?
+               GROUP BY ar.id
+               ORDER BY ar.id
+               LIMIT ?""",
+            (after_artist_id, limit)
+        )
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def update_album_metadata(albums: List[dict]) -> int:
+    """Fill missing cover/year from Spotify album objects (keyed by spotify_id)"""
+    if not albums:
+        return 0
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            """UPDATE OR IGNORE albums SET
+                   cover_url = COALESCE(NULLIF(cover_url, ''), ?),
+                   year = COALESCE(NULLIF(year, ''), ?)
+               WHERE spotify_id = ?""",
+            [(album.get("image_url"), _year(album.get("release_date")), album["id"]) for album in albums]
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def update_artist_images(artists: List[dict]) -> int:
+    if not artists:
+        return 0
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            "UPDATE artists SET image_url = ? WHERE spotify_id = ? AND (image_url IS NULL OR image_url = '')",
+            [(artist["image_url"], artist["id"]) for artist in artists if artist.get("image_url")]
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
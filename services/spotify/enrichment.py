@@ -0,0 +1,112 @@
+"""
+Batch backfill of Spotify metadata for DB albums and artists.
+
+Per-album lookups (/search?type=album) cost one Spotify call per album.
+This job works per artist and per batch instead:
+
+1. Artists with a spotify_id but no image: /artists?ids= (50 per call)
+2. Albums with a spotify_id but no cover/year: /albums?ids= (20 per call)
+3. Albums with no spotify_id: one artist search (skipped when
+   artists.spotify_id is known) plus one /artists/{id}/albums call per
+   artist, matched to DB titles. One or two calls cover every album of
+   that artist.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from libs.shared.retry import CooldownActive
+from libs.shared.utils import log_event, normalize_text
+from . import db_utils
+from .spotify_client import SpotifyClient
+
+
+async def resolve_artist_id(client: SpotifyClient, artist_name: str, fail_fast: bool = False) -> Optional[str]:
+    """Spotify id for an artist name (exact normalized name match only)"""
+    target = normalize_text(artist_name)
+    for artist in await client.search_artists(artist_name, limit=5, fail_fast=fail_fast):
+        if normalize_text(artist["name"]) == target:
+            return artist["id"]
+    return None
+
+
+async def enrich_artist(client: SpotifyClient, artist_name: str, spotify_artist_id: Optional[str] = None,
+                        fail_fast: bool = False) -> Dict[str, Any]:
+    """Match every DB album of one artist against its Spotify discography
+
+    With fail_fast, every Spotify call makes a single attempt and raises
+    CooldownActive during a 429 cooldown instead of waiting it out.
+    """
+    spotify_artist_id = spotify_artist_id or await resolve_artist_id(client, artist_name, fail_fast)
+    if not spotify_artist_id:
+        return {"artist_name": artist_name, "spotify_artist_id": None, "albums_matched": 0, "albums": []}
+
+    albums = await client.get_artist_albums(spotify_artist_id, limit=50, persist=False, fail_fast=fail_fast)
+    # The DB row is keyed by our artist name, which may differ in case/accents from Spotify's
+    albums = [{**album, "artist_name": artist_name} for album in albums]
+    matched = await asyncio.to_thread(db_utils.save_artist_albums_spotify_ids, spotify_artist_id, albums)
+    return {
+        "artist_name": artist_name,
+        "spotify_artist_id": spotify_artist_id,
+        "albums_matched": matched,
+        "albums": albums,
+    }
+
+
+async def run_batch_enrichment(client: SpotifyClient, max_albums: int = 200, max_artists: int = 25,
+                               after_artist_id: int = 0, after_image_artist_id: int = 0,
+                               after_album_id: int = 0) -> Dict[str, Any]:
+    """
+    One bounded pass of the backfill. Every step walks its rows in id order,
+    so rows Spotify has nothing for are tried once per run, not on every
+    pass. Call again with the returned cursors (after_artist_id=next_cursor,
+    after_image_artist_id=next_image_cursor, after_album_id=next_album_cursor)
+    until `done` is true.
+    """
+    stats = {
+        "artist_images_updated": 0,
+        "album_metadata_updated": 0,
+        "artists_scanned": 0,
+        "albums_matched": 0,
+        "next_cursor": after_artist_id,
+        "next_image_cursor": after_image_artist_id,
+        "next_album_cursor": after_album_id,
+        "rate_limited": False,
+    }
+    max_images = max_artists * 2
+    artists: List[dict] = []
+    albums: List[dict] = []
+    pending: List[dict] = []
+
+    try:
+        # 1. Artist images
+        artists = await asyncio.to_thread(db_utils.get_artists_missing_image, max_images, after_image_artist_id)
+        if artists:
+            fetched = await client.get_artists([a["spotify_id"] for a in artists])
+            stats["artist_images_updated"] = await asyncio.to_thread(db_utils.update_artist_images, fetched)
+            stats["next_image_cursor"] = artists[-1]["id"]
+
+        # 2. Cover / release date for albums that already have a spotify_id
+        albums = await asyncio.to_thread(db_utils.get_albums_missing_metadata, max_albums, after_album_id)
+        if albums:
+            fetched = await client.get_albums([a["spotify_id"] for a in albums])
+            stats["album_metadata_updated"] = await asyncio.to_thread(db_utils.update_album_metadata, fetched)
+            stats["next_album_cursor"] = albums[-1]["id"]
+
+        # 3. Albums without a spotify_id, one artist at a time
+        pending = await asyncio.to_thread(db_utils.get_artists_with_unmatched_albums, max_artists, after_artist_id)
+        for artist in pending:
+            result = await enrich_artist(client, artist["name"], artist.get("spotify_id"))
+            stats["artists_scanned"] += 1
+            stats["albums_matched"] += result["albums_matched"]
+            stats["next_cursor"] = artist["id"]
+    except CooldownActive:
+        stats["rate_limited"] = True
+
+    stats["done"] = (
+        not stats["rate_limited"]
+        and len(artists) < max_images
+        and len(albums) < max_albums
+        and len(pending) < max_artists
+    )
+    log_event("spotify-enrichment", "INFO", f"Batch enrichment pass: {stats}")
+    return stats
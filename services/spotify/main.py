@@ -4,13 +4,20 @@ from pathlib import Path
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from libs.shared.models import ServiceHealth
 from libs.shared.utils import log_event
+from libs.shared.http_clients import close_http_clients
+from libs.shared.retry import CooldownActive
+from libs.shared.metrics import install_metrics
+from libs.shared.tracing import install_tracing
+from libs.shared.profiling import install_profiling
 from .spotify_client import SpotifyClient
+from . import enrichment
 
 spotify_client: Optional[SpotifyClient] = None
 
@@ -32,6 +39,7 @@ async def lifespan(app: FastAPI):
     yield
     
     await spotify_client.close()
+    await close_http_clients()
     log_event("spotify-service", "INFO", "Spotify Service stopped")
 
 
@@ -44,6 +52,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+install_metrics(app, "spotify")
+install_tracing(app, "spotify")
+install_profiling(app, "spotify")
+
+
+def _rate_limited(e: CooldownActive) -> HTTPException:
+    log_event("spotify-service", "WARNING", f"Fail-fast request rejected: {e}")
+    return HTTPException(
+        status_code=503,
+        detail="Spotify rate limited, try again later",
+        headers={"Retry-After": str(max(1, round(e.retry_after)))}
+    )
 
 
 @app.get("/health")
@@ -54,13 +74,22 @@ async def health_check():
     ).dict()
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    if not spotify_client:
+        raise HTTPException(status_code=500, detail="Spotify client not initialized")
+    return spotify_client.cache_stats()
+
+
 @app.get("/search/artists")
-async def search_artists(q: str = Query(..., min_length=2), limit: int = Query(10, ge=1, le=50)):
+async def search_artists(q: str = Query(..., min_length=2), limit: int = Query(10, ge=1, le=50),
+                         fail_fast: bool = Query(False)):
     """Search for artists on Spotify
     
     Args:
         q: Search query (minimum 2 characters)
         limit: Number of results to return (default 10, max 50)
+        fail_fast: Return 503 immediately while rate limited instead of waiting
     
     Returns:
         List of artists with id, name, image_url, genres, popularity
@@ -69,11 +98,13 @@ async def search_artists(q: str = Query(..., min_length=2), limit: int = Query(1
         raise HTTPException(status_code=500, detail="Spotify client not initialized")
     
     try:
-        artists = await spotify_client.search_artists(q, limit)
+        artists = await spotify_client.search_artists(q, limit, fail_fast=fail_fast)
         return {
             "artists": artists,
             "total": len(artists)
         }
+    except CooldownActive as e:
+        raise _rate_limited(e)
     except Exception as e:
         log_event("spotify-service", "ERROR", f"Artist search failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
@@ -106,12 +137,13 @@ async def get_artist_albums(artist_id: str, limit: int = Query(20, ge=1, le=50))
 
 
 @app.get("/search/album")
-async def search_album(artist: str = Query(...), album: str = Query(...)):
+async def search_album(artist: str = Query(...), album: str = Query(...), fail_fast: bool = Query(False)):
     """Search for a specific album by artist and name
     
     Args:
         artist: Artist name
         album: Album name
+        fail_fast: Return 503 immediately while rate limited instead of waiting
     
     Returns:
         Album data or 404 if not found
@@ -120,7 +152,7 @@ async def search_album(artist: str = Query(...), album: str = Query(...)):
         raise HTTPException(status_code=500, detail="Spotify client not initialized")
     
     try:
-        result = await spotify_client.search_album(artist, album)
+        result = await spotify_client.search_album(artist, album, fail_fast=fail_fast)
         
         if not result:
             raise HTTPException(status_code=404, detail=f"Album not found: {artist} - {album}")
@@ -128,6 +160,96 @@ async def search_album(artist: str = Query(...), album: str = Query(...)):
         return result
     except HTTPException:
         raise
+    except CooldownActive as e:
+        raise _rate_limited(e)
     except Exception as e:
         log_event("spotify-service", "ERROR", f"Album search failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+class BatchIdsRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+class EnrichBatchRequest(BaseModel):
+    max_albums: int = Field(200, ge=1, le=2000)
+    max_artists: int = Field(25, ge=1, le=200)
+    after_artist_id: int = Field(0, ge=0)
+    after_image_artist_id: int = Field(0, ge=0)
+    after_album_id: int = Field(0, ge=0)
+
+
+@app.post("/albums/batch")
+async def get_albums_batch(request: BatchIdsRequest, fail_fast: bool = Query(False)):
+    """Album metadata for many Spotify ids (/albums?ids=, 20 per upstream call)"""
+    if not spotify_client:
+        raise HTTPException(status_code=500, detail="Spotify client not initialized")
+
+    try:
+        albums = await spotify_client.get_albums(request.ids, fail_fast=fail_fast)
+        return {"albums": albums, "total": len(albums)}
+    except CooldownActive as e:
+        raise _rate_limited(e)
+    except Exception as e:
+        log_event("spotify-service", "ERROR", f"Batch album lookup failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch lookup failed: {str(e)}")
+
+
+@app.post("/artists/batch")
+async def get_artists_batch(request: BatchIdsRequest, fail_fast: bool = Query(False)):
+    """Artist metadata for many Spotify ids (/artists?ids=, 50 per upstream call)"""
+    if not spotify_client:
+        raise HTTPException(status_code=500, detail="Spotify client not initialized")
+
+    try:
+        artists = await spotify_client.get_artists(request.ids, fail_fast=fail_fast)
+        return {"artists": artists, "total": len(artists)}
+    except CooldownActive as e:
+        raise _rate_limited(e)
+    except Exception as e:
+        log_event("spotify-service", "ERROR", f"Batch artist lookup failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch lookup failed: {str(e)}")
+
+
+@app.post("/enrich/batch")
+async def enrich_batch(request: EnrichBatchRequest):
+    """Backfill spotify_id, cover and release year for DB albums and artist images
+
+    Returns counters and cursors; call again with after_artist_id=next_cursor,
+    after_image_artist_id=next_image_cursor and after_album_id=next_album_cursor
+    until `done` is true.
+    """
+    if not spotify_client:
+        raise HTTPException(status_code=500, detail="Spotify client not initialized")
+
+    try:
+        return await enrichment.run_batch_enrichment(
+            spotify_client,
+            max_albums=request.max_albums,
+            max_artists=request.max_artists,
+            after_artist_id=request.after_artist_id,
+            after_image_artist_id=request.after_image_artist_id,
+            after_album_id=request.after_album_id,
+        )
+    except Exception as e:
+        log_event("spotify-service", "ERROR", f"Batch enrichment failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Enrichment failed: {str(e)}")
+
+
+@app.get("/enrich/artist")
+async def enrich_artist(artist: str = Query(..., min_length=1), fail_fast: bool = Query(False)):
+    """Match all DB albums of one artist to Spotify in one or two upstream calls
+
+    Returns the artist's Spotify albums, so callers can pick any album id
+    without a per-album search.
+    """
+    if not spotify_client:
+        raise HTTPException(status_code=500, detail="Spotify client not initialized")
+
+    try:
+        return await enrichment.enrich_artist(spotify_client, artist, fail_fast=fail_fast)
+    except CooldownActive as e:
+        raise _rate_limited(e)
+    except Exception as e:
+        log_event("spotify-service", "ERROR", f"Artist enrichment failed for '{artist}': {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Enrichment failed: {str(e)}")
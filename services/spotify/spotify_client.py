@@ -1,5 +1,5 @@
 import os
-import time
+import asyncio
 import httpx
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
@@ -7,7 +7,13 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from libs.shared.utils import log_event
+from libs.shared.utils import log_event, normalize_text
+from libs.shared.cache import LRUTTLCache
+from libs.shared.http_clients import close_http_client, get_http_client
+from libs.shared.retry import CooldownWindow, RetryPolicy, send_with_retry
+from . import db_utils
+
+_MISSING = object()
 
 
 class SpotifyClient:
@@ -15,17 +21,32 @@ class SpotifyClient:
     
     BASE_URL = "https://api.spotify.com/v1"
     AUTH_URL = "https://accounts.spotify.com/api/token"
+    ALBUMS_TTL = 24 * 3600.0
+    # Spotify multi-id endpoint limits
+    ALBUMS_BATCH = 20
+    ARTISTS_BATCH = 50
     
     def __init__(self, client_id: str, client_secret: str):
         self.client_id = client_id
         self.client_secret = client_secret
         self.access_token: Optional[str] = None
         self.token_expires_at: Optional[datetime] = None
-        self.http_client = httpx.AsyncClient(timeout=10.0)
+        # One cooldown per client: a 429 on any call pauses all Spotify calls
+        self.retry_policy = RetryPolicy(max_attempts=3, base_delay=1.0)
+        self.cooldown = CooldownWindow("spotify")
+        # Search results live 1h, artist albums / album lookups 24h
+        self.search_cache = LRUTTLCache(maxsize=2048, ttl=3600.0, name="spotify_search")
+        self.prefix_hits = 0
+        self._background_tasks = set()
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Pooled client from the shared registry"""
+        return get_http_client("spotify")
         
     async def close(self):
         """Close HTTP client"""
-        await self.http_client.aclose()
+        await close_http_client("spotify")
     
     async def _get_access_token(self) -> str:
         """Get or refresh access token using Client Credentials Flow"""
@@ -61,74 +82,58 @@ class SpotifyClient:
             log_event("spotify-client", "ERROR", f"Failed to get access token: {str(e)}")
             raise
     
-    async def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
-        """Make authenticated request to Spotify API with retry logic"""
-        token = await self._get_access_token()
+    async def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                            fail_fast: bool = False) -> Dict[str, Any]:
+        """Make authenticated request to Spotify API with async retry/backoff.
+        
+        fail_fast: single attempt, and CooldownActive is raised right away while
+        Spotify is rate limiting us instead of waiting for the cooldown.
+        """
+        if method != "GET":
+            raise ValueError(f"Unsupported method: {method}")
+        
         url = f"{self.BASE_URL}{endpoint}"
         
-        headers = {
-            "Authorization": f"Bearer {token}"
-        }
+        async def send() -> httpx.Response:
+            token = await self._get_access_token()
+            return await self.http_client.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
         
-        max_retries = 3
-        backoff = 1.0
-        
-        for attempt in range(1, max_retries + 1):
-            try:
-                if method == "GET":
-                    response = await self.http_client.get(url, headers=headers, params=params)
-                else:
-                    raise ValueError(f"Unsupported method: {method}")
-                
-                # Handle rate limiting
-                if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 60))
-                    log_event("spotify-client", "WARNING", f"Rate limited, waiting {retry_after}s")
-                    time.sleep(retry_after)
-                    continue
-                
-                response.raise_for_status()
-                return response.json()
-                
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 401 and attempt < max_retries:
-                    # Token might be invalid, refresh and retry
-                    log_event("spotify-client", "WARNING", "Token invalid, refreshing...")
-                    self.access_token = None
-                    token = await self._get_access_token()
-                    headers["Authorization"] = f"Bearer {token}"
-                    continue
-                    
-                log_event("spotify-client", "ERROR", f"HTTP error: {e.response.status_code} - {e.response.text}")
-                raise
-                
-            except Exception as e:
-                if attempt < max_retries:
-                    log_event("spotify-client", "WARNING", f"Request failed (attempt {attempt}/{max_retries}): {str(e)}")
-                    time.sleep(backoff)
-                    backoff *= 2
-                    continue
-                else:
-                    log_event("spotify-client", "ERROR", f"Request failed after {max_retries} attempts: {str(e)}")
-                    raise
+        response = await send_with_retry(send, self.retry_policy, self.cooldown, fail_fast, service="spotify-client")
         
-        raise RuntimeError("Max retries exceeded")
+        if response.status_code == 401 and not fail_fast:
+            # Token might be invalid, refresh and retry
+            log_event("spotify-client", "WARNING", "Token invalid, refreshing...")
+            self.access_token = None
+            response = await send_with_retry(send, self.retry_policy, self.cooldown, fail_fast, service="spotify-client")
+        
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            log_event("spotify-client", "ERROR", f"HTTP error: {e.response.status_code} - {e.response.text}")
+            raise
+        return response.json()
     
-    async def search_artists(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    async def search_artists(self, query: str, limit: int = 10, fail_fast: bool = False) -> List[Dict[str, Any]]:
         """Search for artists on Spotify
         
         Returns:
             List of artists with: id, name, image_url, genres, popularity
         """
+        limit = min(limit, 50)
+        key = normalize_text(query)
+        cached = self._cached_artist_search(key, limit)
+        if cached is not None:
+            return cached
+        
         log_event("spotify-client", "INFO", f"Searching artists: {query}")
         
         params = {
             "q": query,
             "type": "artist",
-            "limit": min(limit, 50)
+            "limit": limit
         }
         
-        data = await self._make_request("GET", "/search", params)
+        data = await self._make_request("GET", "/search", params, fail_fast=fail_fast)
         artists_data = data.get("artists", {}).get("items", [])
         
         artists = []
@@ -145,14 +150,40 @@ class SpotifyClient:
             })
         
         log_event("spotify-client", "INFO", f"Found {len(artists)} artists")
+        # complete: Spotify had no more matches, so the list can be filtered for longer queries
+        self.search_cache.set(("artists", key), {"limit": limit, "complete": len(artists_data) < limit, "artists": artists})
         return artists
     
-    async def get_artist_albums(self, artist_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    def _cached_artist_search(self, key: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Exact hit, or a cached shorter prefix ("radiohe" for "radiohead") filtered by name"""
+        entry = self.search_cache.get(("artists", key))
+        if entry is not None and (entry["limit"] >= limit or entry["complete"]):
+            return entry["artists"][:limit]
+        
+        for end in range(len(key) - 1, 1, -1):
+            entry = self.search_cache.get(("artists", key[:end]), count=False)
+            if entry is None:
+                continue
+            matches = [a for a in entry["artists"] if key in normalize_text(a["name"])]
+            if entry["complete"] or len(matches) >= limit:
+                self.prefix_hits += 1
+                log_event("spotify-client", "DEBUG", f"Artist search '{key}' served from cached prefix '{key[:end]}'")
+                return matches[:limit]
+            break
+        return None
+    
+    async def get_artist_albums(self, artist_id: str, limit: int = 20, persist: bool = True,
+                                fail_fast: bool = False) -> List[Dict[str, Any]]:
         """Get albums for an artist
         
         Returns:
             List of albums with: id, name, artist_name, image_url, release_date, total_tracks
         """
+        cache_key = ("artist_albums", artist_id, min(limit, 50))
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         log_event("spotify-client", "INFO", f"Getting albums for artist: {artist_id}")
         
         params = {
@@ -161,7 +192,7 @@ class SpotifyClient:
             "market": "ES"  # Filter by market to get available albums
         }
         
-        data = await self._make_request("GET", f"/artists/{artist_id}/albums", params)
+        data = await self._make_request("GET", f"/artists/{artist_id}/albums", params, fail_fast=fail_fast)
         albums_data = data.get("items", [])
         
         albums = []
@@ -192,14 +223,28 @@ class SpotifyClient:
             })
         
         log_event("spotify-client", "INFO", f"Found {len(albums)} unique albums")
+        self.search_cache.set(cache_key, albums, ttl=self.ALBUMS_TTL)
+        if persist:
+            self._persist_spotify_ids(artist_id, albums)
         return albums
     
-    async def search_album(self, artist_name: str, album_name: str) -> Optional[Dict[str, Any]]:
+    def _persist_spotify_ids(self, artist_id: str, albums: List[Dict[str, Any]]):
+        """Write artist/album spotify_id into the DB in the background"""
+        task = asyncio.create_task(asyncio.to_thread(db_utils.save_artist_albums_spotify_ids, artist_id, albums))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def search_album(self, artist_name: str, album_name: str, fail_fast: bool = False) -> Optional[Dict[str, Any]]:
         """Search for a specific album by artist and name
         
         Returns:
             Album data or None if not found
         """
+        cache_key = ("album", normalize_text(artist_name), normalize_text(album_name))
+        cached = self.search_cache.get(cache_key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
         log_event("spotify-client", "INFO", f"Searching album: {artist_name} - {album_name}")
         
         query = f"artist:{artist_name} album:{album_name}"
@@ -209,11 +254,12 @@ class SpotifyClient:
             "limit": 5
         }
         
-        data = await self._make_request("GET", "/search", params)
+        data = await self._make_request("GET", "/search", params, fail_fast=fail_fast)
         albums_data = data.get("albums", {}).get("items", [])
         
         if not albums_data:
             log_event("spotify-client", "INFO", f"Album not found: {artist_name} - {album_name}")
+            self.search_cache.set(cache_key, None)
             return None
         
         # Take first result (best match)
@@ -235,4 +281,59 @@ class SpotifyClient:
         }
         
         log_event("spotify-client", "INFO", f"Album found: {result['name']}")
+        self.search_cache.set(cache_key, result, ttl=self.ALBUMS_TTL)
         return result
+    
+    async def get_albums(self, album_ids: List[str], fail_fast: bool = False) -> List[Dict[str, Any]]:
+        """Album metadata for many ids via /albums?ids= (20 ids per call)
+        
+        Returns:
+            List of albums with: id, name, artist_name, artist_id, image_url, release_date, total_tracks
+        """
+        albums = []
+        for start in range(0, len(album_ids), self.ALBUMS_BATCH):
+            batch = album_ids[start:start + self.ALBUMS_BATCH]
+            data = await self._make_request("GET", "/albums", {"ids": ",".join(batch)}, fail_fast=fail_fast)
+            for album in data.get("albums", []):
+                if not album:
+                    continue  # unknown id
+                images = album.get("images", [])
+                artists = album.get("artists", [])
+                albums.append({
+                    "id": album["id"],
+                    "name": album["name"],
+                    "artist_name": artists[0]["name"] if artists else "Unknown",
+                    "artist_id": artists[0]["id"] if artists else None,
+                    "image_url": images[0]["url"] if images else None,
+                    "release_date": album.get("release_date"),
+                    "total_tracks": album.get("total_tracks", 0)
+                })
+        log_event("spotify-client", "INFO", f"Fetched {len(albums)} albums in {-(-len(album_ids) // self.ALBUMS_BATCH)} batch calls")
+        return albums
+    
+    async def get_artists(self, artist_ids: List[str], fail_fast: bool = False) -> List[Dict[str, Any]]:
+        """Artist metadata for many ids via /artists?ids= (50 ids per call)
+        
+        Returns:
+            List of artists with: id, name, image_url, genres, popularity
+        """
+        artists = []
+        for start in range(0, len(artist_ids), self.ARTISTS_BATCH):
+            batch = artist_ids[start:start + self.ARTISTS_BATCH]
+            data = await self._make_request("GET", "/artists", {"ids": ",".join(batch)}, fail_fast=fail_fast)
+            for artist in data.get("artists", []):
+                if not artist:
+                    continue
+                images = artist.get("images", [])
+                artists.append({
+                    "id": artist["id"],
+                    "name": artist["name"],
+                    "image_url": images[0]["url"] if images else None,
+                    "genres": artist.get("genres", []),
+                    "popularity": artist.get("popularity", 0)
+                })
+        log_event("spotify-client", "INFO", f"Fetched {len(artists)} artists in {-(-len(artist_ids) // self.ARTISTS_BATCH)} batch calls")
+        return artists
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        return {**self.search_cache.stats(), "prefix_hits": self.prefix_hits}
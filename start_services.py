@@ -27,15 +27,24 @@ if __name__ == "__main__":
     
     python_cmd = sys.executable
     
-    services = [
-        ("Discogs Service", [python_cmd, "-m", "uvicorn", "services.discogs.main:app", "--host", "0.0.0.0", "--port", "3001"]),
-        ("Recommender Service", [python_cmd, "-m", "uvicorn", "services.recommender.main:app", "--host", "0.0.0.0", "--port", "3002"]),
-        ("Pricing Service", [python_cmd, "-m", "uvicorn", "services.pricing.main:app", "--host", "0.0.0.0", "--port", "3003"]),
-        ("Last.fm Service", [python_cmd, "-m", "uvicorn", "services.lastfm.main:app", "--host", "0.0.0.0", "--port", "3004"]),
-        ("Spotify Service", [python_cmd, "-m", "uvicorn", "services.spotify.main:app", "--host", "0.0.0.0", "--port", "3005"]),
-        ("API Gateway", [python_cmd, "-m", "uvicorn", "gateway.main:app", "--host", "0.0.0.0", "--port", os.getenv("PORT", "5000")]),
-        ("DB Explorer", [python_cmd, "db_explorer/app.py"]),
-    ]
+    # INPROCESS=1: gateway and all services in one process (gateway/inprocess.py)
+    inprocess = os.getenv("INPROCESS", "").lower() in ("1", "true", "yes")
+    
+    if inprocess:
+        services = [
+            ("API Gateway (in-process services)", [python_cmd, "-m", "uvicorn", "gateway.inprocess:app", "--host", "0.0.0.0", "--port", os.getenv("PORT", "5000")]),
+            ("DB Explorer", [python_cmd, "db_explorer/app.py"]),
+        ]
+    else:
+        services = [
+            ("Discogs Service", [python_cmd, "-m", "uvicorn", "services.discogs.main:app", "--host", "0.0.0.0", "--port", "3001"]),
+            ("Recommender Service", [python_cmd, "-m", "uvicorn", "services.recommender.main:app", "--host", "0.0.0.0", "--port", "3002"]),
+            ("Pricing Service", [python_cmd, "-m", "uvicorn", "services.pricing.main:app", "--host", "0.0.0.0", "--port", "3003"]),
+            ("Last.fm Service", [python_cmd, "-m", "uvicorn", "services.lastfm.main:app", "--host", "0.0.0.0", "--port", "3004"]),
+            ("Spotify Service", [python_cmd, "-m", "uvicorn", "services.spotify.main:app", "--host", "0.0.0.0", "--port", "3005"]),
+            ("API Gateway", [python_cmd, "-m", "uvicorn", "gateway.main:app", "--host", "0.0.0.0", "--port", os.getenv("PORT", "5000")]),
+            ("DB Explorer", [python_cmd, "db_explorer/app.py"]),
+        ]
     
     for name, cmd in services:
         print(f"Starting {name}...")
@@ -44,11 +53,14 @@ if __name__ == "__main__":
         time.sleep(2)
     
     print("\nAll services started!")
-    print("- Discogs Service: http://localhost:3001")
-    print("- Recommender Service: http://localhost:3002")
-    print("- Pricing Service: http://localhost:3003")
-    print("- Last.fm Service: http://localhost:3004")
-    print("- Spotify Service: http://localhost:3005")
+    if inprocess:
+        print("- Backend services: in-process (no service ports)")
+    else:
+        print("- Discogs Service: http://localhost:3001")
+        print("- Recommender Service: http://localhost:3002")
+        print("- Pricing Service: http://localhost:3003")
+        print("- Last.fm Service: http://localhost:3004")
+        print("- Spotify Service: http://localhost:3005")
     print("- API Gateway: http://localhost:5000")
     print("- DB Explorer: http://localhost:5001")
     print("\nPress Ctrl+C to stop all services")
@@ -48,6 +48,9 @@ if __name__ == "__main__":
     # Obtener puerto del gateway desde variable de entorno (para Railway, Render, etc.)
     gateway_port = os.getenv("PORT", "5000")
     
+    # INPROCESS=1: gateway y todos los servicios en un solo proceso (gateway/inprocess.py)
+    inprocess = os.getenv("INPROCESS", "").lower() in ("1", "true", "yes")
+    
     services = [
         ("Discogs Service", [python_cmd, "-m", "uvicorn", "services.discogs.main:app", "--host", "0.0.0.0", "--port", "3001"]),
         ("Recommender Service", [python_cmd, "-m", "uvicorn", "services.recommender.main:app", "--host", "0.0.0.0", "--port", "3002"]),
@@ -56,6 +59,10 @@ if __name__ == "__main__":
         ("Spotify Service", [python_cmd, "-m", "uvicorn", "services.spotify.main:app", "--host", "0.0.0.0", "--port", "3005"]),
         ("API Gateway", [python_cmd, "-m", "uvicorn", "gateway.main:app", "--host", "0.0.0.0", "--port", gateway_port]),
     ]
+    if inprocess:
+        services = [
+            ("API Gateway (in-process services)", [python_cmd, "-m", "uvicorn", "gateway.inprocess:app", "--host", "0.0.0.0", "--port", gateway_port]),
+        ]
     
     for name, cmd in services:
         print(f"▶️  Starting {name}...")
@@ -83,11 +90,14 @@ if __name__ == "__main__":
     print("\n" + "="*60)
     print("🎉 All services started!")
     print("="*60)
-    print(f"📍 Discogs Service:     http://localhost:3001")
-    print(f"📍 Recommender Service: http://localhost:3002")
-    print(f"📍 Pricing Service:     http://localhost:3003")
-    print(f"📍 Last.fm Service:     http://localhost:3004")
-    print(f"📍 Spotify Service:     http://localhost:3005")
+    if inprocess:
+        print(f"📍 Backend services:    in-process")
+    else:
+        print(f"📍 Discogs Service:     http://localhost:3001")
+        print(f"📍 Recommender Service: http://localhost:3002")
+        print(f"📍 Pricing Service:     http://localhost:3003")
+        print(f"📍 Last.fm Service:     http://localhost:3004")
+        print(f"📍 Spotify Service:     http://localhost:3005")
     print(f"📍 API Gateway:         http://localhost:{gateway_port}")
     print("="*60)
     print("\n💡 Press Ctrl+C to stop all services\n")
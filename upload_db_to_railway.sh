@@ -27,7 +27,16 @@ echo "📡 Conectando a: $RAILWAY_URL"
 
 # Crear un backup de la base de datos actual en Railway (opcional)
 echo "📦 Descargando backup de la base de datos actual..."
-curl -f "$RAILWAY_URL/api/admin/db/download" -o "vinylbe.db.railway.backup.$(date +%Y%m%d_%H%M%S)" 2>/dev/null || echo "⚠️  No se pudo descargar backup (puede que no exista)"
+# El endpoint devuelve la base de datos comprimida con gzip. Para restaurarla:
+#   gunzip -c vinylbe.db.railway.backup.<fecha>.gz > vinylbe.db
+# o súbela tal cual a /api/admin/db/upload, que acepta gzip
+BACKUP_FILE="vinylbe.db.railway.backup.$(date +%Y%m%d_%H%M%S).gz"
+if curl -f "$RAILWAY_URL/api/admin/db/download" -o "$BACKUP_FILE" 2>/dev/null; then
+    echo "💾 Backup guardado en $BACKUP_FILE (gzip; restaurar con: gunzip -c $BACKUP_FILE > vinylbe.db)"
+else
+    rm -f "$BACKUP_FILE"
+    echo "⚠️  No se pudo descargar backup (puede que no exista)"
+fi
 
 # Subir la nueva base de datos
 echo "⬆️  Subiendo nueva base de datos..."